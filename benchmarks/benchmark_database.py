@@ -0,0 +1,548 @@
+#!/usr/bin/env python3
+"""
+データベース性能ベンチマーク
+DatabaseManager micro-benchmarks on synthetic data
+
+一時ディレクトリに合成データ（既定: 保有銘柄1万件・株価履歴100万行・
+アラート50万件）を生成し、DatabaseManager の公開メソッドごとに実行時間を
+計測する。結果は JSON の履歴ファイルへ追記し、同じデータ件数の前回結果と
+比べて遅くなったメソッドを表示する。ネットワークには接続しない。
+
+使い方:
+    python benchmarks/benchmark_database.py            # 既定の件数
+    python benchmarks/benchmark_database.py --quick    # 件数を1/100にした動作確認
+    python benchmarks/benchmark_database.py --only alerts
+    python benchmarks/benchmark_database.py --in-memory   # インメモリモードで計測
+"""
+
+import argparse
+import contextlib
+import io
+import itertools
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import unicodedata
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+# プロジェクトルートをパスに追加
+project_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(project_root / 'src'))
+
+from csv_parser import Holding
+from data_sources import StockInfo
+from database import DatabaseManager
+from db_connection import disable_in_memory
+from version import VERSION
+
+
+DEFAULT_HOLDINGS = 10000
+DEFAULT_PRICES = 1000000
+DEFAULT_ALERTS = 500000
+QUICK_SCALE = 100                   # --quick で件数を割る値
+
+PRICE_SYMBOLS = 1000                # 株価履歴の銘柄数（1銘柄あたりの日数は件数から決める）
+HOLDINGS_PER_SYMBOL = 4             # 証券会社2社 × 口座種別2種
+SNAPSHOT_DAYS = 20
+ISSUERS = 4000
+GENERATE_CHUNK = 100000
+
+DEFAULT_HISTORY = project_root / 'benchmarks' / 'results' / 'history.json'
+REGRESSION_THRESHOLD = 1.25         # 前回の中央値からこの倍率を超えたら警告
+MIN_COMPARE_MS = 1.0                # これより短い計測は誤差が大きいため比較しない
+
+BROKERS = ('SBI証券', '楽天証券')
+ACCOUNT_TYPES = ('特定', 'NISA')
+ALERT_TYPES = ('buy', 'sell', 'take_profit', 'stop_loss', 'dividend')
+STRATEGIES = ('default_strategy', 'dividend_focus', 'growth_value', None)
+
+
+def _symbol(index: int) -> str:
+    return str(1300 + index)
+
+
+def _business_days(end: date, count: int):
+    """end 以前の平日を古い順に count 日分"""
+    days = []
+    current = end
+    while len(days) < count:
+        if current.weekday() < 5:
+            days.append(current)
+        current -= timedelta(days=1)
+    return list(reversed(days))
+
+
+class SyntheticData:
+    """ベンチマーク用の合成データ生成（シード固定で毎回同じ内容）"""
+
+    def __init__(self, holdings: int, prices: int, alerts: int, seed: int = 42):
+        self.holdings = holdings
+        self.prices = prices
+        self.alerts = alerts
+        self.random = random.Random(seed)
+        self.end_date = date(2026, 3, 31)
+
+        self.holding_symbols = [_symbol(i) for i in range(max(1, holdings // HOLDINGS_PER_SYMBOL))]
+        self.price_symbols = [_symbol(i) for i in range(min(PRICE_SYMBOLS, max(1, prices)))]
+        days_per_symbol = max(1, prices // len(self.price_symbols))
+        self.price_dates = [day.isoformat() for day in _business_days(self.end_date, days_per_symbol)]
+
+    def holding_rows(self):
+        rows = []
+        for index in range(self.holdings):
+            symbol = self.holding_symbols[(index // HOLDINGS_PER_SYMBOL) % len(self.holding_symbols)]
+            if index >= len(self.holding_symbols) * HOLDINGS_PER_SYMBOL:
+                # 銘柄数×口座数を超える分は別銘柄にする（一意キーの重複を避ける）
+                symbol = _symbol(len(self.holding_symbols) + index)
+            quantity = self.random.randrange(100, 5000, 100)
+            average_cost = round(self.random.uniform(300, 8000), 1)
+            current_price = round(average_cost * self.random.uniform(0.6, 1.6), 1)
+            acquisition = quantity * average_cost
+            market_value = quantity * current_price
+            rows.append(Holding(
+                symbol=symbol,
+                name=f'銘柄{symbol}',
+                quantity=quantity,
+                average_cost=average_cost,
+                current_price=current_price,
+                acquisition_amount=acquisition,
+                market_value=market_value,
+                profit_loss=market_value - acquisition,
+                broker=BROKERS[index % 2],
+                account_type=ACCOUNT_TYPES[(index // 2) % 2],
+            ))
+        return rows
+
+    def issuer_rows(self):
+        """上場銘柄一覧（東証の銘柄数程度）"""
+        katakana = 'アイウエオカキクケコサシスセソタチツテトナニヌネノハヒフヘホマミムメモヤユヨラリルレロワン'
+        return [{
+            'code': _symbol(index),
+            'name': ''.join(self.random.choice(katakana) for _ in range(5)) + ('工業', '商事', 'ホールディングス')[index % 3],
+            'name_english': f'Company {index} Co., Ltd.',
+            'sector33_code': str(50 + index % 33 * 50),
+            'sector33_name': f'業種{index % 33}',
+            'market_name': 'プライム',
+        } for index in range(ISSUERS)]
+
+    def price_chunks(self):
+        """(symbol, date, open, high, low, close, volume) を GENERATE_CHUNK 行ずつ"""
+        chunk = []
+        for symbol in self.price_symbols:
+            price = self.random.uniform(300, 8000)
+            for day in self.price_dates:
+                open_price = price
+                price = max(1.0, price * (1 + self.random.gauss(0, 0.015)))
+                high = max(open_price, price) * (1 + abs(self.random.gauss(0, 0.005)))
+                low = min(open_price, price) * (1 - abs(self.random.gauss(0, 0.005)))
+                chunk.append((symbol, day, round(open_price, 1), round(high, 1), round(low, 1),
+                              round(price, 1), self.random.randrange(1000, 5000000)))
+                if len(chunk) >= GENERATE_CHUNK:
+                    yield chunk
+                    chunk = []
+        if chunk:
+            yield chunk
+
+    def alert_chunks(self):
+        """(symbol, alert_type, message, triggered_price, strategy_name, created_at) を GENERATE_CHUNK 行ずつ"""
+        start = datetime.combine(self.end_date, datetime.min.time()) - timedelta(days=365)
+        step = timedelta(days=365) / max(1, self.alerts)
+        chunk = []
+        for index in range(self.alerts):
+            symbol = self.random.choice(self.price_symbols)
+            alert_type = self.random.choice(ALERT_TYPES)
+            created_at = (start + step * index).strftime('%Y-%m-%d %H:%M:%S')
+            chunk.append((symbol, alert_type, f'{symbol} {alert_type} シグナル',
+                          round(self.random.uniform(300, 8000), 1),
+                          self.random.choice(STRATEGIES), created_at))
+            if len(chunk) >= GENERATE_CHUNK:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+
+def populate(db: DatabaseManager, data: SyntheticData) -> None:
+    """合成データを一時データベースへ投入"""
+    started = time.perf_counter()
+    db.insert_holdings(data.holding_rows())
+
+    price_columns = ('symbol', 'date', 'open_price', 'high_price', 'low_price', 'close_price', 'volume')
+    price_rows = 0
+    for chunk in data.price_chunks():
+        price_rows += db.import_table_rows('price_history', price_columns, chunk)
+
+    alert_rows = 0
+    for chunk in data.alert_chunks():
+        db.write_batch(chunk, [])
+        alert_rows += len(chunk)
+
+    for index, symbol in enumerate(data.price_symbols[:200]):
+        db.add_to_watchlist(symbol, f'銘柄{symbol}', STRATEGIES[index % 3], 1000.0, 2000.0)
+        db.add_to_wishlist(symbol, f'銘柄{symbol}', 1500.0, 'ベンチマーク')
+
+    db.upsert_fundamentals([{'code': symbol, 'disclosed_date': '2026-02-14', 'eps': 120.5, 'bps': 1500.0}
+                            for symbol in data.price_symbols])
+    for day in data.price_dates[-SNAPSHOT_DAYS:]:
+        db.save_portfolio_snapshot(day)
+    db.replace_issuers(data.issuer_rows())
+
+    print(f"📦 合成データ生成: 保有{db.get_holdings_count():,}件 / 株価履歴{price_rows:,}行 / "
+          f"アラート{alert_rows:,}件 ({time.perf_counter() - started:.1f}秒)")
+
+
+class Case:
+    """計測対象（method は DatabaseManager のメソッド名、label は表示名）"""
+
+    def __init__(self, method: str, func, label: str = None, setup=None, once: bool = False):
+        self.method = method
+        self.func = func
+        self.label = label or method
+        self.setup = setup
+        self.once = once            # 破壊的な処理は1回だけ実行する
+
+
+def build_cases(db: DatabaseManager, data: SyntheticData, work_dir: str):
+    """計測ケース一覧（読み込み → 書き込み → 破壊的な処理の順に実行する）"""
+    symbols = data.price_symbols
+    holding_symbols = data.holding_symbols
+    first, last = data.price_dates[0], data.price_dates[-1]
+    year_ago = data.price_dates[max(0, len(data.price_dates) - 245)]
+    # 全体の中ほどから読み始めるページ（キーセットページングの深いページ）
+    rows = db.get_alerts_page(limit=max(1, data.alerts // 2), as_records=True)['alerts']
+    middle_cursor = (rows[-1].created_at, rows[-1].id) if rows else None
+    del rows
+
+    counter = itertools.count()
+    new_holdings = [Holding(symbol=f'9{index:03d}', name='ベンチマーク', quantity=100, average_cost=1000.0,
+                            current_price=1100.0, acquisition_amount=100000.0, market_value=110000.0,
+                            profit_loss=10000.0, broker=BROKERS[0], account_type=ACCOUNT_TYPES[0])
+                    for index in range(100)]
+    price_updates = {symbol: round(data.random.uniform(300, 8000), 1) for symbol in holding_symbols}
+    stock_info = StockInfo(symbol=symbols[0], name='ベンチマーク', current_price=1234.5,
+                           previous_close=1200.0, change_percent=2.9, volume=100000)
+    bars = [(symbols[index % len(symbols)], f'2026-03-31 09:{index // len(symbols) % 60:02d}:00', 300,
+             1000.0, 1010.0, 990.0, 1005.0, 1000, 10)
+            for index in range(1000)]
+    batch_alerts = [(symbols[index % len(symbols)], 'buy', 'ベンチマーク', 1000.0, None,
+                     f'{last} 15:00:00') for index in range(1000)]
+    batch_prices = [(symbols[index % len(symbols)], last, 1000.0, 1000) for index in range(1000)]
+    fundamentals = [{'code': symbol, 'disclosed_date': '2026-02-14', 'eps': 121.0} for symbol in symbols]
+    import_rows = [(symbols[0], day, 1000.0, 1010.0, 990.0, 1005.0, 1000) for day in data.price_dates[-10000:]]
+    listener = lambda event, holdings: None
+
+    def first_chunk(table):
+        for rows in db.iter_table_rows(table, 10000):
+            return rows
+
+    def full_scan(table):
+        return sum(len(rows) for rows in db.iter_table_rows(table))
+
+    def watchlist_round_trip():
+        db.add_to_watchlist('9999', 'ベンチマーク', 'default_strategy', 1000.0, 2000.0)
+        return db.delete_from_watchlist('9999')
+
+    def wishlist_round_trip():
+        db.add_to_wishlist('9999', 'ベンチマーク', 1000.0)
+        return db.delete_from_wishlist('9999')
+
+    def snapshot_reads():
+        with db.snapshot():
+            db.get_watchlist(as_records=True)
+            db.get_alerts_page(limit=100)
+
+    def batched_writes():
+        with db.batch():
+            for index in range(100):
+                db.set_sync_state('benchmark_batch', str(index))
+
+    def monitor_cycle():
+        with db.unit_of_work() as uow:
+            with uow.reads():
+                db.get_all_holdings()
+                db.get_watchlist(as_records=True)
+            for symbol in symbols:
+                uow.save_price_history(symbol, stock_info)
+            for symbol in symbols[:20]:
+                uow.log_alert(symbol, 'buy', 'ベンチマーク', 1000.0, 'default_strategy')
+
+    issuers = data.issuer_rows()
+    deletions = iter(holding_symbols)
+
+    return [
+        # 読み込み
+        Case('get_schema_version', db.get_schema_version),
+        Case('get_all_holdings', db.get_all_holdings, 'get_all_holdings[cold]',
+             setup=db.holdings_store.invalidate),
+        Case('get_all_holdings', db.get_all_holdings, 'get_all_holdings[cached]'),
+        Case('get_all_holdings', lambda: db.get_all_holdings(as_records=True), 'get_all_holdings[records]'),
+        Case('get_holdings_by_symbol', lambda: db.get_holdings_by_symbol(holding_symbols[-1])),
+        Case('get_holding', lambda: db.get_holding(holding_symbols[-1])),
+        Case('get_holdings_count', db.get_holdings_count),
+        Case('get_portfolio_summary', db.get_portfolio_summary),
+        Case('get_watchlist', db.get_watchlist),
+        Case('get_watchlist', lambda: db.get_watchlist(as_records=True), 'get_watchlist[records]'),
+        Case('get_watchlist_count', db.get_watchlist_count),
+        Case('get_wishlist', db.get_wishlist),
+        Case('get_alerts', lambda: db.get_alerts(limit=100)),
+        Case('get_alerts_page', lambda: db.get_alerts_page(limit=100), 'get_alerts_page[first]'),
+        Case('get_alerts_page', lambda: db.get_alerts_page(limit=100, cursor=middle_cursor),
+             'get_alerts_page[deep]'),
+        Case('get_alerts_page', lambda: db.get_alerts_page(limit=100, symbol=symbols[0]),
+             'get_alerts_page[symbol]'),
+        Case('get_alerts_page', lambda: db.get_alerts_page(limit=100, as_records=True),
+             'get_alerts_page[records]'),
+        Case('get_price_series', lambda: db.get_price_series(symbols[0], first, last),
+             'get_price_series[1銘柄・全期間]'),
+        Case('get_price_series', lambda: db.get_price_series(symbols[:50], year_ago, last),
+             'get_price_series[50銘柄・1年]'),
+        Case('get_price_series', lambda: db.get_price_series(symbols[:50], year_ago, last,
+                                                             fields=('open', 'high', 'low', 'close'),
+                                                             as_numpy=True),
+             'get_price_series[50銘柄・OHLC・numpy]'),
+        Case('get_price_table', lambda: db.get_price_table(year_ago), 'get_price_table[全銘柄・1年]'),
+        Case('get_intraday_bars', lambda: db.get_intraday_bars(symbols[0])),
+        Case('get_table_columns', lambda: db.get_table_columns('price_history')),
+        Case('iter_table_rows', lambda: first_chunk('price_history'), 'iter_table_rows[1万行]'),
+        Case('iter_table_rows', lambda: full_scan('alerts'), 'iter_table_rows[alerts全件]'),
+        Case('get_fundamentals', lambda: db.get_fundamentals(symbols[-1])),
+        Case('get_sync_state', lambda: db.get_sync_state('portfolio_snapshot_last_date')),
+        Case('get_portfolio_snapshots', db.get_portfolio_snapshots),
+        Case('get_holding_snapshots', lambda: db.get_holding_snapshots(holding_symbols[-1])),
+        Case('get_issuer', lambda: db.get_issuer(symbols[-1])),
+        Case('get_issuers_count', db.get_issuers_count),
+        Case('get_issuer_sectors', db.get_issuer_sectors),
+        Case('search_issuers', lambda: db.search_issuers('13'), 'search_issuers[コード前方一致]'),
+        Case('search_issuers', lambda: db.search_issuers('ホールディングス'), 'search_issuers[銘柄名]'),
+        Case('search_issuers', lambda: db.search_issuers('company 12'), 'search_issuers[英語名]'),
+        Case('search_issuers', lambda: db.search_issuers('ホールデングス'), 'search_issuers[あいまい]'),
+        Case('snapshot', snapshot_reads, 'snapshot[監視銘柄+アラート]'),
+
+        # 書き込み（繰り返しても件数が増え続けないもの）
+        Case('subscribe_holdings', lambda: db.subscribe_holdings(listener)),
+        Case('unsubscribe_holdings', lambda: db.unsubscribe_holdings(listener)),
+        Case('insert_holdings', lambda: db.insert_holdings(new_holdings), 'insert_holdings[100件]'),
+        Case('update_current_prices', lambda: db.update_current_prices(price_updates),
+             f'update_current_prices[{len(price_updates)}銘柄]'),
+        Case('add_to_watchlist', lambda: db.add_to_watchlist(symbols[0], 'ベンチマーク', 'default_strategy',
+                                                             1000.0, 2000.0)),
+        Case('delete_from_watchlist', watchlist_round_trip, 'delete_from_watchlist[追加+削除]'),
+        Case('add_to_wishlist', lambda: db.add_to_wishlist(symbols[0], 'ベンチマーク', 1000.0)),
+        Case('delete_from_wishlist', wishlist_round_trip, 'delete_from_wishlist[追加+削除]'),
+        Case('log_alert', lambda: db.log_alert(symbols[0], 'buy', 'ベンチマーク', 1000.0, 'default_strategy')),
+        Case('write_batch', lambda: db.write_batch(batch_alerts, batch_prices), 'write_batch[1000+1000行]'),
+        Case('save_price_history', lambda: db.save_price_history(symbols[0], stock_info)),
+        Case('save_intraday_bars', lambda: db.save_intraday_bars(bars), 'save_intraday_bars[1000本]'),
+        Case('upsert_fundamentals', lambda: db.upsert_fundamentals(fundamentals),
+             f'upsert_fundamentals[{len(fundamentals)}件]'),
+        Case('set_sync_state', lambda: db.set_sync_state('benchmark', str(next(counter)))),
+        Case('import_table_rows', lambda: db.import_table_rows(
+            'price_history', ('symbol', 'date', 'open_price', 'high_price', 'low_price', 'close_price', 'volume'),
+            import_rows), f'import_table_rows[{len(import_rows)}行]'),
+        Case('save_portfolio_snapshot', lambda: db.save_portfolio_snapshot(last)),
+        Case('batch', batched_writes, 'batch[書き込み100回]'),
+        Case('unit_of_work', monitor_cycle, f'unit_of_work[{len(symbols)}銘柄の周期]'),
+        Case('replace_issuers', lambda: db.replace_issuers(issuers), f'replace_issuers[{len(issuers)}銘柄]'),
+
+        # 破壊的な処理（1回だけ）
+        Case('delete_intraday_bars', lambda: db.delete_intraday_bars('2026-04-01'), once=True),
+        Case('downsample_price_history', lambda: db.downsample_price_history(year_ago, year_ago), once=True),
+        Case('get_price_bars', lambda: db.get_price_bars(symbols[0], 'M')),
+        Case('archive_alerts', lambda: db.archive_alerts(f'{year_ago} 00:00:00',
+                                                         os.path.join(work_dir, 'archive.db')), once=True),
+        Case('compact', db.compact, once=True),
+        Case('delete_holding', lambda: db.delete_holding(next(deletions))),
+        Case('delete_holding_by_symbol', lambda: db.delete_holding_by_symbol(next(deletions))),
+        Case('clear_alerts', db.clear_alerts, once=True),
+        Case('delete_all_holdings', db.delete_all_holdings, once=True),
+        Case('init_database', db.init_database, once=True),
+        Case('persist', db.persist, once=True),
+        Case('close', db.close, once=True),
+    ]
+
+
+def _pad(text: str, width: int) -> str:
+    """全角文字を2桁として左詰め"""
+    used = sum(2 if unicodedata.east_asian_width(char) in 'WF' else 1 for char in text)
+    return text + ' ' * max(0, width - used)
+
+
+def public_methods():
+    return sorted(name for name, value in vars(DatabaseManager).items()
+                  if not name.startswith('_') and callable(value))
+
+
+def measure(case: Case, repeat: int, warmup: int):
+    """実行時間（ミリ秒）を計測"""
+    runs = 1 if case.once else repeat
+    # 削除メソッド等の表示出力は計測結果に混ぜない
+    with contextlib.redirect_stdout(io.StringIO()):
+        return _measure(case, runs, 0 if case.once else warmup)
+
+
+def _measure(case: Case, runs: int, warmup: int):
+    for _ in range(warmup):
+        if case.setup:
+            case.setup()
+        case.func()
+
+    timings = []
+    for _ in range(runs):
+        if case.setup:
+            case.setup()
+        started = time.perf_counter()
+        case.func()
+        timings.append((time.perf_counter() - started) * 1000)
+
+    return {
+        'method': case.method,
+        'runs': runs,
+        'min_ms': round(min(timings), 4),
+        'median_ms': round(statistics.median(timings), 4),
+    }
+
+
+def git_revision():
+    """計測したコードのコミット（gitがなければNone）"""
+    try:
+        result = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=project_root,
+                                capture_output=True, text=True, timeout=10)
+        return result.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def load_history(path: Path):
+    if not path.exists():
+        return []
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        print(f"⚠️ 履歴ファイル読み込みエラー: {e} - 新しく作成します")
+        return []
+
+
+def save_history(path: Path, history) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(history, f, ensure_ascii=False, indent=2)
+
+
+def compare(previous, current, threshold: float):
+    """前回より遅くなったケースの一覧 [(label, 前回ms, 今回ms)]"""
+    regressions = []
+    for label, result in current['results'].items():
+        before = previous['results'].get(label)
+        if not before or before['median_ms'] < MIN_COMPARE_MS:
+            continue
+        if result['median_ms'] > before['median_ms'] * threshold:
+            regressions.append((label, before['median_ms'], result['median_ms']))
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='DatabaseManager の性能ベンチマーク（合成データ・オフライン）')
+    parser.add_argument('--holdings', type=int, default=DEFAULT_HOLDINGS, help='保有銘柄の件数')
+    parser.add_argument('--prices', type=int, default=DEFAULT_PRICES, help='株価履歴の行数')
+    parser.add_argument('--alerts', type=int, default=DEFAULT_ALERTS, help='アラートの件数')
+    parser.add_argument('--quick', action='store_true', help=f'件数を1/{QUICK_SCALE}にして実行')
+    parser.add_argument('--repeat', type=int, default=5, help='1ケースあたりの計測回数')
+    parser.add_argument('--warmup', type=int, default=1, help='計測前の空実行回数')
+    parser.add_argument('--only', help='ラベルにこの文字列を含むケースだけ計測')
+    parser.add_argument('--history', type=Path, default=DEFAULT_HISTORY, help='結果を追記するJSONファイル')
+    parser.add_argument('--no-save', action='store_true', help='履歴に保存しない')
+    parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD,
+                        help='前回比でこの倍率を超えたら性能低下とみなす')
+    parser.add_argument('--in-memory', action='store_true', help='インメモリモード（DatabaseManager(in_memory=True)）で計測')
+    parser.add_argument('--fail-on-regression', action='store_true', help='性能低下があれば終了コード1')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.quick:
+        args.holdings //= QUICK_SCALE
+        args.prices //= QUICK_SCALE
+        args.alerts //= QUICK_SCALE
+    sizes = {'holdings': args.holdings, 'prices': args.prices, 'alerts': args.alerts}
+    storage = 'memory' if args.in_memory else 'file'
+
+    print("⏱️ データベースベンチマーク開始")
+    print(f"   バージョン {VERSION} / Python {platform.python_version()} / SQLite {sqlite3.sqlite_version}"
+          f" / {storage}")
+
+    results = {}
+    with tempfile.TemporaryDirectory() as work_dir:
+        db_path = os.path.join(work_dir, 'benchmark.db')
+        # 書き戻しは persist ケースで計測する
+        db = DatabaseManager(db_path, in_memory=args.in_memory, persist_interval=0)
+        data = SyntheticData(**sizes)
+        populate(db, data)
+        cases = build_cases(db, data, work_dir)
+
+        covered = {case.method for case in cases}
+        missing = [name for name in public_methods() if name not in covered]
+        if missing:
+            print(f"⚠️ 計測ケースのないメソッド: {', '.join(missing)}")
+
+        print(f"\n{_pad('ケース', 48)}{'回数':>6}{'最小(ms)':>12}{'中央値(ms)':>12}")
+        for case in cases:
+            if args.only and args.only not in case.label:
+                continue
+            try:
+                result = measure(case, max(1, args.repeat), max(0, args.warmup))
+            except Exception as e:
+                print(f"❌ {case.label}: {e}")
+                continue
+            results[case.label] = result
+            print(f"{_pad(case.label, 48)}{result['runs']:>6}{result['min_ms']:>12.3f}{result['median_ms']:>12.3f}")
+        db.close()
+        # 一時ディレクトリの削除後に終了時の書き戻しが走らないようにする
+        disable_in_memory(db_path)
+
+    entry = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'version': VERSION,
+        'git_revision': git_revision(),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'platform': platform.platform(),
+        'sizes': sizes,
+        'storage': storage,
+        'repeat': args.repeat,
+        'results': results,
+    }
+
+    history = load_history(args.history)
+    previous = next((run for run in reversed(history) if run.get('sizes') == sizes
+                     and run.get('storage', 'file') == storage), None)
+    regressions = []
+    if previous:
+        regressions = compare(previous, entry, args.threshold)
+        print(f"\n📊 前回（{previous['version']} {previous.get('git_revision') or ''} "
+              f"{previous['timestamp']}）との比較")
+        if regressions:
+            for label, before, after in regressions:
+                print(f"⚠️ {label}: {before:.3f}ms → {after:.3f}ms ({after / before:.2f}倍)")
+        else:
+            print(f"✅ {args.threshold}倍を超えて遅くなったケースはありません")
+
+    if not args.no_save:
+        history.append(entry)
+        save_history(args.history, history)
+        print(f"💾 結果を保存しました: {args.history}")
+
+    return 1 if regressions and args.fail_on_regression else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -347,7 +347,14 @@ class AlertManager:
 評価金額: ¥{portfolio_summary.get('total_market_value', 0):,.0f}
 損益: ¥{portfolio_summary.get('total_profit_loss', 0):+,.0f}
 収益率: {portfolio_summary.get('return_rate', 0):+.2f}%
-
+"""
+        
+        # 日次スナップショットの前日比（DailySnapshotJob.get_daily_change の値を渡した場合）
+        if portfolio_summary.get('previous_market_value'):
+            report += (f"前日比: ¥{portfolio_summary.get('day_change', 0):+,.0f} "
+                       f"({portfolio_summary.get('day_change_rate', 0):+.2f}%)\n")
+        
+        report += """
 === 本日のアラート ===
 """
         
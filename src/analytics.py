@@ -0,0 +1,409 @@
+"""
+横断分析モジュール
+Vectorized cross-sectional analytics over the price history
+
+「52週安値にある保有銘柄」「全銘柄の20日ボラティリティ」「今月の業種別騰落率」の
+ように全銘柄・全期間をまとめて見る集計は、SQLiteで1行ずつ処理すると遅い。
+AnalyticsService は株価履歴を一度だけ列指向で読み込み、銘柄ごとの範囲・対数収益率を
+前計算しておき、以降の集計をメモリ上のベクトル演算として行う。
+
+DuckDB がインストールされていればDuckDBの表に読み込んでSQLで集計し、なければ
+pandas / numpy で同じ結果を計算する。読み込み元はSQLite（DatabaseManager）か、
+ColumnarExporter で書き出したParquet / Arrow のディレクトリ。正となるデータは
+常にSQLiteで、読み込んだ後の変更は refresh() を呼ぶまで反映されない。
+
+    analytics = AnalyticsService(db)
+    lows = analytics.holdings_at_52_week_low()
+    volatility = analytics.rolling_volatility(window=20)
+    sectors = analytics.sector_returns('2024-06')
+
+duckdb はオプション依存（pip install duckdb）。
+"""
+
+import os
+import threading
+from datetime import datetime
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from logger import app_logger
+
+try:
+    import duckdb
+    DUCKDB_AVAILABLE = True
+except ImportError:
+    DUCKDB_AVAILABLE = False
+    app_logger.info("duckdb not available. Analytics uses pandas. Install with: pip install duckdb")
+
+
+ENGINES = ('duckdb', 'pandas')
+
+TRADING_DAYS_PER_YEAR = 252
+VOLATILITY_WINDOW = 20       # 営業日
+LOOKBACK_DAYS_52_WEEKS = 365
+
+_PRICE_COLUMNS = ['symbol', 'date', 'high', 'low', 'close']
+_LOW_COLUMNS = ['symbol', 'name', 'date', 'close', 'low', 'low_52w', 'high_52w', 'from_low_pct']
+_VOLATILITY_COLUMNS = ['symbol', 'date', 'volatility']
+_SECTOR_COLUMNS = ['sector33_code', 'sector33_name', 'symbols', 'mean_return_pct', 'median_return_pct']
+
+
+def _month_range(month: str):
+    """'YYYY-MM' → (月初, 翌月初)"""
+    start = pd.Timestamp(datetime.strptime(month, '%Y-%m'))
+    return start, start + pd.offsets.MonthBegin(1)
+
+
+class _PriceIndex:
+    """銘柄・日付順の株価履歴の配列と、銘柄ごとの行範囲 [starts, ends)（pandas エンジン用）"""
+
+    def __init__(self, prices: pd.DataFrame):
+        codes, symbols = pd.factorize(prices['symbol'], sort=False)
+        self.symbols = pd.Index(symbols)
+        if len(codes):
+            self.starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+            self.ends = np.append(self.starts[1:], len(codes))
+        else:
+            self.starts = self.ends = np.array([], dtype=np.int64)
+
+        days = prices['date'].to_numpy('datetime64[D]').astype(np.int64)
+        self.base_day = int(days.min()) if len(days) else 0
+        self.days = days - self.base_day
+        # 銘柄番号と日付を1つの昇順のキーにして、銘柄内の日付位置を二分探索する
+        self.span = int(self.days.max()) + 2 if len(days) else 1
+        self.keys = codes.astype(np.int64) * self.span + self.days
+
+        self.dates = prices['date'].to_numpy()
+        self.close = prices['close'].to_numpy(np.float64)
+        self.low = prices['low'].fillna(prices['close']).to_numpy(np.float64)
+        self.high = prices['high'].fillna(prices['close']).to_numpy(np.float64)
+        returns = np.empty_like(self.close)
+        returns[1:] = np.diff(np.log(self.close))
+        # 銘柄の最初の行は前の銘柄との差になるため除外
+        returns[self.starts] = np.nan
+        self.returns = returns
+
+    def position(self, groups: np.ndarray, day, side: str) -> np.ndarray:
+        """各銘柄の行範囲で、日付（base_day からの日数）が day の位置"""
+        # 範囲外の日付が隣の銘柄のキーにならないよう丸める
+        day = np.clip(day, -1, self.span - 1)
+        return np.searchsorted(self.keys, groups.astype(np.int64) * self.span + day, side=side)
+
+    def day(self, timestamp: pd.Timestamp) -> int:
+        return int(np.datetime64(timestamp, 'D').astype(np.int64)) - self.base_day
+
+    @staticmethod
+    def reduce(ufunc, values: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+        """空でない範囲 [starts, ends) ごとに ufunc で集約"""
+        if not len(starts):
+            return np.array([], dtype=values.dtype)
+        # [s0, e0, s1, e1, ...] の偶数番目が各範囲の集約（奇数番目は捨てる）
+        bounds = np.column_stack([starts, ends]).ravel()
+        return ufunc.reduceat(np.append(values, values[-1]), bounds)[::2]
+
+
+class AnalyticsService:
+    """株価履歴の横断的な集計（DuckDB があればDuckDB、なければ pandas で計算）"""
+
+    def __init__(self, db, parquet_dir: Optional[str] = None, engine: Optional[str] = None):
+        """
+        Args:
+            db: DatabaseManager（保有銘柄・業種は常にここから読む）
+            parquet_dir: ColumnarExporter の出力先。指定すると株価履歴をSQLiteではなく
+                parquet_dir/price_history/ から読み込む
+            engine: 'duckdb' / 'pandas'（Noneなら使えるほう）
+        """
+        if engine is None:
+            engine = 'duckdb' if DUCKDB_AVAILABLE else 'pandas'
+        if engine not in ENGINES:
+            raise ValueError(f"不明な集計エンジン: {engine}")
+        if engine == 'duckdb' and not DUCKDB_AVAILABLE:
+            raise RuntimeError("duckdb エンジンには duckdb が必要です（pip install duckdb）")
+
+        self.db = db
+        self.parquet_dir = parquet_dir
+        self.engine = engine
+        self.loaded_at: Optional[datetime] = None
+        self.row_count = 0
+        self._index: Optional[_PriceIndex] = None
+        self._duck = None
+        # DuckDBの接続は複数スレッドから同時に使えないため、集計を1つずつ行う
+        self._lock = threading.RLock()
+
+    def refresh(self) -> None:
+        """読み込んだ株価履歴を捨てる（次の集計で読み直す）"""
+        with self._lock:
+            if self._duck is not None:
+                self._duck.close()
+            self._duck = None
+            self._index = None
+            self.loaded_at = None
+
+    def close(self) -> None:
+        self.refresh()
+
+    def _read_prices(self) -> pd.DataFrame:
+        """株価履歴を symbol, date, high, low, close の縦持ちで読み込む（銘柄・日付順）"""
+        if self.parquet_dir:
+            from data_export import ColumnarExporter
+            table = ColumnarExporter(self.db).read_table(
+                os.path.join(self.parquet_dir, 'price_history'),
+                columns=['symbol', 'date', 'high_price', 'low_price', 'close_price'])
+            prices = table.to_pandas().rename(columns={
+                'high_price': 'high', 'low_price': 'low', 'close_price': 'close'})
+            prices['symbol'] = prices['symbol'].astype(str)
+            prices['date'] = pd.to_datetime(prices['date'])
+            prices = prices.sort_values(['symbol', 'date'], kind='stable')
+        else:
+            prices = self.db.get_price_table(fields=('high', 'low', 'close'))
+
+        # 終値のない行は集計に使わない（収益率の計算で0除算・対数の異常値になる）
+        prices = prices[prices['close'] > 0]
+        return prices[_PRICE_COLUMNS].reset_index(drop=True)
+
+    def _load(self) -> None:
+        if self.loaded_at is not None:
+            return
+        started = datetime.now()
+        prices = self._read_prices()
+        if self.engine == 'duckdb':
+            conn = duckdb.connect()
+            conn.register('price_rows', prices)
+            # 銘柄内の連番・対数収益率・最新行からの距離を前計算し、集計時は窓関数や
+            # 銘柄ごとの結合を使わずに済ませる
+            conn.execute('''
+                CREATE TABLE prices AS
+                SELECT symbol, date, high, low, close, seq, ret,
+                       count(*) OVER s - seq AS rows_from_latest,
+                       date_diff('day', date, max(date) OVER s) AS days_from_latest
+                FROM (
+                    SELECT symbol, date, high, low, close,
+                           row_number() OVER w AS seq,
+                           ln(close / lag(close) OVER w) AS ret
+                    FROM (SELECT symbol, CAST(date AS DATE) AS date,
+                                 coalesce(high, close) AS high, coalesce(low, close) AS low, close
+                          FROM price_rows)
+                    WINDOW w AS (PARTITION BY symbol ORDER BY date)
+                )
+                WINDOW s AS (PARTITION BY symbol)
+                ORDER BY symbol, date
+            ''')
+            conn.unregister('price_rows')
+            self._duck = conn
+        else:
+            self._index = _PriceIndex(prices)
+        self.row_count = len(prices)
+        self.loaded_at = datetime.now()
+        app_logger.info(f"分析用株価履歴読み込み: {len(prices)}行 ({self.engine}, "
+                        f"{(self.loaded_at - started).total_seconds() * 1000:.0f}ms)")
+
+    def _holdings(self) -> pd.DataFrame:
+        """保有銘柄（証券会社・口座をまとめた銘柄ごと）"""
+        names = {}
+        for holding in self.db.get_all_holdings():
+            names.setdefault(holding['symbol'], holding['name'])
+        return pd.DataFrame({'symbol': list(names), 'name': list(names.values())}, dtype=object)
+
+    def _sectors(self) -> pd.DataFrame:
+        return pd.DataFrame(self.db.get_issuer_sectors(),
+                            columns=['code', 'sector33_code', 'sector33_name'])
+
+    def _query(self, sql: str, params=(), **tables) -> pd.DataFrame:
+        """DuckDBで集計（tables の DataFrame をその名前で参照できる）"""
+        conn = self._duck
+        for name, frame in tables.items():
+            conn.register(name, frame)
+        try:
+            result = conn.execute(sql, list(params)).df()
+        finally:
+            for name in tables:
+                conn.unregister(name)
+        if 'date' in result:
+            result['date'] = pd.to_datetime(result['date'])
+        return result
+
+    def holdings_at_52_week_low(self, tolerance: float = 0.0) -> pd.DataFrame:
+        """直近の安値が52週安値（から tolerance 以内）の保有銘柄
+
+        Returns:
+            symbol, name, date（最新日）, close, low, low_52w, high_52w,
+            from_low_pct（終値の52週安値からの上昇率%）。from_low_pct の小さい順。
+        """
+        with self._lock:
+            self._load()
+            held = self._holdings()
+            if held.empty:
+                return pd.DataFrame(columns=_LOW_COLUMNS)
+            if self.engine == 'duckdb':
+                result = self._query(f'''
+                    SELECT *, (close / low_52w - 1) * 100 AS from_low_pct FROM (
+                        SELECT p.symbol, any_value(h.name) AS name, max(p.date) AS date,
+                               arg_max(p.close, p.date) AS close, arg_max(p.low, p.date) AS low,
+                               min(p.low) AS low_52w, max(p.high) AS high_52w
+                        FROM prices p JOIN held h ON h.symbol = p.symbol
+                        WHERE p.days_from_latest < {LOOKBACK_DAYS_52_WEEKS}
+                        GROUP BY p.symbol
+                    )
+                    WHERE low <= low_52w * (1 + ?)
+                    ORDER BY from_low_pct, symbol
+                ''', [tolerance], held=held)
+                return result[_LOW_COLUMNS]
+
+            index = self._index
+            groups = index.symbols.get_indexer(held['symbol'])
+            held, groups = held[groups >= 0], groups[groups >= 0]
+            # 行範囲を昇順に並べると reduceat が範囲の間を読み飛ばせる
+            order = np.argsort(groups, kind='stable')
+            held, groups = held.iloc[order], groups[order]
+            last = index.ends[groups] - 1
+            # 最新日から365日以内の行は銘柄の行範囲の末尾にまとまっている
+            window_starts = index.position(groups, index.days[last] - LOOKBACK_DAYS_52_WEEKS, 'right')
+            low_52w = index.reduce(np.minimum, index.low, window_starts, index.ends[groups])
+            high_52w = index.reduce(np.maximum, index.high, window_starts, index.ends[groups])
+
+            result = pd.DataFrame({
+                'symbol': held['symbol'].to_numpy(),
+                'name': held['name'].to_numpy(),
+                'date': index.dates[last],
+                'close': index.close[last],
+                'low': index.low[last],
+                'low_52w': low_52w,
+                'high_52w': high_52w,
+            })
+            result['from_low_pct'] = (result['close'] / result['low_52w'] - 1) * 100
+            result = result[result['low'] <= result['low_52w'] * (1 + tolerance)]
+            return result.sort_values(['from_low_pct', 'symbol'])[_LOW_COLUMNS].reset_index(drop=True)
+
+    def rolling_volatility(self, window: int = VOLATILITY_WINDOW, annualize: bool = True,
+                           latest_only: bool = True) -> pd.DataFrame:
+        """全銘柄の直近 window 営業日の対数収益率の標準偏差
+
+        Args:
+            annualize: Trueなら年率換算（√252倍）
+            latest_only: Trueなら銘柄ごとに最新日の値だけ、Falseなら全日付
+
+        Returns:
+            symbol, date, volatility（履歴が window 日に満たない日は含まない）。銘柄・日付順。
+        """
+        window = int(window)
+        if window < 2:
+            raise ValueError("window は2以上を指定してください")
+        factor = float(np.sqrt(TRADING_DAYS_PER_YEAR)) if annualize else 1.0
+
+        with self._lock:
+            self._load()
+            if self.engine == 'duckdb':
+                if latest_only:
+                    sql = f'''
+                        SELECT symbol, max(date) AS date, stddev_samp(ret) * ? AS volatility
+                        FROM prices WHERE rows_from_latest < {window}
+                        GROUP BY symbol
+                        HAVING count(ret) = {window}
+                        ORDER BY symbol
+                    '''
+                else:
+                    sql = f'''
+                        SELECT symbol, date, volatility * ? AS volatility FROM (
+                            SELECT symbol, date,
+                                   stddev_samp(ret) OVER w AS volatility, count(ret) OVER w AS observations
+                            FROM prices
+                            WINDOW w AS (PARTITION BY symbol ORDER BY date
+                                         ROWS BETWEEN {window - 1} PRECEDING AND CURRENT ROW)
+                        )
+                        WHERE observations = {window}
+                        ORDER BY symbol, date
+                    '''
+                return self._query(sql, [factor])[_VOLATILITY_COLUMNS]
+
+            index = self._index
+            if latest_only:
+                # 収益率は各銘柄の2行目から（最初の行はNaN）
+                groups = np.flatnonzero(index.ends - index.starts - 1 >= window)
+                rows = index.ends[groups][:, None] - window + np.arange(window)
+                volatility = index.returns[rows].std(axis=1, ddof=1) * factor
+                last = index.ends[groups] - 1
+                return pd.DataFrame({
+                    'symbol': index.symbols[groups].to_numpy(),
+                    'date': index.dates[last],
+                    'volatility': volatility,
+                })
+
+            # 銘柄の最初の行（NaN）を含む窓は min_periods を満たさないため銘柄をまたがない
+            volatility = pd.Series(index.returns).rolling(window, min_periods=window).std().to_numpy() * factor
+            valid = ~np.isnan(volatility)
+            codes = np.repeat(np.arange(len(index.starts)), index.ends - index.starts)
+            return pd.DataFrame({
+                'symbol': index.symbols[codes[valid]].to_numpy(),
+                'date': index.dates[valid],
+                'volatility': volatility[valid],
+            })
+
+    def sector_returns(self, month: Optional[str] = None) -> pd.DataFrame:
+        """33業種ごとの月間騰落率（構成銘柄の単純平均・中央値）
+
+        銘柄ごとの騰落率は前月末の終値（前月の履歴がなければ月内最初の終値）から
+        月内最後の終値まで。業種は上場銘柄一覧（issuers）から引く。
+
+        Args:
+            month: 'YYYY-MM'（Noneなら株価履歴の最新日の月）
+
+        Returns:
+            sector33_code, sector33_name, symbols, mean_return_pct, median_return_pct。
+            平均騰落率の高い順。
+        """
+        with self._lock:
+            self._load()
+            if month is None:
+                if not self.row_count:
+                    return pd.DataFrame(columns=_SECTOR_COLUMNS)
+                month = self._latest_month()
+            start, end = _month_range(month)
+            sectors = self._sectors()
+
+            if self.engine == 'duckdb':
+                result = self._query('''
+                    WITH in_month AS (
+                        SELECT symbol, arg_max(close, date) AS last_close, arg_min(close, date) AS first_close,
+                               min(seq) AS first_seq
+                        FROM prices WHERE date >= ? AND date < ? GROUP BY symbol
+                    ), returns AS (
+                        SELECT m.symbol, m.last_close / coalesce(b.close, m.first_close) - 1 AS ret
+                        FROM in_month m
+                        LEFT JOIN prices b ON b.symbol = m.symbol AND b.seq = m.first_seq - 1
+                    )
+                    SELECT s.sector33_code, s.sector33_name, count(*) AS symbols,
+                           avg(r.ret) * 100 AS mean_return_pct, median(r.ret) * 100 AS median_return_pct
+                    FROM returns r JOIN sectors s ON s.code = r.symbol
+                    GROUP BY s.sector33_code, s.sector33_name
+                    ORDER BY mean_return_pct DESC, s.sector33_code
+                ''', [start.date(), end.date()], sectors=sectors)
+                return result[_SECTOR_COLUMNS]
+
+            index = self._index
+            groups = np.arange(len(index.starts))
+            first = index.position(groups, index.day(start), 'left')
+            stop = index.position(groups, index.day(end), 'left')
+            traded = stop > first
+            groups, first, stop = groups[traded], first[traded], stop[traded]
+            # 月初より前の履歴があれば前月末の終値を基準にする
+            base = np.where(first > index.starts[groups], index.close[first - 1], index.close[first])
+            returns = pd.DataFrame({
+                'code': index.symbols[groups].to_numpy(),
+                'ret': index.close[stop - 1] / base - 1,
+            })
+
+            joined = sectors.merge(returns, on='code')
+            result = joined.groupby(['sector33_code', 'sector33_name'], as_index=False).agg(
+                symbols=('code', 'size'), mean_return_pct=('ret', 'mean'), median_return_pct=('ret', 'median'))
+            result[['mean_return_pct', 'median_return_pct']] *= 100
+            result = result.sort_values(['mean_return_pct', 'sector33_code'], ascending=[False, True])
+            return result[_SECTOR_COLUMNS].reset_index(drop=True)
+
+    def _latest_month(self) -> str:
+        if self.engine == 'duckdb':
+            latest = self._duck.execute('SELECT max(date) FROM prices').fetchone()[0]
+        else:
+            latest = self._index.dates.max()
+        return pd.Timestamp(latest).strftime('%Y-%m')
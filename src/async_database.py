@@ -0,0 +1,222 @@
+"""
+非同期データベースモジュール
+Async facade over DatabaseManager with a dedicated database thread
+
+asyncio のイベントループから DatabaseManager を直接呼ぶと、sqlite3 の同期I/Oの
+間ループ全体が止まる。AsyncDatabaseManager は DatabaseManager と同じ名前の
+メソッドを await で呼べるようにし、実際の処理は専用のデータベーススレッドで行う。
+
+呼び出しはキューに積まれ、データベーススレッドが溜まっている分をまとめて取り出す。
+連続する単純な書き込み（アラート記録・株価履歴保存など）は1トランザクションで
+コミットするため、多数のコルーチンから同時に書き込んでもコミット回数が増えない。
+
+    db = AsyncDatabaseManager('data/portfolio.db')
+    holdings = await db.get_all_holdings()
+    await asyncio.gather(*(db.log_alert(symbol, 'buy', message) for symbol in symbols))
+    await db.close()
+"""
+
+import asyncio
+import queue
+import threading
+from concurrent.futures import Future
+from typing import Any, AsyncIterator, Callable, List, Optional, Sequence
+
+from database import DatabaseManager
+from logger import app_logger
+
+
+# 1回のトランザクションにまとめてよい書き込み（ATTACHやVACUUMを伴わないもの）
+BATCHABLE_METHODS = frozenset({
+    'log_alert', 'save_price_history', 'write_batch', 'insert_holdings',
+    'update_current_prices', 'add_to_watchlist', 'add_to_wishlist',
+    'delete_from_watchlist', 'delete_from_wishlist', 'delete_holding',
+    'delete_holding_by_symbol', 'set_sync_state', 'upsert_fundamentals',
+    'save_intraday_bars', 'import_table_rows', 'save_portfolio_snapshot',
+})
+
+# キュー内の停止マーカー
+_STOP = object()
+
+
+class _Call:
+    """データベーススレッドで実行する1回の呼び出し"""
+
+    __slots__ = ('func', 'future', 'batchable')
+
+    def __init__(self, func: Callable[[], Any], batchable: bool = False):
+        self.func = func
+        self.future: Future = Future()
+        self.batchable = batchable
+
+
+class AsyncDatabaseManager:
+    """DatabaseManager の await 可能な窓口（処理は専用スレッドで直列に実行）"""
+
+    def __init__(self, db_path: str = "data/portfolio.db", db: Optional[DatabaseManager] = None,
+                 max_batch: int = 200):
+        self._db_path = db_path
+        self._db = db
+        self.max_batch = max_batch
+        self._queue: queue.Queue = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._closed = False
+        # まとめてコミットした回数・まとめた呼び出し数
+        self.batch_count = 0
+        self.batched_calls = 0
+
+    @property
+    def db(self) -> DatabaseManager:
+        """内部の DatabaseManager（データベーススレッドで作成される）"""
+        if self._db is None:
+            raise RuntimeError("データベーススレッドがまだ開始されていません")
+        return self._db
+
+    def _ensure_started(self) -> None:
+        """初回の呼び出しでデータベーススレッドを開始"""
+        if self._thread and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, daemon=True, name="AsyncDatabase")
+            self._thread.start()
+
+    def _submit(self, call: _Call) -> Future:
+        if self._closed:
+            raise RuntimeError("AsyncDatabaseManager は停止済みです")
+        self._ensure_started()
+        self._queue.put(call)
+        return call.future
+
+    async def run(self, func: Callable, *args, **kwargs) -> Any:
+        """任意の関数をデータベーススレッドで実行（第1引数に DatabaseManager を渡す）"""
+        call = _Call(lambda: func(self.db, *args, **kwargs))
+        return await asyncio.wrap_future(self._submit(call))
+
+    def __getattr__(self, name: str):
+        """DatabaseManager の公開メソッドを await 可能な関数として返す"""
+        if name.startswith('_') or not callable(getattr(DatabaseManager, name, None)):
+            raise AttributeError(name)
+        batchable = name in BATCHABLE_METHODS
+
+        async def method(*args, **kwargs):
+            call = _Call(lambda: getattr(self.db, name)(*args, **kwargs), batchable)
+            return await asyncio.wrap_future(self._submit(call))
+
+        method.__name__ = name
+        method.__doc__ = getattr(DatabaseManager, name).__doc__
+        return method
+
+    async def iter_table_rows(self, table: str, chunk_size: int = 50000,
+                              order_by: Optional[Sequence[str]] = None) -> AsyncIterator[List[tuple]]:
+        """テーブル全体を chunk_size 行ずつ返す（読み進めはデータベーススレッドで行う）"""
+        iterator = await self.run(lambda db: db.iter_table_rows(table, chunk_size, order_by))
+        try:
+            while True:
+                rows = await self.run(lambda db: next(iterator, None))
+                if rows is None:
+                    break
+                yield rows
+        finally:
+            # カーソルは作成したスレッドで閉じる
+            if not self._closed:
+                await self.run(lambda db: iterator.close())
+
+    async def close(self) -> None:
+        """キュー内の呼び出しをすべて実行してからデータベーススレッドを停止"""
+        if self._closed:
+            return
+        self._closed = True
+        if self._thread and self._thread.is_alive():
+            self._queue.put(_STOP)
+            await asyncio.get_running_loop().run_in_executor(None, self._thread.join)
+
+    async def __aenter__(self) -> 'AsyncDatabaseManager':
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.close()
+
+    def _run(self) -> None:
+        """キューに溜まった呼び出しをまとめて取り出して実行"""
+        if self._db is None:
+            try:
+                self._db = DatabaseManager(self._db_path)
+            except Exception as e:
+                app_logger.error(f"非同期データベース初期化エラー: {e}")
+                self._fail_pending(e)
+                return
+
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            calls = []
+            while True:
+                if item is _STOP:
+                    stopping = True
+                    break
+                calls.append(item)
+                if len(calls) >= self.max_batch:
+                    break
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+            self._execute(calls)
+
+    def _fail_pending(self, error: BaseException) -> None:
+        """データベースを開けなかった場合、待機中の呼び出しをすべて失敗させる"""
+        self._closed = True
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            if item is not _STOP and item.future.set_running_or_notify_cancel():
+                item.future.set_exception(error)
+
+    def _execute(self, calls: List[_Call]) -> None:
+        """連続するまとめ可能な書き込みは1トランザクション、それ以外は1件ずつ実行"""
+        index = 0
+        while index < len(calls):
+            end = index
+            while end < len(calls) and calls[end].batchable:
+                end += 1
+            if end - index > 1:
+                self._execute_batch(calls[index:end])
+                index = end
+            else:
+                self._execute_one(calls[index])
+                index += 1
+
+    def _execute_one(self, call: _Call, started: bool = False) -> None:
+        if not started and not call.future.set_running_or_notify_cancel():
+            return
+        try:
+            call.future.set_result(call.func())
+        except Exception as e:
+            call.future.set_exception(e)
+
+    def _execute_batch(self, calls: List[_Call]) -> None:
+        """まとめて1回コミットし、コミット後に各呼び出しの結果を返す"""
+        calls = [call for call in calls if call.future.set_running_or_notify_cancel()]
+        if not calls:
+            return
+        results = []
+        try:
+            with self.db.batch():
+                for call in calls:
+                    results.append(call.func())
+        except Exception as e:
+            # どれかが例外で失敗した場合はロールバックして1件ずつやり直す
+            app_logger.warning(f"非同期データベース一括書き込みエラー: {e} - 1件ずつ再実行します")
+            for call in calls:
+                self._execute_one(call, started=True)
+            return
+
+        self.batch_count += 1
+        self.batched_calls += len(calls)
+        for call, result in zip(calls, results):
+            call.future.set_result(result)
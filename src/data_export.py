@@ -0,0 +1,263 @@
+"""
+列指向データエクスポートモジュール
+Columnar Parquet / Arrow IPC export and import
+
+holdings・price_history・alerts・日次スナップショットなどのテーブルを、行を辞書に変換せずに
+chunk_size 行ずつ Arrow の RecordBatch へ変換し、Parquet または Arrow IPC
+（Feather v2）ファイルへストリーミングで書き出す。銘柄別（symbol=...）・
+月別（month=YYYY-MM）のHive形式ディレクトリに分割でき、分析用ノートブックから
+pyarrow.dataset / pandas / DuckDB でそのまま読み込める。
+
+Arrow IPC は無圧縮で書き出すため、メモリマップで読み込むとコピーなしで
+列データを参照できる（Parquet は読み込み時に展開が必要）。
+
+pyarrow はオプション依存（pip install pyarrow）。未導入の場合は
+PYARROW_AVAILABLE が False になり、エクスポートは RuntimeError になる。
+"""
+
+import json
+import os
+import shutil
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Sequence
+
+import pandas as pd
+
+from database import EXPORT_TABLES
+from logger import app_logger
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.dataset as ds
+    import pyarrow.fs as pafs
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+    app_logger.info("pyarrow not available. Parquet/Arrow export is disabled. Install with: pip install pyarrow")
+
+
+FORMATS = {
+    'parquet': ('parquet', 'parquet'),   # 形式名 → (pyarrow.dataset の形式, 拡張子)
+    'arrow': ('ipc', 'arrow'),
+}
+PARTITIONS = (None, 'symbol', 'month')
+MANIFEST_FILE = '_manifest.json'    # "_" で始まるファイルはデータセットの読み込み対象外
+
+
+def _require_pyarrow() -> None:
+    if not PYARROW_AVAILABLE:
+        raise RuntimeError("Parquet/Arrow の入出力には pyarrow が必要です（pip install pyarrow）")
+
+
+def _arrow_type(declared: str):
+    """SQLiteの宣言型 → Arrowの型"""
+    if 'INT' in declared:
+        return pa.int64()
+    if 'REAL' in declared or 'FLOA' in declared or 'DOUB' in declared:
+        return pa.float64()
+    if declared == 'DATE':
+        return pa.date32()
+    if declared in ('TIMESTAMP', 'DATETIME'):
+        return pa.timestamp('us')
+    if declared == 'BOOLEAN':
+        return pa.bool_()
+    return pa.string()
+
+
+def _string_array(values: Sequence):
+    try:
+        return pa.array(values, type=pa.string())
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        return pa.array([None if value is None else str(value) for value in values], type=pa.string())
+
+
+def _to_array(values: Sequence, arrow_type):
+    """1列分の値をArrow配列へ（SQLiteの型の揺れは変換で吸収）"""
+    if pa.types.is_string(arrow_type):
+        return _string_array(values)
+
+    if pa.types.is_date32(arrow_type) or pa.types.is_timestamp(arrow_type):
+        strings = _string_array(values)
+        try:
+            return strings.cast(arrow_type)
+        except pa.ArrowInvalid:
+            # タイムゾーン付きなど形式が混在する場合はpandasで解釈（解釈できない値はNULL）
+            parsed = pd.to_datetime(strings.to_pandas(), errors='coerce', utc=True).dt.tz_localize(None)
+            if pa.types.is_date32(arrow_type):
+                parsed = parsed.dt.date
+            return pa.array(parsed, type=arrow_type, from_pandas=True)
+
+    try:
+        return pa.array(values, type=arrow_type)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # INTEGER列に実数が入っている場合など
+        return pa.array(values, type=pa.float64(), from_pandas=True).cast(arrow_type, safe=False)
+
+
+class ColumnarExporter:
+    """DatabaseManager のテーブルを Parquet / Arrow IPC で入出力する"""
+
+    def __init__(self, db, chunk_size: int = 50000):
+        self.db = db
+        self.chunk_size = chunk_size
+
+    def _schema(self, table: str):
+        return pa.schema([(name, _arrow_type(declared))
+                          for name, declared in self.db.get_table_columns(table)])
+
+    def _batches(self, table: str, schema, partition_by: Optional[str],
+                 counter: List[int]) -> Iterator:
+        """テーブルを chunk_size 行ずつ RecordBatch に変換"""
+        date_column = EXPORT_TABLES[table]
+        if partition_by == 'symbol':
+            order_by = ['symbol'] + ([date_column] if date_column else [])
+        elif partition_by == 'month':
+            order_by = [date_column]
+        else:
+            order_by = None
+
+        date_index = schema.get_field_index(date_column) if date_column else -1
+        for rows in self.db.iter_table_rows(table, self.chunk_size, order_by):
+            columns = list(zip(*rows))
+            arrays = [_to_array(values, field.type) for values, field in zip(columns, schema)]
+            if partition_by == 'month':
+                arrays.append(pc.utf8_slice_codeunits(_string_array(columns[date_index]), 0, 7))
+            counter[0] += len(rows)
+            yield pa.RecordBatch.from_arrays(arrays, schema=self._output_schema(schema, partition_by))
+
+    @staticmethod
+    def _output_schema(schema, partition_by: Optional[str]):
+        if partition_by == 'month':
+            return schema.append(pa.field('month', pa.string()))
+        return schema
+
+    def export_table(self, table: str, directory: str, fmt: str = 'parquet',
+                     partition_by: Optional[str] = None) -> int:
+        """1テーブルを directory/<table>/ に書き出し、行数を返す
+
+        directory/<table>/ が既にある場合は、前回のエクスポート（_manifest.json あり）
+        のときだけ作り直し、それ以外のファイルがあれば FileExistsError にする。
+
+        Args:
+            fmt: 'parquet' または 'arrow'（Arrow IPC）
+            partition_by: None / 'symbol' / 'month'
+        """
+        _require_pyarrow()
+        if fmt not in FORMATS:
+            raise ValueError(f"不明な形式: {fmt}")
+        if partition_by not in PARTITIONS:
+            raise ValueError(f"不明な分割方法: {partition_by}")
+        if table not in EXPORT_TABLES:
+            raise ValueError(f"エクスポート対象外のテーブル: {table}")
+
+        schema = self._schema(table)
+        if ((partition_by == 'month' and EXPORT_TABLES[table] is None) or
+                (partition_by == 'symbol' and 'symbol' not in schema.names)):
+            # 日付のないテーブル（保有銘柄）・銘柄のないテーブル（ポートフォリオ全体）は分割しない
+            partition_by = None
+
+        output_schema = self._output_schema(schema, partition_by)
+        dataset_format, extension = FORMATS[fmt]
+        table_dir = os.path.join(directory, table)
+        if os.path.isdir(table_dir) and os.listdir(table_dir):
+            # 前回の出力の分割が残らないよう作り直す（このエクスポーターの出力だけを削除する）
+            if not self._is_export_of(table_dir, table):
+                raise FileExistsError(
+                    f"出力先 {table_dir} にエクスポート以外のファイルがあるため上書きしません"
+                    f"（別のフォルダを指定するか、不要なら削除してください）")
+            shutil.rmtree(table_dir)
+        os.makedirs(table_dir, exist_ok=True)
+
+        counter = [0]
+        reader = pa.RecordBatchReader.from_batches(
+            output_schema, self._batches(table, schema, partition_by, counter))
+        ds.write_dataset(
+            reader, table_dir,
+            format=dataset_format,
+            partitioning=[partition_by] if partition_by else None,
+            partitioning_flavor='hive' if partition_by else None,
+            basename_template=f'{table}-{{i}}.{extension}',
+            existing_data_behavior='overwrite_or_ignore',
+        )
+
+        manifest = {
+            'table': table,
+            'format': fmt,
+            'partition_by': partition_by,
+            'rows': counter[0],
+            'exported_at': datetime.now().isoformat(timespec='seconds'),
+        }
+        with open(os.path.join(table_dir, MANIFEST_FILE), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+        app_logger.info(f"エクスポート完了: {table} {counter[0]}行 → {table_dir} ({fmt}, 分割: {partition_by})")
+        return counter[0]
+
+    def export_all(self, directory: str, fmt: str = 'parquet', partition_by: Optional[str] = None,
+                   tables: Optional[Sequence[str]] = None) -> Dict[str, int]:
+        """複数テーブルを書き出し、テーブルごとの行数を返す"""
+        return {table: self.export_table(table, directory, fmt, partition_by)
+                for table in (tables or EXPORT_TABLES)}
+
+    @classmethod
+    def _is_export_of(cls, table_dir: str, table: str) -> bool:
+        """table_dir が table を書き出したディレクトリ（_manifest.json がある）か"""
+        try:
+            return cls.read_manifest(table_dir).get('table') == table
+        except (OSError, ValueError, AttributeError):
+            return False
+
+    @staticmethod
+    def read_manifest(table_dir: str) -> Dict:
+        with open(os.path.join(table_dir, MANIFEST_FILE), 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def open_dataset(self, table_dir: str):
+        """書き出したテーブルを pyarrow.dataset として開く
+
+        Arrow IPC はメモリマップで開くため、読み込んだ列はファイルの内容を
+        コピーせずに参照する。
+        """
+        _require_pyarrow()
+        manifest = self.read_manifest(table_dir)
+        partition_by = manifest['partition_by']
+        partitioning = None
+        if partition_by:
+            partitioning = ds.partitioning(pa.schema([(partition_by, pa.string())]), flavor='hive')
+        return ds.dataset(
+            table_dir,
+            format=FORMATS[manifest['format']][0],
+            partitioning=partitioning,
+            filesystem=pafs.LocalFileSystem(use_mmap=True),
+        )
+
+    def read_table(self, table_dir: str, columns: Optional[List[str]] = None, filter=None):
+        """書き出したテーブルを pyarrow.Table として読み込む
+
+        filter には pyarrow.dataset.field('symbol') == '7203' などを指定でき、
+        分割ディレクトリ単位で読み飛ばされる。
+        """
+        return self.open_dataset(table_dir).to_table(columns=columns, filter=filter)
+
+    def import_table(self, table: str, directory: str) -> int:
+        """directory/<table>/ の内容をデータベースへ書き戻し、行数を返す"""
+        table_dir = os.path.join(directory, table)
+        dataset = self.open_dataset(table_dir)
+        # 月別分割の month 列など、テーブルにない列は読まない
+        columns = [name for name, _ in self.db.get_table_columns(table)
+                   if name in dataset.schema.names]
+
+        imported = 0
+        for batch in dataset.to_batches(columns=columns, batch_size=self.chunk_size):
+            rows = list(zip(*[column.to_pylist() for column in batch.columns]))
+            imported += self.db.import_table_rows(table, columns, rows)
+
+        app_logger.info(f"インポート完了: {table} {imported}行 ← {table_dir}")
+        return imported
+
+    def import_all(self, directory: str, tables: Optional[Sequence[str]] = None) -> Dict[str, int]:
+        """書き出し済みのテーブルをすべて書き戻す"""
+        tables = tables or [table for table in EXPORT_TABLES
+                            if os.path.exists(os.path.join(directory, table, MANIFEST_FILE))]
+        return {table: self.import_table(table, directory) for table in tables}
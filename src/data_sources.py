@@ -1,11 +1,18 @@
 import yfinance as yf
 import pandas as pd
 import requests
-from typing import Dict, Optional, List
+import os
+import threading
+from typing import Dict, Optional, List, Iterator
 from dataclasses import dataclass
 import time
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 from logger import app_logger
+from market_calendar import is_trading_day
+from fundamentals import extract_fundamentals, calculate_valuation
+from symbols import symbol_registry
+from jquants_stream import JQuantsStream, last_rows, latest_row
+from token_cache import JQuantsTokenCache, JQuantsTokenManager, credential_fingerprint, DEFAULT_TOKEN_CACHE_PATH
 import numpy as np
 try:
     from jquantsapi import Client as JQuantsClient
@@ -42,24 +49,7 @@ class YahooFinanceDataSource:
     
     def _format_japanese_symbol(self, symbol: str) -> str:
         """株式シンボルをYahoo Finance形式に変換"""
-        # 既に.Tが付いている場合はそのまま
-        if symbol.endswith('.T'):
-            return symbol
-        
-        # 数字のみの場合（日本株）は .T を追加
-        if symbol.isdigit():
-            return f"{symbol}.T"
-        
-        # 数字+アルファベット（日本株の優先株など: 314A, 335A）
-        elif symbol[:-1].isdigit() and symbol[-1].isalpha() and len(symbol) <= 6:
-            return f"{symbol}.T"
-        
-        # アルファベットのみで.Tが付いていない場合（米国株など）
-        elif symbol.isalpha() and len(symbol) <= 5:
-            # 米国株式として処理（.Tを付けない）
-            return symbol
-        
-        return symbol
+        return symbol_registry.to_yahoo(symbol) or symbol
     
     def _is_cache_valid(self, symbol: str) -> bool:
         """キャッシュが有効かチェック"""
@@ -72,10 +62,7 @@ class YahooFinanceDataSource:
     def get_stock_info(self, symbol: str) -> Optional[StockInfo]:
         """株式の基本情報を取得"""
         # 疑似的なシンボルをスキップ
-        if (symbol.startswith('PORTFOLIO_') or 
-            symbol.startswith('FUND_') or
-            symbol == 'STOCK_PORTFOLIO' or
-            symbol == 'TOTAL_PORTFOLIO'):
+        if symbol_registry.is_pseudo(symbol):
             print(f"疑似シンボルをスキップ: {symbol}")
             return None
             
@@ -288,8 +275,8 @@ class YahooFinanceDataSource:
         """東京証券取引所が開いているかチェック"""
         now = datetime.now()
         
-        # 平日かチェック
-        if now.weekday() >= 5:  # 土曜日=5, 日曜日=6
+        # 取引日かチェック（土日・祝日・年末年始は休業）
+        if not is_trading_day(now):
             return False
         
         # 取引時間チェック（9:00-11:30, 12:30-15:00）
@@ -308,16 +295,24 @@ class YahooFinanceDataSource:
 class JQuantsDataSource:
     """J Quants API対応データソース（日本株専用・無料）"""
     
-    def __init__(self, email: str = None, password: str = None, refresh_token: str = None):
+    # 株価取得期間（日数、Noneは全期間）。無料プランの12週間遅延も考慮
+    QUOTE_LOOKBACK_DAYS = (14, 120, None)
+    
+    def __init__(self, email: str = None, password: str = None, refresh_token: str = None,
+                 fundamentals_db=None, token_cache_path: Optional[str] = DEFAULT_TOKEN_CACHE_PATH):
         if not JQUANTS_AVAILABLE:
             raise ImportError("J Quants API client not installed")
         
         self.client = None
+        self.token_manager = None
+        self.token_cache_path = token_cache_path
         self.email = email
         self.password = password
         self.refresh_token = refresh_token
         self.cache = {}
         self.cache_duration = 300  # 5分間キャッシュ
+        # ローカル財務データ（DatabaseManager）。あれば銘柄別の財務API呼び出しを省略
+        self.fundamentals_db = fundamentals_db
         
         # 認証情報がある場合は初期化
         if refresh_token or (email and password):
@@ -342,6 +337,24 @@ class JQuantsDataSource:
         except Exception as e:
             app_logger.error(f"J Quants API認証失敗: {e}")
             self.client = None
+            return
+        
+        if self.client and self.token_cache_path:
+            self._setup_token_cache()
+    
+    def _setup_token_cache(self):
+        """ディスクのトークンキャッシュを適用し、期限前更新を開始"""
+        try:
+            cache = JQuantsTokenCache(
+                credential_fingerprint(self.email, self.refresh_token),
+                self.token_cache_path
+            )
+            self.token_manager = JQuantsTokenManager(self.client, cache)
+            self.token_manager.restore()
+            self.token_manager.start_background_refresh()
+        except Exception as e:
+            app_logger.warning(f"J Quantsトークンキャッシュ初期化失敗: {e}")
+            self.token_manager = None
     
     def _is_cache_valid(self, symbol: str) -> bool:
         """キャッシュが有効かチェック"""
@@ -352,35 +365,11 @@ class JQuantsDataSource:
     
     def _format_jquants_symbol(self, symbol: str) -> str:
         """J Quants API用銘柄コード変換（4桁→5桁）"""
-        # 4桁の場合は末尾に0を追加
-        if len(symbol) == 4 and symbol.isdigit():
-            return symbol + "0"
-        return symbol
+        return symbol_registry.to_jquants(symbol) or symbol
     
     def _is_japanese_stock(self, symbol: str) -> bool:
         """日本株かどうかを判定"""
-        # 疑似シンボルは日本株ではない
-        if (symbol.startswith('PORTFOLIO_') or 
-            symbol.startswith('FUND_') or
-            symbol == 'STOCK_PORTFOLIO' or
-            symbol == 'TOTAL_PORTFOLIO' or
-            len(symbol) > 10):
-            return False
-        
-        # 数字のみの場合は日本株
-        if symbol.isdigit() and len(symbol) == 4:
-            return True
-        
-        # 数字+アルファベット1文字の場合は日本株の優先株
-        if len(symbol) == 5 and symbol[:4].isdigit() and symbol[4].isalpha():
-            return True
-        
-        # アルファベットのみの場合は米国株
-        if symbol.isalpha():
-            return False
-        
-        # その他の場合は日本株として扱う
-        return True
+        return symbol_registry.is_japanese(symbol)
     
     def _safe_float_conversion(self, value, field_name: str) -> Optional[float]:
         """安全な数値変換"""
@@ -397,82 +386,121 @@ class JQuantsDataSource:
             app_logger.warning(f"数値変換エラー ({field_name}): {value}")
             return None
 
+    def iter_statements_by_date(self, date_yyyymmdd: str) -> Iterator[Dict]:
+        """指定日に開示された全銘柄の決算情報を1件ずつ取得
+        
+        通信エラーは呼び出し側へ送出する（差分更新で当日を完了扱いにしないため）。
+        """
+        if not self.client:
+            app_logger.warning("J Quants API未認証のため決算情報取得不可")
+            return iter(())
+        
+        return JQuantsStream(self.client).iter_statements(disclosed_date=date_yyyymmdd)
+    
+    def iter_listed_info(self) -> Iterator[Dict]:
+        """最新の上場銘柄一覧（全銘柄）を1件ずつ取得"""
+        if not self.client:
+            app_logger.warning("J Quants API未認証のため上場銘柄一覧取得不可")
+            return iter(())
+        
+        return JQuantsStream(self.client).iter_listed_info()
+    
+    def _get_latest_quotes(self, jquants_code: str, count: int = 2) -> List[Dict]:
+        """直近count営業日分の日足を取得（期間をAPIへプッシュダウン）"""
+        stream = JQuantsStream(self.client)
+        today = date.today()
+        
+        # 無料プランは12週間遅延のため、取得期間を段階的に広げる
+        for lookback_days in self.QUOTE_LOOKBACK_DAYS:
+            from_date = today - timedelta(days=lookback_days) if lookback_days else None
+            quotes = last_rows(
+                (quote for quote in stream.iter_daily_quotes(jquants_code, from_date=from_date)
+                 if quote.get('Close') is not None),
+                count
+            )
+            if quotes:
+                return quotes
+        return []
+    
+    def _get_local_financial_metrics(self, jquants_code: str, current_price: float) -> Optional[tuple]:
+        """ローカルの財務データから指標を計算（未登録ならNone）"""
+        if self.fundamentals_db is None:
+            return None
+        try:
+            fundamentals = self.fundamentals_db.get_fundamentals(jquants_code)
+        except Exception as e:
+            app_logger.warning(f"ローカル財務データ参照エラー ({jquants_code}): {e}")
+            return None
+        if not fundamentals:
+            return None
+        return calculate_valuation(fundamentals, current_price)
+    
+    def _store_latest_fundamentals(self, latest_fin: Dict) -> None:
+        """銘柄別に取得した最新決算をローカルにも保存（次回以降はAPI不要）"""
+        if self.fundamentals_db is None:
+            return
+        try:
+            record = extract_fundamentals(latest_fin)
+            if record:
+                self.fundamentals_db.upsert_fundamentals([record])
+        except Exception as e:
+            app_logger.debug(f"財務データ保存スキップ: {e}")
+    
     def _get_financial_metrics(self, jquants_code: str, current_price: float) -> tuple[Optional[float], Optional[float], Optional[float], Optional[float]]:
         """J Quants APIから財務指標を取得（PER、PBR、ROE、配当利回り）"""
+        # 差分更新済みのローカル財務データがあれば最新株価で再計算
+        local_metrics = self._get_local_financial_metrics(jquants_code, current_price)
+        if local_metrics is not None:
+            return local_metrics
+        
         try:
-            # 財務データ取得
-            fins_response = self.client.get_fins_statements(code=jquants_code)
+            # 財務データ取得（最新開示のみ保持）
+            latest_fin = latest_row(
+                JQuantsStream(self.client).iter_statements(code=jquants_code),
+                'DisclosedDate', 'DisclosedTime'
+            )
+            if latest_fin is None:
+                app_logger.warning(f"財務データが空: {jquants_code}")
+                return None, None, None, None
+            
+            self._store_latest_fundamentals(latest_fin)
             
-            pe_ratio = None
-            pb_ratio = None
-            roe = None
+            # 直接取得可能な指標
+            pe_ratio = self._safe_float_conversion(latest_fin.get('PriceEarningsRatio'), 'PER')
+            pb_ratio = self._safe_float_conversion(latest_fin.get('PriceBookValueRatio'), 'PBR') 
+            roe = self._safe_float_conversion(latest_fin.get('RateOfReturnOnEquity'), 'ROE')
             dividend_yield = None
             
-            # DataFrameレスポンスの処理
-            if hasattr(fins_response, 'empty'):
-                if not fins_response.empty:
-                    latest_fin = fins_response.iloc[-1]
-                else:
-                    app_logger.warning(f"財務データが空: {jquants_code}")
-                    return None, None, None, None
-                
-                # 直接取得可能な指標
-                pe_ratio = self._safe_float_conversion(latest_fin.get('PriceEarningsRatio'), 'PER')
-                pb_ratio = self._safe_float_conversion(latest_fin.get('PriceBookValueRatio'), 'PBR') 
-                roe = self._safe_float_conversion(latest_fin.get('RateOfReturnOnEquity'), 'ROE')
-                
-                # 配当利回り（直接取得または計算）
-                dividend_yield_direct = self._safe_float_conversion(latest_fin.get('DividendYieldAnnual'), '配当利回り直接')
-                if dividend_yield_direct:
-                    dividend_yield = dividend_yield_direct
-                else:
-                    # 配当から計算
-                    annual_dividend = self._safe_float_conversion(latest_fin.get('ResultDividendPerShareAnnual'), '年間配当実績')
-                    if not annual_dividend:
-                        annual_dividend = self._safe_float_conversion(latest_fin.get('ForecastDividendPerShareAnnual'), '年間配当予想')
-                    
-                    if annual_dividend and annual_dividend > 0 and current_price > 0:
-                        dividend_yield = (annual_dividend / current_price) * 100
-                
-                # 直接取得できない場合の計算フォールバック
-                if not pe_ratio:
-                    eps = self._safe_float_conversion(latest_fin.get('EarningsPerShare'), 'EPS')
-                    if eps and eps > 0 and current_price > 0:
-                        pe_ratio = current_price / eps
-                
-                if not pb_ratio:
-                    bps = self._safe_float_conversion(latest_fin.get('BookValuePerShare'), 'BPS')
-                    if bps and bps > 0 and current_price > 0:
-                        pb_ratio = current_price / bps
+            # 配当利回り（直接取得または計算）
+            dividend_yield_direct = self._safe_float_conversion(latest_fin.get('DividendYieldAnnual'), '配当利回り直接')
+            if dividend_yield_direct:
+                dividend_yield = dividend_yield_direct
+            else:
+                # 配当から計算
+                annual_dividend = self._safe_float_conversion(latest_fin.get('ResultDividendPerShareAnnual'), '年間配当実績')
+                if not annual_dividend:
+                    annual_dividend = self._safe_float_conversion(latest_fin.get('ForecastDividendPerShareAnnual'), '年間配当予想')
                 
-                if not roe:
-                    # ROE = 純利益 / 自己資本 * 100
-                    net_income = self._safe_float_conversion(latest_fin.get('NetIncome'), '純利益')
-                    equity = self._safe_float_conversion(latest_fin.get('Equity'), '自己資本')
-                    if net_income and equity and equity > 0:
-                        roe = (net_income / equity) * 100
-                        
-            elif isinstance(fins_response, dict) and 'statements' in fins_response:
-                statements = fins_response['statements']
-                if statements:
-                    latest_fin = statements[-1]
-                    
-                    # 同様の処理をdict形式でも実行
-                    pe_ratio = self._safe_float_conversion(latest_fin.get('PriceEarningsRatio'), 'PER')
-                    pb_ratio = self._safe_float_conversion(latest_fin.get('PriceBookValueRatio'), 'PBR')
-                    roe = self._safe_float_conversion(latest_fin.get('RateOfReturnOnEquity'), 'ROE')
-                    
-                    # 配当利回り
-                    dividend_yield_direct = self._safe_float_conversion(latest_fin.get('DividendYieldAnnual'), '配当利回り直接')
-                    if dividend_yield_direct:
-                        dividend_yield = dividend_yield_direct
-                    else:
-                        annual_dividend = self._safe_float_conversion(latest_fin.get('ResultDividendPerShareAnnual'), '年間配当実績')
-                        if not annual_dividend:
-                            annual_dividend = self._safe_float_conversion(latest_fin.get('ForecastDividendPerShareAnnual'), '年間配当予想')
-                        
-                        if annual_dividend and annual_dividend > 0 and current_price > 0:
-                            dividend_yield = (annual_dividend / current_price) * 100
+                if annual_dividend and annual_dividend > 0 and current_price > 0:
+                    dividend_yield = (annual_dividend / current_price) * 100
+            
+            # 直接取得できない場合の計算フォールバック
+            if not pe_ratio:
+                eps = self._safe_float_conversion(latest_fin.get('EarningsPerShare'), 'EPS')
+                if eps and eps > 0 and current_price > 0:
+                    pe_ratio = current_price / eps
+            
+            if not pb_ratio:
+                bps = self._safe_float_conversion(latest_fin.get('BookValuePerShare'), 'BPS')
+                if bps and bps > 0 and current_price > 0:
+                    pb_ratio = current_price / bps
+            
+            if not roe:
+                # ROE = 純利益 / 自己資本 * 100
+                net_income = self._safe_float_conversion(latest_fin.get('Profit') or latest_fin.get('NetIncome'), '純利益')
+                equity = self._safe_float_conversion(latest_fin.get('Equity'), '自己資本')
+                if net_income and equity and equity > 0:
+                    roe = (net_income / equity) * 100
             
             app_logger.info(f"財務データ取得: {jquants_code} PER={pe_ratio}, PBR={pb_ratio}, ROE={roe}%, 配当利回り={dividend_yield}%")
             return pe_ratio, pb_ratio, roe, dividend_yield
@@ -492,123 +520,49 @@ class JQuantsDataSource:
         
         try:
             jquants_code = self._format_jquants_symbol(symbol)
+            since = date.today() - timedelta(days=365 * years)
             
-            # 財務データ取得（複数年分）
-            fins_response = self.client.get_fins_statements(code=jquants_code)
-            
-            dividend_history = []
-            
-            # DataFrameレスポンスの処理
-            if hasattr(fins_response, 'empty'):
-                if fins_response.empty:
-                    app_logger.warning(f"配当履歴データが空: {jquants_code}")
-                    return []
-                    
-                # 最新から指定年数分のデータを取得
+            # 財務データを逐次取得し、年度別の最大配当のみ保持
+            yearly_dividends = {}
+            statements = JQuantsStream(self.client).iter_statements(code=jquants_code, since=since)
+            for statement in statements:
                 try:
-                    # カラム名を確認して適切な日付カラムを使用
-                    date_column = None
-                    for col in ['Date', 'DisclosedDate', 'AnnouncementDate', 'ReportDate']:
-                        if col in fins_response.columns:
-                            date_column = col
+                    # 複数の日付フィールドを試行
+                    date_value = None
+                    for date_field in ['Date', 'DisclosedDate', 'AnnouncementDate', 'ReportDate']:
+                        if statement.get(date_field):
+                            date_value = statement[date_field]
                             break
                     
-                    if date_column:
-                        df = fins_response.sort_values(date_column, ascending=False)
-                        recent_data = df.head(years * 4)  # 四半期データ想定で年数×4
+                    if date_value is None:
+                        continue
+                    
+                    # 日付から年度を抽出
+                    if isinstance(date_value, pd.Timestamp):
+                        year = date_value.year
+                        date_str = date_value.strftime('%Y-%m-%d')
                     else:
-                        available_cols = list(fins_response.columns)
-                        app_logger.warning(f"日付カラムが見つかりません ({jquants_code})")
-                        app_logger.info(f"利用可能カラム: {available_cols[:10]}...")  # 最初の10個のみ表示
-                        # 日付ソートなしで最新データを使用
-                        recent_data = fins_response.tail(years * 4)
-                        
-                except Exception as e:
-                    app_logger.error(f"DataFrame処理エラー ({jquants_code}): {e}")
-                    return []
-                
-                # 年度別に配当データを集計
-                yearly_dividends = {}
-                for _, row in recent_data.iterrows():
-                    try:
-                        # 複数の日付カラムを試行
-                        date_value = None
-                        for col in [date_column, 'Date', 'DisclosedDate', 'AnnouncementDate', 'ReportDate']:
-                            if col and col in row and pd.notna(row[col]):
-                                date_value = row[col]
-                                break
-                        
-                        if date_value is None:
-                            continue
-                            
-                        # 日付から年度を抽出
-                        if isinstance(date_value, pd.Timestamp):
-                            year = date_value.year
-                            date_str = date_value.strftime('%Y-%m-%d')
+                        date_str = str(date_value)
+                        if len(date_str) >= 4:
+                            year = int(date_str[:4])
                         else:
-                            date_str = str(date_value)
-                            if len(date_str) >= 4:
-                                year = int(date_str[:4])
-                            else:
-                                continue
-                        
-                        annual_dividend = self._safe_float_conversion(row.get('ResultDividendPerShareAnnual'), '年間配当')
-                        
-                        if annual_dividend and annual_dividend > 0:
-                            if year not in yearly_dividends or yearly_dividends[year]['dividend'] < annual_dividend:
-                                yearly_dividends[year] = {
-                                    'year': year,
-                                    'dividend': annual_dividend,
-                                    'date': date_str
-                                }
-                    except (ValueError, TypeError) as e:
-                        app_logger.debug(f"行処理エラー ({jquants_code}): {e}")
-                        continue
-                
-                # リストに変換してソート
-                dividend_history = sorted(yearly_dividends.values(), key=lambda x: x['year'], reverse=True)
-                
-            elif isinstance(fins_response, dict) and 'statements' in fins_response:
-                statements = fins_response['statements']
-                yearly_dividends = {}
-                
-                for statement in statements[-years*4:]:  # 最近のデータのみ
-                    try:
-                        # 複数の日付フィールドを試行
-                        date_value = None
-                        for date_field in ['Date', 'DisclosedDate', 'AnnouncementDate', 'ReportDate']:
-                            if date_field in statement and statement[date_field]:
-                                date_value = statement[date_field]
-                                break
-                        
-                        if date_value is None:
                             continue
-                        
-                        # 日付から年度を抽出
-                        if isinstance(date_value, (pd.Timestamp, pd.Timedelta)):
-                            year = date_value.year
-                            date_str = date_value.strftime('%Y-%m-%d')
-                        else:
-                            date_str = str(date_value)
-                            if len(date_str) >= 4:
-                                year = int(date_str[:4])
-                            else:
-                                continue
-                        
-                        annual_dividend = self._safe_float_conversion(statement.get('ResultDividendPerShareAnnual'), '年間配当')
-                        
-                        if annual_dividend and annual_dividend > 0:
-                            if year not in yearly_dividends or yearly_dividends[year]['dividend'] < annual_dividend:
-                                yearly_dividends[year] = {
-                                    'year': year,
-                                    'dividend': annual_dividend,
-                                    'date': date_str
-                                }
-                    except (ValueError, TypeError) as e:
-                        app_logger.debug(f"statement処理エラー: {e}")
-                        continue
-                
-                dividend_history = sorted(yearly_dividends.values(), key=lambda x: x['year'], reverse=True)
+                    
+                    annual_dividend = self._safe_float_conversion(statement.get('ResultDividendPerShareAnnual'), '年間配当')
+                    
+                    if annual_dividend and annual_dividend > 0:
+                        if year not in yearly_dividends or yearly_dividends[year]['dividend'] < annual_dividend:
+                            yearly_dividends[year] = {
+                                'year': year,
+                                'dividend': annual_dividend,
+                                'date': date_str
+                            }
+                except (ValueError, TypeError) as e:
+                    app_logger.debug(f"statement処理エラー: {e}")
+                    continue
+            
+            # リストに変換してソート
+            dividend_history = sorted(yearly_dividends.values(), key=lambda x: x['year'], reverse=True)
             
             app_logger.info(f"配当履歴取得: {symbol} - {len(dividend_history)}年分")
             return dividend_history
@@ -637,22 +591,10 @@ class JQuantsDataSource:
             jquants_code = self._format_jquants_symbol(symbol)
             app_logger.info(f"J Quants API: {symbol} → {jquants_code}")
             
-            # J Quants APIで株価取得
-            prices_response = self.client.get_prices_daily_quotes(code=jquants_code)
-            
-            # DataFrameレスポンスの処理
-            if hasattr(prices_response, 'empty'):
-                if prices_response.empty:
-                    app_logger.warning(f"J Quants API: DataFrameが空 ({symbol})")
-                    return None
-                quotes = [prices_response.iloc[-1].to_dict()]  # 最新行をdictに変換
-            elif isinstance(prices_response, dict) and 'daily_quotes' in prices_response:
-                quotes = prices_response['daily_quotes']
-                if not quotes:
-                    app_logger.warning(f"J Quants API: データなし ({symbol})")
-                    return None
-            else:
-                app_logger.warning(f"J Quants API: 未知のレスポンス形式 ({symbol})")
+            # J Quants APIで直近2営業日の株価取得
+            quotes = self._get_latest_quotes(jquants_code)
+            if not quotes:
+                app_logger.warning(f"J Quants API: データなし ({symbol})")
                 return None
             
             # 最新データを取得
@@ -660,17 +602,10 @@ class JQuantsDataSource:
             previous_quote = quotes[-2] if len(quotes) > 1 else latest_quote
             
             # 株式情報取得（同じコード変換を適用）
-            info_response = self.client.get_listed_info(code=jquants_code)
             company_name = symbol  # デフォルト
-            
-            # DataFrameレスポンスの処理
-            if hasattr(info_response, 'empty'):
-                if not info_response.empty:
-                    company_name = info_response.iloc[0].get('CompanyName', symbol)
-            elif isinstance(info_response, dict) and 'listed_info' in info_response:
-                listed_info = info_response['listed_info']
-                if listed_info and len(listed_info) > 0:
-                    company_name = listed_info[0].get('CompanyName', symbol)
+            listed_info = next(JQuantsStream(self.client).iter_listed_info(code=jquants_code), None)
+            if listed_info:
+                company_name = listed_info.get('CompanyName', symbol)
             
             # 財務データを取得
             pe_ratio, pb_ratio, roe, dividend_yield = self._get_financial_metrics(jquants_code, float(latest_quote.get('Close', 0)))
@@ -686,7 +621,7 @@ class JQuantsDataSource:
                 current_price=float(current_price),
                 previous_close=float(previous_close),
                 change_percent=change_percent,
-                volume=int(latest_quote.get('Volume', 0)),
+                volume=int(latest_quote.get('Volume') or 0),
                 market_cap=None,  # J Quants APIから取得可能だが実装省略
                 pe_ratio=pe_ratio,
                 pb_ratio=pb_ratio,
@@ -763,13 +698,15 @@ class RakutenRSSDataSource:
 class MultiDataSource:
     """複数データソースのフォールバック機能"""
     
-    def __init__(self, jquants_email: str = None, jquants_password: str = None, refresh_token: str = None):
+    def __init__(self, jquants_email: str = None, jquants_password: str = None, refresh_token: str = None,
+                 fundamentals_db=None):
         self.sources = []
         
         # J Quants APIを第一選択（利用可能な場合）
         if JQUANTS_AVAILABLE:
             try:
-                jquants_source = JQuantsDataSource(jquants_email, jquants_password, refresh_token)
+                jquants_source = JQuantsDataSource(jquants_email, jquants_password, refresh_token,
+                                                   fundamentals_db=fundamentals_db)
                 self.sources.append(jquants_source)
                 app_logger.info("J Quants APIをプライマリデータソースに設定")
             except Exception as e:
@@ -828,28 +765,16 @@ class MultiDataSource:
         app_logger.error(f"全データソース失敗: {symbol}")
         return None
     
+    def get_jquants_source(self) -> Optional[JQuantsDataSource]:
+        """認証済みのJ Quantsデータソースを返す（なければNone）"""
+        for source in self.sources:
+            if isinstance(source, JQuantsDataSource) and source.client:
+                return source
+        return None
+    
     def _is_japanese_stock(self, symbol: str) -> bool:
         """日本株かどうかを判定"""
-        # 疑似シンボルは日本株ではない
-        if (symbol.startswith('PORTFOLIO_') or 
-            symbol.startswith('FUND_') or
-            symbol == 'STOCK_PORTFOLIO' or
-            symbol == 'TOTAL_PORTFOLIO'):
-            return False
-        
-        # 数字のみの場合は日本株
-        if symbol.isdigit() and len(symbol) == 4:
-            return True
-        
-        # 数字+アルファベット1文字の場合は日本株の優先株
-        if len(symbol) == 5 and symbol[:4].isdigit() and symbol[4].isalpha():
-            return True
-        
-        # アルファベットのみの場合は米国株
-        if symbol.isalpha():
-            return False
-        
-        return True
+        return symbol_registry.is_japanese(symbol)
     
     def _supplement_financial_data(self, primary_info: StockInfo, fallback_info: Optional[StockInfo]) -> StockInfo:
         """不足している財務データをフォールバックデータで補完"""
@@ -928,6 +853,43 @@ class MultiDataSource:
         return False
 
 
+_shared_data_source: Optional[MultiDataSource] = None
+_shared_data_source_key = None
+_shared_data_source_lock = threading.Lock()
+
+
+def get_shared_data_source(jquants_email: str = None, jquants_password: str = None,
+                           refresh_token: str = None, fundamentals_db=None) -> MultiDataSource:
+    """プロセス共通のMultiDataSourceを取得（認証は初回のみ）
+    
+    認証情報を省略した場合は環境変数（.env）から読み込む。
+    認証情報が変わった場合のみ作り直す。
+    """
+    global _shared_data_source, _shared_data_source_key
+    
+    if not (jquants_email or jquants_password or refresh_token):
+        from dotenv import load_dotenv
+        load_dotenv()
+        jquants_email = os.getenv('JQUANTS_EMAIL')
+        jquants_password = os.getenv('JQUANTS_PASSWORD')
+        refresh_token = os.getenv('JQUANTS_REFRESH_TOKEN')
+    
+    key = credential_fingerprint(f"{jquants_email or ''}\n{jquants_password or ''}", refresh_token)
+    
+    with _shared_data_source_lock:
+        if _shared_data_source is None or _shared_data_source_key != key:
+            _shared_data_source = MultiDataSource(jquants_email, jquants_password, refresh_token,
+                                                  fundamentals_db=fundamentals_db)
+            _shared_data_source_key = key
+        elif fundamentals_db is not None:
+            # 後から渡されたローカル財務データを共有インスタンスにも反映
+            for source in _shared_data_source.sources:
+                if isinstance(source, JQuantsDataSource) and source.fundamentals_db is None:
+                    source.fundamentals_db = fundamentals_db
+        
+        return _shared_data_source
+
+
 if __name__ == "__main__":
     # テスト用 - 環境変数から認証情報を読み込み
     from dotenv import load_dotenv
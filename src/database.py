@@ -1,21 +1,309 @@
+import os
+import re
 import sqlite3
 import json
-from datetime import datetime
-from typing import List, Dict, Optional
+from contextlib import contextmanager
+from dataclasses import asdict
+from datetime import date, datetime
+from typing import Iterator, List, Dict, Optional, Sequence, Tuple, Union
+import numpy as np
+import pandas as pd
 from csv_parser import Holding
 from data_sources import StockInfo
+from db_connection import PERSIST_INTERVAL_SECONDS, enable_in_memory, get_connection_manager
+from holdings_store import get_holdings_store
+from issuers import normalize_search_text
+from portfolio_summary import SummaryTotals, build_summary, get_portfolio_tracker
+from records import AlertRecord, HoldingRecord, WatchlistRecord, WishlistRecord
+from unit_of_work import UnitOfWork
+
+
+# スキーマ移行: (バージョン, 内容, SQL一覧)
+# 追加のみ行い、適用済みバージョンは PRAGMA user_version に記録する
+SCHEMA_MIGRATIONS = [
+    (1, 'アラート履歴・監視銘柄・欲しい銘柄の一覧取得用インデックス', [
+        'CREATE INDEX IF NOT EXISTS idx_alerts_created_at ON alerts(created_at, id)',
+        'CREATE INDEX IF NOT EXISTS idx_watchlist_active_created ON watchlist(is_active, created_at)',
+        'CREATE INDEX IF NOT EXISTS idx_wishlist_active_created ON wishlist(is_active, created_at)',
+    ]),
+    (2, '株価時系列取得用のカバリングインデックス', [
+        '''CREATE INDEX IF NOT EXISTS idx_price_history_series
+           ON price_history(symbol, date, open_price, high_price, low_price, close_price, volume)''',
+    ]),
+    (3, '古い株価履歴を集約した週足・月足テーブル', [
+        '''CREATE TABLE IF NOT EXISTS price_history_bars (
+               symbol TEXT NOT NULL,
+               period TEXT NOT NULL,
+               period_start DATE NOT NULL,
+               first_date DATE NOT NULL,
+               last_date DATE NOT NULL,
+               open_price REAL,
+               high_price REAL,
+               low_price REAL,
+               close_price REAL,
+               volume INTEGER,
+               PRIMARY KEY (symbol, period, period_start)
+           ) WITHOUT ROWID''',
+    ]),
+    (4, '日中足テーブル', [
+        '''CREATE TABLE IF NOT EXISTS intraday_bars (
+               symbol TEXT NOT NULL,
+               bar_seconds INTEGER NOT NULL,
+               bar_start TIMESTAMP NOT NULL,
+               open_price REAL,
+               high_price REAL,
+               low_price REAL,
+               close_price REAL,
+               volume INTEGER,
+               tick_count INTEGER,
+               PRIMARY KEY (symbol, bar_seconds, bar_start)
+           ) WITHOUT ROWID''',
+    ]),
+    (5, 'アラート履歴の絞り込みページング用インデックス', [
+        'CREATE INDEX IF NOT EXISTS idx_alerts_symbol_created ON alerts(symbol, created_at, id)',
+        'CREATE INDEX IF NOT EXISTS idx_alerts_type_created ON alerts(alert_type, created_at, id)',
+        'CREATE INDEX IF NOT EXISTS idx_alerts_strategy_created ON alerts(strategy_name, created_at, id)',
+    ]),
+    (6, '日次ポートフォリオ評価額スナップショット', [
+        '''CREATE TABLE IF NOT EXISTS portfolio_snapshots (
+               snapshot_date DATE PRIMARY KEY,
+               total_stocks INTEGER NOT NULL,
+               total_acquisition REAL NOT NULL,
+               total_market_value REAL NOT NULL,
+               total_profit_loss REAL NOT NULL,
+               return_rate REAL NOT NULL,
+               created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+           ) WITHOUT ROWID''',
+        '''CREATE TABLE IF NOT EXISTS holding_snapshots (
+               snapshot_date DATE NOT NULL,
+               symbol TEXT NOT NULL,
+               broker TEXT NOT NULL DEFAULT '',
+               account_type TEXT NOT NULL DEFAULT '',
+               quantity INTEGER,
+               current_price REAL,
+               acquisition_amount REAL,
+               market_value REAL,
+               profit_loss REAL,
+               PRIMARY KEY (snapshot_date, symbol, broker, account_type)
+           ) WITHOUT ROWID''',
+        'CREATE INDEX IF NOT EXISTS idx_holding_snapshots_symbol ON holding_snapshots(symbol, snapshot_date)',
+    ]),
+    (7, '上場銘柄一覧（銘柄検索用）', [
+        '''CREATE TABLE IF NOT EXISTS issuers (
+               code TEXT PRIMARY KEY,
+               name TEXT NOT NULL,
+               name_english TEXT DEFAULT '',
+               search_name TEXT NOT NULL DEFAULT '',
+               sector17_code TEXT,
+               sector17_name TEXT,
+               sector33_code TEXT,
+               sector33_name TEXT,
+               market_code TEXT,
+               market_name TEXT,
+               scale_category TEXT,
+               updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+           )''',
+        'CREATE INDEX IF NOT EXISTS idx_issuers_sector33 ON issuers(sector33_code)',
+    ]),
+    (8, '保有銘柄の変更カウンタ（他の接続の書き込み検知用）', [
+        '''CREATE TABLE IF NOT EXISTS holdings_version (
+               id INTEGER PRIMARY KEY CHECK (id = 1),
+               version INTEGER NOT NULL
+           )''',
+        'INSERT OR IGNORE INTO holdings_version (id, version) VALUES (1, 0)',
+        '''CREATE TRIGGER IF NOT EXISTS holdings_version_ai AFTER INSERT ON holdings BEGIN
+               UPDATE holdings_version SET version = version + 1 WHERE id = 1;
+           END''',
+        '''CREATE TRIGGER IF NOT EXISTS holdings_version_au AFTER UPDATE ON holdings BEGIN
+               UPDATE holdings_version SET version = version + 1 WHERE id = 1;
+           END''',
+        '''CREATE TRIGGER IF NOT EXISTS holdings_version_ad AFTER DELETE ON holdings BEGIN
+               UPDATE holdings_version SET version = version + 1 WHERE id = 1;
+           END''',
+    ]),
+]
+SCHEMA_VERSION = SCHEMA_MIGRATIONS[-1][0]
+
+
+# holdings への書き込みごとにトリガーで進む変更カウンタ
+HOLDINGS_VERSION_SQL = 'SELECT version FROM holdings_version WHERE id = 1'
+
+
+# 株価時系列の項目名 → price_history のカラム
+PRICE_FIELDS = {
+    'open': 'open_price',
+    'high': 'high_price',
+    'low': 'low_price',
+    'close': 'close_price',
+    'volume': 'volume',
+}
+
+# 銘柄検索の全文検索インデックス（issuers の外部コンテンツ、トリガーで同期）
+_ISSUER_FTS_SQL = [
+    '''CREATE VIRTUAL TABLE IF NOT EXISTS issuers_fts USING fts5(
+           code, search_name, name_english,
+           content='issuers', content_rowid='rowid', tokenize='trigram'
+       )''',
+    '''CREATE TRIGGER IF NOT EXISTS issuers_fts_insert AFTER INSERT ON issuers BEGIN
+           INSERT INTO issuers_fts(rowid, code, search_name, name_english)
+           VALUES (new.rowid, new.code, new.search_name, new.name_english);
+       END''',
+    '''CREATE TRIGGER IF NOT EXISTS issuers_fts_delete AFTER DELETE ON issuers BEGIN
+           INSERT INTO issuers_fts(issuers_fts, rowid, code, search_name, name_english)
+           VALUES ('delete', old.rowid, old.code, old.search_name, old.name_english);
+       END''',
+    '''CREATE TRIGGER IF NOT EXISTS issuers_fts_update AFTER UPDATE ON issuers BEGIN
+           INSERT INTO issuers_fts(issuers_fts, rowid, code, search_name, name_english)
+           VALUES ('delete', old.rowid, old.code, old.search_name, old.name_english);
+           INSERT INTO issuers_fts(rowid, code, search_name, name_english)
+           VALUES (new.rowid, new.code, new.search_name, new.name_english);
+       END''',
+]
+_ISSUER_SEARCH_COLUMNS = 'i.code, i.name, i.name_english, i.sector33_name, i.market_name'
+_CODE_QUERY = re.compile(r'^[0-9][0-9A-Za-z]{0,4}$')
+
+
+def _fts_trigram_available() -> bool:
+    """FTS5の trigram トークナイザ（SQLite 3.34以降）が使えるか"""
+    conn = sqlite3.connect(':memory:')
+    try:
+        conn.execute("CREATE VIRTUAL TABLE fts_check USING fts5(text, tokenize='trigram')")
+        return True
+    except sqlite3.Error:
+        return False
+    finally:
+        conn.close()
+
+
+# 使えない環境では銘柄検索を LIKE による部分一致で行う
+ISSUER_FTS_AVAILABLE = _fts_trigram_available()
+
+# SQLiteのバインド変数上限（古いバージョンは999）に収まる銘柄数
+_MAX_SYMBOLS_PER_QUERY = 500
+
+# 軽量レコードで読み込む場合のカラム（SQL文を固定して接続ごとの文キャッシュに載せる）
+_WATCHLIST_RECORD_SQL = f'''
+    SELECT {', '.join(WatchlistRecord._fields)} FROM watchlist
+    WHERE is_active = 1
+    ORDER BY created_at DESC
+'''
+_WISHLIST_RECORD_SQL = f'''
+    SELECT {', '.join(WishlistRecord._fields)} FROM wishlist
+    WHERE is_active = 1
+    ORDER BY created_at DESC
+'''
+_ALERT_RECORD_COLUMNS = ', '.join(AlertRecord._fields)
+
+# 一括エクスポート対象のテーブル → 月別分割に使う日付カラム（Noneは分割不可）
+EXPORT_TABLES = {
+    'holdings': None,
+    'price_history': 'date',
+    'alerts': 'created_at',
+    'price_history_bars': 'period_start',
+    'intraday_bars': 'bar_start',
+    'portfolio_snapshots': 'snapshot_date',
+    'holding_snapshots': 'snapshot_date',
+}
 
 
 class DatabaseManager:
     """SQLiteデータベース管理クラス"""
     
-    def __init__(self, db_path: str = "data/portfolio.db"):
+    def __init__(self, db_path: str = "data/portfolio.db", in_memory: bool = False,
+                 persist_interval: float = PERSIST_INTERVAL_SECONDS):
+        """
+        Args:
+            db_path: データベースファイル（':memory:' ならディスクに保存しないインメモリDB）
+            in_memory: Trueなら db_path をメモリ上に読み込んで使い、persist_interval 秒ごとと
+                終了時にディスクへ書き戻す（同じプロセスの以降の DatabaseManager(db_path) も共有）
+        """
         self.db_path = db_path
-        self.init_database()
+        if in_memory:
+            enable_in_memory(db_path, persist_interval)
+        self._pool = get_connection_manager(db_path)
+        # 保有銘柄のメモリ上の写し（同じDBを開く全インスタンスで共有）
+        self.holdings_store = get_holdings_store(db_path)
+        # 保有銘柄の変更から差分更新するポートフォリオ集計
+        self.portfolio_summary = get_portfolio_tracker(db_path, self.holdings_store)
+        
+        # ファイルが削除されていれば古い接続を捨てて作り直す
+        if self._pool.is_file and not os.path.exists(db_path):
+            self._pool.close()
+            self._pool.remove_orphaned_journal()
+            self.holdings_store.invalidate()
+        
+        # スキーマ初期化はプロセス内でデータベースごとに1回
+        if not self._pool.schema_initialized:
+            self.init_database()
+    
+    def _connect(self):
+        """スレッドごとの永続接続でトランザクションを開始（読み込み用）"""
+        return self._pool.transaction()
+    
+    def _write(self):
+        """書き込みロックを取得してトランザクションを開始（他プロセスと安全に共有）"""
+        return self._pool.write_transaction()
+    
+    @contextmanager
+    def batch(self) -> Iterator[sqlite3.Connection]:
+        """複数の書き込みを1トランザクションにまとめる
+        
+        with db.batch(): の中で呼んだ書き込みメソッドは外側のトランザクションに
+        含まれ、ブロックを抜けたときに1回だけコミットされる（例外時はすべてロールバック）。
+        """
+        try:
+            with self._write() as conn:
+                yield conn
+        except BaseException:
+            # ロールバックした書き込みが保有銘柄ストアには反映済みの場合がある
+            self.holdings_store.invalidate()
+            raise
+    
+    def snapshot(self):
+        """ブロック内の読み込みを同じ時点のデータで行う（with db.snapshot():）"""
+        return self._pool.read_snapshot()
+    
+    def unit_of_work(self, writer=None) -> UnitOfWork:
+        """周期の最初の読み込みを1つのスナップショットで行い、書き込みを最後に1回でコミットする
+        
+        with db.unit_of_work() as uow: の中では、同じ時点で読みたいものを
+        with uow.reads(): のブロックで読み込み（通信の前に抜ける）、
+        書き込みは uow.log_alert() / uow.save_price_history() / uow.defer() に積む。
+        writer（WriteBehindQueue）を渡すと、最後のコミットを書き込みスレッドで行う。
+        """
+        return UnitOfWork(self, writer)
+    
+    def close(self):
+        """このデータベースへの接続をすべて閉じる（インメモリモードではディスクへ書き戻す）"""
+        self._pool.close()
+    
+    @property
+    def in_memory(self) -> bool:
+        return not self._pool.is_file
+    
+    def persist(self) -> bool:
+        """インメモリモードの内容をすぐにディスクへ書き戻す（ディスク上のDBでは何もしない）"""
+        return self._pool.persist()
+    
+    @staticmethod
+    def _fetch_records(conn: sqlite3.Connection, sql: str, params: Sequence, record_type) -> list:
+        """行をdictにせず、そのままレコード型（NamedTuple）に詰める"""
+        cursor = conn.cursor()
+        cursor.row_factory = None
+        cursor.execute(sql, params)
+        return list(map(record_type._make, cursor.fetchall()))
     
     def init_database(self):
         """データベースとテーブルを初期化"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connect() as conn:
+            # 新規作成時は増分VACUUMを有効化（既存DBは保守処理の compact で切り替える）
+            # WAL設定後は空のDBでもVACUUMしないと反映されない
+            if not conn.execute('SELECT 1 FROM sqlite_master LIMIT 1').fetchone():
+                conn.commit()
+                conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+                conn.execute('VACUUM')
+        
+        with self._write() as conn:
             cursor = conn.cursor()
             
             # 保有銘柄テーブル
@@ -96,45 +384,155 @@ class DatabaseManager:
                 )
             ''')
             
-            conn.commit()
+            # 財務データテーブル（J Quants決算開示の最新値、コードは5桁）
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS fundamentals (
+                    code TEXT PRIMARY KEY,
+                    disclosed_date DATE,
+                    type_of_document TEXT DEFAULT '',
+                    eps REAL,
+                    forecast_eps REAL,
+                    bps REAL,
+                    result_dividend_annual REAL,
+                    forecast_dividend_annual REAL,
+                    net_income REAL,
+                    equity REAL,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            
+            # 差分同期の状態テーブル
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS sync_state (
+                    key TEXT PRIMARY KEY,
+                    value TEXT,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+        
+        self._apply_migrations()
+        if ISSUER_FTS_AVAILABLE:
+            self._create_issuer_search_index()
+        self._pool.schema_initialized = True
+    
+    def get_schema_version(self) -> int:
+        """適用済みのスキーマバージョンを取得"""
+        with self._connect() as conn:
+            return conn.execute('PRAGMA user_version').fetchone()[0]
+    
+    def _apply_migrations(self):
+        """未適用のスキーマ移行をバージョン順に1つずつ適用"""
+        current_version = self.get_schema_version()
+        
+        for version, description, statements in SCHEMA_MIGRATIONS:
+            if version <= current_version:
+                continue
+            
+            with self._write() as conn:
+                # DDLを含めて1バージョン分を1トランザクションで適用
+                # （他プロセスが同時に移行した場合に備えてロック取得後に再確認）
+                if conn.execute('PRAGMA user_version').fetchone()[0] >= version:
+                    continue
+                for statement in statements:
+                    conn.execute(statement)
+                conn.execute(f'PRAGMA user_version = {version}')
+            print(f"データベース移行: v{version} {description}")
+    
+    def _create_issuer_search_index(self):
+        """銘柄検索の全文検索インデックスを作成（既存の上場銘柄一覧も索引化）"""
+        with self._write() as conn:
+            if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'issuers_fts'").fetchone():
+                return
+            for statement in _ISSUER_FTS_SQL:
+                conn.execute(statement)
+            conn.execute("INSERT INTO issuers_fts(issuers_fts) VALUES ('rebuild')")
+    
+    @staticmethod
+    def _holding_row(holding: Holding, timestamp: datetime) -> tuple:
+        return (
+            holding.symbol,
+            holding.name,
+            holding.quantity,
+            holding.average_cost,
+            holding.current_price,
+            holding.acquisition_amount,
+            holding.market_value,
+            holding.profit_loss,
+            holding.broker,
+            holding.account_type,
+            timestamp
+        )
     
     def insert_holdings(self, holdings: List[Holding]) -> int:
-        """保有銘柄を一括挿入"""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
+        """保有銘柄を一括挿入（1トランザクション・同一タイムスタンプ）"""
+        if not holdings:
+            return 0
+        
+        sql = '''
+            INSERT OR REPLACE INTO holdings 
+            (symbol, name, quantity, average_cost, current_price, 
+             acquisition_amount, market_value, profit_loss, broker, account_type, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        '''
+        now = datetime.now()
+        
+        try:
+            with self._write() as conn:
+                conn.executemany(sql, [self._holding_row(h, now) for h in holdings])
+            inserted = holdings
+        except sqlite3.Error as e:
+            print(f"保有銘柄一括挿入エラー: {e} - 1件ずつ再試行します")
             
-            inserted_count = 0
-            for holding in holdings:
-                try:
-                    cursor.execute('''
-                        INSERT OR REPLACE INTO holdings 
-                        (symbol, name, quantity, average_cost, current_price, 
-                         acquisition_amount, market_value, profit_loss, broker, account_type, updated_at)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    ''', (
-                        holding.symbol,
-                        holding.name,
-                        holding.quantity,
-                        holding.average_cost,
-                        holding.current_price,
-                        holding.acquisition_amount,
-                        holding.market_value,
-                        holding.profit_loss,
-                        holding.broker,
-                        holding.account_type,
-                        datetime.now()
-                    ))
-                    inserted_count += 1
-                except sqlite3.Error as e:
-                    print(f"保有銘柄挿入エラー ({holding.symbol}): {e}")
-            
-            conn.commit()
-            return inserted_count
-    
-    def get_all_holdings(self) -> List[Dict]:
-        """全保有銘柄を取得"""
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
+            # 一括挿入に失敗した場合は不正な行だけを除外して挿入
+            inserted = []
+            with self._write() as conn:
+                for holding in holdings:
+                    try:
+                        conn.execute(sql, self._holding_row(holding, now))
+                        inserted.append(holding)
+                    except sqlite3.Error as e:
+                        print(f"保有銘柄挿入エラー ({holding.symbol}): {e}")
+        
+        # INSERT OR REPLACE で行IDが変わるため、次回読み込み時にDBから再取得
+        self.holdings_store.invalidate()
+        self.holdings_store.notify_inserted([asdict(holding) for holding in inserted])
+        return len(inserted)
+    
+    @staticmethod
+    def _holdings_version(conn: sqlite3.Connection) -> int:
+        """holdings の変更カウンタ（holdings への書き込みだけで進む）"""
+        return conn.execute(HOLDINGS_VERSION_SQL).fetchone()[0]
+    
+    def _sync_holdings_store(self) -> None:
+        """他の接続（別プロセス等）が holdings に書き込んでいれば保有銘柄ストアを無効化"""
+        if not self.holdings_store.is_loaded:
+            return
+        self.holdings_store.check_version(self._holdings_version(self._pool.connection()))
+    
+    def get_all_holdings(self, as_records: bool = False) -> List:
+        """全保有銘柄を取得（メモリ上の写しがあればDBを読まない）
+        
+        as_records=True なら HoldingRecord のリスト（辞書のコピーを作らない）
+        """
+        self._sync_holdings_store()
+        if as_records:
+            records = self.holdings_store.records()
+            if records is None:
+                holdings = self.get_all_holdings()
+                records = self.holdings_store.records()
+                if records is None:
+                    # 読み込み中に書き込みがありストアに載らなかった場合
+                    records = [HoldingRecord(*(holding[field] for field in HoldingRecord._fields))
+                               for holding in holdings]
+            return records
+        
+        cached = self.holdings_store.all()
+        if cached is not None:
+            return cached
+        
+        generation = self.holdings_store.generation
+        with self._connect() as conn:
+            version = self._holdings_version(conn)
             cursor = conn.cursor()
             
             cursor.execute('''
@@ -142,30 +540,81 @@ class DatabaseManager:
                 ORDER BY market_value DESC
             ''')
             
-            return [dict(row) for row in cursor.fetchall()]
+            holdings = [dict(row) for row in cursor.fetchall()]
+        
+        self.holdings_store.load(holdings, generation, version)
+        return holdings
     
-    def update_current_prices(self, price_updates: Dict[str, float]):
-        """現在価格を一括更新"""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            
-            for symbol, price in price_updates.items():
-                cursor.execute('''
-                    UPDATE holdings 
-                    SET current_price = ?,
-                        market_value = quantity * ?,
-                        profit_loss = (quantity * ?) - acquisition_amount,
-                        updated_at = ?
-                    WHERE symbol = ?
-                ''', (price, price, price, datetime.now(), symbol))
-            
-            conn.commit()
+    def get_holdings_by_symbol(self, symbol: str) -> List[Dict]:
+        """銘柄コードの保有情報（証券会社・口座ごと）を取得"""
+        self._sync_holdings_store()
+        holdings = self.holdings_store.get(symbol)
+        if holdings is None:
+            # 未読み込みなら全件を1回読み込んでストアに載せる
+            holdings = [h for h in self.get_all_holdings() if str(h['symbol']) == str(symbol)]
+        return holdings
+    
+    def get_holding(self, symbol: str) -> Optional[Dict]:
+        """銘柄コードの保有情報を1件取得（複数口座ある場合は評価額が最大のもの）"""
+        holdings = self.get_holdings_by_symbol(symbol)
+        if not holdings:
+            return None
+        return max(holdings, key=lambda holding: holding.get('market_value') or 0)
+    
+    def get_holdings_count(self) -> int:
+        """保有銘柄の件数"""
+        self._sync_holdings_store()
+        count = self.holdings_store.count()
+        return count if count is not None else len(self.get_all_holdings())
+    
+    def subscribe_holdings(self, listener) -> None:
+        """保有銘柄の変更イベントを購読（listener(event, holdings)）"""
+        self.holdings_store.subscribe(listener)
+    
+    def unsubscribe_holdings(self, listener) -> None:
+        self.holdings_store.unsubscribe(listener)
+    
+    def update_current_prices(self, price_updates: Dict[str, float]) -> int:
+        """現在価格を一括更新（一時テーブルとの結合で1回のUPDATE）"""
+        if not price_updates:
+            return 0
+        
+        now = datetime.now()
+        with self._write() as conn:
+            version_before = self._holdings_version(conn)
+            conn.execute('''
+                CREATE TEMP TABLE IF NOT EXISTS price_updates (
+                    symbol TEXT PRIMARY KEY,
+                    price REAL NOT NULL
+                )
+            ''')
+            conn.execute('DELETE FROM temp.price_updates')
+            conn.executemany(
+                'INSERT OR REPLACE INTO temp.price_updates (symbol, price) VALUES (?, ?)',
+                price_updates.items()
+            )
+            # UPDATE ... FROM はSQLite 3.33以降のため、主キー参照の相関サブクエリで結合
+            cursor = conn.execute('''
+                UPDATE holdings 
+                SET current_price = (SELECT p.price FROM temp.price_updates p WHERE p.symbol = holdings.symbol),
+                    market_value = quantity * (SELECT p.price FROM temp.price_updates p WHERE p.symbol = holdings.symbol),
+                    profit_loss = (quantity * (SELECT p.price FROM temp.price_updates p WHERE p.symbol = holdings.symbol)) - acquisition_amount,
+                    updated_at = ?
+                WHERE symbol IN (SELECT symbol FROM temp.price_updates)
+            ''', (now,))
+            updated_count = cursor.rowcount
+            conn.execute('DELETE FROM temp.price_updates')
+            version = (version_before, self._holdings_version(conn))
+        
+        # DBに保存される表記（datetimeのstr）と揃えて反映
+        self.holdings_store.apply_prices(price_updates, str(now), version)
+        return updated_count
     
     def add_to_watchlist(self, symbol: str, name: str, strategy_name: str, 
                         target_buy_price: Optional[float] = None,
                         target_sell_price: Optional[float] = None):
         """監視銘柄に追加"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._write() as conn:
             cursor = conn.cursor()
             
             try:
@@ -174,17 +623,17 @@ class DatabaseManager:
                     (symbol, name, strategy_name, target_buy_price, target_sell_price, updated_at)
                     VALUES (?, ?, ?, ?, ?, ?)
                 ''', (symbol, name, strategy_name, target_buy_price, target_sell_price, datetime.now()))
-                
-                conn.commit()
                 return True
             except sqlite3.Error as e:
                 print(f"監視銘柄追加エラー: {e}")
                 return False
     
-    def get_watchlist(self) -> List[Dict]:
-        """監視銘柄一覧を取得"""
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
+    def get_watchlist(self, as_records: bool = False) -> List:
+        """監視銘柄一覧を取得（as_records=True なら WatchlistRecord のリスト）"""
+        with self._connect() as conn:
+            if as_records:
+                return self._fetch_records(conn, _WATCHLIST_RECORD_SQL, (), WatchlistRecord)
+            
             cursor = conn.cursor()
             
             cursor.execute('''
@@ -197,7 +646,7 @@ class DatabaseManager:
     
     def add_to_wishlist(self, symbol: str, name: str, target_price: Optional[float] = None, memo: str = '') -> bool:
         """欲しい銘柄に追加"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._write() as conn:
             cursor = conn.cursor()
             
             try:
@@ -206,17 +655,22 @@ class DatabaseManager:
                     (symbol, name, target_price, memo, updated_at)
                     VALUES (?, ?, ?, ?, ?)
                 ''', (symbol, name, target_price, memo, datetime.now()))
-                
-                conn.commit()
                 return True
             except sqlite3.Error as e:
                 print(f"欲しい銘柄追加エラー: {e}")
                 return False
     
-    def get_wishlist(self) -> List[Dict]:
-        """欲しい銘柄一覧を取得"""
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
+    def get_watchlist_count(self) -> int:
+        """監視銘柄の件数"""
+        with self._connect() as conn:
+            return conn.execute('SELECT COUNT(*) FROM watchlist WHERE is_active = 1').fetchone()[0]
+    
+    def get_wishlist(self, as_records: bool = False) -> List:
+        """欲しい銘柄一覧を取得（as_records=True なら WishlistRecord のリスト）"""
+        with self._connect() as conn:
+            if as_records:
+                return self._fetch_records(conn, _WISHLIST_RECORD_SQL, (), WishlistRecord)
+            
             cursor = conn.cursor()
             
             cursor.execute('''
@@ -229,13 +683,12 @@ class DatabaseManager:
     
     def delete_from_wishlist(self, symbol: str) -> bool:
         """欲しい銘柄から削除"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._write() as conn:
             cursor = conn.cursor()
             
             try:
                 cursor.execute('DELETE FROM wishlist WHERE symbol = ?', (symbol,))
                 deleted_rows = cursor.rowcount
-                conn.commit()
                 
                 if deleted_rows > 0:
                     print(f"欲しい銘柄削除: {symbol}")
@@ -249,13 +702,12 @@ class DatabaseManager:
     
     def delete_from_watchlist(self, symbol: str) -> bool:
         """監視リストから削除"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._write() as conn:
             cursor = conn.cursor()
             
             try:
                 cursor.execute('DELETE FROM watchlist WHERE symbol = ?', (symbol,))
                 deleted_rows = cursor.rowcount
-                conn.commit()
                 
                 if deleted_rows > 0:
                     print(f"監視リスト削除: {symbol}")
@@ -271,7 +723,7 @@ class DatabaseManager:
                   triggered_price: Optional[float] = None, 
                   strategy_name: Optional[str] = None):
         """アラートをログに記録"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._write() as conn:
             cursor = conn.cursor()
             
             try:
@@ -280,8 +732,6 @@ class DatabaseManager:
                     (symbol, alert_type, message, triggered_price, strategy_name)
                     VALUES (?, ?, ?, ?, ?)
                 ''', (symbol, alert_type, message, triggered_price, strategy_name))
-                
-                conn.commit()
                 return True
             except sqlite3.Error as e:
                 print(f"アラートログエラー: {e}")
@@ -289,21 +739,67 @@ class DatabaseManager:
     
     def get_alerts(self, limit: int = 100) -> List[Dict]:
         """アラート履歴を取得"""
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
+        with self._connect() as conn:
             cursor = conn.cursor()
             
             cursor.execute('''
                 SELECT * FROM alerts 
-                ORDER BY created_at DESC 
+                ORDER BY created_at DESC, id DESC 
                 LIMIT ?
             ''', (limit,))
             
             return [dict(row) for row in cursor.fetchall()]
     
+    def get_alerts_page(self, limit: int = 100, cursor: Optional[Sequence] = None,
+                        symbol: Optional[str] = None, alert_type: Optional[str] = None,
+                        strategy_name: Optional[str] = None, as_records: bool = False) -> Dict:
+        """アラート履歴を新しい順に1ページ取得（キーセットページング）
+        
+        cursor には前ページの next_cursor（最後の行の (created_at, id)）を渡す。
+        OFFSET を使わずインデックス上の位置から読み始めるため、
+        何ページ目でも取得時間は変わらない。
+        
+        Returns:
+            {'alerts': [...], 'next_cursor': (created_at, id) または None（最終ページ）}
+            as_records=True なら alerts は AlertRecord のリスト
+        """
+        conditions = []
+        params: List = []
+        for column, value in (('symbol', symbol), ('alert_type', alert_type),
+                              ('strategy_name', strategy_name)):
+            if value:
+                conditions.append(f'{column} = ?')
+                params.append(value)
+        if cursor is not None:
+            created_at, alert_id = cursor
+            # (created_at, id) < (?, ?) をインデックスの範囲検索になる形で記述
+            conditions.append('created_at <= ? AND (created_at < ? OR id < ?)')
+            params.extend([created_at, created_at, alert_id])
+        
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        columns = _ALERT_RECORD_COLUMNS if as_records else '*'
+        sql = f'''
+                SELECT {columns} FROM alerts
+                {where}
+                ORDER BY created_at DESC, id DESC
+                LIMIT ?
+            '''
+        with self._connect() as conn:
+            if as_records:
+                rows = self._fetch_records(conn, sql, params + [limit + 1], AlertRecord)
+            else:
+                rows = [dict(row) for row in conn.execute(sql, params + [limit + 1]).fetchall()]
+        
+        alerts = rows[:limit]
+        next_cursor = None
+        if len(rows) > limit:
+            last = alerts[-1]
+            next_cursor = (last.created_at, last.id) if as_records else (last['created_at'], last['id'])
+        return {'alerts': alerts, 'next_cursor': next_cursor}
+    
     def save_price_history(self, symbol: str, stock_info: StockInfo):
         """株価履歴を保存"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._write() as conn:
             cursor = conn.cursor()
             
             try:
@@ -317,21 +813,443 @@ class DatabaseManager:
                     stock_info.current_price,
                     stock_info.volume
                 ))
-                
-                conn.commit()
                 return True
             except sqlite3.Error as e:
                 print(f"株価履歴保存エラー: {e}")
                 return False
     
+    def get_price_series(self, symbols: Union[str, Sequence[str]],
+                         start: Optional[Union[str, date]] = None,
+                         end: Optional[Union[str, date]] = None,
+                         fields: Sequence[str] = ('close',),
+                         as_numpy: bool = False):
+        """複数銘柄の株価時系列を日付で揃えて取得
+        
+        Args:
+            symbols: 銘柄コード（1つまたは複数）
+            start, end: 期間（両端を含む、Noneは制限なし）
+            fields: 'open' / 'high' / 'low' / 'close' / 'volume'
+            as_numpy: Trueなら {'dates', 'symbols', 各項目の2次元配列} を返す
+        
+        Returns:
+            DataFrame（行: 日付、列: 銘柄。複数項目なら (項目, 銘柄) のMultiIndex）。
+            データのない日付・銘柄はNaN。
+        """
+        if isinstance(symbols, str):
+            symbols = [symbols]
+        symbols = list(dict.fromkeys(symbols))
+        fields = list(fields)
+        
+        unknown = [field for field in fields if field not in PRICE_FIELDS]
+        if unknown:
+            raise ValueError(f"不明な株価項目: {unknown}")
+        
+        columns = ', '.join(f"{PRICE_FIELDS[field]} AS {field}" for field in fields)
+        conditions = []
+        params: List = []
+        if start is not None:
+            conditions.append('date >= ?')
+            params.append(str(start)[:10])
+        if end is not None:
+            conditions.append('date <= ?')
+            params.append(str(end)[:10])
+        
+        frames = []
+        with self._connect() as conn:
+            # 銘柄数が多い場合のみバインド変数上限に合わせて分割
+            for i in range(0, len(symbols), _MAX_SYMBOLS_PER_QUERY):
+                chunk = symbols[i:i + _MAX_SYMBOLS_PER_QUERY]
+                where = ' AND '.join([f"symbol IN ({', '.join('?' * len(chunk))})"] + conditions)
+                frames.append(pd.read_sql_query(
+                    f"SELECT symbol, date, {columns} FROM price_history WHERE {where} ORDER BY symbol, date",
+                    conn, params=chunk + params
+                ))
+        
+        rows = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=['symbol', 'date'] + fields)
+        rows['date'] = pd.to_datetime(rows['date'])
+        
+        frame = rows.pivot(index='date', columns='symbol', values=fields)
+        frame = frame.reindex(columns=pd.MultiIndex.from_product([fields, symbols])).sort_index()
+        frame = frame.astype(float)
+        frame.index.name = 'date'
+        
+        if as_numpy:
+            result = {
+                'dates': frame.index.values,
+                'symbols': symbols,
+            }
+            for field in fields:
+                result[field] = frame[field].to_numpy(dtype=np.float64)
+            return result
+        
+        if len(fields) == 1:
+            frame = frame[fields[0]]
+            frame.columns.name = 'symbol'
+        return frame
+    
+    def get_price_table(self, start: Optional[Union[str, date]] = None,
+                        fields: Sequence[str] = ('high', 'low', 'close')) -> pd.DataFrame:
+        """全銘柄の株価履歴を縦持ちのDataFrameで取得（横断的な集計用）
+        
+        Returns:
+            symbol, date（datetime64）, 各項目の列。銘柄・日付順。
+        """
+        fields = list(fields)
+        unknown = [field for field in fields if field not in PRICE_FIELDS]
+        if unknown:
+            raise ValueError(f"不明な株価項目: {unknown}")
+        
+        columns = ', '.join(PRICE_FIELDS[field] for field in fields)
+        where, params = '', []
+        if start is not None:
+            where, params = 'WHERE date >= ?', [str(start)[:10]]
+        with self._connect() as conn:
+            # (symbol, date, ...) のカバリングインデックスの順に、行を辞書にせず読む
+            cursor = conn.cursor()
+            cursor.row_factory = None
+            cursor.execute(f"SELECT symbol, date, {columns} FROM price_history {where} ORDER BY symbol, date",
+                           params)
+            frame = pd.DataFrame.from_records(cursor.fetchall(), columns=['symbol', 'date'] + fields,
+                                              coerce_float=True)
+        frame['date'] = pd.to_datetime(frame['date'])
+        return frame.astype({field: float for field in fields if field != 'volume'})
+    
+    def downsample_price_history(self, daily_before: str, weekly_before: str) -> Dict[str, int]:
+        """古い日足を週足・月足に集約して削除
+        
+        daily_before より前の日足は週足に、weekly_before より前の日足と週足は
+        月足に集約する（週足は開始日の月に含める）。既存の足とは始値・終値を
+        日付で、高値・安値を最大・最小で、出来高を合計でマージする。
+        
+        Args:
+            daily_before: 日足を残す最古日（YYYY-MM-DD）
+            weekly_before: 週足を残す最古日（YYYY-MM-DD、daily_before以前）
+        
+        Returns:
+            {'weekly': 集約した日足数, 'monthly': 集約した日足・週足数}
+        """
+        # 週の開始日は月曜日
+        period_expressions = {
+            'W': "date(date, 'weekday 0', '-6 days')",
+            'M': "date(date, 'start of month')",
+        }
+        ranges = [
+            ('W', 'price_history', 'date >= ? AND date < ?', (weekly_before, daily_before)),
+            ('M', 'price_history', 'date < ?', (weekly_before,)),
+        ]
+        counts = {'weekly': 0, 'monthly': 0}
+        
+        try:
+            with self._write() as conn:
+                for period, source, condition, params in ranges:
+                    cursor = conn.execute(f'''
+                        WITH grouped AS (
+                            SELECT symbol,
+                                   {period_expressions[period]} AS period_start,
+                                   MIN(date) AS first_date,
+                                   MAX(date) AS last_date,
+                                   MAX(COALESCE(high_price, close_price)) AS high_price,
+                                   MIN(COALESCE(low_price, close_price)) AS low_price,
+                                   SUM(volume) AS volume
+                            FROM {source}
+                            WHERE {condition}
+                            GROUP BY symbol, period_start
+                        )
+                        INSERT INTO price_history_bars
+                        (symbol, period, period_start, first_date, last_date,
+                         open_price, high_price, low_price, close_price, volume)
+                        SELECT g.symbol, '{period}', g.period_start, g.first_date, g.last_date,
+                               (SELECT COALESCE(p.open_price, p.close_price) FROM price_history p
+                                 WHERE p.symbol = g.symbol AND p.date = g.first_date),
+                               g.high_price, g.low_price,
+                               (SELECT p.close_price FROM price_history p
+                                 WHERE p.symbol = g.symbol AND p.date = g.last_date),
+                               g.volume
+                        FROM grouped g
+                        WHERE true
+                        ON CONFLICT(symbol, period, period_start) DO UPDATE SET
+                            open_price = CASE WHEN excluded.first_date < price_history_bars.first_date
+                                              THEN excluded.open_price ELSE price_history_bars.open_price END,
+                            close_price = CASE WHEN excluded.last_date > price_history_bars.last_date
+                                               THEN excluded.close_price ELSE price_history_bars.close_price END,
+                            first_date = MIN(excluded.first_date, price_history_bars.first_date),
+                            last_date = MAX(excluded.last_date, price_history_bars.last_date),
+                            high_price = MAX(COALESCE(excluded.high_price, price_history_bars.high_price),
+                                             COALESCE(price_history_bars.high_price, excluded.high_price)),
+                            low_price = MIN(COALESCE(excluded.low_price, price_history_bars.low_price),
+                                            COALESCE(price_history_bars.low_price, excluded.low_price)),
+                            volume = COALESCE(price_history_bars.volume, 0) + COALESCE(excluded.volume, 0)
+                    ''', params)
+                    deleted = conn.execute(f'DELETE FROM {source} WHERE {condition}', params).rowcount
+                    counts['weekly' if period == 'W' else 'monthly'] += deleted
+                
+                # 保持期間を過ぎた週足を月足に繰り上げ
+                conn.execute('''
+                    INSERT INTO price_history_bars
+                    (symbol, period, period_start, first_date, last_date,
+                     open_price, high_price, low_price, close_price, volume)
+                    SELECT symbol, 'M', date(period_start, 'start of month'), first_date, last_date,
+                           open_price, high_price, low_price, close_price, volume
+                    FROM price_history_bars
+                    WHERE period = 'W' AND last_date < ?
+                    ORDER BY symbol, period_start
+                    ON CONFLICT(symbol, period, period_start) DO UPDATE SET
+                        open_price = CASE WHEN excluded.first_date < price_history_bars.first_date
+                                          THEN excluded.open_price ELSE price_history_bars.open_price END,
+                        close_price = CASE WHEN excluded.last_date > price_history_bars.last_date
+                                           THEN excluded.close_price ELSE price_history_bars.close_price END,
+                        first_date = MIN(excluded.first_date, price_history_bars.first_date),
+                        last_date = MAX(excluded.last_date, price_history_bars.last_date),
+                        high_price = MAX(COALESCE(excluded.high_price, price_history_bars.high_price),
+                                         COALESCE(price_history_bars.high_price, excluded.high_price)),
+                        low_price = MIN(COALESCE(excluded.low_price, price_history_bars.low_price),
+                                        COALESCE(price_history_bars.low_price, excluded.low_price)),
+                        volume = COALESCE(price_history_bars.volume, 0) + COALESCE(excluded.volume, 0)
+                ''', (weekly_before,))
+                counts['monthly'] += conn.execute(
+                    "DELETE FROM price_history_bars WHERE period = 'W' AND last_date < ?",
+                    (weekly_before,)
+                ).rowcount
+            return counts
+        except sqlite3.Error as e:
+            print(f"株価履歴集約エラー: {e}")
+            return counts
+    
+    def get_price_bars(self, symbol: str, period: str = 'W',
+                       start: Optional[str] = None, end: Optional[str] = None) -> List[Dict]:
+        """集約済みの週足（'W'）・月足（'M'）を取得"""
+        sql = 'SELECT * FROM price_history_bars WHERE symbol = ? AND period = ?'
+        params: List = [symbol, period]
+        if start is not None:
+            sql += ' AND period_start >= ?'
+            params.append(str(start)[:10])
+        if end is not None:
+            sql += ' AND period_start <= ?'
+            params.append(str(end)[:10])
+        
+        with self._connect() as conn:
+            cursor = conn.execute(sql + ' ORDER BY period_start', params)
+            return [dict(row) for row in cursor.fetchall()]
+    
+    def save_intraday_bars(self, bars: List[tuple]) -> bool:
+        """日中足をまとめて保存（同じ足は上書き）
+        
+        Args:
+            bars: (symbol, bar_start, bar_seconds, open, high, low, close, volume, tick_count) のリスト
+        """
+        if not bars:
+            return True
+        
+        try:
+            with self._write() as conn:
+                conn.executemany('''
+                    INSERT OR REPLACE INTO intraday_bars 
+                    (symbol, bar_start, bar_seconds, open_price, high_price, low_price,
+                     close_price, volume, tick_count)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''', bars)
+            return True
+        except sqlite3.Error as e:
+            print(f"日中足保存エラー: {e}")
+            return False
+    
+    def get_intraday_bars(self, symbol: str, start: Optional[str] = None, end: Optional[str] = None,
+                          bar_seconds: int = 300) -> List[Dict]:
+        """保存済みの日中足を取得（bar_startは YYYY-MM-DD HH:MM:SS）"""
+        sql = 'SELECT * FROM intraday_bars WHERE symbol = ? AND bar_seconds = ?'
+        params: List = [symbol, bar_seconds]
+        if start is not None:
+            sql += ' AND bar_start >= ?'
+            params.append(str(start))
+        if end is not None:
+            sql += ' AND bar_start <= ?'
+            params.append(str(end))
+        
+        with self._connect() as conn:
+            cursor = conn.execute(sql + ' ORDER BY bar_start', params)
+            return [dict(row) for row in cursor.fetchall()]
+    
+    def delete_intraday_bars(self, before: str) -> int:
+        """指定日時より前の日中足を削除"""
+        try:
+            with self._write() as conn:
+                return conn.execute('DELETE FROM intraday_bars WHERE bar_start < ?', (before,)).rowcount
+        except sqlite3.Error as e:
+            print(f"日中足削除エラー: {e}")
+            return 0
+    
+    def _require_no_transaction(self, operation: str) -> None:
+        """トランザクションの中（db.batch() 等）で呼ばれたら RuntimeError"""
+        if self._pool.connection().in_transaction:
+            raise RuntimeError(f"{operation}はトランザクションの中では実行できません"
+                               f"（ブロックを抜けてから呼んでください）")
+    
+    def archive_alerts(self, before: str, archive_path: str) -> int:
+        """指定日時より前のアラートを別ファイルのデータベースへ移動
+        
+        Args:
+            before: この日時（UTC、YYYY-MM-DD HH:MM:SS）より前のアラートを移動
+            archive_path: アーカイブ先のSQLiteファイル
+        """
+        # ATTACHはトランザクション外で行う（外側の書き込みを勝手にコミットしない）
+        self._require_no_transaction("アラートのアーカイブ")
+        
+        directory = os.path.dirname(archive_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        
+        with self._connect() as conn:
+            conn.execute('ATTACH DATABASE ? AS archive', (archive_path,))
+        try:
+            with self._write() as conn:
+                conn.execute('''
+                    CREATE TABLE IF NOT EXISTS archive.alerts (
+                        id INTEGER PRIMARY KEY,
+                        symbol TEXT NOT NULL,
+                        alert_type TEXT NOT NULL,
+                        message TEXT NOT NULL,
+                        triggered_price REAL,
+                        strategy_name TEXT,
+                        created_at TIMESTAMP,
+                        archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                    )
+                ''')
+                conn.execute('''
+                    INSERT OR REPLACE INTO archive.alerts
+                    (id, symbol, alert_type, message, triggered_price, strategy_name, created_at)
+                    SELECT id, symbol, alert_type, message, triggered_price, strategy_name, created_at
+                    FROM main.alerts WHERE created_at < ?
+                ''', (before,))
+                return conn.execute('DELETE FROM main.alerts WHERE created_at < ?', (before,)).rowcount
+        except sqlite3.Error as e:
+            print(f"アラートアーカイブエラー: {e}")
+            return 0
+        finally:
+            with self._connect() as conn:
+                conn.execute('DETACH DATABASE archive')
+    
+    def compact(self, max_pages: int = 1000) -> Dict[str, int]:
+        """空きページを少しずつ解放（増分VACUUM）
+        
+        auto_vacuum が INCREMENTAL でない既存データベースは、初回のみ
+        VACUUM で切り替える（時間がかかるためバックグラウンドで呼ぶこと）。
+        
+        Returns:
+            {'freed_pages': 解放したページ数, 'free_pages': 残りの空きページ数}
+        """
+        # VACUUMはトランザクション外で行う（外側の書き込みを勝手にコミットしない）
+        self._require_no_transaction("データベースの圧縮")
+        
+        with self._connect() as conn:
+            if conn.execute('PRAGMA auto_vacuum').fetchone()[0] != 2:
+                conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+                conn.execute('VACUUM')
+                print("データベースを増分VACUUMモードに切り替えました")
+        
+        with self._write() as conn:
+            free_before = conn.execute('PRAGMA freelist_count').fetchone()[0]
+            conn.execute(f'PRAGMA incremental_vacuum({int(max_pages)})').fetchall()
+            free_after = conn.execute('PRAGMA freelist_count').fetchone()[0]
+        
+        if self._pool.is_file:
+            with self._connect() as conn:
+                # 縮小したWALファイルも切り詰める
+                conn.execute('PRAGMA wal_checkpoint(TRUNCATE)').fetchall()
+        
+        return {'freed_pages': free_before - free_after, 'free_pages': free_after}
+    
+    def get_table_columns(self, table: str) -> List[Tuple[str, str]]:
+        """エクスポート対象テーブルの (カラム名, 宣言型) 一覧"""
+        if table not in EXPORT_TABLES:
+            raise ValueError(f"エクスポート対象外のテーブル: {table}")
+        with self._connect() as conn:
+            return [(row['name'], (row['type'] or '').upper())
+                    for row in conn.execute(f'PRAGMA table_info({table})')]
+    
+    def iter_table_rows(self, table: str, chunk_size: int = 50000,
+                        order_by: Optional[Sequence[str]] = None) -> Iterator[List[tuple]]:
+        """テーブル全体を chunk_size 行ずつタプルのリストで返す（一括エクスポート用）
+        
+        行を辞書に変換せず、1つのSELECTを少しずつ読み進める。
+        """
+        columns = [name for name, _ in self.get_table_columns(table)]
+        order_by = list(order_by or [])
+        unknown = [column for column in order_by if column not in columns]
+        if unknown:
+            raise ValueError(f"不明なカラム: {unknown}")
+        
+        sql = f'SELECT {", ".join(columns)} FROM {table}'
+        if order_by:
+            sql += f' ORDER BY {", ".join(order_by)}'
+        
+        cursor = self._pool.connection().cursor()
+        cursor.row_factory = None
+        try:
+            cursor.execute(sql)
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield rows
+        finally:
+            cursor.close()
+    
+    def import_table_rows(self, table: str, columns: Sequence[str], rows: List[tuple]) -> int:
+        """エクスポートした行をまとめて書き戻す（同じ主キー・一意キーの行は置き換え）"""
+        known = {name for name, _ in self.get_table_columns(table)}
+        unknown = [column for column in columns if column not in known]
+        if unknown:
+            raise ValueError(f"不明なカラム: {unknown}")
+        if not rows:
+            return 0
+        
+        placeholders = ', '.join('?' for _ in columns)
+        with self._write() as conn:
+            conn.executemany(
+                f'INSERT OR REPLACE INTO {table} ({", ".join(columns)}) VALUES ({placeholders})',
+                rows
+            )
+        
+        if table == 'holdings':
+            self.holdings_store.invalidate()
+        return len(rows)
+    
+    def write_batch(self, alerts: List[tuple], price_history: List[tuple]) -> bool:
+        """アラートと株価履歴をまとめて1トランザクションで書き込む（グループコミット）
+        
+        Args:
+            alerts: (symbol, alert_type, message, triggered_price, strategy_name, created_at) のリスト
+            price_history: (symbol, date, close_price, volume) のリスト
+        """
+        if not alerts and not price_history:
+            return True
+        
+        try:
+            with self._write() as conn:
+                if alerts:
+                    conn.executemany('''
+                        INSERT INTO alerts 
+                        (symbol, alert_type, message, triggered_price, strategy_name, created_at)
+                        VALUES (?, ?, ?, ?, ?, ?)
+                    ''', alerts)
+                if price_history:
+                    conn.executemany('''
+                        INSERT OR REPLACE INTO price_history 
+                        (symbol, date, close_price, volume)
+                        VALUES (?, ?, ?, ?)
+                    ''', price_history)
+            return True
+        except sqlite3.Error as e:
+            print(f"一括書き込みエラー: {e}")
+            return False
+    
     def clear_alerts(self):
         """アラート履歴をクリア"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._write() as conn:
             cursor = conn.cursor()
             
             try:
                 cursor.execute('DELETE FROM alerts')
-                conn.commit()
                 return True
             except sqlite3.Error as e:
                 print(f"アラート履歴クリアエラー: {e}")
@@ -340,18 +1258,21 @@ class DatabaseManager:
     def delete_holding(self, symbol: str) -> bool:
         """指定した銘柄を保有銘柄から削除"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._write() as conn:
+                version_before = self._holdings_version(conn)
                 cursor = conn.cursor()
                 cursor.execute('DELETE FROM holdings WHERE symbol = ?', (symbol,))
                 deleted_rows = cursor.rowcount
-                conn.commit()
-                
-                if deleted_rows > 0:
-                    print(f"保有銘柄削除: {symbol}")
-                    return True
-                else:
-                    print(f"削除対象が見つかりません: {symbol}")
-                    return False
+                version = (version_before, self._holdings_version(conn))
+            
+            if deleted_rows > 0:
+                # コミット後にストアへ反映（コミット失敗時に削除済みと通知しない）
+                self.holdings_store.remove_symbol(symbol, version)
+                print(f"保有銘柄削除: {symbol}")
+                return True
+            else:
+                print(f"削除対象が見つかりません: {symbol}")
+                return False
                     
         except sqlite3.Error as e:
             print(f"保有銘柄削除エラー: {e}")
@@ -364,63 +1285,410 @@ class DatabaseManager:
     def delete_all_holdings(self) -> int:
         """全ての保有銘柄を削除"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._write() as conn:
                 cursor = conn.cursor()
                 
                 # 削除前に件数確認
                 cursor.execute('SELECT COUNT(*) FROM holdings')
                 count_before = cursor.fetchone()[0]
+                version_before = self._holdings_version(conn)
                 
                 # 全削除実行
                 cursor.execute('DELETE FROM holdings')
                 deleted_count = cursor.rowcount
-                conn.commit()
-                
-                print(f"保有銘柄全削除: {deleted_count}件削除")
-                return deleted_count
+                version = (version_before, self._holdings_version(conn))
+            
+            self.holdings_store.clear(version)
+            print(f"保有銘柄全削除: {deleted_count}件削除")
+            return deleted_count
                 
         except sqlite3.Error as e:
             print(f"保有銘柄全削除エラー: {e}")
             return 0
     
+    def upsert_fundamentals(self, records: List[Dict]) -> int:
+        """財務データを一括更新（開示日が古いデータでは上書きしない）"""
+        if not records:
+            return 0
+        
+        with self._write() as conn:
+            cursor = conn.cursor()
+            
+            try:
+                now = datetime.now()
+                # 欠損項目は既存値を保持する
+                cursor.executemany('''
+                    INSERT INTO fundamentals 
+                    (code, disclosed_date, type_of_document, eps, forecast_eps, bps,
+                     result_dividend_annual, forecast_dividend_annual, net_income, equity, updated_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(code) DO UPDATE SET
+                        disclosed_date = excluded.disclosed_date,
+                        type_of_document = excluded.type_of_document,
+                        eps = COALESCE(excluded.eps, fundamentals.eps),
+                        forecast_eps = COALESCE(excluded.forecast_eps, fundamentals.forecast_eps),
+                        bps = COALESCE(excluded.bps, fundamentals.bps),
+                        result_dividend_annual = COALESCE(excluded.result_dividend_annual, fundamentals.result_dividend_annual),
+                        forecast_dividend_annual = COALESCE(excluded.forecast_dividend_annual, fundamentals.forecast_dividend_annual),
+                        net_income = COALESCE(excluded.net_income, fundamentals.net_income),
+                        equity = COALESCE(excluded.equity, fundamentals.equity),
+                        updated_at = excluded.updated_at
+                    WHERE fundamentals.disclosed_date IS NULL
+                       OR excluded.disclosed_date >= fundamentals.disclosed_date
+                ''', [
+                    (
+                        record['code'],
+                        record.get('disclosed_date'),
+                        record.get('type_of_document', ''),
+                        record.get('eps'),
+                        record.get('forecast_eps'),
+                        record.get('bps'),
+                        record.get('result_dividend_annual'),
+                        record.get('forecast_dividend_annual'),
+                        record.get('net_income'),
+                        record.get('equity'),
+                        now
+                    )
+                    for record in records
+                ])
+                return len(records)
+            except sqlite3.Error as e:
+                print(f"財務データ更新エラー: {e}")
+                return 0
+    
+    def get_fundamentals(self, code: str) -> Optional[Dict]:
+        """財務データを取得（J Quants 5桁コード）"""
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('SELECT * FROM fundamentals WHERE code = ?', (code,))
+            row = cursor.fetchone()
+            return dict(row) if row else None
+    
+    def get_sync_state(self, key: str) -> Optional[str]:
+        """差分同期の状態値を取得"""
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('SELECT value FROM sync_state WHERE key = ?', (key,))
+            row = cursor.fetchone()
+            return row[0] if row else None
+    
+    def set_sync_state(self, key: str, value: str) -> bool:
+        """差分同期の状態値を保存"""
+        with self._write() as conn:
+            cursor = conn.cursor()
+            
+            try:
+                cursor.execute('''
+                    INSERT OR REPLACE INTO sync_state (key, value, updated_at)
+                    VALUES (?, ?, ?)
+                ''', (key, value, datetime.now()))
+                return True
+            except sqlite3.Error as e:
+                print(f"同期状態保存エラー: {e}")
+                return False
+    
+    def replace_issuers(self, issuers: List[Dict]) -> int:
+        """上場銘柄一覧を置き換える（一覧にない銘柄は上場廃止として削除）
+        
+        Args:
+            issuers: code, name, name_english, sector17_code, sector17_name, sector33_code,
+                     sector33_name, market_code, market_name, scale_category の辞書のリスト
+        """
+        if not issuers:
+            return 0
+        
+        now = datetime.now()
+        rows = [(
+            issuer['code'],
+            issuer['name'],
+            issuer.get('name_english') or '',
+            normalize_search_text(issuer['name']),
+            issuer.get('sector17_code'),
+            issuer.get('sector17_name'),
+            issuer.get('sector33_code'),
+            issuer.get('sector33_name'),
+            issuer.get('market_code'),
+            issuer.get('market_name'),
+            issuer.get('scale_category'),
+            now,
+        ) for issuer in issuers]
+        codes = {row[0] for row in rows}
+        
+        try:
+            with self._write() as conn:
+                # 行IDを保つため置き換えではなく更新（全文検索インデックスはトリガーで同期）
+                conn.executemany('''
+                    INSERT INTO issuers
+                    (code, name, name_english, search_name, sector17_code, sector17_name,
+                     sector33_code, sector33_name, market_code, market_name, scale_category, updated_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(code) DO UPDATE SET
+                        name = excluded.name,
+                        name_english = excluded.name_english,
+                        search_name = excluded.search_name,
+                        sector17_code = excluded.sector17_code,
+                        sector17_name = excluded.sector17_name,
+                        sector33_code = excluded.sector33_code,
+                        sector33_name = excluded.sector33_name,
+                        market_code = excluded.market_code,
+                        market_name = excluded.market_name,
+                        scale_category = excluded.scale_category,
+                        updated_at = excluded.updated_at
+                ''', rows)
+                delisted = [(row[0],) for row in conn.execute('SELECT code FROM issuers')
+                            if row[0] not in codes]
+                conn.executemany('DELETE FROM issuers WHERE code = ?', delisted)
+            return len(rows)
+        except sqlite3.Error as e:
+            print(f"上場銘柄一覧更新エラー: {e}")
+            return 0
+    
+    def get_issuer(self, code: str) -> Optional[Dict]:
+        """銘柄コードの上場銘柄情報（一覧にない場合はNone）"""
+        with self._connect() as conn:
+            row = conn.execute('SELECT * FROM issuers WHERE code = ?', (str(code).strip(),)).fetchone()
+            return dict(row) if row else None
+    
+    def get_issuers_count(self) -> int:
+        with self._connect() as conn:
+            return conn.execute('SELECT COUNT(*) FROM issuers').fetchone()[0]
+    
+    def get_issuer_sectors(self) -> List[Dict]:
+        """業種（33業種）が分かる上場銘柄の code, sector33_code, sector33_name"""
+        with self._connect() as conn:
+            cursor = conn.execute('''
+                SELECT code, sector33_code, sector33_name FROM issuers
+                WHERE sector33_code IS NOT NULL AND sector33_code != ''
+            ''')
+            return [dict(row) for row in cursor.fetchall()]
+    
+    def search_issuers(self, query: str, limit: int = 20) -> List[Dict]:
+        """銘柄コードの前方一致・銘柄名/英語名の部分一致で上場銘柄を検索
+        
+        数字で始まる入力は銘柄コードの前方一致、3文字以上は全文検索インデックス
+        （trigram）、2文字以下は部分一致で検索する。一致がなければ入力の3文字ずつの
+        断片のいずれかを含む銘柄を一致数の多い順に返す（入力ミスの救済）。
+        
+        Returns:
+            code, name, name_english, sector33_name, market_name の辞書のリスト
+            （コード完全一致 → 銘柄名の前方一致 → 関連度の順）
+        """
+        text = normalize_search_text(query)
+        if not text:
+            return []
+        
+        with self._connect() as conn:
+            if _CODE_QUERY.match(text):
+                upper = text[:-1] + chr(ord(text[-1]) + 1)
+                rows = conn.execute(f'''
+                    SELECT {_ISSUER_SEARCH_COLUMNS} FROM issuers i
+                    WHERE i.code >= ? AND i.code < ?
+                    ORDER BY i.code LIMIT ?
+                ''', (text.upper(), upper.upper(), limit)).fetchall()
+                if rows:
+                    return [dict(row) for row in rows]
+            
+            order = '''CASE WHEN i.code = :code THEN 0
+                              WHEN i.search_name LIKE :prefix ESCAPE '\\' THEN 1
+                              WHEN i.name_english LIKE :prefix ESCAPE '\\' THEN 2
+                              ELSE 3 END'''
+            escaped = text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+            params = {'code': text.upper(), 'prefix': escaped + '%', 'limit': limit}
+            
+            if ISSUER_FTS_AVAILABLE and len(text) >= 3:
+                params['match'] = '"' + text.replace('"', '""') + '"'
+                rows = conn.execute(f'''
+                    SELECT {_ISSUER_SEARCH_COLUMNS} FROM issuers_fts
+                    JOIN issuers i ON i.rowid = issuers_fts.rowid
+                    WHERE issuers_fts MATCH :match
+                    ORDER BY {order}, bm25(issuers_fts), i.code LIMIT :limit
+                ''', params).fetchall()
+                if not rows and len(text) >= 4:
+                    # 3文字ずつの断片のいずれかに一致（一致した断片が多いほど上位）
+                    fragments = {text[i:i + 3] for i in range(len(text) - 2)}
+                    params['match'] = ' OR '.join('"' + f.replace('"', '""') + '"' for f in sorted(fragments))
+                    rows = conn.execute(f'''
+                        SELECT {_ISSUER_SEARCH_COLUMNS} FROM issuers_fts
+                        JOIN issuers i ON i.rowid = issuers_fts.rowid
+                        WHERE issuers_fts MATCH :match
+                        ORDER BY bm25(issuers_fts), i.code LIMIT :limit
+                    ''', params).fetchall()
+            else:
+                params['contains'] = '%' + escaped + '%'
+                rows = conn.execute(f'''
+                    SELECT {_ISSUER_SEARCH_COLUMNS} FROM issuers i
+                    WHERE i.search_name LIKE :contains ESCAPE '\\'
+                       OR i.name_english LIKE :contains ESCAPE '\\'
+                       OR i.code LIKE :contains ESCAPE '\\'
+                    ORDER BY {order}, length(i.search_name), i.code LIMIT :limit
+                ''', params).fetchall()
+            
+            return [dict(row) for row in rows]
+    
+    def save_portfolio_snapshot(self, snapshot_date: Optional[Union[str, date]] = None) -> bool:
+        """保有銘柄のその日の評価額を日次スナップショットとして保存（同じ日付は上書き）
+        
+        holdings.current_price は最後に価格更新した時点の値のため、各銘柄は
+        price_history の snapshot_date 以前で最新の終値で評価する。holdings の
+        価格更新の方が新しい（snapshot_date 以前）場合や履歴がない場合は current_price。
+        """
+        snapshot_date = str(snapshot_date or date.today())[:10]
+        try:
+            with self._write() as conn:
+                # 日中に売却した銘柄の行が残らないよう、その日の分を入れ替える
+                conn.execute('DELETE FROM holding_snapshots WHERE snapshot_date = ?', (snapshot_date,))
+                conn.execute('''
+                    WITH latest AS (
+                        SELECT h.*, p.date AS close_date, p.close_price
+                        FROM holdings h
+                        LEFT JOIN price_history p ON p.id = (
+                            SELECT id FROM price_history
+                            WHERE symbol = h.symbol AND date <= :day AND close_price IS NOT NULL
+                            ORDER BY date DESC LIMIT 1
+                        )
+                    ),
+                    valued AS (
+                        SELECT *, CASE WHEN close_price IS NOT NULL
+                                            AND (DATE(updated_at) IS NULL
+                                                 OR DATE(updated_at) > :day
+                                                 OR DATE(updated_at) <= close_date)
+                                       THEN close_price END AS day_price
+                        FROM latest
+                    )
+                    INSERT INTO holding_snapshots
+                    (snapshot_date, symbol, broker, account_type, quantity, current_price,
+                     acquisition_amount, market_value, profit_loss)
+                    SELECT :day, symbol, COALESCE(broker, ''), COALESCE(account_type, ''),
+                           SUM(quantity), MAX(COALESCE(day_price, current_price)),
+                           SUM(acquisition_amount),
+                           SUM(CASE WHEN day_price IS NULL THEN market_value
+                                    ELSE quantity * day_price END),
+                           SUM(CASE WHEN day_price IS NULL THEN profit_loss
+                                    ELSE quantity * day_price - acquisition_amount END)
+                    FROM valued
+                    GROUP BY symbol, COALESCE(broker, ''), COALESCE(account_type, '')
+                ''', {'day': snapshot_date})
+                conn.execute('''
+                    INSERT OR REPLACE INTO portfolio_snapshots
+                    (snapshot_date, total_stocks, total_acquisition, total_market_value,
+                     total_profit_loss, return_rate, created_at)
+                    SELECT ?, COUNT(*),
+                           COALESCE(SUM(acquisition_amount), 0),
+                           COALESCE(SUM(market_value), 0),
+                           COALESCE(SUM(profit_loss), 0),
+                           CASE WHEN SUM(acquisition_amount) > 0
+                                THEN (SUM(market_value) / SUM(acquisition_amount) - 1) * 100
+                                ELSE 0 END,
+                           ?
+                    FROM holding_snapshots WHERE snapshot_date = ?
+                ''', (snapshot_date, datetime.now(), snapshot_date))
+            return True
+        except sqlite3.Error as e:
+            print(f"ポートフォリオスナップショット保存エラー: {e}")
+            return False
+    
+    def get_portfolio_snapshots(self, start: Optional[Union[str, date]] = None,
+                                end: Optional[Union[str, date]] = None) -> List[Dict]:
+        """日次のポートフォリオ評価額・損益の推移（日付順）"""
+        sql = 'SELECT * FROM portfolio_snapshots WHERE 1 = 1'
+        params: List = []
+        if start is not None:
+            sql += ' AND snapshot_date >= ?'
+            params.append(str(start)[:10])
+        if end is not None:
+            sql += ' AND snapshot_date <= ?'
+            params.append(str(end)[:10])
+        
+        with self._connect() as conn:
+            cursor = conn.execute(sql + ' ORDER BY snapshot_date', params)
+            return [dict(row) for row in cursor.fetchall()]
+    
+    def get_holding_snapshots(self, symbol: str, start: Optional[Union[str, date]] = None,
+                              end: Optional[Union[str, date]] = None) -> List[Dict]:
+        """銘柄の日次評価額・損益の推移（証券会社・口座をまとめて日付順）"""
+        sql = '''
+            SELECT snapshot_date, SUM(quantity) AS quantity, MAX(current_price) AS current_price,
+                   SUM(acquisition_amount) AS acquisition_amount,
+                   SUM(market_value) AS market_value, SUM(profit_loss) AS profit_loss
+            FROM holding_snapshots WHERE symbol = ?
+        '''
+        params: List = [symbol]
+        if start is not None:
+            sql += ' AND snapshot_date >= ?'
+            params.append(str(start)[:10])
+        if end is not None:
+            sql += ' AND snapshot_date <= ?'
+            params.append(str(end)[:10])
+        
+        with self._connect() as conn:
+            cursor = conn.execute(sql + ' GROUP BY snapshot_date ORDER BY snapshot_date', params)
+            return [dict(row) for row in cursor.fetchall()]
+    
     def get_portfolio_summary(self) -> Dict:
-        """ポートフォリオサマリーを取得"""
-        with sqlite3.connect(self.db_path) as conn:
+        """ポートフォリオサマリーを取得（証券会社別・口座種別の内訳を含む）
+        
+        価格更新・削除のたびに差分更新した集計値を返し、
+        RECONCILE_INTERVAL ごとにDBでの集計と突き合わせる。
+        他の接続（別プロセス等）が書き込んでいればストアと一緒に集計も作り直す。
+        """
+        tracker = self.portfolio_summary
+        self._sync_holdings_store()
+        if not tracker.is_ready:
+            # 保有銘柄ストアを読み込むと集計も作り直される
+            self.get_all_holdings()
+        
+        if not tracker.reconcile_due():
+            summary = tracker.summary()
+            if summary is not None:
+                return summary
+        
+        summary = self._query_portfolio_summary()
+        tracker.reconcile(summary)
+        return summary
+    
+    def _query_portfolio_summary(self) -> Dict:
+        """holdings 全体をDBで集計"""
+        with self._connect() as conn:
             cursor = conn.cursor()
             
             cursor.execute('''
                 SELECT 
+                    broker,
+                    account_type,
                     COUNT(*) as total_stocks,
                     SUM(acquisition_amount) as total_acquisition,
                     SUM(market_value) as total_market_value,
                     SUM(profit_loss) as total_profit_loss,
-                    AVG(profit_loss / acquisition_amount * 100) as avg_return_rate
+                    SUM(profit_loss / acquisition_amount * 100) as rate_sum,
+                    COUNT(profit_loss / acquisition_amount) as rate_count
                 FROM holdings
+                GROUP BY broker, account_type
             ''')
             
-            result = cursor.fetchone()
-            
+            rows = cursor.fetchall()
+        
+        totals = SummaryTotals()
+        by_broker: Dict[str, SummaryTotals] = {}
+        by_account_type: Dict[str, SummaryTotals] = {}
+        for row in rows:
+            group = SummaryTotals()
             # None値を安全に0に変換
-            total_stocks = result[0] if result[0] is not None else 0
-            total_acquisition = result[1] if result[1] is not None else 0
-            total_market_value = result[2] if result[2] is not None else 0
-            total_profit_loss = result[3] if result[3] is not None else 0
-            avg_return_rate = result[4] if result[4] is not None else 0
-            
-            # 収益率計算（ゼロ除算対策）
-            return_rate = 0
-            if total_acquisition is not None and total_acquisition > 0 and total_market_value is not None:
-                return_rate = ((total_market_value / total_acquisition) - 1) * 100
-            
-            return {
-                'total_stocks': total_stocks,
-                'total_acquisition': total_acquisition,
-                'total_market_value': total_market_value,
-                'total_profit_loss': total_profit_loss,
-                'avg_return_rate': avg_return_rate,
-                'return_rate': return_rate
-            }
-
+            group.count = row['total_stocks']
+            group.acquisition = row['total_acquisition'] or 0
+            group.market_value = row['total_market_value'] or 0
+            group.profit_loss = row['total_profit_loss'] or 0
+            group.rate_sum = row['rate_sum'] or 0
+            group.rate_count = row['rate_count']
+            
+            for target in (totals,
+                           by_broker.setdefault(row['broker'] or '', SummaryTotals()),
+                           by_account_type.setdefault(row['account_type'] or '', SummaryTotals())):
+                for field in SummaryTotals.__slots__:
+                    setattr(target, field, getattr(target, field) + getattr(group, field))
+        
+        return build_summary(totals, by_broker, by_account_type)
 
 if __name__ == "__main__":
     # テスト用
@@ -0,0 +1,395 @@
+"""
+SQLite接続管理モジュール
+Persistent per-thread SQLite connections
+
+DatabaseManager の各メソッドが毎回 sqlite3.connect() していた接続を、
+データベースファイルごと・スレッドごとに使い回す。接続作成時に一度だけ
+WALジャーナル、busy_timeout、synchronous=NORMAL、ページキャッシュを設定する。
+
+同じデータベースをデーモン・GUI・CLIの複数プロセスで共有するため、書き込みは
+write_transaction() で行う。プロセス内では書き込みを1スレッドずつに直列化し、
+BEGIN IMMEDIATE で最初に書き込みロックを取得する（読み込みから書き込みへの
+昇格で待たずに失敗することがない）。他プロセスが長く書き込み中の場合は
+busy_timeout の待機に加えて間隔を空けて再試行する。
+
+ベンチマーク・テスト・応答速度を優先する実行では、MemoryConnectionManager で
+データベース全体をメモリ上（共有キャッシュのインメモリDB）に置ける。起動時に
+SQLiteのオンラインバックアップAPIでディスクから読み込み、一定間隔と終了時に
+同じAPIでディスクへ書き戻す。
+"""
+
+import atexit
+import itertools
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional, Set
+
+from logger import app_logger
+
+
+MEMORY_DB_PATH = ':memory:'
+
+# 接続ごとに設定するPRAGMA
+BUSY_TIMEOUT_MS = 5000
+CACHE_SIZE_KIB = 16 * 1024   # ページキャッシュ16MB
+MMAP_SIZE_BYTES = 64 * 1024 * 1024
+# 接続ごとにコンパイル済みSQL文を保持する数（接続を使い回すため再コンパイルが減る）
+CACHED_STATEMENTS = 256
+
+# 書き込みロック取得の再試行（busy_timeout 経過後）
+WRITE_RETRY_ATTEMPTS = 5
+WRITE_RETRY_BACKOFF = 0.2   # 秒（再試行ごとに2倍）
+
+# インメモリモードでディスクへ書き戻す間隔（秒）
+PERSIST_INTERVAL_SECONDS = 300
+
+# 共有キャッシュのインメモリDBの名前の連番（同じ名前の接続が同じDBを共有する）
+_memory_db_ids = itertools.count(1)
+
+
+def is_busy_error(error: sqlite3.Error) -> bool:
+    """他の接続がロック中のために失敗したか"""
+    message = str(error).lower()
+    return 'locked' in message or 'busy' in message
+
+
+class ConnectionManager:
+    """1つのデータベースファイルに対するスレッドごとの永続接続"""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self.schema_initialized = False
+        self._connections: Dict[threading.Thread, sqlite3.Connection] = {}
+        # read_snapshot() で読み込みトランザクション中の接続
+        self._snapshots: Set[sqlite3.Connection] = set()
+        self._lock = threading.Lock()
+        # プロセス内の書き込みは1スレッドずつ
+        self._write_lock = threading.RLock()
+
+    @property
+    def is_file(self) -> bool:
+        return self.db_path != MEMORY_DB_PATH
+
+    def _connect_raw(self) -> sqlite3.Connection:
+        # スレッド終了後に別スレッドから close できるよう check_same_thread=False
+        # （接続自体は作成したスレッドだけが使う）
+        return sqlite3.connect(self.db_path, timeout=BUSY_TIMEOUT_MS / 1000,
+                               check_same_thread=False, cached_statements=CACHED_STATEMENTS)
+
+    def _open(self) -> sqlite3.Connection:
+        """新しい接続を作成してPRAGMAを設定"""
+        conn = self._connect_raw()
+        conn.row_factory = sqlite3.Row
+        if self.is_file:
+            conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute(f'PRAGMA busy_timeout={BUSY_TIMEOUT_MS}')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute(f'PRAGMA cache_size=-{CACHE_SIZE_KIB}')
+        conn.execute('PRAGMA temp_store=MEMORY')
+        conn.execute(f'PRAGMA mmap_size={MMAP_SIZE_BYTES}')
+        return conn
+
+    def _close_dead_threads(self) -> None:
+        """終了したスレッドの接続を閉じる（ロック取得済みで呼ぶ）"""
+        for thread in [t for t in self._connections if not t.is_alive()]:
+            self._connections.pop(thread).close()
+
+    def connection(self) -> sqlite3.Connection:
+        """現在のスレッド用の接続を取得（なければ作成）"""
+        thread = threading.current_thread()
+        conn = self._connections.get(thread)
+        if conn is None:
+            conn = self._open()
+            with self._lock:
+                self._close_dead_threads()
+                self._connections[thread] = conn
+        return conn
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """接続を取得し、正常終了でコミット・例外でロールバック
+        
+        書き込みトランザクションの途中で呼ばれた場合は外側に含める（途中でコミットしない）。
+        """
+        conn = self.connection()
+        if conn.in_transaction:
+            yield conn
+            return
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+
+    @contextmanager
+    def read_snapshot(self) -> Iterator[sqlite3.Connection]:
+        """読み込みトランザクションを開始し、ブロック内の読み込みを同じ時点のデータで行う
+        
+        WALモードでは最初の読み込みの時点の内容が終了まで固定され、他の接続の
+        書き込みは妨げない。ブロック内の書き込み（write_transaction）は、
+        書き込みロックへの昇格と終了時のロールバックによる消失を防ぐため
+        RuntimeError になる。書き込みはブロックを抜けてから行うこと。
+        """
+        conn = self.connection()
+        if conn.in_transaction:
+            yield conn
+            return
+        
+        conn.execute('BEGIN')
+        self._snapshots.add(conn)
+        try:
+            # ここで読み込み位置が確定する
+            conn.execute('SELECT 1 FROM sqlite_master LIMIT 1').fetchone()
+            yield conn
+        finally:
+            self._snapshots.discard(conn)
+            if conn.in_transaction:
+                conn.rollback()
+    
+    @contextmanager
+    def write_transaction(self) -> Iterator[sqlite3.Connection]:
+        """書き込みロックを取得してからトランザクションを開始
+        
+        同じスレッドで入れ子になった場合は外側のトランザクションに含める。
+        読み込みスナップショットの中では RuntimeError（書き込みはスナップショットと
+        一緒にロールバックされてしまうため）。
+        """
+        conn = self.connection()
+        if conn in self._snapshots:
+            raise RuntimeError("読み込みスナップショットの中では書き込めません（ブロックを抜けてから書き込んでください）")
+        with self._write_lock:
+            if conn.in_transaction:
+                yield conn
+                return
+            
+            self._begin_immediate(conn)
+            try:
+                yield conn
+                conn.commit()
+            except BaseException:
+                if conn.in_transaction:
+                    conn.rollback()
+                raise
+    
+    def _begin_immediate(self, conn: sqlite3.Connection) -> None:
+        """BEGIN IMMEDIATE（他プロセスの書き込み中は間隔を空けて再試行）"""
+        for attempt in range(WRITE_RETRY_ATTEMPTS):
+            try:
+                conn.execute('BEGIN IMMEDIATE')
+                return
+            except sqlite3.OperationalError as e:
+                if not is_busy_error(e) or attempt == WRITE_RETRY_ATTEMPTS - 1:
+                    raise
+                delay = WRITE_RETRY_BACKOFF * (2 ** attempt)
+                app_logger.warning(f"データベース書き込み待機中 ({self.db_path}): {e} - {delay:.1f}秒後に再試行")
+                time.sleep(delay)
+    
+    def remove_orphaned_journal(self) -> None:
+        """本体ファイルがないのに残ったWAL/共有メモリファイルを削除"""
+        if not self.is_file or os.path.exists(self.db_path):
+            return
+        for suffix in ('-wal', '-shm'):
+            try:
+                os.remove(self.db_path + suffix)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                app_logger.warning(f"WALファイル削除エラー ({self.db_path}{suffix}): {e}")
+
+    def close(self) -> None:
+        """全スレッドの接続を閉じる（次回アクセス時に再接続）"""
+        with self._lock:
+            connections = list(self._connections.values())
+            self._connections.clear()
+            self.schema_initialized = False
+        for conn in connections:
+            try:
+                conn.close()
+            except sqlite3.Error as e:
+                app_logger.warning(f"データベース接続クローズエラー ({self.db_path}): {e}")
+
+    def persist(self) -> bool:
+        """ディスク上のデータベースは常に最新のため何もしない"""
+        return True
+
+
+class MemoryConnectionManager(ConnectionManager):
+    """共有キャッシュのインメモリDBに対するスレッドごとの接続
+
+    persist_path を指定すると、起動時にそのファイルからバックアップAPIで読み込み、
+    persist_interval 秒ごとと close() 時に書き戻す。スレッドごとの接続は同じ
+    インメモリDBを共有し、DBは close() 後もプロセス終了まで保持される。
+
+    共有キャッシュではロックがテーブル単位になり、busy_timeout が効かないため、
+    読み込みは read_uncommitted で書き込みを待たずに行う（書き込み中のデータが
+    見える場合がある）。書き込みは write_transaction で直列化される。
+    ディスクへの書き戻しは丸ごと上書きになるため、同じファイルを他のプロセスが
+    更新する構成では使わないこと。
+    """
+
+    def __init__(self, db_path: str = MEMORY_DB_PATH, persist_path: Optional[str] = None,
+                 persist_interval: float = PERSIST_INTERVAL_SECONDS):
+        super().__init__(db_path)
+        self.persist_path = persist_path
+        self.persist_interval = persist_interval
+        self.uri = f'file:watchdog-memory-{next(_memory_db_ids)}?mode=memory&cache=shared'
+        self.last_persisted: Optional[float] = None
+        # 最後の接続が閉じるとインメモリDBが破棄されるため、常に1本開いておく
+        self._keeper = self._open()
+        self._stop_event = threading.Event()
+        self._persist_thread: Optional[threading.Thread] = None
+
+        if persist_path:
+            self.load()
+            if persist_interval and persist_interval > 0:
+                self._persist_thread = threading.Thread(target=self._persist_loop, daemon=True,
+                                                        name="DatabasePersist")
+                self._persist_thread.start()
+
+    @property
+    def is_file(self) -> bool:
+        return False
+
+    def _connect_raw(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.uri, uri=True, timeout=BUSY_TIMEOUT_MS / 1000,
+                               check_same_thread=False, cached_statements=CACHED_STATEMENTS)
+        conn.execute('PRAGMA read_uncommitted=1')
+        return conn
+
+    def load(self) -> bool:
+        """ディスクのデータベースをインメモリDBに読み込む（ファイルがなければ空のまま）"""
+        if not self.persist_path or not os.path.exists(self.persist_path):
+            return False
+        start = time.perf_counter()
+        try:
+            source = sqlite3.connect(self.persist_path, timeout=BUSY_TIMEOUT_MS / 1000)
+            try:
+                with self._write_lock:
+                    source.backup(self._keeper)
+            finally:
+                source.close()
+        except sqlite3.Error as e:
+            app_logger.error(f"インメモリDB読み込みエラー ({self.persist_path}): {e}")
+            print(f"インメモリDB読み込みエラー: {e}")
+            return False
+        app_logger.info(f"インメモリDB読み込み完了 ({self.persist_path}): "
+                        f"{(time.perf_counter() - start) * 1000:.0f}ms")
+        return True
+
+    def persist(self) -> bool:
+        """インメモリDBをディスクへ書き戻す（書き込み中でない時点の内容）"""
+        if not self.persist_path:
+            return True
+        start = time.perf_counter()
+        try:
+            directory = os.path.dirname(self.persist_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            target = sqlite3.connect(self.persist_path, timeout=BUSY_TIMEOUT_MS / 1000)
+            try:
+                # 書き込みロックを持つ間はトランザクション途中のデータがない
+                with self._write_lock:
+                    self._keeper.backup(target)
+            finally:
+                target.close()
+        except sqlite3.Error as e:
+            app_logger.error(f"インメモリDB書き戻しエラー ({self.persist_path}): {e}")
+            print(f"インメモリDB書き戻しエラー: {e}")
+            return False
+        self.last_persisted = time.time()
+        app_logger.info(f"インメモリDB書き戻し完了 ({self.persist_path}): "
+                        f"{(time.perf_counter() - start) * 1000:.0f}ms")
+        return True
+
+    def _persist_loop(self) -> None:
+        while not self._stop_event.wait(self.persist_interval):
+            self.persist()
+
+    def close(self) -> None:
+        """ディスクへ書き戻してから全スレッドの接続を閉じる（インメモリDBは保持）"""
+        self.persist()
+        super().close()
+
+    def shutdown(self) -> None:
+        """定期書き戻しを止めて最後に書き戻し、インメモリDBを破棄する"""
+        self._stop_event.set()
+        self.close()
+        try:
+            self._keeper.close()
+        except sqlite3.Error as e:
+            app_logger.warning(f"インメモリDBクローズエラー ({self.db_path}): {e}")
+
+
+_managers: Dict[str, ConnectionManager] = {}
+_managers_lock = threading.Lock()
+
+
+def _normalize_path(db_path: str) -> str:
+    if db_path == MEMORY_DB_PATH:
+        return db_path
+    return os.path.realpath(db_path)
+
+
+def get_connection_manager(db_path: str) -> ConnectionManager:
+    """データベースファイルごとに共有される接続管理を取得"""
+    key = _normalize_path(db_path)
+    manager = _managers.get(key)
+    if manager is None:
+        with _managers_lock:
+            manager = _managers.get(key)
+            if manager is None:
+                if db_path == MEMORY_DB_PATH:
+                    manager = MemoryConnectionManager()
+                else:
+                    manager = ConnectionManager(db_path)
+                _managers[key] = manager
+    return manager
+
+
+def enable_in_memory(db_path: str,
+                     persist_interval: float = PERSIST_INTERVAL_SECONDS) -> MemoryConnectionManager:
+    """db_path をインメモリDBで開くよう切り替える（以降の DatabaseManager(db_path) が共有）
+
+    データベースを開く前（起動直後）に呼ぶこと。開いていたディスクの接続は閉じる。
+    """
+    if db_path == MEMORY_DB_PATH:
+        return get_connection_manager(db_path)
+    key = _normalize_path(db_path)
+    with _managers_lock:
+        manager = _managers.get(key)
+        if isinstance(manager, MemoryConnectionManager):
+            return manager
+        if manager is not None:
+            manager.close()
+        manager = MemoryConnectionManager(db_path, persist_path=db_path,
+                                          persist_interval=persist_interval)
+        _managers[key] = manager
+    app_logger.info(f"インメモリモードで開きます: {db_path}（{persist_interval}秒ごとに書き戻し）")
+    return manager
+
+
+def disable_in_memory(db_path: str) -> bool:
+    """インメモリモードを終了してディスクへ書き戻し、以降はディスクのファイルを開く"""
+    key = _normalize_path(db_path)
+    with _managers_lock:
+        manager = _managers.get(key)
+        if not isinstance(manager, MemoryConnectionManager):
+            return False
+        del _managers[key]
+    manager.shutdown()
+    return True
+
+
+def close_all_connections() -> None:
+    """プロセス内の全接続を閉じる（終了時にWALをチェックポイント・インメモリDBを書き戻し）"""
+    with _managers_lock:
+        managers = list(_managers.values())
+    for manager in managers:
+        manager.close()
+
+
+atexit.register(close_all_connections)
@@ -0,0 +1,176 @@
+"""
+財務データ差分更新モジュール
+Incremental Fundamentals Refresh
+
+J Quants APIの開示日指定（statements by date）で前回実行以降の
+決算開示だけを取得し、ローカルの fundamentals テーブルを更新する。
+PER/PBR/配当利回りは最新株価からローカルで再計算する。
+"""
+
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from logger import app_logger
+
+
+# 1回の差分更新で取得する開示日数（初回の遡り取得は数回に分けて進める）
+MAX_DAYS_PER_RUN = 20
+
+# 決算短信の項目 → fundamentals テーブルのカラム
+STATEMENT_FIELDS = {
+    'eps': ('EarningsPerShare',),
+    'forecast_eps': ('ForecastEarningsPerShare', 'NextYearForecastEarningsPerShare'),
+    'bps': ('BookValuePerShare',),
+    'result_dividend_annual': ('ResultDividendPerShareAnnual',),
+    'forecast_dividend_annual': ('ForecastDividendPerShareAnnual', 'NextYearForecastDividendPerShareAnnual'),
+    'net_income': ('Profit', 'NetIncome'),
+    'equity': ('Equity',),
+}
+
+
+def _to_float(value) -> Optional[float]:
+    """J Quantsの数値文字列を安全にfloatへ変換（空文字・'-'はNone）"""
+    if value is None:
+        return None
+    try:
+        if isinstance(value, str):
+            value = value.strip().replace(',', '')
+            if value == '' or value == '-':
+                return None
+        result = float(value)
+        # pandas由来のNaNは欠損扱い
+        return None if result != result else result
+    except (ValueError, TypeError):
+        return None
+
+
+def _to_date_str(value) -> Optional[str]:
+    """開示日をYYYY-MM-DD文字列に正規化"""
+    if value is None:
+        return None
+    if hasattr(value, 'strftime'):
+        return value.strftime('%Y-%m-%d')
+    value = str(value).strip()
+    if len(value) == 8 and value.isdigit():
+        return f"{value[:4]}-{value[4:6]}-{value[6:]}"
+    return value[:10] if value else None
+
+
+def extract_fundamentals(statement: Dict) -> Optional[Dict]:
+    """決算開示1件からfundamentalsレコードを抽出"""
+    code = statement.get('LocalCode') or statement.get('Code')
+    if not code:
+        return None
+
+    record = {
+        'code': str(code),
+        'disclosed_date': _to_date_str(statement.get('DisclosedDate')),
+        'type_of_document': statement.get('TypeOfDocument') or '',
+    }
+
+    has_value = False
+    for column, fields in STATEMENT_FIELDS.items():
+        value = None
+        for field in fields:
+            value = _to_float(statement.get(field))
+            if value is not None:
+                break
+        record[column] = value
+        has_value = has_value or value is not None
+
+    # 数値項目が一つもない開示（訂正のみ等）は無視
+    return record if has_value else None
+
+
+def calculate_valuation(fundamentals: Dict, current_price: float) -> Tuple[Optional[float], Optional[float], Optional[float], Optional[float]]:
+    """ローカルの財務データと最新株価からPER、PBR、ROE、配当利回りを計算"""
+    pe_ratio = None
+    pb_ratio = None
+    roe = None
+    dividend_yield = None
+
+    if current_price and current_price > 0:
+        # 予想EPSを優先（日本の慣行に合わせる）
+        eps = fundamentals.get('forecast_eps') or fundamentals.get('eps')
+        if eps and eps > 0:
+            pe_ratio = current_price / eps
+
+        bps = fundamentals.get('bps')
+        if bps and bps > 0:
+            pb_ratio = current_price / bps
+
+        annual_dividend = fundamentals.get('result_dividend_annual') or fundamentals.get('forecast_dividend_annual')
+        if annual_dividend and annual_dividend > 0:
+            dividend_yield = (annual_dividend / current_price) * 100
+
+    net_income = fundamentals.get('net_income')
+    equity = fundamentals.get('equity')
+    if net_income and equity and equity > 0:
+        roe = (net_income / equity) * 100
+
+    return pe_ratio, pb_ratio, roe, dividend_yield
+
+
+class FundamentalsUpdater:
+    """開示日ベースの財務データ差分更新ジョブ"""
+
+    LAST_DATE_KEY = 'fundamentals_last_date'
+    LAST_RUN_KEY = 'fundamentals_last_run'
+
+    def __init__(self, jquants_source, db, initial_lookback_days: int = 400):
+        self.source = jquants_source
+        self.db = db
+        self.initial_lookback_days = initial_lookback_days
+
+    def _last_completed_date(self) -> date:
+        """前回までに取り込み済みの最終開示日"""
+        value = self.db.get_sync_state(self.LAST_DATE_KEY)
+        if value:
+            try:
+                return datetime.strptime(value, '%Y-%m-%d').date()
+            except ValueError:
+                app_logger.warning(f"財務データ同期日付が不正です: {value}")
+        return date.today() - timedelta(days=self.initial_lookback_days)
+
+    def is_due(self) -> bool:
+        """本日まだ実行していなければTrue"""
+        return self.db.get_sync_state(self.LAST_RUN_KEY) != date.today().isoformat()
+
+    def refresh(self, until: Optional[date] = None, max_days: Optional[int] = None) -> int:
+        """前回実行以降の開示を取り込み、更新した銘柄数を返す
+
+        max_days を指定すると取得する開示日数をその日数までに抑え、残りは次回に回す
+        （最後まで取り込むまで本日の実行済みにしない）。
+        """
+        until = until or date.today()
+        current = self._last_completed_date() + timedelta(days=1)
+        updated_count = 0
+        requested = 0
+
+        while current <= until:
+            # 適時開示は営業日のみ
+            if current.weekday() < 5:
+                if max_days is not None and requested >= max_days:
+                    app_logger.info(f"財務データ差分更新を中断（{current} 以降は次回取得）: {updated_count}件")
+                    return updated_count
+                requested += 1
+                statements = self.source.iter_statements_by_date(current.strftime('%Y%m%d'))
+                records = [r for r in (extract_fundamentals(s) for s in statements) if r]
+                if records:
+                    updated_count += self.db.upsert_fundamentals(records)
+                app_logger.info(f"財務データ差分取得: {current} - {len(records)}件")
+
+            # 当日分は引け後にも開示が続くため、完了扱いは前日まで
+            if current < date.today():
+                self.db.set_sync_state(self.LAST_DATE_KEY, current.isoformat())
+            current += timedelta(days=1)
+
+        self.db.set_sync_state(self.LAST_RUN_KEY, date.today().isoformat())
+        app_logger.info(f"財務データ差分更新完了: {updated_count}件")
+        return updated_count
+
+    def refresh_if_due(self, max_days: Optional[int] = MAX_DAYS_PER_RUN) -> int:
+        """1日1回だけ差分更新を実行（1回あたり max_days 日分まで）"""
+        if not self.is_due():
+            return 0
+        return self.refresh(max_days=max_days)
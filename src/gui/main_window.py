@@ -11,8 +11,13 @@ import platform
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from csv_parser import CSVParser
-from data_sources import YahooFinanceDataSource, MultiDataSource
+from data_sources import YahooFinanceDataSource, MultiDataSource, get_shared_data_source
 from database import DatabaseManager
+from symbols import symbol_registry
+from retention import RetentionManager
+from issuers import IssuerDirectory
+from intraday import IntradayTickStore
+from data_export import ColumnarExporter, PYARROW_AVAILABLE
 from alert_manager import AlertManager, Alert
 from version import get_version_info
 from dividend_visualizer import DividendVisualizer
@@ -90,9 +95,195 @@ class ToolTip:
         self.text = new_text
 
 
+class AlertHistoryView:
+    """アラート履歴の逐次読み込みビュー
+    
+    全件を読み込まず、末尾付近までスクロールしたときに次のページを
+    DatabaseManager.get_alerts_page のカーソルで取得して追加する。
+    """
+    
+    PAGE_SIZE = 100
+    LOAD_THRESHOLD = 0.9  # スクロール位置がこの割合を超えたら次ページを読み込む
+    
+    def __init__(self, tree, scrollbar, db, format_row):
+        self.tree = tree
+        self.scrollbar = scrollbar
+        self.db = db
+        self.format_row = format_row  # alert -> (values, tags)
+        self.filters = {}
+        self.next_cursor = None
+        self.exhausted = True
+        self.loaded_count = 0
+        self._load_pending = False
+        self.tree.configure(yscrollcommand=self.on_scroll)
+    
+    def clear(self):
+        """表示をクリア"""
+        self.tree.delete(*self.tree.get_children())
+        self.next_cursor = None
+        self.exhausted = True
+        self.loaded_count = 0
+    
+    def reset(self, symbol=None, alert_type=None, strategy_name=None):
+        """絞り込み条件を設定して先頭ページから読み込み直す"""
+        self.clear()
+        self.filters = {'symbol': symbol, 'alert_type': alert_type, 'strategy_name': strategy_name}
+        self.exhausted = False
+        return self.load_next_page()
+    
+    def load_next_page(self):
+        """次のページを読み込んで末尾に追加"""
+        self._load_pending = False
+        if self.exhausted:
+            return 0
+        
+        page = self.db.get_alerts_page(self.PAGE_SIZE, self.next_cursor, as_records=True, **self.filters)
+        for alert in page['alerts']:
+            values, tags = self.format_row(alert)
+            self.tree.insert("", tk.END, values=values, tags=tags)
+        
+        self.next_cursor = page['next_cursor']
+        self.exhausted = self.next_cursor is None
+        self.loaded_count += len(page['alerts'])
+        return len(page['alerts'])
+    
+    def on_scroll(self, first, last):
+        """Treeviewのスクロール通知（スクロールバー更新と次ページ読み込み）"""
+        self.scrollbar.set(first, last)
+        if not self.exhausted and not self._load_pending and float(last) >= self.LOAD_THRESHOLD:
+            self._load_pending = True
+            self.tree.after_idle(self.load_next_page)
+
+
+class IssuerSearchBox:
+    """入力中の銘柄コード・銘柄名から上場銘柄の候補を表示するドロップダウン
+    
+    DatabaseManager.search_issuers でローカルの検索インデックスを引くため、
+    通信なしで入力のたびに候補を更新できる。候補を選ぶと on_select(issuer) を呼ぶ。
+    一覧が未取得（issuers テーブルが空）の場合は候補の代わりに案内を表示する。
+    """
+    
+    DELAY_MS = 120     # 入力が止まってから検索するまでの待ち時間
+    MAX_RESULTS = 10
+    EMPTY_HINT = "銘柄一覧が未取得です（J Quants API の認証設定後、起動時に取得されます）"
+    
+    def __init__(self, entry, db, on_select):
+        self.entry = entry
+        self.db = db
+        self.on_select = on_select
+        self.results = []
+        self._listbox = None
+        self._after_id = None
+        entry.bind("<KeyRelease>", self._on_key, add="+")
+        entry.bind("<Down>", self._focus_list, add="+")
+        entry.bind("<Escape>", lambda event: self.hide(), add="+")
+        entry.bind("<FocusOut>", self._on_focus_out, add="+")
+    
+    def _on_key(self, event):
+        if event.keysym in ("Up", "Down", "Return", "Escape", "Tab"):
+            return
+        if self._after_id:
+            self.entry.after_cancel(self._after_id)
+        self._after_id = self.entry.after(self.DELAY_MS, self.search)
+    
+    def search(self):
+        """入力内容で検索して候補を表示"""
+        self._after_id = None
+        query = self.entry.get().strip()
+        try:
+            self.results = self.db.search_issuers(query, self.MAX_RESULTS) if query else []
+        except Exception as e:
+            print(f"銘柄検索エラー: {e}")
+            self.results = []
+        
+        if self.results:
+            self._show([self._format(issuer) for issuer in self.results])
+        elif query and self._index_empty():
+            self._show([self.EMPTY_HINT])
+        else:
+            self.hide()
+    
+    def _index_empty(self) -> bool:
+        try:
+            return self.db.get_issuers_count() == 0
+        except Exception as e:
+            print(f"銘柄一覧件数取得エラー: {e}")
+            return False
+    
+    @staticmethod
+    def _format(issuer) -> str:
+        market = f"  [{issuer['market_name']}]" if issuer.get('market_name') else ""
+        return f"{issuer['code']}  {issuer['name']}{market}"
+    
+    def _create_listbox(self):
+        listbox = tk.Listbox(self.entry.winfo_toplevel(), activestyle="dotbox", exportselection=False)
+        listbox.bind("<ButtonRelease-1>", self._select)
+        listbox.bind("<Return>", self._select)
+        listbox.bind("<Escape>", lambda event: (self.hide(), self.entry.focus_set()))
+        listbox.bind("<FocusOut>", self._on_focus_out)
+        return listbox
+    
+    def _show(self, lines):
+        if self._listbox is None:
+            self._listbox = self._create_listbox()
+        listbox = self._listbox
+        listbox.delete(0, tk.END)
+        for line in lines:
+            listbox.insert(tk.END, line)
+        
+        # 入力欄の直下に重ねて表示
+        top = self.entry.winfo_toplevel()
+        x = self.entry.winfo_rootx() - top.winfo_rootx()
+        y = self.entry.winfo_rooty() - top.winfo_rooty() + self.entry.winfo_height()
+        listbox.configure(height=len(lines))
+        listbox.place(x=x, y=y, width=max(self.entry.winfo_width(), 360))
+        listbox.lift()
+    
+    def hide(self):
+        if self._listbox is not None:
+            self._listbox.place_forget()
+    
+    def _focus_list(self, event):
+        """↓キーで候補の先頭へ移動"""
+        if self._listbox is not None and self._listbox.winfo_ismapped():
+            self._listbox.focus_set()
+            self._listbox.selection_clear(0, tk.END)
+            self._listbox.selection_set(0)
+            self._listbox.activate(0)
+    
+    def _on_focus_out(self, event):
+        # 候補のクリックでフォーカスが移る場合があるため、少し待ってから判定
+        self.entry.after(150, self._hide_unless_focused)
+    
+    def _hide_unless_focused(self):
+        focused = self.entry.focus_get()
+        if focused is not self.entry and focused is not self._listbox:
+            self.hide()
+    
+    def _select(self, event=None):
+        selection = self._listbox.curselection() if self._listbox is not None else ()
+        if not selection or selection[0] >= len(self.results):
+            # 案内の行は選択できない
+            return
+        issuer = self.results[selection[0]]
+        self.hide()
+        self.entry.focus_set()
+        self.on_select(issuer)
+
+
 class MainWindow:
     """メインGUIウィンドウクラス"""
     
+    # アラートタイプの日本語化（絵文字付き）
+    ALERT_TYPE_LABELS = {
+        'buy': '💰 買い推奨',
+        'sell_profit': '✅ 利益確定',
+        'sell_loss': '⚠️ 損切り', 
+        'test': '🧪 テスト',
+        'info': '📊 情報',
+        'warning': '🚨 警告'
+    }
+    
     def __init__(self):
         self.root = tk.Tk()
         self.root.title("日本株ウォッチドッグ (Japanese Stock Watchdog)")
@@ -113,10 +304,14 @@ class MainWindow:
         # 基本クラス初期化（軽量）
         self.csv_parser = CSVParser()
         self.db = DatabaseManager()
+        self.retention = RetentionManager(self.db)
+        self.intraday = IntradayTickStore(self.db)
+        self.intraday.start()
         self.alert_manager = AlertManager()
         
         # データソースは遅延初期化
         self.data_source = None
+        self._issuer_refresh_thread = None
         self.dividend_visualizer = DividendVisualizer()
         self.market_indices_manager = MarketIndicesManager()
         
@@ -544,6 +739,13 @@ class MainWindow:
         name_entry = ttk.Entry(add_frame, textvariable=self.watchlist_name_var, width=20)
         name_entry.grid(row=0, column=3, padx=5, pady=5)
         
+        # 入力中に上場銘柄一覧から候補を表示（選択でコードと銘柄名を入力）
+        self.watchlist_issuer_search = [
+            IssuerSearchBox(entry, self.db, lambda issuer: self._fill_issuer(
+                issuer, self.watchlist_symbol_var, self.watchlist_name_var))
+            for entry in (symbol_entry, name_entry)
+        ]
+        
         # 目標価格入力（オプション）
         ttk.Label(add_frame, text="目標価格:").grid(row=0, column=4, sticky=tk.W, padx=5, pady=5)
         self.watchlist_target_var = tk.StringVar()
@@ -633,6 +835,13 @@ class MainWindow:
         name_entry = ttk.Entry(add_frame, textvariable=self.wishlist_name_var, width=20)
         name_entry.grid(row=0, column=3, padx=5, pady=5)
         
+        # 入力中に上場銘柄一覧から候補を表示（選択でコードと銘柄名を入力）
+        self.wishlist_issuer_search = [
+            IssuerSearchBox(entry, self.db, lambda issuer: self._fill_issuer(
+                issuer, self.wishlist_symbol_var, self.wishlist_name_var))
+            for entry in (symbol_entry, name_entry)
+        ]
+        
         # 希望購入価格
         ttk.Label(add_frame, text="希望購入価格:").grid(row=0, column=4, sticky=tk.W, padx=5, pady=5)
         self.wishlist_target_var = tk.StringVar()
@@ -1372,6 +1581,29 @@ PBR: 1.0 ✅ (設定: 4.0以下)
         alert_frame = ttk.Frame(self.notebook)
         self.notebook.add(alert_frame, text="アラート履歴")
         
+        # 絞り込み条件
+        alert_filter_frame = ttk.Frame(alert_frame)
+        alert_filter_frame.pack(fill=tk.X, padx=5, pady=(5, 0))
+        
+        ttk.Label(alert_filter_frame, text="銘柄:").pack(side=tk.LEFT)
+        self.alert_symbol_filter = tk.StringVar()
+        symbol_entry = ttk.Entry(alert_filter_frame, textvariable=self.alert_symbol_filter, width=10)
+        symbol_entry.pack(side=tk.LEFT, padx=(2, 10))
+        
+        ttk.Label(alert_filter_frame, text="種類:").pack(side=tk.LEFT)
+        self.alert_type_filter = tk.StringVar()
+        ttk.Combobox(alert_filter_frame, textvariable=self.alert_type_filter, width=12,
+                     values=[''] + list(self.ALERT_TYPE_LABELS)).pack(side=tk.LEFT, padx=(2, 10))
+        
+        ttk.Label(alert_filter_frame, text="戦略:").pack(side=tk.LEFT)
+        self.alert_strategy_filter = tk.StringVar()
+        strategy_entry = ttk.Entry(alert_filter_frame, textvariable=self.alert_strategy_filter, width=16)
+        strategy_entry.pack(side=tk.LEFT, padx=(2, 10))
+        
+        ttk.Button(alert_filter_frame, text="絞り込み", command=self.refresh_alerts).pack(side=tk.LEFT)
+        symbol_entry.bind('<Return>', lambda e: self.refresh_alerts())
+        strategy_entry.bind('<Return>', lambda e: self.refresh_alerts())
+        
         # アラート履歴表示
         alert_list_frame = ttk.LabelFrame(alert_frame, text="アラート履歴", padding=5)
         alert_list_frame.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
@@ -1395,9 +1627,15 @@ PBR: 1.0 ✅ (設定: 4.0以下)
             else:
                 self.alert_tree.column(col, width=120, anchor=tk.CENTER)
         
-        # スクロールバー
+        # スクロールバー（末尾までスクロールすると古い履歴を読み込む）
         alert_scrollbar = ttk.Scrollbar(alert_list_frame, orient=tk.VERTICAL, command=self.alert_tree.yview)
-        self.alert_tree.configure(yscrollcommand=alert_scrollbar.set)
+        self.alert_view = AlertHistoryView(self.alert_tree, alert_scrollbar, self.db, self._format_alert_row)
+        
+        # アラート履歴の色分け設定
+        self.alert_tree.tag_configure('buy_alert', foreground='blue')
+        self.alert_tree.tag_configure('profit_alert', foreground='green')
+        self.alert_tree.tag_configure('warning_alert', foreground='red')
+        self.alert_tree.tag_configure('info_alert', foreground='black')
         
         self.alert_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         alert_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
@@ -1493,8 +1731,8 @@ PBR: 1.0 ✅ (設定: 4.0以下)
             self.progress.start()
             
             # データベースから銘柄一覧取得
-            holdings = self.db.get_all_holdings()
-            symbols = [h['symbol'] for h in holdings]
+            holdings = self.db.get_all_holdings(as_records=True)
+            symbols = [h.symbol for h in holdings]
             
             if not symbols:
                 self.update_status("更新する銘柄がありません")
@@ -1518,11 +1756,7 @@ PBR: 1.0 ✅ (設定: 4.0以下)
                     continue
                 
                 # 疑似シンボルをスキップ（より厳密なチェック）
-                if (symbol_str.startswith('PORTFOLIO_') or 
-                    symbol_str.startswith('FUND_') or
-                    symbol_str == 'STOCK_PORTFOLIO' or
-                    symbol_str == 'TOTAL_PORTFOLIO' or
-                    len(symbol_str) > 10):  # 通常の銘柄コードは10文字以下
+                if symbol_registry.is_pseudo(symbol_str):
                     print(f"疑似シンボルをスキップ: {symbol_str}")
                     skipped_count += 1
                     continue
@@ -1548,6 +1782,7 @@ PBR: 1.0 ✅ (設定: 4.0以下)
                         for symbol, stock_info in batch_results.items():
                             if stock_info:
                                 price_updates[symbol] = stock_info.current_price
+                                self.intraday.record_stock_info(symbol, stock_info)
                             else:
                                 error_count += 1
                         
@@ -1568,6 +1803,7 @@ PBR: 1.0 ✅ (設定: 4.0以下)
                                 stock_info = self.data_source.get_stock_info(symbol)
                                 if stock_info:
                                     price_updates[symbol] = stock_info.current_price
+                                    self.intraday.record_stock_info(symbol, stock_info)
                                 else:
                                     error_count += 1
                             except:
@@ -1633,11 +1869,11 @@ PBR: 1.0 ✅ (設定: 4.0以下)
             for item in self.holdings_tree.get_children():
                 self.holdings_tree.delete(item)
             
-            holdings = self.db.get_all_holdings()
+            holdings = self.db.get_all_holdings(as_records=True)
             for holding in holdings:
                 # 安全な計算
-                acquisition_amount = holding.get('acquisition_amount', 0) or 0
-                market_value = holding.get('market_value', 0) or 0
+                acquisition_amount = holding.acquisition_amount or 0
+                market_value = holding.market_value or 0
                 return_rate = ((market_value / acquisition_amount) - 1) * 100 if acquisition_amount > 0 else 0
                 
                 # 条件チェック（株価情報取得）
@@ -1646,7 +1882,7 @@ PBR: 1.0 ✅ (設定: 4.0以下)
                     data_source = YahooFinanceDataSource()
                     
                     # シンボルを文字列に変換
-                    symbol_str = str(holding['symbol'])
+                    symbol_str = str(holding.symbol)
                     stock_info = data_source.get_stock_info(symbol_str)
                     
                     if stock_info:
@@ -1659,28 +1895,28 @@ PBR: 1.0 ✅ (設定: 4.0以下)
                         conditions_met = 0
                         indicator = "😴様子見"
                 except Exception as e:
-                    print(f"条件チェックエラー ({holding['symbol']}): {e}")
+                    print(f"条件チェックエラー ({holding.symbol}): {e}")
                     conditions_met = 0
                     indicator = "😴様子見"
                 
                 values = (
                     indicator,
-                    holding['symbol'],
-                    holding['name'][:15] + "..." if len(holding['name']) > 15 else holding['name'],
-                    f"{holding['quantity']:,}",
-                    f"¥{holding['average_cost']:,.0f}",
-                    f"¥{holding['current_price']:,.0f}",
-                    f"¥{holding['market_value']:,.0f}",
-                    f"¥{holding['profit_loss']:+,.0f}",
+                    holding.symbol,
+                    holding.name[:15] + "..." if len(holding.name) > 15 else holding.name,
+                    f"{holding.quantity:,}",
+                    f"¥{holding.average_cost:,.0f}",
+                    f"¥{holding.current_price:,.0f}",
+                    f"¥{holding.market_value:,.0f}",
+                    f"¥{holding.profit_loss:+,.0f}",
                     f"{return_rate:+.2f}%",
-                    holding['broker']
+                    holding.broker
                 )
                 
                 # 色分け（条件マッチングを優先）
                 tags = [f'condition_{conditions_met}']
-                if holding['profit_loss'] > 0:
+                if holding.profit_loss > 0:
                     tags.append('profit')
-                elif holding['profit_loss'] < 0:
+                elif holding.profit_loss < 0:
                     tags.append('loss')
                 
                 self.holdings_tree.insert("", tk.END, values=values, tags=tags)
@@ -1749,8 +1985,7 @@ PBR: 1.0 ✅ (設定: 4.0以下)
         """売り条件をチェック"""
         try:
             # データベースから保有情報を取得
-            holdings = self.db.get_all_holdings()
-            holding_info = next((h for h in holdings if str(h['symbol']) == str(symbol)), None)
+            holding_info = self.db.get_holding(symbol)
             
             if not holding_info:
                 return None
@@ -1792,6 +2027,11 @@ PBR: 1.0 ✅ (設定: 4.0以下)
         else:
             return "😴様子見"    # 条件満たさない
     
+    def _fill_issuer(self, issuer, symbol_var, name_var):
+        """銘柄検索の候補を入力欄に反映"""
+        symbol_var.set(issuer['code'])
+        name_var.set(issuer['name'])
+    
     def add_to_watchlist(self):
         """ウォッチリストに銘柄を追加"""
         symbol = self.watchlist_symbol_var.get().strip()
@@ -1901,7 +2141,7 @@ PBR: 1.0 ✅ (設定: 4.0以下)
                     if symbol is None:
                         continue
                     symbol_str = str(symbol).strip()
-                    if not symbol_str or symbol_str.startswith('PORTFOLIO_'):
+                    if not symbol_str or symbol_registry.is_pseudo(symbol_str):
                         continue
                     symbol = symbol_str
                 except (TypeError, AttributeError):
@@ -1973,17 +2213,42 @@ PBR: 1.0 ✅ (設定: 4.0以下)
                 self.watchlist_tree.delete(item)
             messagebox.showinfo("完了", "ウォッチリストをクリアしました")
     
+    def _format_alert_row(self, alert):
+        """アラート1件（AlertRecord）をTreeviewの (values, tags) に変換"""
+        alert_type_str = self.ALERT_TYPE_LABELS.get(alert.alert_type, f"📈 {alert.alert_type}")
+        
+        # メッセージを短縮
+        message = alert.message[:80] + "..." if len(alert.message) > 80 else alert.message
+        
+        values = (
+            alert.created_at,
+            alert.symbol,
+            alert_type_str,
+            message
+        )
+        
+        # アラートタイプに応じた色分け
+        if alert.alert_type == 'buy':
+            tags = ['buy_alert']
+        elif alert.alert_type in ['sell_profit']:
+            tags = ['profit_alert']
+        elif alert.alert_type in ['sell_loss', 'warning']:
+            tags = ['warning_alert']
+        else:
+            tags = ['info_alert']
+        return values, tags
+    
     def refresh_alerts(self):
-        """アラート履歴を更新"""
+        """アラート履歴を更新（先頭ページのみ読み込み、以降はスクロールで追加）"""
         try:
-            # アラート履歴をクリア
-            for item in self.alert_tree.get_children():
-                self.alert_tree.delete(item)
-            
-            # データベースからアラート履歴を取得
-            alerts = self.db.get_alerts(50)  # 最新50件
+            filters = {
+                'symbol': self.alert_symbol_filter.get().strip() or None,
+                'alert_type': self.alert_type_filter.get().strip() or None,
+                'strategy_name': self.alert_strategy_filter.get().strip() or None,
+            }
+            loaded = self.alert_view.reset(**filters)
             
-            if not alerts:
+            if not loaded and not any(filters.values()):
                 # サンプルデータを表示
                 sample_alert = (
                     datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
@@ -1992,49 +2257,6 @@ PBR: 1.0 ✅ (設定: 4.0以下)
                     "アラート履歴はここに表示されます。「アラートテスト」ボタンで動作確認できます。"
                 )
                 self.alert_tree.insert("", tk.END, values=sample_alert)
-                return
-            
-            # アラートタイプの日本語化（絵文字付き）
-            alert_type_map = {
-                'buy': '💰 買い推奨',
-                'sell_profit': '✅ 利益確定',
-                'sell_loss': '⚠️ 損切り', 
-                'test': '🧪 テスト',
-                'info': '📊 情報',
-                'warning': '🚨 警告'
-            }
-            
-            for alert in alerts:
-                alert_type_str = alert_type_map.get(alert['alert_type'], f"📈 {alert['alert_type']}")
-                
-                # メッセージを短縮
-                message = alert['message'][:80] + "..." if len(alert['message']) > 80 else alert['message']
-                
-                values = (
-                    alert['created_at'],
-                    alert['symbol'],
-                    alert_type_str,
-                    message
-                )
-                
-                # アラートタイプに応じた色分け
-                tags = []
-                if alert['alert_type'] == 'buy':
-                    tags.append('buy_alert')
-                elif alert['alert_type'] in ['sell_profit']:
-                    tags.append('profit_alert')
-                elif alert['alert_type'] in ['sell_loss', 'warning']:
-                    tags.append('warning_alert')
-                else:
-                    tags.append('info_alert')
-                
-                self.alert_tree.insert("", tk.END, values=values, tags=tags)
-            
-            # アラート履歴の色分け設定
-            self.alert_tree.tag_configure('buy_alert', foreground='blue')
-            self.alert_tree.tag_configure('profit_alert', foreground='green')
-            self.alert_tree.tag_configure('warning_alert', foreground='red')
-            self.alert_tree.tag_configure('info_alert', foreground='black')
                 
         except Exception as e:
             messagebox.showerror("エラー", f"アラート履歴更新エラー: {str(e)}")
@@ -2051,8 +2273,7 @@ PBR: 1.0 ✅ (設定: 4.0以下)
                 self.db.clear_alerts()
                 
                 # 表示もクリア
-                for item in self.alert_tree.get_children():
-                    self.alert_tree.delete(item)
+                self.alert_view.clear()
                 
                 messagebox.showinfo("完了", "アラート履歴をクリアしました。")
                 
@@ -2072,16 +2293,10 @@ PBR: 1.0 ✅ (設定: 4.0以下)
                 # データソースの遅延初期化（J Quants APIを優先）
                 if self.data_source is None:
                     self.update_status_thread_safe("データソース初期化中...")
-                    from data_sources import MultiDataSource
-                    from dotenv import load_dotenv
-                    import os
-                    
-                    load_dotenv()
-                    jquants_email = os.getenv('JQUANTS_EMAIL')
-                    jquants_password = os.getenv('JQUANTS_PASSWORD') 
-                    refresh_token = os.getenv('JQUANTS_REFRESH_TOKEN')
-                    
-                    self.data_source = MultiDataSource(jquants_email, jquants_password, refresh_token)
+                    self.data_source = get_shared_data_source(fundamentals_db=self.db)
+                
+                # 銘柄検索用の上場銘柄一覧（デーモンを動かしていなくても取得する）
+                self.start_issuer_refresh()
                 
                 # ポートフォリオデータを読み込み
                 self.update_status_thread_safe("ポートフォリオデータ読み込み中...")
@@ -2103,6 +2318,27 @@ PBR: 1.0 ✅ (設定: 4.0以下)
         # バックグラウンドスレッドで実行
         threading.Thread(target=load_in_background, daemon=True).start()
     
+    def start_issuer_refresh(self) -> bool:
+        """上場銘柄一覧（銘柄検索用）を必要ならバックグラウンドで更新（J Quants認証時のみ）"""
+        jquants_source = self.data_source.get_jquants_source() if self.data_source else None
+        if not jquants_source:
+            return False
+        if self._issuer_refresh_thread and self._issuer_refresh_thread.is_alive():
+            return False
+        
+        def worker():
+            try:
+                saved = IssuerDirectory(jquants_source, self.db).refresh_if_due()
+            except Exception as e:
+                print(f"上場銘柄一覧更新エラー: {e}")
+                return
+            if saved:
+                self.update_status_thread_safe(f"銘柄検索の一覧を更新しました（{saved:,}銘柄）")
+        
+        self._issuer_refresh_thread = threading.Thread(target=worker, daemon=True, name="IssuerRefresh")
+        self._issuer_refresh_thread.start()
+        return True
+    
     def update_status_thread_safe(self, message):
         """スレッドセーフなステータス更新"""
         self.root.after(0, lambda: self.update_status(message))
@@ -2815,10 +3051,7 @@ PBR: 1.0 ✅ (設定: 4.0以下)
             return
         
         # 疑似シンボルの場合はスキップ
-        if (symbol.startswith('PORTFOLIO_') or 
-            symbol.startswith('FUND_') or
-            symbol == 'STOCK_PORTFOLIO' or
-            symbol == 'TOTAL_PORTFOLIO'):
+        if symbol_registry.is_pseudo(symbol):
             # 投資信託などの基本情報のみ表示
             tooltip_text = f"📋 {symbol}\\n"
             tooltip_text += "━━━━━━━━━━━━━━━━━━━━━━\\n"
@@ -2916,10 +3149,7 @@ PBR: 1.0 ✅ (設定: 4.0以下)
                 return
             
             # 疑似シンボルの場合はメニューを表示しない
-            if (symbol.startswith('PORTFOLIO_') or 
-                symbol.startswith('FUND_') or
-                symbol == 'STOCK_PORTFOLIO' or
-                symbol == 'TOTAL_PORTFOLIO'):
+            if symbol_registry.is_pseudo(symbol):
                 return
             
             # コンテキストメニュー作成（インスタンス変数として保存）
@@ -3000,10 +3230,7 @@ PBR: 1.0 ✅ (設定: 4.0以下)
                 return
             
             # 疑似シンボルの場合はメニューを表示しない
-            if (symbol.startswith('PORTFOLIO_') or 
-                symbol.startswith('FUND_') or
-                symbol == 'STOCK_PORTFOLIO' or
-                symbol == 'TOTAL_PORTFOLIO'):
+            if symbol_registry.is_pseudo(symbol):
                 return
             
             # コンテキストメニュー作成（インスタンス変数として保存）
@@ -3080,10 +3307,7 @@ PBR: 1.0 ✅ (設定: 4.0以下)
                 return
             
             # 疑似シンボルの場合はメニューを表示しない
-            if (symbol.startswith('PORTFOLIO_') or 
-                symbol.startswith('FUND_') or
-                symbol == 'STOCK_PORTFOLIO' or
-                symbol == 'TOTAL_PORTFOLIO'):
+            if symbol_registry.is_pseudo(symbol):
                 return
             
             # コンテキストメニュー作成（インスタンス変数として保存）
@@ -3266,15 +3490,7 @@ PBR: 1.0 ✅ (設定: 4.0以下)
             
             # データソース確認
             if not self.data_source:
-                from dotenv import load_dotenv
-                import os
-                load_dotenv()
-                
-                jquants_email = os.getenv('JQUANTS_EMAIL')
-                jquants_password = os.getenv('JQUANTS_PASSWORD')
-                refresh_token = os.getenv('JQUANTS_REFRESH_TOKEN')
-                
-                self.data_source = MultiDataSource(jquants_email, jquants_password, refresh_token)
+                self.data_source = get_shared_data_source(fundamentals_db=self.db)
             
             # 株価情報取得
             stock_info = self.data_source.get_stock_info(symbol)
@@ -3328,15 +3544,7 @@ PBR: 1.0 ✅ (設定: 4.0以下)
             
             # データソース確認
             if not self.data_source:
-                from dotenv import load_dotenv
-                import os
-                load_dotenv()
-                
-                jquants_email = os.getenv('JQUANTS_EMAIL')
-                jquants_password = os.getenv('JQUANTS_PASSWORD') 
-                refresh_token = os.getenv('JQUANTS_REFRESH_TOKEN')
-                
-                self.data_source = MultiDataSource(jquants_email, jquants_password, refresh_token)
+                self.data_source = get_shared_data_source(fundamentals_db=self.db)
             
             self.update_status(f"配当履歴取得中: {symbol}")
             
@@ -3476,15 +3684,7 @@ PBR: 1.0 ✅ (設定: 4.0以下)
             
             # データソース確認
             if not self.data_source:
-                from dotenv import load_dotenv
-                import os
-                load_dotenv()
-                
-                jquants_email = os.getenv('JQUANTS_EMAIL')
-                jquants_password = os.getenv('JQUANTS_PASSWORD')
-                refresh_token = os.getenv('JQUANTS_REFRESH_TOKEN')
-                
-                self.data_source = MultiDataSource(jquants_email, jquants_password, refresh_token)
+                self.data_source = get_shared_data_source(fundamentals_db=self.db)
             
             self.update_status(f"チャート作成中: {symbol}")
             
@@ -3538,7 +3738,7 @@ PBR: 1.0 ✅ (設定: 4.0以下)
     def load_wishlist_data(self):
         """データベースから欲しい銘柄データを読み込み"""
         try:
-            wishlist_data = self.db.get_wishlist()
+            wishlist_data = self.db.get_wishlist(as_records=True)
             
             # Treeviewをクリア
             for item in self.wishlist_tree.get_children():
@@ -3546,23 +3746,15 @@ PBR: 1.0 ✅ (設定: 4.0以下)
             
             # データを表示
             for item in wishlist_data:
-                symbol = item['symbol']
-                name = item['name']
-                target_price = item.get('target_price')
-                memo = item.get('memo', '')
+                symbol = item.symbol
+                name = item.name
+                target_price = item.target_price
+                memo = item.memo or ''
                 
                 # 株価情報を取得（簡単な表示のため、現在価格のみ）
                 try:
                     if not hasattr(self, 'data_source') or self.data_source is None:
-                        from dotenv import load_dotenv
-                        import os
-                        load_dotenv()
-                        
-                        jquants_email = os.getenv('JQUANTS_EMAIL')
-                        jquants_password = os.getenv('JQUANTS_PASSWORD')
-                        refresh_token = os.getenv('JQUANTS_REFRESH_TOKEN')
-                        
-                        self.data_source = MultiDataSource(jquants_email, jquants_password, refresh_token)
+                        self.data_source = get_shared_data_source(fundamentals_db=self.db)
                     
                     stock_info = self.data_source.get_stock_info(symbol)
                     
@@ -3589,7 +3781,7 @@ PBR: 1.0 ✅ (設定: 4.0以下)
                             f"{stock_info.pe_ratio:.1f}" if stock_info.pe_ratio else "N/A",
                             f"{stock_info.pb_ratio:.1f}" if stock_info.pb_ratio else "N/A",
                             memo,
-                            item['created_at'][:10] if item.get('created_at') else ""
+                            item.created_at[:10] if item.created_at else ""
                         )
                         
                         self.wishlist_tree.insert("", tk.END, values=values)
@@ -3606,7 +3798,7 @@ PBR: 1.0 ✅ (設定: 4.0以下)
                             "N/A",
                             "N/A",
                             memo,
-                            item['created_at'][:10] if item.get('created_at') else ""
+                            item.created_at[:10] if item.created_at else ""
                         )
                         
                         self.wishlist_tree.insert("", tk.END, values=values)
@@ -3620,7 +3812,7 @@ PBR: 1.0 ✅ (設定: 4.0以下)
     def load_watchlist_data(self):
         """データベースから監視リストデータを読み込み"""
         try:
-            watchlist_data = self.db.get_watchlist()
+            watchlist_data = self.db.get_watchlist(as_records=True)
             
             # Treeviewをクリア
             for item in self.watchlist_tree.get_children():
@@ -3628,22 +3820,14 @@ PBR: 1.0 ✅ (設定: 4.0以下)
             
             # データを表示
             for item in watchlist_data:
-                symbol = item['symbol']
-                name = item['name']
-                target_buy_price = item.get('target_buy_price')
+                symbol = item.symbol
+                name = item.name
+                target_buy_price = item.target_buy_price
                 
                 # 株価情報を取得
                 try:
                     if not hasattr(self, 'data_source') or self.data_source is None:
-                        from dotenv import load_dotenv
-                        import os
-                        load_dotenv()
-                        
-                        jquants_email = os.getenv('JQUANTS_EMAIL')
-                        jquants_password = os.getenv('JQUANTS_PASSWORD')
-                        refresh_token = os.getenv('JQUANTS_REFRESH_TOKEN')
-                        
-                        self.data_source = MultiDataSource(jquants_email, jquants_password, refresh_token)
+                        self.data_source = get_shared_data_source(fundamentals_db=self.db)
                     
                     stock_info = self.data_source.get_stock_info(symbol)
                     
@@ -3710,9 +3894,68 @@ PBR: 1.0 ✅ (設定: 4.0以下)
             print(f"監視リストデータ読み込みエラー: {e}")
 
     def export_data(self):
-        """データエクスポート機能（プレースホルダー）"""
-        import tkinter.messagebox as messagebox
-        messagebox.showinfo("データエクスポート", "データエクスポート機能は現在開発中です。")
+        """データエクスポート（Parquet / Arrow形式で保有銘柄・株価履歴・アラートを出力）"""
+        if not PYARROW_AVAILABLE:
+            messagebox.showerror("データエクスポート",
+                                 "データエクスポートには pyarrow が必要です。\n"
+                                 "pip install pyarrow でインストールしてください。")
+            return
+        
+        directory = filedialog.askdirectory(title="エクスポート先フォルダを選択")
+        if not directory:
+            return
+        
+        dialog = tk.Toplevel(self.root)
+        dialog.title("データエクスポート")
+        dialog.transient(self.root)
+        dialog.resizable(False, False)
+        
+        frame = ttk.Frame(dialog, padding=15)
+        frame.pack(fill=tk.BOTH, expand=True)
+        
+        ttk.Label(frame, text=f"出力先: {directory}").grid(row=0, column=0, columnspan=2, sticky=tk.W, pady=(0, 10))
+        
+        ttk.Label(frame, text="形式:").grid(row=1, column=0, sticky=tk.W)
+        format_var = tk.StringVar(value='parquet')
+        ttk.Combobox(frame, textvariable=format_var, values=['parquet', 'arrow'],
+                     state='readonly', width=12).grid(row=1, column=1, sticky=tk.W, pady=2)
+        
+        partition_labels = {'分割なし': None, '銘柄別': 'symbol', '月別': 'month'}
+        ttk.Label(frame, text="分割:").grid(row=2, column=0, sticky=tk.W)
+        partition_var = tk.StringVar(value='分割なし')
+        ttk.Combobox(frame, textvariable=partition_var, values=list(partition_labels),
+                     state='readonly', width=12).grid(row=2, column=1, sticky=tk.W, pady=2)
+        
+        def on_complete(counts, error):
+            if error:
+                messagebox.showerror("エラー", f"データエクスポートエラー: {error}")
+                self.update_status("❌ データエクスポート失敗")
+                return
+            lines = "\n".join(f"{table}: {count:,}行" for table, count in counts.items())
+            self.update_status("✅ データエクスポート完了")
+            messagebox.showinfo("完了", f"データをエクスポートしました。\n\n{lines}\n\n出力先: {directory}")
+        
+        def start_export():
+            fmt = format_var.get()
+            partition_by = partition_labels[partition_var.get()]
+            dialog.destroy()
+            
+            def worker():
+                # 大量の履歴でもUIを止めないようバックグラウンドで書き出す
+                try:
+                    counts = ColumnarExporter(self.db).export_all(directory, fmt, partition_by)
+                except Exception as e:
+                    self.root.after(0, lambda error=e: on_complete(None, error))
+                    return
+                self.root.after(0, lambda: on_complete(counts, None))
+            
+            self.update_status("💾 データエクスポート中...")
+            threading.Thread(target=worker, daemon=True, name="DataExport").start()
+        
+        button_frame = ttk.Frame(frame)
+        button_frame.grid(row=3, column=0, columnspan=2, pady=(10, 0))
+        ttk.Button(button_frame, text="エクスポート", command=start_export).pack(side=tk.LEFT, padx=5)
+        ttk.Button(button_frame, text="キャンセル", command=dialog.destroy).pack(side=tk.LEFT, padx=5)
 
     def show_settings(self):
         """設定画面表示（プレースホルダー）"""
@@ -3740,14 +3983,25 @@ PBR: 1.0 ✅ (設定: 4.0以下)
         """データベースクリーンアップ"""
         try:
             result = messagebox.askyesno("データベースクリーンアップ", 
-                "データベースの最適化を実行しますか？\n（古いデータの削除や断片化の解消を行います）")
+                "データベースの最適化を実行しますか？\n（古いデータの集約・アーカイブや断片化の解消を行います）")
             if result:
-                # データベースのVACUUMコマンドを実行
-                import sqlite3
-                with sqlite3.connect(self.db.db_path) as conn:
-                    conn.execute("VACUUM")
-                    conn.commit()
-                messagebox.showinfo("完了", "データベースのクリーンアップが完了しました。")
+                def on_complete(summary, error):
+                    # 保守スレッドからUIスレッドへ戻す
+                    if error:
+                        self.root.after(0, lambda: messagebox.showerror("エラー", f"データベースクリーンアップエラー: {error}"))
+                        return
+                    message = (f"データベースのクリーンアップが完了しました。\n\n"
+                               f"週足に集約: {summary['weekly_rows']}件\n"
+                               f"月足に集約: {summary['monthly_rows']}件\n"
+                               f"アーカイブしたアラート: {summary['archived_alerts']}件")
+                    self.root.after(0, lambda: (self.update_status("✅ データベースクリーンアップ完了"),
+                                                messagebox.showinfo("完了", message)))
+                
+                # 保持ポリシーに従った保守処理をバックグラウンドで実行（UIを止めない）
+                if self.retention.run_in_background(on_complete):
+                    self.update_status("🧹 データベースクリーンアップ実行中...")
+                else:
+                    messagebox.showinfo("実行中", "データベースクリーンアップは既に実行中です。")
         except Exception as e:
             messagebox.showerror("エラー", f"データベースクリーンアップエラー: {e}")
 
@@ -4225,6 +4479,9 @@ CONTRIBUTING.md をご参照ください
             # 監視設定も保存
             self.save_monitoring_settings()
             
+            # メモリ上の日中足を書き出す
+            self.intraday.stop()
+            
             # アプリケーション終了
             self.root.destroy()
             
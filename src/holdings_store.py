@@ -0,0 +1,230 @@
+"""
+保有銘柄キャッシュモジュール
+Write-through in-memory holdings store with change notifications
+
+holdings テーブルの内容をプロセス内のメモリに保持し、銘柄コードでの参照を
+O(1) で返す。DatabaseManager の書き込みメソッドがデータベースへの書き込み後に
+このストアを更新（または無効化）するため、読み込みは最初の1回だけDBへ行く。
+変更は購読者にイベントとして通知する。
+
+他の接続（別プロセス等）による holdings への書き込みは、トリガーで進む変更カウンタ
+（holdings_version）を読み込みのたびに前回と比べて検知し、変わっていればDBから読み直す。
+自分の書き込みは書き込み前後のカウンタを受け取って進めるため、読み直しは起きない。
+"""
+
+import os
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from logger import app_logger
+from records import HoldingRecord
+
+
+# 変更イベント
+EVENT_RELOADED = 'reloaded'
+EVENT_INSERTED = 'inserted'
+EVENT_PRICES_UPDATED = 'prices_updated'
+EVENT_DELETED = 'deleted'
+EVENT_CLEARED = 'cleared'
+
+HoldingKey = Tuple[str, str, str]  # (symbol, broker, account_type)
+Listener = Callable[[str, List[Dict]], None]
+
+
+def holding_key(holding: Dict) -> HoldingKey:
+    return (str(holding['symbol']), holding.get('broker') or '', holding.get('account_type') or '')
+
+
+class HoldingsStore:
+    """保有銘柄のメモリ上の写し（同一データベースのDatabaseManager間で共有）"""
+
+    def __init__(self):
+        self._holdings: Optional[Dict[HoldingKey, Dict]] = None
+        self._by_symbol: Dict[str, List[HoldingKey]] = {}
+        self._lock = threading.RLock()
+        self._listeners: List[Listener] = []
+        # 書き込みごとに進める世代（読み込み中の書き込みで古い行を載せないため）
+        self._generation = 0
+        # ストアの内容に対応する holdings の変更カウンタ（不明ならNone）
+        self._db_version: Optional[int] = None
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._holdings is not None
+
+    @property
+    def generation(self) -> int:
+        """DBから読み込む直前に取得し、load() に渡す"""
+        return self._generation
+
+    def load(self, rows: Iterable[Dict], generation: int, db_version: Optional[int] = None) -> bool:
+        """DBから読み込んだ全行でストアを置き換える
+
+        読み込み中に書き込みがあった場合（世代が変わった場合）は反映せずFalseを返す。
+        db_version は同じトランザクションで読んだ holdings の変更カウンタ。
+        """
+        with self._lock:
+            if generation != self._generation:
+                return False
+            self._db_version = db_version
+            self._holdings = {}
+            self._by_symbol = {}
+            for row in rows:
+                self._put(dict(row))
+            holdings = self._snapshot()
+        self._notify(EVENT_RELOADED, holdings)
+        return True
+
+    def invalidate(self) -> None:
+        """次回の読み込みでDBから再取得させる"""
+        with self._lock:
+            self._invalidate()
+
+    def _invalidate(self) -> None:
+        self._generation += 1
+        self._holdings = None
+        self._by_symbol = {}
+        self._db_version = None
+
+    def check_version(self, db_version: int) -> bool:
+        """holdings の変更カウンタがストアの内容と違えば無効化してFalse"""
+        with self._lock:
+            if self._holdings is None or db_version == self._db_version:
+                return True
+            self._invalidate()
+        app_logger.info("他の接続での保有銘柄の書き込みを検知したため読み直します")
+        return False
+
+    def _advance(self, version: Optional[Tuple[int, int]]) -> bool:
+        """自分の書き込みの前後の変更カウンタでストアの版を進める（ロック内で呼ぶ）
+
+        書き込み前のカウンタがストアの版と違えば、間に他の接続の書き込みがあったため
+        無効化してFalseを返す。
+        """
+        self._generation += 1
+        if self._holdings is None:
+            return False
+        if version is not None:
+            before, after = version
+            if before != self._db_version:
+                self._invalidate()
+                return False
+            self._db_version = after
+        return True
+
+    def _put(self, holding: Dict) -> None:
+        key = holding_key(holding)
+        if key not in self._holdings:
+            self._by_symbol.setdefault(key[0], []).append(key)
+        self._holdings[key] = holding
+
+    def _snapshot(self) -> List[Dict]:
+        """market_value降順のコピー（get_all_holdings と同じ並び）"""
+        rows = [dict(holding) for holding in self._holdings.values()]
+        rows.sort(key=lambda holding: holding.get('market_value') or 0, reverse=True)
+        return rows
+
+    def all(self) -> Optional[List[Dict]]:
+        """全保有銘柄のコピー（未読み込みならNone）"""
+        with self._lock:
+            if self._holdings is None:
+                return None
+            return self._snapshot()
+
+    def records(self) -> Optional[List[HoldingRecord]]:
+        """全保有銘柄の HoldingRecord（market_value降順、未読み込みならNone）"""
+        with self._lock:
+            if self._holdings is None:
+                return None
+            records = [HoldingRecord(*(holding[field] for field in HoldingRecord._fields))
+                       for holding in self._holdings.values()]
+        records.sort(key=lambda record: record.market_value or 0, reverse=True)
+        return records
+
+    def get(self, symbol: str) -> Optional[List[Dict]]:
+        """銘柄コードの保有行（複数口座分）のコピー（未読み込みならNone）"""
+        with self._lock:
+            if self._holdings is None:
+                return None
+            keys = self._by_symbol.get(str(symbol), [])
+            return [dict(self._holdings[key]) for key in keys]
+
+    def count(self) -> Optional[int]:
+        with self._lock:
+            return None if self._holdings is None else len(self._holdings)
+
+    def apply_prices(self, price_updates: Dict[str, float], updated_at: str,
+                     version: Optional[Tuple[int, int]] = None) -> None:
+        """現在価格の更新をDBと同じ計算式で反映（version は書き込み前後の変更カウンタ）"""
+        changed = []
+        with self._lock:
+            if not self._advance(version):
+                return
+            for symbol, price in price_updates.items():
+                for key in self._by_symbol.get(str(symbol), []):
+                    holding = self._holdings[key]
+                    holding['current_price'] = price
+                    holding['market_value'] = holding['quantity'] * price
+                    holding['profit_loss'] = holding['market_value'] - holding['acquisition_amount']
+                    holding['updated_at'] = updated_at
+                    changed.append(dict(holding))
+        if changed:
+            self._notify(EVENT_PRICES_UPDATED, changed)
+
+    def remove_symbol(self, symbol: str, version: Optional[Tuple[int, int]] = None) -> None:
+        """銘柄コードの全行を削除"""
+        with self._lock:
+            if not self._advance(version):
+                return
+            removed = [self._holdings.pop(key) for key in self._by_symbol.pop(str(symbol), [])]
+        if removed:
+            self._notify(EVENT_DELETED, removed)
+
+    def clear(self, version: Optional[Tuple[int, int]] = None) -> None:
+        """全行を削除（読み込み済みの空の状態にする）"""
+        with self._lock:
+            self._generation += 1
+            removed = list(self._holdings.values()) if self._holdings else []
+            self._holdings = {}
+            self._by_symbol = {}
+            self._db_version = version[1] if version is not None else None
+        self._notify(EVENT_CLEARED, removed)
+
+    def notify_inserted(self, holdings: List[Dict]) -> None:
+        """挿入を通知（行IDが変わるためストアは無効化済みであること）"""
+        self._notify(EVENT_INSERTED, holdings)
+
+    def subscribe(self, listener: Listener) -> None:
+        """変更イベントの購読（listener(event, holdings)）"""
+        with self._lock:
+            if listener not in self._listeners:
+                self._listeners.append(listener)
+
+    def unsubscribe(self, listener: Listener) -> None:
+        with self._lock:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+
+    def _notify(self, event: str, holdings: List[Dict]) -> None:
+        """購読者へ通知（ロック外で呼ぶ。購読者の例外は記録のみ）"""
+        with self._lock:
+            listeners = list(self._listeners)
+        for listener in listeners:
+            try:
+                listener(event, holdings)
+            except Exception as e:
+                app_logger.error(f"保有銘柄変更通知エラー ({event}): {e}")
+
+
+_stores: Dict[str, HoldingsStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_holdings_store(db_path: str) -> HoldingsStore:
+    """データベースファイルごとに共有される保有銘柄ストアを取得"""
+    key = db_path if db_path == ':memory:' else os.path.realpath(db_path)
+    store = _stores.get(key)
+    if store is None:
+        with _stores_lock:
+            store = _stores.setdefault(key, HoldingsStore())
+    return store
@@ -0,0 +1,188 @@
+"""
+HTTPレスポンスキャッシュモジュール
+HTTP response cache with conditional requests
+
+レスポンス本文を ETag / Last-Modified と共にディスクへ保存し、
+鮮度期間内はネットワークに出ずディスクから返す。期限切れ後は
+If-None-Match / If-Modified-Since 付きの条件付きリクエストで再検証し、
+304 の場合は本文を再ダウンロードしない。通信エラー・5xx・429 の場合は
+期限切れでもキャッシュがあればそれを返す。
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional
+
+import requests
+
+from logger import app_logger
+
+
+DEFAULT_HTTP_CACHE_DIR = "data/http_cache"
+
+
+@dataclass
+class CachedResponse:
+    """キャッシュ経由のレスポンス"""
+    status_code: int
+    body: bytes
+    from_cache: bool      # ネットワークに出ずに返した
+    revalidated: bool     # 304で再検証した
+    fetched_at: float
+
+    def json(self):
+        return json.loads(self.body.decode('utf-8'))
+
+
+class HTTPResponseCache:
+    """ディスク永続のHTTPレスポンスキャッシュ（GET専用）"""
+
+    def __init__(self, cache_dir: str = DEFAULT_HTTP_CACHE_DIR, max_age: float = 300,
+                 session: Optional[requests.Session] = None, timeout: float = 10):
+        self.cache_dir = cache_dir
+        self.max_age = max_age
+        self.session = session or requests.Session()
+        self.timeout = timeout
+        self._lock = threading.Lock()
+
+    def _key(self, url: str) -> str:
+        return hashlib.sha256(url.encode('utf-8')).hexdigest()
+
+    def _paths(self, url: str):
+        key = self._key(url)
+        return (os.path.join(self.cache_dir, f"{key}.json"),
+                os.path.join(self.cache_dir, f"{key}.body.gz"))
+
+    def _load_entry(self, url: str) -> Optional[Dict]:
+        meta_path, _ = self._paths(url)
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return entry if entry.get('url') == url else None
+
+    def _load_body(self, url: str) -> Optional[bytes]:
+        _, body_path = self._paths(url)
+        try:
+            with gzip.open(body_path, 'rb') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def _save(self, url: str, entry: Dict, body: Optional[bytes] = None) -> None:
+        meta_path, body_path = self._paths(url)
+        with self._lock:
+            try:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                if body is not None:
+                    with gzip.open(f"{body_path}.tmp", 'wb') as f:
+                        f.write(body)
+                    os.replace(f"{body_path}.tmp", body_path)
+                with open(f"{meta_path}.tmp", 'w', encoding='utf-8') as f:
+                    json.dump(entry, f)
+                os.replace(f"{meta_path}.tmp", meta_path)
+            except OSError as e:
+                app_logger.warning(f"HTTPキャッシュ保存エラー: {e}")
+
+    @staticmethod
+    def _server_max_age(response: requests.Response) -> Optional[float]:
+        """Cache-Control: max-age を取得"""
+        cache_control = response.headers.get('Cache-Control', '')
+        if 'no-store' in cache_control:
+            return 0
+        match = re.search(r'max-age=(\d+)', cache_control)
+        return float(match.group(1)) if match else None
+
+    def is_fresh(self, url: str) -> bool:
+        """鮮度期間内のキャッシュがあればTrue（ネットワーク不要）"""
+        entry = self._load_entry(url)
+        return bool(entry) and entry.get('expires_at', 0) > time.time()
+
+    def get(self, url: str, headers: Optional[Dict] = None,
+            freshness: Optional[Callable[[bytes], Optional[float]]] = None) -> CachedResponse:
+        """キャッシュ付きGET
+
+        Args:
+            url: 取得URL（クエリ込みでキャッシュキーになる）
+            headers: 追加ヘッダー
+            freshness: 本文から鮮度秒数を決める関数（Noneを返すとmax_ageを使用）
+        """
+        now = time.time()
+        entry = self._load_entry(url)
+        body = self._load_body(url) if entry else None
+        if entry and body is None:
+            entry = None
+
+        # 鮮度期間内はディスクから返す
+        if entry and entry.get('expires_at', 0) > now:
+            return CachedResponse(200, body, True, False, entry['fetched_at'])
+
+        request_headers = {'Accept-Encoding': 'gzip, deflate'}
+        request_headers.update(headers or {})
+        if entry:
+            if entry.get('etag'):
+                request_headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                request_headers['If-Modified-Since'] = entry['last_modified']
+
+        try:
+            response = self.session.get(url, headers=request_headers, timeout=self.timeout)
+        except requests.RequestException as e:
+            if entry:
+                # 通信エラー時は期限切れでもキャッシュを返す
+                app_logger.warning(f"HTTP取得失敗のため期限切れキャッシュを使用 ({url}): {e}")
+                return CachedResponse(200, body, True, False, entry['fetched_at'])
+            raise
+
+        if response.status_code == 304 and entry:
+            fresh_for = self._fresh_for(response, body, freshness)
+            entry.update(fetched_at=now, expires_at=now + fresh_for)
+            self._save(url, entry)
+            return CachedResponse(200, body, False, True, now)
+
+        if entry and (response.status_code >= 500 or response.status_code == 429):
+            # サーバー側の障害・レート制限時も期限切れキャッシュを返す
+            app_logger.warning(f"HTTP {response.status_code} のため期限切れキャッシュを使用 ({url})")
+            return CachedResponse(200, body, True, False, entry['fetched_at'])
+
+        response.raise_for_status()
+        body = response.content
+        fresh_for = self._fresh_for(response, body, freshness)
+        self._save(url, {
+            'url': url,
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'fetched_at': now,
+            'expires_at': now + fresh_for,
+        }, body)
+        return CachedResponse(response.status_code, body, False, False, now)
+
+    def _fresh_for(self, response: requests.Response, body: bytes,
+                   freshness: Optional[Callable[[bytes], Optional[float]]]) -> float:
+        """鮮度秒数を決定（呼び出し側指定 > サーバー指定 > 既定値の順で大きい方）"""
+        fresh_for = self.max_age
+        server_max_age = self._server_max_age(response)
+        if server_max_age == 0:
+            return 0
+        if server_max_age:
+            fresh_for = max(fresh_for, server_max_age)
+        if freshness:
+            try:
+                custom = freshness(body)
+                if custom is not None:
+                    fresh_for = max(fresh_for, custom)
+            except Exception as e:
+                app_logger.debug(f"鮮度計算エラー: {e}")
+        return fresh_for
+
+    def get_json(self, url: str, headers: Optional[Dict] = None,
+                 freshness: Optional[Callable[[bytes], Optional[float]]] = None):
+        """キャッシュ付きGETでJSONを返す"""
+        return self.get(url, headers=headers, freshness=freshness).json()
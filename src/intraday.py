@@ -0,0 +1,216 @@
+"""
+日中ティック保持モジュール
+In-memory intraday tick ring buffer with periodic bar flush
+
+price_history は (symbol, date) 単位のため日中の値動きが残らない。
+ここでは銘柄ごとに固定長のNumPyリングバッファで直近のティック
+（時刻・価格・累積出来高）をメモリに保持し、日中チャートや指標は
+メモリから直接計算する。確定した足だけを定期的に intraday_bars テーブルへ
+まとめて書き出すため、ティックごとのSQLite書き込みは発生しない。
+"""
+
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from logger import app_logger
+
+
+class TickRingBuffer:
+    """固定長のティックバッファ（古いティックから上書き）"""
+
+    def __init__(self, capacity: int = 2048):
+        self.capacity = capacity
+        self._times = np.zeros(capacity, dtype=np.float64)
+        self._prices = np.zeros(capacity, dtype=np.float64)
+        self._volumes = np.zeros(capacity, dtype=np.float64)
+        self._next = 0
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def append(self, timestamp: float, price: float, volume: float) -> None:
+        """ティックを追加"""
+        index = self._next
+        self._times[index] = timestamp
+        self._prices[index] = price
+        self._volumes[index] = volume
+        self._next = (index + 1) % self.capacity
+        self._count = min(self._count + 1, self.capacity)
+
+    def snapshot(self, since: Optional[float] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """時系列順の (時刻, 価格, 累積出来高) のコピーを返す"""
+        if self._count < self.capacity:
+            order = slice(0, self._count)
+            times, prices, volumes = self._times[order], self._prices[order], self._volumes[order]
+        else:
+            order = np.r_[self._next:self.capacity, 0:self._next]
+            times, prices, volumes = self._times[order], self._prices[order], self._volumes[order]
+
+        if since is not None:
+            start = int(np.searchsorted(times, since, side='left'))
+            times, prices, volumes = times[start:], prices[start:], volumes[start:]
+        return times.copy(), prices.copy(), volumes.copy()
+
+    def latest(self) -> Optional[Tuple[float, float, float]]:
+        """最新のティック"""
+        if not self._count:
+            return None
+        index = (self._next - 1) % self.capacity
+        return float(self._times[index]), float(self._prices[index]), float(self._volumes[index])
+
+
+def aggregate_bars(times: np.ndarray, prices: np.ndarray, volumes: np.ndarray,
+                   bar_seconds: int) -> Dict[str, np.ndarray]:
+    """ティックを bar_seconds 秒足に集約
+
+    volumes はデータソースが返す当日の累積出来高として扱い、
+    ティック間の増分を足ごとに合計する（日付が変わって減少した場合はその値を増分とみなす）。
+    """
+    if len(times) == 0:
+        empty = np.array([], dtype=np.float64)
+        return {'start': empty, 'open': empty, 'high': empty, 'low': empty,
+                'close': empty, 'volume': empty, 'ticks': np.array([], dtype=np.int64)}
+
+    increments = np.diff(volumes, prepend=volumes[0])
+    reset = increments < 0
+    increments[reset] = volumes[reset]
+
+    bar_index = np.floor(times / bar_seconds).astype(np.int64)
+    starts = np.flatnonzero(np.r_[True, bar_index[1:] != bar_index[:-1]])
+    ends = np.r_[starts[1:], len(times)]
+
+    return {
+        'start': bar_index[starts].astype(np.float64) * bar_seconds,
+        'open': prices[starts],
+        'high': np.maximum.reduceat(prices, starts),
+        'low': np.minimum.reduceat(prices, starts),
+        'close': prices[ends - 1],
+        'volume': np.add.reduceat(increments, starts),
+        'ticks': ends - starts,
+    }
+
+
+class IntradayTickStore:
+    """銘柄ごとのティックバッファと足の定期書き出し"""
+
+    def __init__(self, db, capacity: int = 2048, bar_seconds: int = 300,
+                 flush_interval: float = 60):
+        self.db = db
+        self.capacity = capacity
+        self.bar_seconds = bar_seconds
+        self.flush_interval = flush_interval
+        self._buffers: Dict[str, TickRingBuffer] = {}
+        # 銘柄ごとの書き出し済み時刻（この時刻より前の足は書き出し済み）
+        self._flushed_until: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def record(self, symbol: str, price: float, volume: float = 0,
+               timestamp: Optional[float] = None) -> None:
+        """ティックを記録（メモリのみ）"""
+        if price is None or price <= 0:
+            return
+        timestamp = time.time() if timestamp is None else timestamp
+        with self._lock:
+            buffer = self._buffers.get(symbol)
+            if buffer is None:
+                buffer = self._buffers[symbol] = TickRingBuffer(self.capacity)
+            latest = buffer.latest()
+            # 時刻が戻るティックは捨てる（時系列順を保つ）
+            if latest and timestamp < latest[0]:
+                return
+            buffer.append(timestamp, price, volume or 0)
+
+    def record_stock_info(self, symbol: str, stock_info) -> None:
+        """StockInfo からティックを記録"""
+        self.record(symbol, stock_info.current_price, stock_info.volume)
+
+    def symbols(self) -> List[str]:
+        with self._lock:
+            return list(self._buffers)
+
+    def get_ticks(self, symbol: str, since: Optional[float] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """直近ティックの (時刻, 価格, 累積出来高)"""
+        with self._lock:
+            buffer = self._buffers.get(symbol)
+            if buffer is None:
+                empty = np.array([], dtype=np.float64)
+                return empty, empty.copy(), empty.copy()
+            return buffer.snapshot(since)
+
+    def get_bars(self, symbol: str, bar_seconds: Optional[int] = None,
+                 since: Optional[float] = None) -> Dict[str, np.ndarray]:
+        """メモリ上のティックから足を計算（日中チャート・指標用）"""
+        times, prices, volumes = self.get_ticks(symbol, since)
+        return aggregate_bars(times, prices, volumes, bar_seconds or self.bar_seconds)
+
+    def flush(self, now: Optional[float] = None, include_open_bar: bool = False) -> int:
+        """確定した足をデータベースへまとめて書き出し、書き出した足の数を返す
+
+        include_open_bar=True の場合は未確定の足も書き出す（終了時用）。
+        未確定の足は次回以降の書き出しで上書きされる。
+        """
+        now = time.time() if now is None else now
+        rows = []
+        flushed_until = {}
+
+        for symbol in self.symbols():
+            # 出来高の増分を正しく計算するため、集約はバッファ全体で行う
+            bars = self.get_bars(symbol)
+            bar_ends = bars['start'] + self.bar_seconds
+            pending = bars['start'] >= self._flushed_until.get(symbol, 0)
+            complete = pending & (bar_ends <= now)
+            selected = pending if include_open_bar else complete
+            if not selected.any():
+                continue
+
+            for i in np.flatnonzero(selected):
+                rows.append((
+                    symbol,
+                    datetime.fromtimestamp(bars['start'][i]).strftime('%Y-%m-%d %H:%M:%S'),
+                    self.bar_seconds,
+                    float(bars['open'][i]),
+                    float(bars['high'][i]),
+                    float(bars['low'][i]),
+                    float(bars['close'][i]),
+                    int(bars['volume'][i]),
+                    int(bars['ticks'][i]),
+                ))
+            if complete.any():
+                flushed_until[symbol] = float(bar_ends[np.flatnonzero(complete)[-1]])
+
+        if not rows:
+            return 0
+        if not self.db.save_intraday_bars(rows):
+            return 0
+        self._flushed_until.update(flushed_until)
+        return len(rows)
+
+    def start(self) -> None:
+        """定期書き出しスレッドを開始"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._flush_loop, daemon=True,
+                                        name="IntradayFlush")
+        self._thread.start()
+
+    def stop(self) -> None:
+        """定期書き出しを停止し、未確定の足も含めて書き出す"""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+        self.flush(include_open_bar=True)
+
+    def _flush_loop(self) -> None:
+        while not self._stop_event.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                app_logger.error(f"日中足書き出しエラー: {e}")
@@ -0,0 +1,104 @@
+"""
+上場銘柄一覧モジュール
+Local issuer directory from J Quants listed info
+
+監視銘柄・欲しい銘柄の追加時に銘柄コードと銘柄名を正確に入力する必要が
+ないよう、J Quants の上場銘柄一覧（listed/info）を一括取得して issuers テーブルに
+保存する。検索は DatabaseManager.search_issuers がFTS5（trigram）の全文検索
+インデックスで行うため、通信なしで入力中に候補を表示できる。
+
+J Quants の上場銘柄一覧にはカナ表記がないため、検索対象は銘柄コード・
+銘柄名（NFKC正規化）・英語名とする。
+"""
+
+import re
+import unicodedata
+from datetime import date, datetime
+from typing import Dict, Optional
+
+from logger import app_logger
+
+
+# 上場銘柄一覧の更新間隔（日）
+REFRESH_INTERVAL_DAYS = 7
+
+_SPACES = re.compile(r'\s+')
+
+
+def normalize_search_text(text: Optional[str]) -> str:
+    """検索用の正規化（全角英数・半角カナをNFKCで統一し、空白を1つにまとめる）"""
+    if not text:
+        return ''
+    return _SPACES.sub(' ', unicodedata.normalize('NFKC', str(text))).strip()
+
+
+def to_local_code(code) -> str:
+    """J Quants の5桁コード（72030）をアプリで使う4桁コード（7203）に変換"""
+    code = str(code or '').strip()
+    if len(code) == 5 and code.endswith('0'):
+        return code[:4]
+    return code
+
+
+def extract_issuer(row: Dict) -> Optional[Dict]:
+    """listed/info の1行を issuers テーブルの行に変換（コード・銘柄名がなければNone）"""
+    code = to_local_code(row.get('Code'))
+    name = (row.get('CompanyName') or '').strip()
+    if not code or not name:
+        return None
+    return {
+        'code': code,
+        'name': name,
+        'name_english': (row.get('CompanyNameEnglish') or '').strip(),
+        'sector17_code': row.get('Sector17Code'),
+        'sector17_name': row.get('Sector17CodeName'),
+        'sector33_code': row.get('Sector33Code'),
+        'sector33_name': row.get('Sector33CodeName'),
+        'market_code': row.get('MarketCode'),
+        'market_name': row.get('MarketCodeName'),
+        'scale_category': row.get('ScaleCategory'),
+    }
+
+
+class IssuerDirectory:
+    """上場銘柄一覧の一括取得ジョブ（週1回）"""
+
+    LAST_RUN_KEY = 'issuers_last_run'
+    LAST_ATTEMPT_KEY = 'issuers_last_attempt'
+
+    def __init__(self, jquants_source, db, refresh_days: int = REFRESH_INTERVAL_DAYS):
+        self.source = jquants_source
+        self.db = db
+        self.refresh_days = refresh_days
+
+    def is_due(self) -> bool:
+        """一覧が空か、前回の取得から refresh_days 日以上経っていればTrue
+
+        一覧が空のままの場合（契約プランで取得できない等）の再取得は1日1回まで。
+        """
+        if self.db.get_issuers_count() == 0:
+            return self.db.get_sync_state(self.LAST_ATTEMPT_KEY) != date.today().isoformat()
+        last_run = self.db.get_sync_state(self.LAST_RUN_KEY)
+        try:
+            last_date = datetime.strptime(last_run, '%Y-%m-%d').date()
+        except (TypeError, ValueError):
+            return True
+        return (date.today() - last_date).days >= self.refresh_days
+
+    def refresh(self) -> int:
+        """上場銘柄一覧を取得して置き換え、保存した銘柄数を返す"""
+        self.db.set_sync_state(self.LAST_ATTEMPT_KEY, date.today().isoformat())
+        records = [r for r in (extract_issuer(row) for row in self.source.iter_listed_info()) if r]
+        if not records:
+            app_logger.warning("上場銘柄一覧を取得できませんでした")
+            return 0
+
+        saved = self.db.replace_issuers(records)
+        self.db.set_sync_state(self.LAST_RUN_KEY, date.today().isoformat())
+        app_logger.info(f"上場銘柄一覧更新完了: {saved}銘柄")
+        return saved
+
+    def refresh_if_due(self) -> int:
+        if not self.is_due():
+            return 0
+        return self.refresh()
@@ -0,0 +1,149 @@
+"""
+J Quants APIストリーミング取得モジュール
+Streaming pagination adapter for J Quants API
+
+jquants-api-client の get_* 系メソッドは全ページを結合してDataFrame化するため、
+長期間の株価や市場全体の開示を取得するとレスポンス全体がメモリに載る。
+ここでは raw API を pagination_key に沿って1ページずつ取得し、行（dict）を
+逐次 yield する。呼び出し側がイテレーションを止めた時点で以降のページは取得しない。
+"""
+
+import json
+from collections import deque
+from datetime import date, datetime
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Union
+
+
+# エンドポイント名 → (raw取得メソッド, レスポンスのデータキー, DataFrame版メソッド)
+ENDPOINTS = {
+    'daily_quotes': ('_get_prices_daily_quotes_raw', 'daily_quotes', 'get_prices_daily_quotes'),
+    'statements': ('_get_fins_statements_raw', 'statements', 'get_fins_statements'),
+    'listed_info': ('_get_listed_info_raw', 'info', 'get_listed_info'),
+}
+
+DateLike = Union[str, date, datetime, None]
+
+
+def to_yyyymmdd(value: DateLike) -> str:
+    """日付をJ Quants APIのYYYYMMDD形式に変換（Noneは空文字）"""
+    if value is None or value == '':
+        return ''
+    if isinstance(value, (date, datetime)):
+        return value.strftime('%Y%m%d')
+    return str(value).replace('-', '')[:8]
+
+
+def _row_date(row: Dict, field: str) -> str:
+    """行の日付をYYYYMMDD文字列で取得（比較用）"""
+    return to_yyyymmdd(row.get(field))
+
+
+class JQuantsStream:
+    """pagination_key を辿って行を逐次返すストリーミングアダプタ"""
+
+    def __init__(self, client):
+        self.client = client
+
+    def iter_rows(self, endpoint: str, limit: Optional[int] = None, **params) -> Iterator[Dict]:
+        """エンドポイントの行を1ページずつ取得してyield
+
+        Args:
+            endpoint: 'daily_quotes' / 'statements' / 'listed_info'
+            limit: 最大行数（到達したら以降のページは取得しない）
+            params: raw APIの引数（code, date_yyyymmdd, from_yyyymmdd, to_yyyymmdd など）
+        """
+        raw_method_name, data_key, frame_method_name = ENDPOINTS[endpoint]
+        raw_method = getattr(self.client, raw_method_name, None)
+
+        if raw_method is None:
+            # raw APIがないクライアントはDataFrame経由（ページングはクライアント任せ）
+            yield from self._iter_dataframe(getattr(self.client, frame_method_name), limit, **params)
+            return
+
+        count = 0
+        pagination_key = ''
+        while True:
+            if pagination_key:
+                page = json.loads(raw_method(pagination_key=pagination_key, **params))
+            else:
+                page = json.loads(raw_method(**params))
+
+            rows = page.get(data_key) or []
+            pagination_key = page.get('pagination_key', '')
+            # 次ページ取得前に現ページへの参照を切る
+            del page
+
+            for row in rows:
+                yield row
+                count += 1
+                if limit is not None and count >= limit:
+                    return
+
+            if not pagination_key:
+                return
+
+    def _iter_dataframe(self, frame_method: Callable, limit: Optional[int], **params) -> Iterator[Dict]:
+        """DataFrame版メソッドのフォールバック"""
+        frame = frame_method(**params)
+        if frame is None or getattr(frame, 'empty', True):
+            return
+        for count, (_, row) in enumerate(frame.iterrows(), start=1):
+            yield row.to_dict()
+            if limit is not None and count >= limit:
+                return
+
+    def iter_daily_quotes(self, code: str, from_date: DateLike = None, to_date: DateLike = None,
+                          limit: Optional[int] = None) -> Iterator[Dict]:
+        """日足株価を期間指定（APIへプッシュダウン）で逐次取得"""
+        return self.iter_rows(
+            'daily_quotes',
+            limit=limit,
+            code=code,
+            from_yyyymmdd=to_yyyymmdd(from_date),
+            to_yyyymmdd=to_yyyymmdd(to_date),
+        )
+
+    def iter_statements(self, code: str = '', disclosed_date: DateLike = None,
+                        since: DateLike = None, until: DateLike = None,
+                        limit: Optional[int] = None) -> Iterator[Dict]:
+        """決算開示を逐次取得
+
+        statements APIは開示日の単日指定のみ対応のため、since/untilは
+        ストリーム上で絞り込む（範囲外の行は保持しない）。
+        """
+        since_str = to_yyyymmdd(since)
+        until_str = to_yyyymmdd(until)
+        rows = self.iter_rows('statements', code=code, date_yyyymmdd=to_yyyymmdd(disclosed_date))
+
+        count = 0
+        for row in rows:
+            row_date = _row_date(row, 'DisclosedDate')
+            if since_str and row_date < since_str:
+                continue
+            if until_str and row_date > until_str:
+                continue
+            yield row
+            count += 1
+            if limit is not None and count >= limit:
+                return
+
+    def iter_listed_info(self, code: str = '', on_date: DateLike = None) -> Iterator[Dict]:
+        """上場銘柄一覧を逐次取得"""
+        return self.iter_rows('listed_info', code=code, date_yyyymmdd=to_yyyymmdd(on_date))
+
+
+def last_rows(rows: Iterable[Dict], count: int) -> List[Dict]:
+    """ストリームの末尾count行だけを保持して返す（メモリ使用量は一定）"""
+    return list(deque(rows, maxlen=count))
+
+
+def latest_row(rows: Iterable[Dict], *date_fields: str) -> Optional[Dict]:
+    """日付フィールドが最大の行を返す（ストリーム順序に依存しない）"""
+    latest = None
+    latest_key = None
+    for row in rows:
+        key = tuple(str(row.get(field) or '') for field in date_fields)
+        if latest_key is None or key >= latest_key:
+            latest, latest_key = row, key
+    return latest
+
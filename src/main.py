@@ -170,6 +170,12 @@ class WatchdogApp:
             print(f"  評価金額: ¥{summary['total_market_value']:,.0f}")
             print(f"  損益: ¥{summary['total_profit_loss']:+,.0f}")
             print(f"  収益率: {summary['return_rate']:+.2f}%")
+            
+            # 前回の大引け後スナップショットとの比較
+            snapshot = self.monitor.snapshots.get_daily_change()
+            if snapshot and snapshot['previous_market_value']:
+                print(f"  前日比 ({snapshot['snapshot_date']}): ¥{snapshot['day_change']:+,.0f} "
+                      f"({snapshot['day_change_rate']:+.2f}%)")
     
     def show_portfolio(self):
         """ポートフォリオ表示"""
@@ -229,17 +235,44 @@ class WatchdogApp:
         else:
             print("\n株価情報を取得できませんでした")
     
+    def _select_issuer(self, query: str):
+        """上場銘柄一覧から銘柄を選択（一覧にない場合は入力をコードとして扱う）"""
+        if self.db.get_issuer(query):
+            return query
+        
+        candidates = self.db.search_issuers(query, limit=10)
+        if not candidates:
+            return query
+        if len(candidates) == 1:
+            return candidates[0]['code']
+        
+        print("\n候補:")
+        for i, issuer in enumerate(candidates, 1):
+            print(f"{i}. {issuer['code']} {issuer['name']}")
+        try:
+            choice = int(input("選択 (番号): ").strip())
+            if 1 <= choice <= len(candidates):
+                return candidates[choice - 1]['code']
+        except ValueError:
+            pass
+        print("無効な選択です")
+        return None
+    
     def add_watchlist_stock(self):
         """監視銘柄追加"""
         print("\n" + "="*30)
         print("監視銘柄追加")
         print("="*30)
         
-        symbol = input("銘柄コード (例: 7203): ").strip()
-        if not symbol:
+        query = input("銘柄コードまたは銘柄名 (例: 7203, トヨタ): ").strip()
+        if not query:
             print("銘柄コードが入力されていません")
             return
         
+        symbol = self._select_issuer(query)
+        if not symbol:
+            return
+        
         # 銘柄情報取得
         print(f"{symbol} の情報を取得中...")
         stock_info = self.data_source.get_stock_info(symbol)
@@ -320,6 +353,12 @@ class WatchdogApp:
         self.monitor.stop_monitoring()
         print("監視が停止されました")
     
+    def update_fundamentals(self):
+        """財務データ差分更新"""
+        print("財務データを差分更新中...")
+        updated_count = self.monitor.refresh_fundamentals(force=True)
+        print(f"{updated_count} 件の財務データを更新しました")
+    
     def test_notifications(self):
         """通知テスト"""
         print("通知機能をテストします...")
@@ -331,12 +370,34 @@ class WatchdogApp:
         print("アプリケーションを終了しました")
 
 
+def configure_database(in_memory: bool = False, config_path: str = "config/settings.json"):
+    """インメモリモードの指定（--in-memory または settings.json の database.in_memory）を反映"""
+    try:
+        with open(config_path, 'r', encoding='utf-8') as f:
+            config = json.load(f).get('database', {})
+    except FileNotFoundError:
+        config = {}
+    except (OSError, ValueError) as e:
+        print(f"データベース設定読み込みエラー: {e}")
+        config = {}
+    
+    if not (in_memory or config.get('in_memory')):
+        return
+    from db_connection import PERSIST_INTERVAL_SECONDS, enable_in_memory
+    interval = config.get('persist_interval_seconds', PERSIST_INTERVAL_SECONDS)
+    enable_in_memory(config.get('path', "data/portfolio.db"), interval)
+    print(f"💾 インメモリモード: {interval}秒ごとと終了時にディスクへ書き戻します")
+
+
 def main():
     """メイン関数"""
     parser = argparse.ArgumentParser(description="日本株ウォッチドッグ")
     parser.add_argument('--daemon', action='store_true', help='デーモンモードで実行')
     parser.add_argument('--gui', action='store_true', help='GUIモードで実行')
     parser.add_argument('--version', action='store_true', help='バージョン情報を表示')
+    parser.add_argument('--update-fundamentals', action='store_true', help='財務データを差分更新して終了')
+    parser.add_argument('--in-memory', action='store_true',
+                        help='データベースをメモリ上で使い、定期的にディスクへ書き戻す（単一プロセス用）')
     
     args = parser.parse_args()
     
@@ -349,6 +410,8 @@ def main():
         print("https://github.com/inata169/miniTest01")
         return
     
+    configure_database(args.in_memory)
+    
     if args.gui:
         # GUIモード
         print("🚀 日本株ウォッチドッグ - GUI起動中...")
@@ -375,6 +438,10 @@ def main():
             print("   1. 必要な依存関係がインストールされていることを確認してください")
             print("   2. pip install -r requirements.txt を実行してください")
             print("   3. 詳細なログは logs/ ディレクトリで確認できます")
+    elif args.update_fundamentals:
+        # 財務データ差分更新（cron等からの日次実行用）
+        app = WatchdogApp()
+        app.update_fundamentals()
     elif args.daemon:
         # デーモンモード
         app = WatchdogApp()
@@ -0,0 +1,39 @@
+"""
+取引日カレンダーモジュール
+Tokyo Stock Exchange trading days
+
+東京証券取引所の休業日（土日・国民の祝日・年末年始の12/31〜1/3）を判定する。
+祝日の判定は jpholiday（pip install jpholiday）を使い、未導入の場合は
+JPHOLIDAY_AVAILABLE が False になって土日と年末年始だけを休業日とみなす。
+"""
+
+from datetime import date, datetime
+from typing import Optional, Union
+
+from logger import app_logger
+
+try:
+    import jpholiday
+    JPHOLIDAY_AVAILABLE = True
+except ImportError:
+    JPHOLIDAY_AVAILABLE = False
+    app_logger.info("jpholiday not available. National holidays are treated as trading days. "
+                    "Install with: pip install jpholiday")
+
+
+# 年末年始の休業日（月, 日）
+YEAR_END_HOLIDAYS = ((12, 31), (1, 1), (1, 2), (1, 3))
+
+
+def is_trading_day(day: Optional[Union[date, datetime]] = None) -> bool:
+    """東京証券取引所の営業日ならTrue（省略時は本日）"""
+    day = day or date.today()
+    if isinstance(day, datetime):
+        day = day.date()
+    if day.weekday() >= 5:
+        return False
+    if (day.month, day.day) in YEAR_END_HOLIDAYS:
+        return False
+    if JPHOLIDAY_AVAILABLE and jpholiday.is_holiday(day):
+        return False
+    return True
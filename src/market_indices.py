@@ -3,12 +3,14 @@
 Market Indices Data Fetcher
 """
 
-import requests
+import json
 import time
 from typing import Dict, Optional
 from dataclasses import dataclass
 from datetime import datetime
 
+from http_cache import HTTPResponseCache
+
 
 @dataclass
 class IndexInfo:
@@ -23,10 +25,15 @@ class IndexInfo:
 class MarketIndicesManager:
     """市場指数管理クラス"""
     
-    def __init__(self):
+    CHART_URL = "https://query1.finance.yahoo.com/v8/finance/chart/{symbol}"
+    CLOSED_MARKET_MAX_AGE = 6 * 3600  # 取引時間外はチャートが変わらないため長めに保持
+    
+    def __init__(self, http_cache: Optional[HTTPResponseCache] = None):
         self.cache = {}
         self.cache_timeout = 300  # 5分間キャッシュ
         self.last_update = None
+        # チャートJSONのディスクキャッシュ（条件付きリクエスト対応）
+        self.http_cache = http_cache or HTTPResponseCache(max_age=self.cache_timeout)
         
         # 指数シンボルマッピング
         self.indices = {
@@ -60,19 +67,37 @@ class MarketIndicesManager:
         time_diff = time.time() - self.last_update
         return time_diff < self.cache_timeout
     
+    def _chart_url(self, symbol: str) -> str:
+        """Yahoo Finance チャートAPIのURL"""
+        return self.CHART_URL.format(symbol=symbol)
+    
+    def _chart_freshness(self, body: bytes) -> Optional[float]:
+        """取引時間外ならチャートを長めにキャッシュ（取引時間中は既定値）"""
+        data = json.loads(body.decode('utf-8'))
+        meta = data['chart']['result'][0]['meta']
+        regular = meta.get('currentTradingPeriod', {}).get('regular', {})
+        start, end = regular.get('start'), regular.get('end')
+        if start is None or end is None:
+            return None
+        
+        now = time.time()
+        if now < start:
+            # 寄り付きまでは変化しない
+            return min(start - now, self.CLOSED_MARKET_MAX_AGE)
+        if now >= end:
+            return self.CLOSED_MARKET_MAX_AGE
+        return None
+    
     def _fetch_from_yahoo_finance(self, symbol: str) -> Optional[IndexInfo]:
         """Yahoo Finance から指数データを取得"""
         try:
             # Yahoo Finance APIを使用（非公式）
-            url = f"https://query1.finance.yahoo.com/v8/finance/chart/{symbol}"
+            url = self._chart_url(symbol)
             headers = {
                 'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
             }
             
-            response = requests.get(url, headers=headers, timeout=10)
-            response.raise_for_status()
-            
-            data = response.json()
+            data = self.http_cache.get_json(url, headers=headers, freshness=self._chart_freshness)
             
             if 'chart' not in data or not data['chart']['result']:
                 return None
@@ -120,6 +145,7 @@ class MarketIndicesManager:
         
         for key, info in self.indices.items():
             print(f"指数取得中: {info['name']}")
+            served_from_disk = self.http_cache.is_fresh(self._chart_url(info['yahoo_symbol']))
             index_info = self._fetch_from_yahoo_finance(info['yahoo_symbol'])
             
             if index_info:
@@ -134,8 +160,9 @@ class MarketIndicesManager:
                     last_updated=datetime.now()
                 )
             
-            # レート制限回避のための待機
-            time.sleep(0.5)
+            # レート制限回避のための待機（ディスクキャッシュ使用時は不要）
+            if not served_from_disk:
+                time.sleep(0.5)
         
         # キャッシュ更新
         self.cache = indices_data
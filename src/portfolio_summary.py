@@ -0,0 +1,211 @@
+"""
+ポートフォリオ集計モジュール
+Incrementally maintained portfolio summary
+
+get_portfolio_summary は更新のたびに holdings 全体を SUM/AVG で集計していた。
+ここでは保有銘柄ストア（holdings_store）の変更イベントを購読し、価格更新・削除の
+差分だけを合計値（全体・証券会社別・口座種別）に反映するため、読み込みはO(1)で済む。
+浮動小数点の誤差や取りこぼしに備え、一定間隔でDBの集計結果と突き合わせる。
+"""
+
+import math
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from holdings_store import (
+    EVENT_CLEARED, EVENT_DELETED, EVENT_INSERTED, EVENT_PRICES_UPDATED, EVENT_RELOADED,
+    HoldingsStore, holding_key,
+)
+from logger import app_logger
+
+
+# DBの集計結果と突き合わせる間隔（秒）
+RECONCILE_INTERVAL = 300
+
+# (broker, account_type, acquisition_amount, market_value, profit_loss, 損益率 or None)
+Contribution = Tuple[str, str, float, float, float, Optional[float]]
+
+
+def _contribution(holding: Dict) -> Contribution:
+    """1行分の集計値（SQLと同じく取得額0の損益率は平均から除外）"""
+    acquisition = holding.get('acquisition_amount') or 0
+    profit_loss = holding.get('profit_loss') or 0
+    rate = profit_loss / acquisition * 100 if acquisition else None
+    return (holding.get('broker') or '', holding.get('account_type') or '',
+            acquisition, holding.get('market_value') or 0, profit_loss, rate)
+
+
+class SummaryTotals:
+    """合計値（行の追加・除外で更新）"""
+
+    __slots__ = ('count', 'acquisition', 'market_value', 'profit_loss', 'rate_sum', 'rate_count')
+
+    def __init__(self):
+        self.count = 0
+        self.acquisition = 0
+        self.market_value = 0
+        self.profit_loss = 0
+        self.rate_sum = 0
+        self.rate_count = 0
+
+    def add(self, contribution: Contribution, sign: int = 1) -> None:
+        _, _, acquisition, market_value, profit_loss, rate = contribution
+        self.count += sign
+        self.acquisition += sign * acquisition
+        self.market_value += sign * market_value
+        self.profit_loss += sign * profit_loss
+        if rate is not None:
+            self.rate_sum += sign * rate
+            self.rate_count += sign
+
+    def to_dict(self) -> Dict:
+        """get_portfolio_summary と同じキーの辞書"""
+        return_rate = 0
+        if self.acquisition > 0:
+            return_rate = ((self.market_value / self.acquisition) - 1) * 100
+        return {
+            'total_stocks': self.count,
+            'total_acquisition': self.acquisition,
+            'total_market_value': self.market_value,
+            'total_profit_loss': self.profit_loss,
+            'avg_return_rate': self.rate_sum / self.rate_count if self.rate_count else 0,
+            'return_rate': return_rate,
+        }
+
+
+def build_summary(totals: SummaryTotals, by_broker: Dict[str, SummaryTotals],
+                  by_account_type: Dict[str, SummaryTotals]) -> Dict:
+    """全体の合計に証券会社別・口座種別の内訳を加えた辞書"""
+    summary = totals.to_dict()
+    summary['by_broker'] = {key: value.to_dict() for key, value in sorted(by_broker.items())
+                            if value.count > 0}
+    summary['by_account_type'] = {key: value.to_dict() for key, value in sorted(by_account_type.items())
+                                  if value.count > 0}
+    return summary
+
+
+def summaries_match(left: Dict, right: Dict) -> bool:
+    """集計結果が誤差の範囲で一致するか"""
+    if left['total_stocks'] != right['total_stocks']:
+        return False
+    for key in ('total_acquisition', 'total_market_value', 'total_profit_loss', 'avg_return_rate'):
+        if not math.isclose(left[key] or 0, right[key] or 0, rel_tol=1e-9, abs_tol=1e-6):
+            return False
+    return True
+
+
+class PortfolioSummaryTracker:
+    """保有銘柄ストアの変更イベントから集計値を差分更新する"""
+
+    def __init__(self, store: HoldingsStore, reconcile_interval: float = RECONCILE_INTERVAL):
+        self.store = store
+        self.reconcile_interval = reconcile_interval
+        self._lock = threading.RLock()
+        self._ready = False
+        self._contributions: Dict[tuple, Contribution] = {}
+        self._totals = SummaryTotals()
+        self._by_broker: Dict[str, SummaryTotals] = {}
+        self._by_account_type: Dict[str, SummaryTotals] = {}
+        self._last_reconciled = 0.0
+
+        # 購読してから現在の内容を取り込む（間の変更を取りこぼさない）
+        store.subscribe(self._on_event)
+        holdings = store.all()
+        if holdings is not None:
+            self._rebuild(holdings)
+
+    @property
+    def is_ready(self) -> bool:
+        # ストアが無効化された（DBファイルの作り直し等）場合は読み直しを待つ
+        return self._ready and self.store.is_loaded
+
+    def reconcile_due(self) -> bool:
+        return time.monotonic() - self._last_reconciled >= self.reconcile_interval
+
+    def summary(self) -> Optional[Dict]:
+        """現在の集計値（未構築ならNone）"""
+        with self._lock:
+            if not self.is_ready:
+                return None
+            return build_summary(self._totals, self._by_broker, self._by_account_type)
+
+    def reconcile(self, expected: Dict) -> bool:
+        """DBで集計し直した結果と突き合わせ、ずれていればストアを読み直させる"""
+        with self._lock:
+            self._last_reconciled = time.monotonic()
+            if not self.is_ready:
+                return False
+            current = build_summary(self._totals, self._by_broker, self._by_account_type)
+        if summaries_match(current, expected):
+            return True
+        app_logger.warning(f"ポートフォリオ集計のずれを検出したため再集計します: "
+                           f"{current['total_market_value']} != {expected['total_market_value']}")
+        with self._lock:
+            self._ready = False
+        self.store.invalidate()
+        return False
+
+    def _on_event(self, event: str, holdings: List[Dict]) -> None:
+        with self._lock:
+            if event == EVENT_RELOADED:
+                self._rebuild(holdings)
+            elif event == EVENT_INSERTED:
+                # ストアは無効化済み。次回の読み込み（reloaded）で作り直す
+                self._ready = False
+            elif event == EVENT_CLEARED:
+                self._rebuild([])
+            elif not self._ready:
+                return
+            elif event == EVENT_PRICES_UPDATED:
+                for holding in holdings:
+                    key = holding_key(holding)
+                    if key in self._contributions:
+                        self._remove(key)
+                    self._add(key, _contribution(holding))
+            elif event == EVENT_DELETED:
+                for holding in holdings:
+                    key = holding_key(holding)
+                    if key in self._contributions:
+                        self._remove(key)
+
+    def _rebuild(self, holdings: List[Dict]) -> None:
+        """全行から集計し直す（DBから読み込んだ直後なので突き合わせ済みとみなす）"""
+        with self._lock:
+            self._contributions = {}
+            self._totals = SummaryTotals()
+            self._by_broker = {}
+            self._by_account_type = {}
+            for holding in holdings:
+                self._add(holding_key(holding), _contribution(holding))
+            self._ready = True
+            self._last_reconciled = time.monotonic()
+
+    def _add(self, key: tuple, contribution: Contribution) -> None:
+        self._contributions[key] = contribution
+        self._totals.add(contribution)
+        self._by_broker.setdefault(contribution[0], SummaryTotals()).add(contribution)
+        self._by_account_type.setdefault(contribution[1], SummaryTotals()).add(contribution)
+
+    def _remove(self, key: tuple) -> None:
+        contribution = self._contributions.pop(key)
+        self._totals.add(contribution, -1)
+        self._by_broker[contribution[0]].add(contribution, -1)
+        self._by_account_type[contribution[1]].add(contribution, -1)
+
+
+_trackers: Dict[str, PortfolioSummaryTracker] = {}
+_trackers_lock = threading.Lock()
+
+
+def get_portfolio_tracker(db_path: str, store: HoldingsStore) -> PortfolioSummaryTracker:
+    """データベースファイルごとに共有される集計トラッカーを取得"""
+    key = db_path if db_path == ':memory:' else os.path.realpath(db_path)
+    tracker = _trackers.get(key)
+    if tracker is None:
+        with _trackers_lock:
+            tracker = _trackers.get(key)
+            if tracker is None:
+                tracker = _trackers[key] = PortfolioSummaryTracker(store)
+    return tracker
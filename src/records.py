@@ -0,0 +1,54 @@
+"""
+読み込み用レコード型モジュール
+Typed lightweight records for DatabaseManager reads
+
+一覧表示や監視ループは各行の一部のカラムしか使わないため、
+sqlite3.Row → dict の変換を行わず、必要なカラムだけを NamedTuple
+（インスタンス辞書を持たないタプル）で返す。
+"""
+
+from typing import NamedTuple, Optional
+
+
+class HoldingRecord(NamedTuple):
+    """保有銘柄"""
+    symbol: str
+    name: str
+    quantity: int
+    average_cost: float
+    current_price: float
+    acquisition_amount: float
+    market_value: float
+    profit_loss: float
+    broker: str
+    account_type: str
+
+
+class WatchlistRecord(NamedTuple):
+    """監視銘柄"""
+    symbol: str
+    name: str
+    strategy_name: str
+    target_buy_price: Optional[float]
+    target_sell_price: Optional[float]
+    created_at: Optional[str]
+
+
+class WishlistRecord(NamedTuple):
+    """欲しい銘柄"""
+    symbol: str
+    name: str
+    target_price: Optional[float]
+    memo: str
+    created_at: Optional[str]
+
+
+class AlertRecord(NamedTuple):
+    """アラート履歴"""
+    id: int
+    symbol: str
+    alert_type: str
+    message: str
+    triggered_price: Optional[float]
+    strategy_name: Optional[str]
+    created_at: str
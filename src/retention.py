@@ -0,0 +1,125 @@
+"""
+データ保持ポリシーモジュール
+Retention, downsampling and compaction for price history and alerts
+
+デーモンを長期間動かしても price_history と alerts が増え続けないよう、
+古い日足を週足・月足に集約し、期限切れの日中足を削除し、古いアラートを
+別ファイルへアーカイブし、空きページを増分VACUUMで少しずつ解放する。
+設定は config/settings.json の database.retention で変更できる。
+"""
+
+import json
+import threading
+from dataclasses import dataclass, fields
+from datetime import date, datetime, timedelta, timezone
+from typing import Callable, Dict, Optional
+
+from logger import app_logger
+
+
+@dataclass
+class RetentionPolicy:
+    """保持期間の設定（日数）"""
+    daily_keep_days: int = 400           # 日足のまま残す期間
+    weekly_keep_days: int = 365 * 3      # 週足で残す期間（これより古いものは月足）
+    intraday_keep_days: int = 30         # 日中足を残す期間
+    alert_keep_days: int = 180           # アラートを本体DBに残す期間
+    alert_archive_path: str = "data/alerts_archive.db"
+    vacuum_pages_per_step: int = 1000    # 増分VACUUMで1回に解放するページ数
+
+    @classmethod
+    def from_config(cls, config_path: str = "config/settings.json") -> 'RetentionPolicy':
+        """設定ファイルの database.retention から読み込む（なければ既定値）"""
+        try:
+            with open(config_path, 'r', encoding='utf-8') as f:
+                config = json.load(f).get('database', {}).get('retention', {})
+        except FileNotFoundError:
+            return cls()
+        except (OSError, ValueError) as e:
+            app_logger.warning(f"保持ポリシー設定読み込みエラー: {e}")
+            return cls()
+
+        known = {field.name for field in fields(cls)}
+        return cls(**{key: value for key, value in config.items() if key in known})
+
+
+class RetentionManager:
+    """保持ポリシーに従ってデータを集約・アーカイブ・圧縮する保守ジョブ"""
+
+    LAST_RUN_KEY = 'retention_last_run'
+
+    def __init__(self, db, policy: Optional[RetentionPolicy] = None):
+        self.db = db
+        self.policy = policy or RetentionPolicy.from_config()
+        self._thread: Optional[threading.Thread] = None
+
+    def is_due(self) -> bool:
+        """本日まだ実行していなければTrue"""
+        return self.db.get_sync_state(self.LAST_RUN_KEY) != date.today().isoformat()
+
+    def run(self, today: Optional[date] = None, max_vacuum_steps: Optional[int] = None) -> Dict[str, int]:
+        """保守処理を実行して件数を返す"""
+        today = today or date.today()
+        policy = self.policy
+
+        daily_before = today - timedelta(days=policy.daily_keep_days)
+        weekly_before = min(daily_before, today - timedelta(days=policy.weekly_keep_days))
+        counts = self.db.downsample_price_history(daily_before.isoformat(), weekly_before.isoformat())
+
+        intraday_before = today - timedelta(days=policy.intraday_keep_days)
+        intraday_deleted = self.db.delete_intraday_bars(intraday_before.isoformat())
+
+        # alerts.created_at はUTC表記
+        alert_before = (datetime.now(timezone.utc) - timedelta(days=policy.alert_keep_days))
+        archived = self.db.archive_alerts(alert_before.strftime('%Y-%m-%d %H:%M:%S'),
+                                          policy.alert_archive_path)
+
+        # 他の処理を長時間止めないよう少しずつ解放する
+        freed_pages = 0
+        steps = 0
+        while max_vacuum_steps is None or steps < max_vacuum_steps:
+            result = self.db.compact(policy.vacuum_pages_per_step)
+            freed_pages += result['freed_pages']
+            steps += 1
+            if result['free_pages'] == 0 or result['freed_pages'] == 0:
+                break
+
+        self.db.set_sync_state(self.LAST_RUN_KEY, date.today().isoformat())
+        summary = {
+            'weekly_rows': counts['weekly'],
+            'monthly_rows': counts['monthly'],
+            'intraday_bars_deleted': intraday_deleted,
+            'archived_alerts': archived,
+            'freed_pages': freed_pages,
+        }
+        app_logger.info(f"データ保守完了: {summary}")
+        return summary
+
+    def run_if_due(self) -> Optional[Dict[str, int]]:
+        """1日1回だけ保守処理を実行"""
+        if not self.is_due():
+            return None
+        return self.run()
+
+    def run_in_background(self, callback: Optional[Callable[[Optional[Dict], Optional[Exception]], None]] = None) -> bool:
+        """保守処理をバックグラウンドスレッドで実行（実行中ならFalse）
+
+        callback(summary, error) は保守処理のスレッドから呼ばれる。
+        """
+        if self._thread and self._thread.is_alive():
+            return False
+
+        def worker():
+            try:
+                summary = self.run()
+            except Exception as e:
+                app_logger.error(f"データ保守エラー: {e}")
+                if callback:
+                    callback(None, e)
+                return
+            if callback:
+                callback(summary, None)
+
+        self._thread = threading.Thread(target=worker, daemon=True, name="DatabaseRetention")
+        self._thread.start()
+        return True
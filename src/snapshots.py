@@ -0,0 +1,87 @@
+"""
+日次スナップショットモジュール
+End-of-day portfolio valuation snapshots
+
+holdings は価格更新のたびに上書きされるため、過去の評価額が残らない。
+取引日の大引け後に1日1回、銘柄ごと・ポートフォリオ全体のその日の終値での評価額と損益を
+holding_snapshots / portfolio_snapshots テーブルへ記録し、損益推移のグラフや
+日次レポートは履歴を再計算せずにこの記録を読む。
+"""
+
+from datetime import date, datetime, time as dt_time
+from typing import Dict, List, Optional
+
+from logger import app_logger
+from market_calendar import is_trading_day
+
+
+# 大引け（15:00）後、最後の価格更新が反映されるまで待ってから記録する
+SNAPSHOT_AFTER = dt_time(15, 10)
+
+
+class DailySnapshotJob:
+    """大引け後のポートフォリオ評価額スナップショット"""
+
+    LAST_RUN_KEY = 'portfolio_snapshot_last_date'
+
+    def __init__(self, db, snapshot_after: dt_time = SNAPSHOT_AFTER):
+        self.db = db
+        self.snapshot_after = snapshot_after
+
+    def is_due(self, now: Optional[datetime] = None) -> bool:
+        """取引日の大引け後で、本日分をまだ記録していなければTrue（土日・祝日・年末年始は記録しない）"""
+        now = now or datetime.now()
+        if not is_trading_day(now) or now.time() < self.snapshot_after:
+            return False
+        return self.db.get_sync_state(self.LAST_RUN_KEY) != now.date().isoformat()
+
+    def run(self, snapshot_date: Optional[date] = None) -> Optional[Dict]:
+        """スナップショットを記録し、前回からの変化を含む当日の値を返す"""
+        snapshot_date = snapshot_date or date.today()
+        if not self.db.save_portfolio_snapshot(snapshot_date):
+            return None
+
+        self.db.set_sync_state(self.LAST_RUN_KEY, snapshot_date.isoformat())
+        snapshot = self.get_daily_change(snapshot_date)
+        app_logger.info(f"ポートフォリオスナップショット記録: {snapshot_date} "
+                        f"評価額 ¥{snapshot['total_market_value']:,.0f}")
+        return snapshot
+
+    def run_if_due(self, now: Optional[datetime] = None) -> Optional[Dict]:
+        """大引け後に1日1回だけ記録"""
+        now = now or datetime.now()
+        if not self.is_due(now):
+            return None
+        return self.run(now.date())
+
+    def get_daily_change(self, snapshot_date: Optional[date] = None) -> Optional[Dict]:
+        """指定日（省略時は最新）のスナップショットと前回比
+
+        Returns:
+            portfolio_snapshots の行に previous_market_value・day_change・
+            day_change_rate を加えた辞書（記録がなければNone）
+        """
+        snapshots = self.db.get_portfolio_snapshots(end=snapshot_date)
+        if not snapshots:
+            return None
+
+        snapshot = dict(snapshots[-1])
+        previous = snapshots[-2] if len(snapshots) > 1 else None
+        previous_value = previous['total_market_value'] if previous else None
+        snapshot['previous_market_value'] = previous_value
+        snapshot['day_change'] = snapshot['total_market_value'] - previous_value if previous else 0
+        snapshot['day_change_rate'] = (snapshot['day_change'] / previous_value * 100
+                                       if previous_value else 0)
+        return snapshot
+
+    def get_profit_curve(self, start: Optional[date] = None,
+                         end: Optional[date] = None) -> Dict[str, List]:
+        """損益推移グラフ用の系列（日付・評価額・取得額・損益・収益率）"""
+        snapshots = self.db.get_portfolio_snapshots(start, end)
+        return {
+            'dates': [row['snapshot_date'] for row in snapshots],
+            'market_value': [row['total_market_value'] for row in snapshots],
+            'acquisition': [row['total_acquisition'] for row in snapshots],
+            'profit_loss': [row['total_profit_loss'] for row in snapshots],
+            'return_rate': [row['return_rate'] for row in snapshots],
+        }
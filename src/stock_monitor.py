@@ -5,8 +5,14 @@ from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Callable
 from dataclasses import dataclass
 
-from data_sources import YahooFinanceDataSource, MultiDataSource, StockInfo
+from data_sources import YahooFinanceDataSource, MultiDataSource, StockInfo, get_shared_data_source
 from database import DatabaseManager
+from fundamentals import FundamentalsUpdater
+from issuers import IssuerDirectory
+from write_behind import WriteBehindQueue
+from retention import RetentionManager
+from snapshots import DailySnapshotJob
+from intraday import IntradayTickStore
 from logger import app_logger
 
 
@@ -36,9 +42,17 @@ class StockMonitor:
     """株価監視クラス"""
     
     def __init__(self, config_path: str = "config/strategies.json", jquants_email: str = None, jquants_password: str = None, refresh_token: str = None):
-        # マルチデータソースを使用（J Quants API優先、Yahoo Financeフォールバック）
-        self.data_source = MultiDataSource(jquants_email, jquants_password, refresh_token)
         self.db = DatabaseManager()
+        # アラート・株価履歴はバックグラウンドでまとめて書き込む
+        self.writer = WriteBehindQueue(self.db)
+        self.retention = RetentionManager(self.db)
+        self.snapshots = DailySnapshotJob(self.db)
+        # 日中ティックはメモリに保持し、確定した足だけを定期的に保存
+        self.intraday = IntradayTickStore(self.db)
+        # マルチデータソースを使用（J Quants API優先、Yahoo Financeフォールバック）
+        # プロセス共通インスタンスを使い、認証はプロセスで1回のみ
+        self.data_source = get_shared_data_source(jquants_email, jquants_password, refresh_token,
+                                                  fundamentals_db=self.db)
         self.strategies = self.load_strategies(config_path)
         
         # 遅延初期化でAlertManagerを設定
@@ -54,6 +68,9 @@ class StockMonitor:
         
         # 最後のアラート時刻を記録（重複防止）
         self.last_alerts = {}
+        
+        # 通信を伴う定期更新のスレッド（監視ループを止めないよう別スレッドで実行）
+        self._background_jobs: Dict[str, threading.Thread] = {}
     
     def _initialize_alert_manager(self):
         """AlertManagerを遅延初期化"""
@@ -131,6 +148,7 @@ class StockMonitor:
         self.monitoring = True
         self.monitor_thread = threading.Thread(target=self._monitor_loop, daemon=True)
         self.monitor_thread.start()
+        self.intraday.start()
         app_logger.info("株価監視を開始しました")
         print("株価監視を開始しました")
     
@@ -139,9 +157,69 @@ class StockMonitor:
         self.monitoring = False
         if self.monitor_thread:
             self.monitor_thread.join(timeout=5)
+        self.intraday.stop()
+        self.writer.flush(timeout=10)
         app_logger.info("株価監視を停止しました")
         print("株価監視を停止しました")
     
+    def _start_background_job(self, name: str, func: Callable) -> bool:
+        """定期処理をバックグラウンドスレッドで開始（同じ処理が実行中ならFalse）"""
+        thread = self._background_jobs.get(name)
+        if thread and thread.is_alive():
+            return False
+        thread = threading.Thread(target=func, daemon=True, name=name)
+        self._background_jobs[name] = thread
+        thread.start()
+        return True
+    
+    def refresh_fundamentals(self, force: bool = False) -> int:
+        """財務データの差分更新（1日1回、J Quants認証時のみ。初回の遡り取得は数回に分ける）"""
+        jquants_source = self.data_source.get_jquants_source()
+        if not jquants_source:
+            return 0
+        
+        updater = FundamentalsUpdater(jquants_source, self.db)
+        try:
+            return updater.refresh() if force else updater.refresh_if_due()
+        except Exception as e:
+            app_logger.error(f"財務データ差分更新エラー: {e}")
+            return 0
+    
+    def refresh_issuers(self, force: bool = False) -> int:
+        """上場銘柄一覧（銘柄検索用）の更新（週1回、J Quants認証時のみ）"""
+        jquants_source = self.data_source.get_jquants_source()
+        if not jquants_source:
+            return 0
+        
+        directory = IssuerDirectory(jquants_source, self.db)
+        try:
+            return directory.refresh() if force else directory.refresh_if_due()
+        except Exception as e:
+            app_logger.error(f"上場銘柄一覧更新エラー: {e}")
+            return 0
+    
+    def run_maintenance(self, force: bool = False) -> bool:
+        """古いデータの集約・アーカイブ・圧縮（1日1回）
+        
+        初回の VACUUM などで時間がかかるため、監視ループを止めないよう
+        バックグラウンドスレッドで実行する（開始したらTrue）。
+        """
+        try:
+            if not force and not self.retention.is_due():
+                return False
+            return self.retention.run_in_background()
+        except Exception as e:
+            app_logger.error(f"データ保守エラー: {e}")
+            return False
+    
+    def record_daily_snapshot(self) -> Optional[Dict]:
+        """大引け後のポートフォリオ評価額スナップショット（1日1回）"""
+        try:
+            return self.snapshots.run_if_due()
+        except Exception as e:
+            app_logger.error(f"ポートフォリオスナップショットエラー: {e}")
+            return None
+    
     def _monitor_loop(self):
         """監視メインループ"""
         while self.monitoring:
@@ -149,6 +227,19 @@ class StockMonitor:
                 app_logger.info("株価チェック開始")
                 print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] 株価チェック開始")
                 
+                # 財務データの日次差分更新（市場時間外でも実行、通信待ちで株価チェックを
+                # 止めないようバックグラウンドで）
+                self._start_background_job("FundamentalsRefresh", self.refresh_fundamentals)
+                
+                # 銘柄検索用の上場銘柄一覧を週次更新
+                self._start_background_job("IssuerRefresh", self.refresh_issuers)
+                
+                # 古いデータの日次保守
+                self.run_maintenance()
+                
+                # 大引け後の評価額スナップショット
+                self.record_daily_snapshot()
+                
                 # 市場開場時間チェック
                 if not self.data_source.is_market_open():
                     app_logger.info("市場クローズ中 - 次回チェックまで待機")
@@ -156,11 +247,19 @@ class StockMonitor:
                     time.sleep(self.check_interval)
                     continue
                 
-                # 保有銘柄をチェック
-                self._check_holdings()
-                
-                # 監視銘柄をチェック
-                self._check_watchlist()
+                # 保有銘柄・監視銘柄は周期の最初に同じ時点のデータで読み込み（通信の前に
+                # 読み込みトランザクションを閉じる）、株価履歴・アラートの書き込みは
+                # 周期の最後に1回でコミット（コミットは書き込みスレッドで行い、待たない）
+                with self.db.unit_of_work(self.writer) as uow:
+                    with uow.reads():
+                        holdings = self.db.get_all_holdings()
+                        watchlist = self.db.get_watchlist(as_records=True)
+                    
+                    # 保有銘柄をチェック
+                    self._check_holdings(uow, holdings)
+                    
+                    # 監視銘柄をチェック
+                    self._check_watchlist(uow, watchlist)
                 
                 app_logger.info("株価チェック完了 - 次回チェックまで待機")
                 print("株価チェック完了 - 次回チェックまで待機")
@@ -171,9 +270,11 @@ class StockMonitor:
             
             time.sleep(self.check_interval)
     
-    def _check_holdings(self):
-        """保有銘柄の売り条件チェック"""
-        holdings = self.db.get_all_holdings()
+    def _check_holdings(self, uow=None, holdings: Optional[List[Dict]] = None):
+        """保有銘柄の売り条件チェック（uow 省略時は書き込みキュー経由で記録）"""
+        writer = uow or self.writer
+        if holdings is None:
+            holdings = self.db.get_all_holdings()
         
         for holding in holdings:
             symbol = holding['symbol']
@@ -184,7 +285,8 @@ class StockMonitor:
                 continue
             
             # 株価履歴保存
-            self.db.save_price_history(symbol, stock_info)
+            writer.save_price_history(symbol, stock_info)
+            self.intraday.record_stock_info(symbol, stock_info)
             
             # 戦略に基づく売り判定
             for strategy_name, strategy in self.strategies.items():
@@ -192,23 +294,24 @@ class StockMonitor:
                 if sell_alert:
                     self._trigger_alert(sell_alert)
     
-    def _check_watchlist(self):
+    def _check_watchlist(self, uow=None, watchlist: Optional[List] = None):
         """監視銘柄の買い条件チェック（最適化版）"""
-        watchlist = self.db.get_watchlist()
+        if watchlist is None:
+            watchlist = self.db.get_watchlist(as_records=True)
         
         if not watchlist:
             return
         
         # 監視銘柄のシンボルリストを作成
-        symbols = [item['symbol'] for item in watchlist]
+        symbols = [item.symbol for item in watchlist]
         
         # 一括で株価情報を取得（効率化）
         stock_infos = self.data_source.get_multiple_stocks(symbols)
         
         # 各銘柄をチェック
         for item in watchlist:
-            symbol = item['symbol']
-            strategy_name = item['strategy_name']
+            symbol = item.symbol
+            strategy_name = item.strategy_name
             
             if strategy_name not in self.strategies:
                 continue
@@ -218,6 +321,7 @@ class StockMonitor:
             
             strategy = self.strategies[strategy_name]
             stock_info = stock_infos[symbol]
+            self.intraday.record_stock_info(symbol, stock_info)
             
             # 配当情報取得
             dividend_info = self.data_source.get_dividend_info(symbol)
@@ -405,8 +509,9 @@ class StockMonitor:
     
     def _trigger_alert(self, alert: Alert):
         """アラートを発火"""
-        # データベースに記録
-        self.db.log_alert(
+        # 通知より先に記録する（周期の作業単位に積むと、周期が失敗したときに
+        # 通知済みで重複防止されたアラートの記録だけが失われるため書き込みキューへ）
+        self.writer.log_alert(
             alert.symbol, 
             alert.alert_type, 
             alert.message, 
@@ -459,8 +564,8 @@ class StockMonitor:
             'check_interval_minutes': self.check_interval // 60,
             'market_open': self.data_source.is_market_open(),
             'strategies_count': len(self.strategies),
-            'watchlist_count': len(self.db.get_watchlist()),
-            'holdings_count': len(self.db.get_all_holdings())
+            'watchlist_count': self.db.get_watchlist_count(),
+            'holdings_count': self.db.get_holdings_count()
         }
 
 
@@ -0,0 +1,167 @@
+"""
+銘柄シンボル分類モジュール
+Symbol normalization and classification registry
+
+データソースやGUIに散在していた銘柄コードの判定（日本株/米国株/投資信託/
+疑似シンボル）と形式変換（Yahoo Finance形式、J Quants 5桁形式）を一箇所にまとめる。
+分類結果はシンボルごとに一度だけ計算してメモ化するため、ループ内で
+文字列判定を繰り返さない（メモは MAX_CACHED_SYMBOLS 件までで古いものから捨てる）。
+"""
+
+import re
+import sys
+import threading
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+
+# 分類
+KIND_TSE = 'tse'          # 東証上場銘柄（4桁コード、英字入り新コード、優先株）
+KIND_US = 'us'            # 米国株などアルファベットのティッカー
+KIND_FUND = 'fund'        # 投資信託（CSV取込時の疑似シンボル FUND_xxx）
+KIND_PSEUDO = 'pseudo'    # ポートフォリオ集計行などの疑似シンボル
+KIND_INDEX = 'index'      # ^N225 などの指数
+KIND_OTHER = 'other'      # 上記以外（従来通り日本株として扱う）
+
+PSEUDO_PREFIXES = ('PORTFOLIO_',)
+FUND_PREFIXES = ('FUND_',)
+PSEUDO_SYMBOLS = frozenset({'STOCK_PORTFOLIO', 'TOTAL_PORTFOLIO'})
+MAX_SYMBOL_LENGTH = 10  # 通常の銘柄コードは10文字以下
+MAX_CACHED_SYMBOLS = 4096  # メモ化する分類結果の上限
+
+# 東証コード: 4桁数字、または 130A のような英字入り新コード
+_TSE_CODE = re.compile(r'^\d[0-9A-Z]\d[0-9A-Z]$')
+# 4桁+英字1文字（優先株など）
+_TSE_SUFFIXED_CODE = re.compile(r'^\d{4}[A-Z]$')
+# J Quantsの5桁コード（4桁コード + チェック桁0）
+_JQUANTS_CODE = re.compile(r'^\d[0-9A-Z]\d[0-9A-Z]0$')
+_US_TICKER = re.compile(r'^[A-Z]{1,5}$')
+# 上記以外の数字コード（数字のみ、または末尾に英字1文字）は従来通り東証で照会
+_NUMERIC_CODE = re.compile(r'^(\d+|\d{1,5}[A-Z])$')
+
+
+@dataclass(frozen=True)
+class SymbolInfo:
+    """銘柄シンボルの分類結果"""
+    symbol: str                 # 入力シンボル（前後空白除去済み）
+    kind: str
+    code: str                   # 正規化したコード（日本株は4桁/新コード、.Tなし）
+    yahoo_symbol: Optional[str]     # Yahoo Finance形式（取得不可ならNone）
+    jquants_code: Optional[str]     # J Quants形式（日本株以外はNone）
+
+    @property
+    def is_japanese(self) -> bool:
+        return self.kind in (KIND_TSE, KIND_OTHER)
+
+    @property
+    def is_pseudo(self) -> bool:
+        """株価を取得できない疑似シンボル（投資信託を含む）"""
+        return self.kind in (KIND_PSEUDO, KIND_FUND)
+
+    @property
+    def is_quotable(self) -> bool:
+        """株価APIで取得可能か"""
+        return self.yahoo_symbol is not None
+
+
+def _classify(symbol: str) -> SymbolInfo:
+    """シンボルを分類（メモ化前の素の判定）"""
+    if not symbol:
+        return SymbolInfo(symbol, KIND_PSEUDO, symbol, None, None)
+
+    if symbol.startswith(FUND_PREFIXES):
+        return SymbolInfo(symbol, KIND_FUND, symbol, None, None)
+    if (symbol.startswith(PSEUDO_PREFIXES) or
+            symbol in PSEUDO_SYMBOLS or
+            len(symbol) > MAX_SYMBOL_LENGTH):
+        return SymbolInfo(symbol, KIND_PSEUDO, symbol, None, None)
+
+    if symbol.startswith('^'):
+        return SymbolInfo(symbol, KIND_INDEX, symbol, symbol, None)
+
+    code = symbol.upper()
+    if code.endswith('.T'):
+        code = code[:-2]
+
+    if _TSE_CODE.match(code) or _TSE_SUFFIXED_CODE.match(code):
+        jquants_code = code + '0' if len(code) == 4 else code
+        return SymbolInfo(symbol, KIND_TSE, code, f"{code}.T", jquants_code)
+    if _JQUANTS_CODE.match(code) and code[:4].isdigit():
+        # J Quants形式で渡された場合は4桁に戻す
+        return SymbolInfo(symbol, KIND_TSE, code[:4], f"{code[:4]}.T", code)
+
+    if _NUMERIC_CODE.match(code):
+        # 12345 など: 分類はできないが Yahoo Finance には .T を付けて照会する
+        return SymbolInfo(symbol, KIND_OTHER, code, f"{code}.T", symbol)
+
+    if _US_TICKER.match(code) and not symbol.upper().endswith('.T'):
+        return SymbolInfo(symbol, KIND_US, code, code, None)
+
+    # 判定できないコードは従来通り日本株扱い（形式変換はしない）
+    return SymbolInfo(symbol, KIND_OTHER, symbol, symbol, symbol)
+
+
+class SymbolRegistry:
+    """シンボル分類のメモ化レジストリ
+
+    分類結果はシンボル文字列ごとにキャッシュし、同じシンボルには同一の
+    SymbolInfo インスタンスを返す。キャッシュが max_size 件に達したら
+    古く登録したものから捨てる。
+    """
+
+    def __init__(self, max_size: int = MAX_CACHED_SYMBOLS):
+        self._symbols: Dict[str, SymbolInfo] = {}
+        self._lock = threading.Lock()
+        self._max_size = max_size
+
+    def get(self, symbol) -> SymbolInfo:
+        """シンボルの分類結果を取得"""
+        info = self._symbols.get(symbol)
+        if info is not None:
+            return info
+
+        key = symbol
+        symbol = '' if symbol is None else str(symbol).strip()
+        info = self._symbols.get(symbol)
+        if info is None:
+            info = _classify(sys.intern(symbol))
+            with self._lock:
+                info = self._remember(symbol, info)
+        if isinstance(key, str) and key != symbol:
+            with self._lock:
+                self._remember(key, info)
+        return info
+
+    def _remember(self, symbol: str, info: SymbolInfo) -> SymbolInfo:
+        """分類結果を登録（ロック内で呼ぶ。上限に達していれば最も古いものを捨てる）"""
+        cached = self._symbols.get(symbol)
+        if cached is not None:
+            return cached
+        while len(self._symbols) >= self._max_size:
+            self._symbols.pop(next(iter(self._symbols)))
+        self._symbols[symbol] = info
+        return info
+
+    def is_japanese(self, symbol) -> bool:
+        return self.get(symbol).is_japanese
+
+    def is_pseudo(self, symbol) -> bool:
+        return self.get(symbol).is_pseudo
+
+    def to_yahoo(self, symbol) -> Optional[str]:
+        return self.get(symbol).yahoo_symbol
+
+    def to_jquants(self, symbol) -> Optional[str]:
+        return self.get(symbol).jquants_code
+
+    def clear(self) -> None:
+        """キャッシュを破棄"""
+        with self._lock:
+            self._symbols.clear()
+
+    def __len__(self) -> int:
+        return len(self._symbols)
+
+
+# アプリケーション全体で共有するレジストリ
+symbol_registry = SymbolRegistry()
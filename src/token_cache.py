@@ -0,0 +1,173 @@
+"""
+J Quants APIトークンキャッシュモジュール
+J Quants token cache with on-disk refresh management
+
+IDトークン/リフレッシュトークンを有効期限付きでディスクに保存し、
+プロセス起動のたびに発生していた認証往復を省略する。
+IDトークンは期限切れ前にバックグラウンドスレッドで更新する。
+パスワードは保存しない。
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+import pandas as pd
+
+from logger import app_logger
+
+
+DEFAULT_TOKEN_CACHE_PATH = "data/jquants_tokens.json"
+
+
+def credential_fingerprint(email: Optional[str], refresh_token: Optional[str]) -> str:
+    """認証情報の指紋（認証情報が変わったらキャッシュを使わない）"""
+    source = f"{email or ''}\n{refresh_token or ''}"
+    return hashlib.sha256(source.encode('utf-8')).hexdigest()
+
+
+def _to_epoch(timestamp) -> float:
+    """pandas.Timestampをエポック秒に変換"""
+    return pd.Timestamp(timestamp).timestamp()
+
+
+def _from_epoch(seconds: float) -> pd.Timestamp:
+    """エポック秒をjquantsapiクライアントと同じUTCのTimestampに変換"""
+    return pd.Timestamp(seconds, unit='s', tz='UTC')
+
+
+class JQuantsTokenCache:
+    """トークンのディスクキャッシュ（所有者のみ読み書き可能なファイル）"""
+
+    def __init__(self, fingerprint: str, cache_path: str = DEFAULT_TOKEN_CACHE_PATH):
+        self.fingerprint = fingerprint
+        self.cache_path = cache_path
+        self._lock = threading.Lock()
+
+    def load(self) -> Optional[Dict]:
+        """有効なキャッシュを読み込む（指紋不一致・期限切れはNone）"""
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                tokens = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            app_logger.warning(f"J Quantsトークンキャッシュ読み込みエラー: {e}")
+            return None
+
+        if tokens.get('fingerprint') != self.fingerprint:
+            return None
+        if tokens.get('refresh_token_expire', 0) <= time.time():
+            return None
+        return tokens
+
+    def save(self, tokens: Dict) -> None:
+        """トークンを保存（一時ファイル経由で置き換え、権限は0600）"""
+        tokens = dict(tokens, fingerprint=self.fingerprint)
+        directory = os.path.dirname(self.cache_path)
+        temp_path = f"{self.cache_path}.tmp"
+
+        with self._lock:
+            try:
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    json.dump(tokens, f)
+                os.replace(temp_path, self.cache_path)
+            except OSError as e:
+                app_logger.warning(f"J Quantsトークンキャッシュ保存エラー: {e}")
+
+    def clear(self) -> None:
+        """キャッシュを削除"""
+        with self._lock:
+            try:
+                os.remove(self.cache_path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                app_logger.warning(f"J Quantsトークンキャッシュ削除エラー: {e}")
+
+
+class JQuantsTokenManager:
+    """jquantsapiクライアントのトークンをキャッシュと同期し、期限前に更新する"""
+
+    REFRESH_MARGIN_SECONDS = 30 * 60  # 期限30分前に更新
+    RETRY_INTERVAL_SECONDS = 5 * 60
+
+    def __init__(self, client, cache: JQuantsTokenCache):
+        self.client = client
+        self.cache = cache
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def restore(self) -> bool:
+        """キャッシュ済みトークンをクライアントに設定（認証往復なしで利用可能に）"""
+        tokens = self.cache.load()
+        if not tokens:
+            return False
+
+        self.client._refresh_token = tokens['refresh_token']
+        self.client._refresh_token_expire = _from_epoch(tokens['refresh_token_expire'])
+        if tokens.get('id_token') and tokens.get('id_token_expire', 0) > time.time():
+            self.client._id_token = tokens['id_token']
+            self.client._id_token_expire = _from_epoch(tokens['id_token_expire'])
+        app_logger.info("J Quantsトークンをキャッシュから復元")
+        return True
+
+    def persist(self) -> None:
+        """クライアントの現在のトークンを保存"""
+        refresh_token = getattr(self.client, '_refresh_token', '')
+        if not refresh_token:
+            return
+        self.cache.save({
+            'refresh_token': refresh_token,
+            'refresh_token_expire': _to_epoch(self.client._refresh_token_expire),
+            'id_token': getattr(self.client, '_id_token', ''),
+            'id_token_expire': _to_epoch(self.client._id_token_expire),
+        })
+
+    def seconds_until_refresh(self) -> float:
+        """次回更新までの秒数（IDトークン未取得なら0）"""
+        if not getattr(self.client, '_id_token', ''):
+            return 0
+        expire = _to_epoch(self.client._id_token_expire)
+        return max(0.0, expire - self.REFRESH_MARGIN_SECONDS - time.time())
+
+    def refresh(self) -> bool:
+        """IDトークンを強制更新して保存"""
+        try:
+            # 期限切れ扱いにしてクライアントに再取得させる
+            self.client._id_token_expire = pd.Timestamp.now(tz='UTC')
+            self.client.get_id_token()
+            self.persist()
+            app_logger.info("J Quants IDトークン更新完了")
+            return True
+        except Exception as e:
+            app_logger.warning(f"J Quants IDトークン更新失敗: {e}")
+            return False
+
+    def start_background_refresh(self) -> None:
+        """期限前更新のバックグラウンドスレッドを開始"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._refresh_loop, daemon=True,
+                                        name="JQuantsTokenRefresh")
+        self._thread.start()
+
+    def stop(self) -> None:
+        """バックグラウンド更新を停止"""
+        self._stop_event.set()
+
+    def _refresh_loop(self):
+        """IDトークンの期限を監視して更新"""
+        while not self._stop_event.is_set():
+            wait_seconds = self.seconds_until_refresh()
+            if wait_seconds > 0 and self._stop_event.wait(wait_seconds):
+                break
+            if not self.refresh():
+                self._stop_event.wait(self.RETRY_INTERVAL_SECONDS)
@@ -0,0 +1,113 @@
+"""
+作業単位モジュール
+Single-transaction unit of work for one monitor cycle
+
+監視ループの1周期は保有銘柄・監視銘柄の読み込みと、銘柄ごとの株価履歴保存・
+アラート記録からなる。UnitOfWork は周期の最初の読み込みを reads() の
+1つの読み込みトランザクション（同じ時点のデータ）で行い、株価履歴・アラートの
+書き込みはメモリに積んでおいて周期の最後に1トランザクションでまとめてコミットする。
+書き込みキュー（WriteBehindQueue）を渡した場合、このコミットは書き込みスレッドで行う。
+
+周期の途中には株価取得の通信待ちがあるため、読み込みトランザクションは通信の
+前に閉じ、書き込みロックはコミットの間だけ取得する。通信中に行われる他の
+書き込み（財務データの保存など）は通常どおりその場でコミットされる。例外で
+周期が中断した場合も、それまでに積んだ書き込み（取得済みの株価など）はコミットする。
+"""
+
+import sqlite3
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Callable, Iterator, List, Optional
+
+from logger import app_logger
+
+
+class UnitOfWork:
+    """周期の最初の読み込みスナップショットと、最後にまとめてコミットする書き込み"""
+
+    def __init__(self, db, writer=None):
+        self.db = db
+        # WriteBehindQueue を渡すと、ブロックを抜けたときのコミットを書き込みスレッドで行う
+        self.writer = writer
+        self.alerts: List[tuple] = []
+        self.price_history: List[tuple] = []
+        self._deferred: List[tuple] = []
+        self._snapshot = None
+        self.committed = False
+
+    def __enter__(self) -> 'UnitOfWork':
+        return self
+
+    @contextmanager
+    def reads(self) -> Iterator['UnitOfWork']:
+        """ブロック内の読み込みを同じ時点のデータで行う（通信を伴う処理はブロックの外で）"""
+        with self.db.snapshot() as snapshot:
+            self._snapshot = snapshot
+            try:
+                yield self
+            finally:
+                self._snapshot = None
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        if exc_type is not None and self.pending_count():
+            app_logger.warning(f"作業単位が中断しましたが、積んだ{self.pending_count()}件の書き込みはコミットします: {exc}")
+        if self.writer is not None:
+            self.writer.submit(self)
+        elif not self.commit() and exc_type is None:
+            # 積んだ書き込みは残っているため、呼び出し側で commit() をやり直せる
+            raise sqlite3.Error(f"作業単位のコミットに失敗しました（{self.pending_count()}件）")
+        return False
+
+    def log_alert(self, symbol: str, alert_type: str, message: str,
+                  triggered_price: Optional[float] = None,
+                  strategy_name: Optional[str] = None) -> None:
+        """アラート記録を積む（作成時刻は積んだ時点）"""
+        # alerts.created_at の既定値（CURRENT_TIMESTAMP）と同じUTC表記
+        created_at = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+        self.alerts.append((symbol, alert_type, message, triggered_price, strategy_name, created_at))
+
+    def save_price_history(self, symbol: str, stock_info) -> None:
+        """株価履歴の保存を積む"""
+        self.price_history.append((symbol, datetime.now().date(), stock_info.current_price, stock_info.volume))
+
+    def defer(self, func: Callable, *args, **kwargs) -> None:
+        """その他の書き込みメソッド（db.set_sync_state など）をコミット時に実行する
+
+        func がFalseを返すか例外を送出した場合は、作業単位全体をロールバックする。
+        """
+        self._deferred.append((func, args, kwargs))
+
+    def pending_count(self) -> int:
+        return len(self.alerts) + len(self.price_history) + len(self._deferred)
+
+    def discard(self) -> None:
+        self.alerts = []
+        self.price_history = []
+        self._deferred = []
+
+    def commit(self) -> bool:
+        """積んだ書き込みを1トランザクションでコミット（失敗時はすべてロールバック）"""
+        if self._snapshot is not None:
+            raise RuntimeError("読み込みスナップショットの終了後にコミットしてください")
+        if not self.pending_count():
+            self.committed = True
+            return True
+
+        try:
+            with self.db.batch():
+                if (self.alerts or self.price_history) and not self.db.write_batch(self.alerts, self.price_history):
+                    raise sqlite3.Error("アラート・株価履歴の書き込みに失敗しました")
+                for func, args, kwargs in self._deferred:
+                    # DatabaseManager の書き込みメソッドは失敗を例外ではなくFalseで返す
+                    if func(*args, **kwargs) is False:
+                        raise sqlite3.Error(f"{getattr(func, '__name__', func)} の書き込みに失敗しました")
+        except Exception as e:
+            app_logger.error(f"作業単位のコミットエラー: {e}")
+            print(f"作業単位のコミットエラー: {e}")
+            return False
+
+        app_logger.info(f"作業単位をコミット: アラート{len(self.alerts)}件・株価履歴{len(self.price_history)}件・"
+                        f"その他{len(self._deferred)}件")
+        self.discard()
+        self.committed = True
+        return True
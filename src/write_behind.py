@@ -0,0 +1,195 @@
+"""
+書き込み遅延キューモジュール
+Asynchronous write-behind queue for alerts and price history
+
+監視ループのアラート記録・株価履歴保存をキューに積むだけにし、
+バックグラウンドの書き込みスレッドが N 件または M ミリ秒ごとに
+まとめて1トランザクションでコミットする。監視周期の作業単位（UnitOfWork）も
+submit() で渡すと書き込みスレッドがコミットするため、監視スレッドはコミットを
+待たない。停止時・終了時には未書き込み分をすべて書き出す。
+"""
+
+import atexit
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+from typing import List, Optional
+
+from logger import app_logger
+
+
+# キュー内の制御用マーカー
+_FLUSH = object()
+_STOP = object()
+
+_ALERT = 'alert'
+_PRICE = 'price'
+_UNIT = 'unit'
+
+# 作業単位のコミットに失敗した場合の再試行
+UNIT_RETRIES = 3
+UNIT_RETRY_DELAY = 0.5
+
+
+class WriteBehindQueue:
+    """DatabaseManager への書き込みをまとめて行うバックグラウンドライター"""
+
+    def __init__(self, db, batch_size: int = 200, flush_interval_ms: int = 500,
+                 max_queue_size: int = 10000):
+        self.db = db
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue_size)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._closed = False
+        self.written_count = 0
+        self.failed_count = 0
+        atexit.register(self.close)
+
+    def _ensure_started(self) -> None:
+        """初回の書き込み要求で書き込みスレッドを開始"""
+        if self._thread and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, daemon=True,
+                                            name="DatabaseWriteBehind")
+            self._thread.start()
+
+    def _put(self, item) -> None:
+        if self._closed:
+            # 停止後の書き込みは同期的に行う
+            self._write([item])
+            return
+        self._ensure_started()
+        # キューが満杯の場合は空くまで待つ（書き込みを捨てない）
+        self._queue.put(item)
+
+    def log_alert(self, symbol: str, alert_type: str, message: str,
+                  triggered_price: Optional[float] = None,
+                  strategy_name: Optional[str] = None) -> None:
+        """アラート記録をキューに積む（作成時刻は積んだ時点）"""
+        # alerts.created_at の既定値（CURRENT_TIMESTAMP）と同じUTC表記
+        created_at = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+        self._put((_ALERT, (symbol, alert_type, message, triggered_price, strategy_name, created_at)))
+
+    def save_price_history(self, symbol: str, stock_info) -> None:
+        """株価履歴の保存をキューに積む"""
+        self._put((_PRICE, (symbol, datetime.now().date(), stock_info.current_price, stock_info.volume)))
+
+    def submit(self, unit) -> None:
+        """作業単位（UnitOfWork）のコミットを書き込みスレッドに任せる"""
+        self._put((_UNIT, unit))
+
+    def pending_count(self) -> int:
+        """未書き込みの件数（概算）"""
+        return self._queue.qsize()
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """キュー内の書き込みをすべてコミットするまで待つ"""
+        if not self._thread or not self._thread.is_alive():
+            return self._queue.empty()
+        self._queue.put(_FLUSH)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def close(self, timeout: float = 10) -> None:
+        """未書き込み分を書き出して書き込みスレッドを停止"""
+        if self._closed:
+            return
+        self._closed = True
+        if self._thread and self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join(timeout)
+            if self._thread.is_alive():
+                app_logger.warning(f"書き込みキューの停止がタイムアウトしました（残り{self._queue.qsize()}件）")
+
+    def _run(self) -> None:
+        """キューから取り出してN件またはMミリ秒ごとにまとめて書き込む"""
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            batch = []
+            taken = 1
+
+            if item is _STOP:
+                stopping = True
+            elif item is not _FLUSH:
+                batch.append(item)
+                deadline = time.monotonic() + self.flush_interval
+                while len(batch) < self.batch_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    try:
+                        item = self._queue.get(timeout=remaining)
+                    except queue.Empty:
+                        break
+                    taken += 1
+                    if item is _STOP:
+                        stopping = True
+                        break
+                    if item is _FLUSH:
+                        break
+                    batch.append(item)
+
+            if stopping:
+                # 停止要求までに積まれた分も取り出して書き込む
+                while True:
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    taken += 1
+                    if item is not _FLUSH and item is not _STOP:
+                        batch.append(item)
+
+            try:
+                self._write(batch)
+            finally:
+                for _ in range(taken):
+                    self._queue.task_done()
+
+    def _write(self, batch: List[tuple]) -> None:
+        """1バッチを1トランザクションで書き込む"""
+        units = [row for kind, row in batch if kind == _UNIT]
+        rows = [(kind, row) for kind, row in batch if kind != _UNIT]
+        if rows:
+            self._write_rows(rows)
+        for unit in units:
+            self._commit_unit(unit)
+
+    def _write_rows(self, batch: List[tuple]) -> None:
+        alerts = [row for kind, row in batch if kind == _ALERT]
+        prices = [row for kind, row in batch if kind == _PRICE]
+        try:
+            success = self.db.write_batch(alerts, prices)
+        except Exception as e:
+            app_logger.error(f"書き込みキューエラー: {e}")
+            success = False
+
+        if success:
+            self.written_count += len(batch)
+        else:
+            self.failed_count += len(batch)
+            app_logger.error(f"書き込みキュー: {len(batch)}件の書き込みに失敗しました")
+
+    def _commit_unit(self, unit) -> None:
+        """作業単位をコミット（失敗時は積んだ書き込みを保ったまま再試行）"""
+        pending = unit.pending_count()
+        for attempt in range(UNIT_RETRIES):
+            if unit.commit():
+                self.written_count += pending
+                return
+            if attempt + 1 < UNIT_RETRIES:
+                time.sleep(UNIT_RETRY_DELAY)
+        self.failed_count += pending
+        app_logger.error(f"書き込みキュー: 作業単位の{pending}件の書き込みに失敗しました"
+                         f"（{UNIT_RETRIES}回再試行）")
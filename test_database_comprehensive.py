@@ -591,6 +591,1640 @@ def test_concurrent_operations():
         traceback.print_exc()
         return False
 
+def test_connection_pool():
+    """永続接続・WAL設定テスト"""
+    print("\n🔌 永続接続テスト開始...")
+    
+    try:
+        import threading
+        from database import DatabaseManager
+        
+        with tempfile.TemporaryDirectory() as temp_dir:
+            test_db_path = os.path.join(temp_dir, "test_pool.db")
+            db = DatabaseManager(test_db_path)
+            
+            # 同一スレッドでは接続を使い回す
+            with db._connect() as first, db._connect() as second:
+                if first is not second:
+                    print("❌ 同一スレッドで接続が再作成されています")
+                    return False
+                journal_mode = first.execute('PRAGMA journal_mode').fetchone()[0]
+                synchronous = first.execute('PRAGMA synchronous').fetchone()[0]
+            if journal_mode.lower() != 'wal' or synchronous != 1:
+                print(f"❌ PRAGMA設定異常: journal_mode={journal_mode}, synchronous={synchronous}")
+                return False
+            print("✅ 接続の再利用とWAL/synchronous=NORMAL設定")
+            
+            # 別スレッドでは別の接続
+            other = []
+            def worker():
+                with db._connect() as conn:
+                    other.append(conn)
+            thread = threading.Thread(target=worker)
+            thread.start()
+            thread.join()
+            if other[0] is first:
+                print("❌ スレッド間で接続が共有されています")
+                return False
+            print("✅ スレッドごとの接続")
+            
+            # 2つ目のインスタンスはスキーマ初期化を繰り返さない
+            calls = []
+            original = DatabaseManager.init_database
+            DatabaseManager.init_database = lambda self: calls.append(self)
+            try:
+                DatabaseManager(test_db_path)
+            finally:
+                DatabaseManager.init_database = original
+            if calls:
+                print("❌ スキーマ初期化が再実行されています")
+                return False
+            print("✅ スキーマ初期化はプロセス内で1回")
+            
+            db.close()
+        
+        print("✅ 永続接続テスト完了")
+        return True
+        
+    except Exception as e:
+        print(f"❌ 永続接続テストエラー: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_bulk_writes():
+    """一括書き込みテスト"""
+    print("\n📦 一括書き込みテスト開始...")
+    
+    try:
+        from database import DatabaseManager
+        from csv_parser import Holding
+        
+        def make_holding(symbol, name="テスト銘柄"):
+            return Holding(
+                symbol=symbol, name=name, quantity=100, average_cost=1000.0,
+                current_price=1000.0, acquisition_amount=100000.0, market_value=100000.0,
+                profit_loss=0.0, broker="テスト証券", account_type="特定"
+            )
+        
+        with tempfile.TemporaryDirectory() as temp_dir:
+            db = DatabaseManager(os.path.join(temp_dir, "test_bulk.db"))
+            
+            holdings = [make_holding(str(1000 + i)) for i in range(1000)]
+            if db.insert_holdings(holdings) != 1000:
+                print("❌ 一括挿入件数異常")
+                return False
+            print("✅ 1000件一括挿入")
+            
+            # 同一バッチは同一タイムスタンプ
+            timestamps = {h['updated_at'] for h in db.get_all_holdings()}
+            if len(timestamps) != 1:
+                print(f"❌ タイムスタンプが{len(timestamps)}種類あります")
+                return False
+            print("✅ バッチ内タイムスタンプ統一")
+            
+            # 不正な行を含む場合は正常な行だけ挿入
+            mixed = [make_holding("9001"), make_holding("9002", name=None)]
+            if db.insert_holdings(mixed) != 1:
+                print("❌ 不正行を含む挿入の件数異常")
+                return False
+            print("✅ 不正行のみ除外して挿入")
+            
+            updated = db.update_current_prices({str(1000 + i): 1200.0 for i in range(500)})
+            holding = next(h for h in db.get_all_holdings() if h['symbol'] == '1000')
+            untouched = next(h for h in db.get_all_holdings() if h['symbol'] == '1999')
+            if (updated != 500 or holding['market_value'] != 120000.0 or
+                    holding['profit_loss'] != 20000.0 or untouched['current_price'] != 1000.0):
+                print(f"❌ 一括価格更新異常: updated={updated}")
+                return False
+            print("✅ 一括価格更新")
+            
+            db.close()
+        
+        print("✅ 一括書き込みテスト完了")
+        return True
+        
+    except Exception as e:
+        print(f"❌ 一括書き込みテストエラー: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_schema_migrations():
+    """スキーマ移行テスト"""
+    print("\n🧱 スキーマ移行テスト開始...")
+    
+    try:
+        from database import DatabaseManager, SCHEMA_VERSION
+        
+        with tempfile.TemporaryDirectory() as temp_dir:
+            test_db_path = os.path.join(temp_dir, "test_migration.db")
+            
+            # 移行機構導入前のデータベース（user_version=0）を再現
+            with sqlite3.connect(test_db_path) as conn:
+                conn.execute('''
+                    CREATE TABLE alerts (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        symbol TEXT NOT NULL,
+                        alert_type TEXT NOT NULL,
+                        message TEXT NOT NULL,
+                        triggered_price REAL,
+                        strategy_name TEXT,
+                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                    )
+                ''')
+                conn.execute("INSERT INTO alerts (symbol, alert_type, message) VALUES ('7203', 'buy', '既存')")
+            
+            db = DatabaseManager(test_db_path)
+            if db.get_schema_version() != SCHEMA_VERSION:
+                print(f"❌ スキーマバージョン異常: {db.get_schema_version()}")
+                return False
+            print(f"✅ スキーマバージョン v{SCHEMA_VERSION}")
+            
+            with db._connect() as conn:
+                indexes = {row[0] for row in conn.execute(
+                    "SELECT name FROM sqlite_master WHERE type = 'index'")}
+                plan = ' '.join(row[3] for row in conn.execute(
+                    "EXPLAIN QUERY PLAN SELECT * FROM alerts ORDER BY created_at DESC, id DESC LIMIT 10"))
+            
+            for index in ('idx_alerts_created_at', 'idx_watchlist_active_created', 'idx_wishlist_active_created'):
+                if index not in indexes:
+                    print(f"❌ インデックス未作成: {index}")
+                    return False
+            if 'idx_alerts_created_at' not in plan or 'TEMP B-TREE' in plan:
+                print(f"❌ アラート取得がインデックスを使用していません: {plan}")
+                return False
+            print("✅ インデックス作成・使用確認")
+            
+            if len(db.get_alerts(10)) != 1:
+                print("❌ 既存データが失われています")
+                return False
+            print("✅ 既存データ保持")
+            
+            # 再初期化しても移行は再適用されない
+            db.init_database()
+            if db.get_schema_version() != SCHEMA_VERSION:
+                print("❌ 再初期化でバージョンが変化")
+                return False
+            print("✅ 再初期化時の冪等性")
+            
+            db.close()
+        
+        print("✅ スキーマ移行テスト完了")
+        return True
+        
+    except Exception as e:
+        print(f"❌ スキーマ移行テストエラー: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_write_behind_queue():
+    """書き込み遅延キューテスト"""
+    print("\n⏳ 書き込み遅延キューテスト開始...")
+    
+    try:
+        from database import DatabaseManager
+        from data_sources import StockInfo
+        from write_behind import WriteBehindQueue
+        
+        with tempfile.TemporaryDirectory() as temp_dir:
+            db = DatabaseManager(os.path.join(temp_dir, "test_write_behind.db"))
+            
+            # コミット回数を数える
+            batches = []
+            original_write_batch = db.write_batch
+            def counting_write_batch(alerts, prices):
+                batches.append(len(alerts) + len(prices))
+                return original_write_batch(alerts, prices)
+            db.write_batch = counting_write_batch
+            
+            writer = WriteBehindQueue(db, batch_size=100, flush_interval_ms=50)
+            stock_info = StockInfo(symbol="7203", name="トヨタ自動車", current_price=2500.0,
+                                   previous_close=2480.0, change_percent=0.8, volume=1000,
+                                   last_updated=datetime.now())
+            
+            for i in range(450):
+                writer.log_alert(f"{1000 + i}", "buy", f"テストアラート{i}", 100.0, "test_strategy")
+            writer.save_price_history("7203", stock_info)
+            
+            if not writer.flush(timeout=10):
+                print("❌ フラッシュがタイムアウトしました")
+                return False
+            
+            alerts = db.get_alerts(1000)
+            if len(alerts) != 450 or writer.written_count != 451:
+                print(f"❌ 書き込み件数異常: alerts={len(alerts)}, written={writer.written_count}")
+                return False
+            print("✅ フラッシュ後に全件書き込み")
+            
+            if len(batches) > 10 or max(batches) > 100:
+                print(f"❌ グループコミット異常: {batches}")
+                return False
+            print(f"✅ グループコミット: {len(batches)}回のコミットで451件")
+            
+            # 停止時に未書き込み分を書き出す
+            writer.log_alert("9999", "sell", "停止直前のアラート", 100.0, "test_strategy")
+            writer.close()
+            if len(db.get_alerts(1000)) != 451:
+                print("❌ 停止時のフラッシュ異常")
+                return False
+            print("✅ 停止時フラッシュ")
+            
+            # 作業単位のコミットは書き込みスレッドで行う
+            import threading
+            writer = WriteBehindQueue(db, batch_size=100, flush_interval_ms=50)
+            commit_threads = []
+            with db.unit_of_work(writer) as uow:
+                uow.log_alert("8001", "buy", "作業単位のアラート", 100.0, "test_strategy")
+                uow.save_price_history("8001", stock_info)
+                original_commit = uow.commit
+                uow.commit = lambda: (commit_threads.append(threading.current_thread()), original_commit())[1]
+            if not writer.flush(timeout=10):
+                print("❌ 作業単位のフラッシュがタイムアウトしました")
+                return False
+            if (not uow.committed or len(db.get_alerts(1000)) != 452
+                    or commit_threads[0] is threading.current_thread()):
+                print(f"❌ 作業単位の書き込みスレッドでのコミット異常: {commit_threads}")
+                return False
+            print("✅ 作業単位を書き込みスレッドでコミット")
+            
+            # コミットに失敗した作業単位は積んだ書き込みを保ったまま再試行する
+            results = iter([False, True])
+            with db.unit_of_work(writer) as uow:
+                uow.log_alert("8002", "buy", "再試行されるアラート", 100.0, "test_strategy")
+                uow.defer(lambda: next(results))
+            if not writer.flush(timeout=10) or not uow.committed or len(db.get_alerts(1000)) != 453:
+                print("❌ 失敗した作業単位が再試行されません")
+                return False
+            print("✅ 失敗した作業単位の再試行")
+            writer.close()
+            
+            db.close()
+        
+        print("✅ 書き込み遅延キューテスト完了")
+        return True
+        
+    except Exception as e:
+        print(f"❌ 書き込み遅延キューテストエラー: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_price_series():
+    """株価時系列取得テスト"""
+    print("\n📈 株価時系列取得テスト開始...")
+    
+    try:
+        import math
+        from database import DatabaseManager
+        
+        with tempfile.TemporaryDirectory() as temp_dir:
+            db = DatabaseManager(os.path.join(temp_dir, "test_series.db"))
+            
+            db.write_batch([], [
+                ("7203", "2024-01-04", 2500.0, 1000),
+                ("7203", "2024-01-05", 2520.0, 1100),
+                ("7203", "2024-01-09", 2550.0, 1200),
+                ("6758", "2024-01-05", 13000.0, 500),
+                ("6758", "2024-01-09", 13100.0, 600),
+            ])
+            
+            series = db.get_price_series(["7203", "6758", "9999"], start="2024-01-05", end="2024-01-09")
+            if list(series.columns) != ["7203", "6758", "9999"] or len(series) != 2:
+                print(f"❌ 時系列の形状異常: {series.shape}")
+                return False
+            if series.loc["2024-01-09", "6758"] != 13100.0 or not math.isnan(series.loc["2024-01-05", "9999"]):
+                print("❌ 時系列の値異常")
+                return False
+            print("✅ 日付で揃えた複数銘柄の終値")
+            
+            arrays = db.get_price_series(["7203", "6758"], fields=("close", "volume"), as_numpy=True)
+            if arrays["close"].shape != (3, 2) or arrays["volume"][0, 0] != 1000:
+                print(f"❌ NumPy配列異常: {arrays['close'].shape}")
+                return False
+            print("✅ NumPy配列での取得")
+            
+            with db._connect() as conn:
+                plan = ' '.join(row[3] for row in conn.execute(
+                    "EXPLAIN QUERY PLAN SELECT symbol, date, close_price FROM price_history "
+                    "WHERE symbol IN (?, ?) AND date >= ? ORDER BY symbol, date", ("7203", "6758", "2024-01-01")))
+            if 'COVERING INDEX' not in plan:
+                print(f"❌ カバリングインデックス未使用: {plan}")
+                return False
+            print("✅ カバリングインデックス使用")
+            
+            db.close()
+        
+        print("✅ 株価時系列取得テスト完了")
+        return True
+        
+    except Exception as e:
+        print(f"❌ 株価時系列取得テストエラー: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_retention_policy():
+    """データ保持ポリシーテスト"""
+    print("\n🧹 データ保持ポリシーテスト開始...")
+    
+    try:
+        from datetime import date
+        from database import DatabaseManager
+        from retention import RetentionManager, RetentionPolicy
+        
+        with tempfile.TemporaryDirectory() as temp_dir:
+            db = DatabaseManager(os.path.join(temp_dir, "test_retention.db"))
+            archive_path = os.path.join(temp_dir, "alerts_archive.db")
+            
+            # 2025-06-30から遡って約1年分の営業日の日足
+            today = date(2025, 6, 30)
+            rows = []
+            for days_ago in range(400):
+                day = today - timedelta(days=days_ago)
+                if day.weekday() < 5:
+                    rows.append(("7203", day.isoformat(), 1000.0 + days_ago, 100))
+            db.write_batch([
+                ("7203", "buy", "古いアラート", 1000.0, "test_strategy", "2020-01-01 00:00:00"),
+                ("7203", "buy", "新しいアラート", 1000.0, "test_strategy", "2099-01-01 00:00:00"),
+            ], rows)
+            
+            # トランザクションの中では外側の書き込みをコミットせずに拒否する
+            for operation in (lambda: db.archive_alerts("2021-01-01 00:00:00", archive_path),
+                              lambda: db.compact()):
+                try:
+                    with db.batch():
+                        db.set_sync_state("retention_test", "uncommitted")
+                        operation()
+                    print("❌ トランザクション中のアーカイブ・圧縮が拒否されません")
+                    return False
+                except RuntimeError:
+                    pass
+            if db.get_sync_state("retention_test") is not None or os.path.exists(archive_path):
+                print("❌ 外側のトランザクションがコミットされました")
+                return False
+            print("✅ トランザクション中のアーカイブ・圧縮を拒否")
+            
+            policy = RetentionPolicy(daily_keep_days=30, weekly_keep_days=90,
+                                     alert_archive_path=archive_path)
+            summary = RetentionManager(db, policy).run(today=today)
+            
+            daily_rows = len(db.get_price_series("7203").dropna())
+            if summary['weekly_rows'] + summary['monthly_rows'] + daily_rows != len(rows):
+                print(f"❌ 集約件数の不整合: {summary}, 日足残り={daily_rows}")
+                return False
+            print(f"✅ 日足{daily_rows}件を残し、古い日足を集約")
+            
+            # 2025-05-26週（月〜金）の週足
+            weekly = {bar['period_start']: bar for bar in db.get_price_bars("7203", "W")}
+            bar = weekly.get("2025-05-26")
+            if not bar or (bar['open_price'], bar['close_price'], bar['high_price'],
+                           bar['low_price'], bar['volume']) != (1035.0, 1031.0, 1035.0, 1031.0, 500):
+                print(f"❌ 週足の四本値異常: {bar}")
+                return False
+            if not db.get_price_bars("7203", "M"):
+                print("❌ 月足が作成されていません")
+                return False
+            print("✅ 週足・月足の四本値と出来高")
+            
+            alerts = db.get_alerts(10)
+            with sqlite3.connect(archive_path) as archive:
+                archived = archive.execute("SELECT message FROM alerts").fetchall()
+            if len(alerts) != 1 or archived != [("古いアラート",)]:
+                print(f"❌ アラートアーカイブ異常: 残り{len(alerts)}件, アーカイブ{archived}")
+                return False
+            print("✅ 古いアラートを別ファイルへアーカイブ")
+            
+            with db._connect() as conn:
+                auto_vacuum = conn.execute("PRAGMA auto_vacuum").fetchone()[0]
+            if auto_vacuum != 2:
+                print("❌ 増分VACUUMが有効になっていません")
+                return False
+            print("✅ 増分VACUUM有効")
+            
+            db.close()
+        
+        print("✅ データ保持ポリシーテスト完了")
+        return True
+        
+    except Exception as e:
+        print(f"❌ データ保持ポリシーテストエラー: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_intraday_ticks():
+    """日中ティックバッファテスト"""
+    print("\n⏱️ 日中ティックバッファテスト開始...")
+    
+    try:
+        from database import DatabaseManager
+        from intraday import IntradayTickStore, TickRingBuffer
+        
+        # 固定長: 容量を超えると古いティックから上書き
+        buffer = TickRingBuffer(capacity=4)
+        for i in range(6):
+            buffer.append(1000.0 + i, 100.0 + i, i * 10)
+        times, prices, _ = buffer.snapshot()
+        if len(buffer) != 4 or list(prices) != [102.0, 103.0, 104.0, 105.0]:
+            print(f"❌ リングバッファ異常: {list(prices)}")
+            return False
+        print("✅ 固定長リングバッファ")
+        
+        with tempfile.TemporaryDirectory() as temp_dir:
+            db = DatabaseManager(os.path.join(temp_dir, "test_intraday.db"))
+            store = IntradayTickStore(db, capacity=100, bar_seconds=60)
+            
+            # 1分足2本分のティック（出来高は累積値）
+            base = 1_700_000_040.0  # 60秒境界
+            ticks = [(0, 100.0, 1000), (20, 103.0, 1500), (40, 99.0, 1600),
+                     (60, 101.0, 2000), (90, 102.0, 2600)]
+            for offset, price, volume in ticks:
+                store.record("7203", price, volume, timestamp=base + offset)
+            
+            bars = store.get_bars("7203")
+            if (list(bars['open']) != [100.0, 101.0] or list(bars['high']) != [103.0, 102.0] or
+                    list(bars['low']) != [99.0, 101.0] or list(bars['close']) != [99.0, 102.0] or
+                    list(bars['volume']) != [600.0, 1000.0]):
+                print(f"❌ 足の集約異常: {bars}")
+                return False
+            print("✅ メモリ上のティックから足を計算")
+            
+            # 確定した足のみ書き出し、二重には書き出さない
+            written = store.flush(now=base + 100)
+            again = store.flush(now=base + 110)
+            saved = db.get_intraday_bars("7203", bar_seconds=60)
+            if written != 1 or again != 0 or len(saved) != 1 or saved[0]['tick_count'] != 3:
+                print(f"❌ 書き出し異常: written={written}, again={again}, saved={saved}")
+                return False
+            
+            store.flush(now=base + 130)
+            if len(db.get_intraday_bars("7203", bar_seconds=60)) != 2:
+                print("❌ 2本目の足が書き出されていません")
+                return False
+            print("✅ 確定した足の定期書き出し")
+            
+            db.close()
+        
+        print("✅ 日中ティックバッファテスト完了")
+        return True
+        
+    except Exception as e:
+        print(f"❌ 日中ティックバッファテストエラー: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def _external_price_update(db_path, price_updates):
+    """別プロセスで現在価格を更新（test_holdings_store 用）"""
+    from database import DatabaseManager
+    db = DatabaseManager(db_path)
+    db.update_current_prices(price_updates)
+    db.close()
+
+def test_holdings_store():
+    """保有銘柄メモリキャッシュテスト"""
+    print("\n🗂️ 保有銘柄メモリキャッシュテスト開始...")
+    
+    try:
+        from database import DatabaseManager, HOLDINGS_VERSION_SQL
+        from csv_parser import Holding
+        
+        with tempfile.TemporaryDirectory() as temp_dir:
+            db = DatabaseManager(os.path.join(temp_dir, "test_holdings_store.db"))
+            events = []
+            db.subscribe_holdings(lambda event, holdings: events.append((event, len(holdings))))
+            
+            holdings = [
+                Holding("7203", "トヨタ自動車", 100, 2000.0, 2100.0, 200000.0, 210000.0, 10000.0, "SBI証券", "特定"),
+                Holding("7203", "トヨタ自動車", 50, 2000.0, 2100.0, 100000.0, 105000.0, 5000.0, "楽天証券", "NISA"),
+                Holding("6758", "ソニーグループ", 10, 12000.0, 13000.0, 120000.0, 130000.0, 10000.0, "SBI証券", "特定"),
+            ]
+            db.insert_holdings(holdings)
+            if ('inserted', 3) not in events:
+                print(f"❌ 挿入イベント異常: {events}")
+                return False
+            
+            # 2回目以降の読み込みはDBへ行かない
+            first = db.get_all_holdings()
+            statements = []
+            db._pool.connection().set_trace_callback(statements.append)
+            second = db.get_all_holdings()
+            by_symbol = db.get_holdings_by_symbol("7203")
+            count = db.get_holdings_count()
+            db._pool.connection().set_trace_callback(None)
+            # 他の接続の書き込みの確認（holdings の変更カウンタ）以外は実行しない
+            statements = [statement for statement in statements if statement != HOLDINGS_VERSION_SQL]
+            if statements or first != second or len(by_symbol) != 2 or count != 3:
+                print(f"❌ キャッシュ読み込み異常: statements={statements}, count={count}")
+                return False
+            
+            # 返り値を書き換えてもキャッシュには影響しない
+            second[0]['market_value'] = -1
+            if db.get_all_holdings()[0]['market_value'] == -1:
+                print("❌ キャッシュが外部から書き換えられました")
+                return False
+            print("✅ 2回目以降の読み込みはメモリから")
+            
+            # 価格更新はDBとキャッシュの両方に同じ値で反映される
+            db.update_current_prices({"7203": 2200.0})
+            cached = db.get_holding("7203")
+            db.holdings_store.invalidate()
+            stored = db.get_holding("7203")
+            if (cached['market_value'] != 220000.0 or cached['profit_loss'] != 20000.0
+                    or cached != stored or ('prices_updated', 2) not in events):
+                print(f"❌ 価格更新の反映異常: cached={cached}, stored={stored}")
+                return False
+            print("✅ 価格更新の書き込みスルー")
+            
+            # 削除・全削除
+            db.delete_holding("6758")
+            if db.get_holding("6758") is not None or ('deleted', 1) not in events:
+                print(f"❌ 削除の反映異常: {events}")
+                return False
+            db.delete_all_holdings()
+            if db.get_all_holdings() != [] or ('cleared', 2) not in events:
+                print(f"❌ 全削除の反映異常: {events}")
+                return False
+            print("✅ 削除・全削除の変更通知")
+            
+            # 別プロセスの holdings への書き込みは変更カウンタの変化で検知して読み直す
+            import multiprocessing
+            db.insert_holdings(holdings)
+            if db.get_holding("6758")['current_price'] != 13000.0:
+                print("❌ 再挿入後の読み込み異常")
+                return False
+            process = multiprocessing.get_context('spawn').Process(
+                target=_external_price_update, args=(db.db_path, {"6758": 14000.0}))
+            process.start()
+            process.join(timeout=60)
+            if process.exitcode != 0:
+                print(f"❌ 別プロセスの価格更新失敗: exitcode={process.exitcode}")
+                return False
+            # 集計はストアと一緒に読み直される（ストアより先に読んでも古い値を返さない）
+            summary = db.get_portfolio_summary()
+            if summary['total_market_value'] != 210000.0 + 105000.0 + 140000.0:
+                print(f"❌ 別プロセスの書き込みが集計に反映されません: {summary['total_market_value']}")
+                return False
+            holding = db.get_holding("6758")
+            if holding['current_price'] != 14000.0 or holding['market_value'] != 140000.0:
+                print(f"❌ 別プロセスの書き込みが反映されません: {holding}")
+                return False
+            # 自分の書き込みでは読み直さない
+            db.update_current_prices({"6758": 15000.0})
+            statements = []
+            db._pool.connection().set_trace_callback(statements.append)
+            db.get_all_holdings()
+            db._pool.connection().set_trace_callback(None)
+            if any('SELECT * FROM holdings' in statement for statement in statements):
+                print(f"❌ 自分の書き込みで読み直しました: {statements}")
+                return False
+            # 別スレッドからの自プロセスの書き込みや holdings 以外の書き込みでも読み直さない
+            import threading
+            writer = threading.Thread(target=lambda: (
+                db.update_current_prices({"7203": 2300.0}),
+                db.log_alert("7203", "buy", "テスト", 2300.0, "test"),
+            ))
+            writer.start()
+            writer.join()
+            statements = []
+            db._pool.connection().set_trace_callback(statements.append)
+            holding = db.get_holding("7203")
+            db._pool.connection().set_trace_callback(None)
+            if (any('SELECT * FROM holdings' in statement for statement in statements)
+                    or holding['current_price'] != 2300.0):
+                print(f"❌ 自プロセスの別スレッドの書き込みで読み直しました: {statements}")
+                return False
+            print("✅ 別プロセスの書き込みを検知して読み直し")
+            
+            db.close()
+        
+        print("✅ 保有銘柄メモリキャッシュテスト完了")
+        return True
+        
+    except Exception as e:
+        print(f"❌ 保有銘柄メモリキャッシュテストエラー: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_portfolio_summary_incremental():
+    """ポートフォリオ集計の差分更新テスト"""
+    print("\n📐 ポートフォリオ集計の差分更新テスト開始...")
+    
+    try:
+        from database import DatabaseManager, HOLDINGS_VERSION_SQL
+        from csv_parser import Holding
+        from portfolio_summary import summaries_match
+        
+        with tempfile.TemporaryDirectory() as temp_dir:
+            db_path = os.path.join(temp_dir, "test_portfolio_summary_incremental.db")
+            db = DatabaseManager(db_path)
+            db.insert_holdings([
+                Holding("7203", "トヨタ自動車", 100, 2000.0, 2100.0, 200000.0, 210000.0, 10000.0, "SBI証券", "特定"),
+                Holding("6758", "ソニーグループ", 10, 12000.0, 13000.0, 120000.0, 130000.0, 10000.0, "SBI証券", "NISA"),
+                Holding("9984", "ソフトバンクグループ", 20, 6000.0, 5500.0, 120000.0, 110000.0, -10000.0, "楽天証券", "特定"),
+            ])
+            
+            summary = db.get_portfolio_summary()
+            if not summaries_match(summary, db._query_portfolio_summary()) or summary['total_stocks'] != 3:
+                print(f"❌ 初期集計異常: {summary}")
+                return False
+            
+            # 価格更新後の集計は集計SQLを実行せずに得られ、DBでの集計と一致する
+            # （他の接続の書き込みの確認 holdings の変更カウンタのみ）
+            db.update_current_prices({"7203": 2200.0, "9984": 6500.0})
+            statements = []
+            db._pool.connection().set_trace_callback(statements.append)
+            summary = db.get_portfolio_summary()
+            db._pool.connection().set_trace_callback(None)
+            if statements != [HOLDINGS_VERSION_SQL] or not summaries_match(summary, db._query_portfolio_summary()):
+                print(f"❌ 差分更新異常: statements={statements}, summary={summary}")
+                return False
+            if (summary['total_market_value'] != 220000.0 + 130000.0 + 130000.0
+                    or summary['by_broker']['楽天証券']['total_profit_loss'] != 10000.0
+                    or summary['by_account_type']['特定']['total_stocks'] != 2):
+                print(f"❌ 内訳異常: {summary}")
+                return False
+            print("✅ 価格更新の差分反映（証券会社別・口座種別）")
+            
+            db.delete_holding("6758")
+            summary = db.get_portfolio_summary()
+            if summary['total_stocks'] != 2 or 'NISA' in summary['by_account_type']:
+                print(f"❌ 削除の反映異常: {summary}")
+                return False
+            print("✅ 削除の差分反映")
+            
+            # 別接続での変更は定期的な突き合わせで検出して再集計する
+            with sqlite3.connect(db_path) as other:
+                other.execute("UPDATE holdings SET market_value = 0 WHERE symbol = '7203'")
+            db.portfolio_summary.reconcile_interval = 0
+            stale = db.get_portfolio_summary()
+            db.portfolio_summary.reconcile_interval = 300
+            fresh = db.get_portfolio_summary()
+            if stale['total_market_value'] != 130000.0 or fresh['total_market_value'] != 130000.0:
+                print(f"❌ 突き合わせ異常: stale={stale}, fresh={fresh}")
+                return False
+            print("✅ 定期的な突き合わせ")
+            
+            db.close()
+        
+        print("✅ ポートフォリオ集計の差分更新テスト完了")
+        return True
+        
+    except Exception as e:
+        print(f"❌ ポートフォリオ集計の差分更新テストエラー: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_alerts_pagination():
+    """アラート履歴のキーセットページングテスト"""
+    print("\n📜 アラート履歴のキーセットページングテスト開始...")
+    
+    try:
+        from database import DatabaseManager
+        
+        with tempfile.TemporaryDirectory() as temp_dir:
+            db = DatabaseManager(os.path.join(temp_dir, "test_alerts_page.db"))
+            
+            # 同一時刻の行を含む250件（id で順序が決まる）
+            alerts = []
+            for i in range(250):
+                created_at = f"2024-01-01 09:{i // 60:02d}:{i % 60 // 2 * 2:02d}"
+                alerts.append((["7203", "6758"][i % 2], ["buy", "sell_profit"][i % 2],
+                               f"alert {i}", 1000.0 + i, "strategy_a", created_at))
+            db.write_batch(alerts, [])
+            
+            # 全ページを辿ると重複・欠落なく新しい順に並ぶ
+            seen = []
+            cursor = None
+            while True:
+                page = db.get_alerts_page(limit=40, cursor=cursor)
+                seen.extend(page['alerts'])
+                cursor = page['next_cursor']
+                if cursor is None:
+                    break
+            keys = [(a['created_at'], a['id']) for a in seen]
+            if len(seen) != 250 or len(set(keys)) != 250 or keys != sorted(keys, reverse=True):
+                print(f"❌ ページング異常: {len(seen)}件")
+                return False
+            if seen[:100] != db.get_alerts(100):
+                print("❌ get_alerts と先頭ページの並びが一致しません")
+                return False
+            print("✅ カーソルで全件を重複なく取得")
+            
+            # 絞り込み
+            page = db.get_alerts_page(limit=200, symbol="7203", alert_type="buy")
+            if len(page['alerts']) != 125 or page['next_cursor'] is not None:
+                print(f"❌ 絞り込み異常: {len(page['alerts'])}件")
+                return False
+            if db.get_alerts_page(strategy_name="other")['alerts']:
+                print("❌ 戦略の絞り込み異常")
+                return False
+            print("✅ 銘柄・種類・戦略での絞り込み")
+            
+            # 2ページ目以降もインデックスの範囲検索になる
+            with db._connect() as conn:
+                plan = ' '.join(row[3] for row in conn.execute('''
+                    EXPLAIN QUERY PLAN
+                    SELECT * FROM alerts WHERE symbol = ?
+                      AND created_at <= ? AND (created_at < ? OR id < ?)
+                    ORDER BY created_at DESC, id DESC LIMIT 40
+                ''', ("7203", "2024-01-01 09:01:00", "2024-01-01 09:01:00", 100)))
+            if 'idx_alerts_symbol_created' not in plan or 'TEMP B-TREE' in plan:
+                print(f"❌ インデックス未使用: {plan}")
+                return False
+            print("✅ カーソル位置からのインデックス検索")
+            
+            db.close()
+        
+        print("✅ アラート履歴のキーセットページングテスト完了")
+        return True
+        
+    except Exception as e:
+        print(f"❌ アラート履歴のキーセットページングテストエラー: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def _concurrent_writer(role, db_path, count, results):
+    """別プロセスでデーモン・GUI・CLIの書き込みを再現（test_concurrent_writers 用）"""
+    from database import DatabaseManager
+    from write_behind import WriteBehindQueue
+    from data_sources import StockInfo
+    
+    failures = 0
+    try:
+        db = DatabaseManager(db_path)
+        if role == 'daemon':
+            # 監視ループ: アラート・株価履歴は書き込み遅延キュー経由
+            writer = WriteBehindQueue(db, batch_size=20, flush_interval_ms=20)
+            for i in range(count):
+                writer.log_alert(f"D{i:04d}", "buy", f"daemon {i}", 100.0, "stress")
+                writer.save_price_history(f"D{i:04d}", StockInfo(f"D{i:04d}", "", 100.0 + i, 100.0, 0.0, i))
+            writer.close()
+            failures += writer.failed_count
+        elif role == 'gui':
+            # GUI: 価格更新・監視銘柄追加・アラート記録
+            for i in range(count):
+                db.update_current_prices({"7203": 2000.0 + i})
+                failures += not db.add_to_watchlist(f"G{i:04d}", "gui", "stress")
+                failures += not db.log_alert(f"G{i:04d}", "info", f"gui {i}")
+        else:
+            # CLI: 欲しい銘柄追加・同期状態・アラート記録
+            for i in range(count):
+                failures += not db.add_to_wishlist(f"C{i:04d}", "cli")
+                failures += not db.set_sync_state(f"cli_{i % 10}", str(i))
+                failures += not db.log_alert(f"C{i:04d}", "info", f"cli {i}")
+        db.close()
+    except Exception as e:
+        print(f"❌ {role} プロセスエラー: {e}")
+        failures += 1
+    results.put((role, failures))
+
+def test_concurrent_writers():
+    """複数プロセス同時書き込みテスト"""
+    print("\n🔀 複数プロセス同時書き込みテスト開始...")
+    
+    try:
+        import multiprocessing
+        import time
+        from database import DatabaseManager
+        from csv_parser import Holding
+        
+        count = 150
+        with tempfile.TemporaryDirectory() as temp_dir:
+            db_path = os.path.join(temp_dir, "test_concurrent.db")
+            db = DatabaseManager(db_path)
+            db.insert_holdings([Holding("7203", "トヨタ自動車", 100, 2000.0, 2000.0,
+                                        200000.0, 200000.0, 0.0, "SBI証券", "特定")])
+            # 親プロセスの保有銘柄キャッシュを読み込んでおく（他プロセスの更新で読み直されること）
+            db.get_all_holdings()
+            
+            # 親プロセスの接続を引き継がないよう spawn で起動
+            context = multiprocessing.get_context('spawn')
+            results = context.Queue()
+            processes = [context.Process(target=_concurrent_writer, args=(role, db_path, count, results))
+                         for role in ('daemon', 'gui', 'cli')]
+            started = time.time()
+            for process in processes:
+                process.start()
+            for process in processes:
+                process.join(timeout=120)
+            elapsed = time.time() - started
+            
+            if any(process.is_alive() for process in processes):
+                for process in processes:
+                    process.terminate()
+                print("❌ 書き込みプロセスが停止しませんでした")
+                return False
+            
+            failures = dict(results.get(timeout=5) for _ in processes)
+            if any(failures.values()):
+                print(f"❌ 書き込み失敗: {failures}")
+                return False
+            print(f"✅ 3プロセスが失敗なく終了 ({elapsed:.1f}秒)")
+            
+            # 書き込みの欠落がない
+            with db._connect() as conn:
+                alert_count = conn.execute('SELECT COUNT(*) FROM alerts').fetchone()[0]
+                price_count = conn.execute('SELECT COUNT(*) FROM price_history').fetchone()[0]
+                watch_count = conn.execute('SELECT COUNT(*) FROM watchlist').fetchone()[0]
+                wish_count = conn.execute('SELECT COUNT(*) FROM wishlist').fetchone()[0]
+                price = conn.execute("SELECT current_price FROM holdings WHERE symbol = '7203'").fetchone()[0]
+            if (alert_count, price_count, watch_count, wish_count) != (count * 3, count, count, count):
+                print(f"❌ 書き込み欠落: alerts={alert_count}, prices={price_count}, "
+                      f"watchlist={watch_count}, wishlist={wish_count}")
+                return False
+            if price != 2000.0 + count - 1:
+                print(f"❌ 価格更新異常: {price}")
+                return False
+            cached = db.get_holding("7203")['current_price']
+            if cached != price:
+                print(f"❌ 保有銘柄キャッシュが他プロセスの更新を反映していません: {cached} != {price}")
+                return False
+            print("✅ 全プロセスの書き込みが欠落なく保存")
+            
+            db.close()
+        
+        print("✅ 複数プロセス同時書き込みテスト完了")
+        return True
+        
+    except Exception as e:
+        print(f"❌ 複数プロセス同時書き込みテストエラー: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_columnar_export():
+    """Parquet/Arrow エクスポート・インポートテスト"""
+    print("\n💾 Parquet/Arrow エクスポート・インポートテスト開始...")
+    
+    try:
+        from database import DatabaseManager
+        from data_export import ColumnarExporter, PYARROW_AVAILABLE
+        
+        if not PYARROW_AVAILABLE:
+            print("   ⚠️ pyarrowライブラリなし - エクスポートテストスキップ")
+            print("✅ Parquet/Arrow エクスポート・インポートテスト完了（簡易版）")
+            return True
+        
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+        
+        with tempfile.TemporaryDirectory() as temp_dir:
+            db = DatabaseManager(os.path.join(temp_dir, "test_export.db"))
+            start = datetime(2024, 1, 1).date()
+            prices = [(symbol, start + timedelta(days=i), 1000.0 + i, 100 * i)
+                      for symbol in ("7203", "6758", "AAPL") for i in range(90)]
+            alerts = [("7203", "buy", f"alert {i}", 1000.0, None, f"2024-0{i % 3 + 1}-10 09:00:00")
+                      for i in range(30)]
+            db.write_batch(alerts, prices)
+            
+            exporter = ColumnarExporter(db, chunk_size=50)
+            export_dir = os.path.join(temp_dir, "export")
+            
+            # 銘柄別のParquet
+            counts = exporter.export_all(export_dir, 'parquet', 'symbol')
+            if counts['price_history'] != 270 or counts['alerts'] != 30:
+                print(f"❌ エクスポート件数異常: {counts}")
+                return False
+            if not os.path.isdir(os.path.join(export_dir, "price_history", "symbol=7203")):
+                print("❌ 銘柄別ディレクトリがありません")
+                return False
+            table = exporter.read_table(os.path.join(export_dir, "price_history"),
+                                        filter=ds.field('symbol') == '6758')
+            if table.num_rows != 90 or table.schema.field('date').type != pa.date32():
+                print(f"❌ Parquet読み込み異常: {table.num_rows}行 {table.schema}")
+                return False
+            print("✅ 銘柄別Parquetの書き出し・絞り込み読み込み")
+            
+            # 月別のArrow IPCはメモリマップでコピーせずに読める
+            exporter.export_all(export_dir, 'arrow', 'month')
+            months = sorted(os.listdir(os.path.join(export_dir, "alerts")))
+            if months != ['_manifest.json', 'month=2024-01', 'month=2024-02', 'month=2024-03']:
+                print(f"❌ 月別ディレクトリ異常: {months}")
+                return False
+            allocated = pa.total_allocated_bytes()
+            table = exporter.read_table(os.path.join(export_dir, "price_history"))
+            if table.num_rows != 270 or pa.total_allocated_bytes() > allocated:
+                print(f"❌ Arrow読み込み異常: {table.num_rows}行, 確保 {pa.total_allocated_bytes() - allocated}バイト")
+                return False
+            print("✅ 月別Arrow IPCのゼロコピー読み込み")
+            
+            # エクスポート以外のファイルがあるディレクトリは削除しない
+            other_dir = os.path.join(temp_dir, "documents")
+            os.makedirs(os.path.join(other_dir, "alerts"))
+            with open(os.path.join(other_dir, "alerts", "memo.txt"), 'w', encoding='utf-8') as f:
+                f.write("削除されてはいけないファイル")
+            try:
+                exporter.export_table("alerts", other_dir)
+                print("❌ エクスポート以外のディレクトリを上書きしました")
+                return False
+            except FileExistsError:
+                pass
+            if not os.path.exists(os.path.join(other_dir, "alerts", "memo.txt")):
+                print("❌ エクスポート以外のファイルが削除されました")
+                return False
+            print("✅ エクスポート以外のディレクトリは上書きしない")
+            
+            # 別のデータベースへ書き戻すと同じ内容になる
+            restored = DatabaseManager(os.path.join(temp_dir, "test_restore.db"))
+            imported = ColumnarExporter(restored).import_all(export_dir)
+            if imported['price_history'] != 270 or restored.get_alerts(100) != db.get_alerts(100):
+                print(f"❌ インポート異常: {imported}")
+                return False
+            original = db.get_price_series(["7203", "AAPL"], fields=('close', 'volume'))
+            if not original.equals(restored.get_price_series(["7203", "AAPL"], fields=('close', 'volume'))):
+                print("❌ 株価履歴の書き戻し内容が一致しません")
+                return False
+            print("✅ エクスポートしたデータのインポート")
+            
+            restored.close()
+            db.close()
+        
+        print("✅ Parquet/Arrow エクスポート・インポートテスト完了")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Parquet/Arrow エクスポート・インポートテストエラー: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_portfolio_snapshots():
+    """日次ポートフォリオスナップショットテスト"""
+    print("\n📅 日次ポートフォリオスナップショットテスト開始...")
+    
+    try:
+        from database import DatabaseManager
+        from csv_parser import Holding
+        from snapshots import DailySnapshotJob
+        
+        with tempfile.TemporaryDirectory() as temp_dir:
+            db = DatabaseManager(os.path.join(temp_dir, "test_snapshots.db"))
+            db.insert_holdings([
+                Holding("7203", "トヨタ自動車", 100, 2000.0, 2000.0, 200000.0, 200000.0, 0.0, "SBI証券", "特定"),
+                Holding("7203", "トヨタ自動車", 100, 2000.0, 2000.0, 200000.0, 200000.0, 0.0, "楽天証券", "NISA"),
+                Holding("6758", "ソニーグループ", 10, 12000.0, 12000.0, 120000.0, 120000.0, 0.0, "SBI証券", "特定"),
+            ])
+            job = DailySnapshotJob(db)
+            
+            # 大引け前・休日・年末年始は記録しない
+            if (job.is_due(datetime(2024, 3, 1, 14, 0)) or job.is_due(datetime(2024, 3, 2, 16, 0))
+                    or job.is_due(datetime(2024, 1, 2, 16, 0))):
+                print("❌ 大引け前・休日に記録対象になっています")
+                return False
+            from market_calendar import JPHOLIDAY_AVAILABLE
+            if JPHOLIDAY_AVAILABLE:
+                # 春分の日（水曜日）
+                if job.is_due(datetime(2024, 3, 20, 16, 0)):
+                    print("❌ 祝日に記録対象になっています")
+                    return False
+            else:
+                print("⚠️ jpholidayライブラリなし - 祝日の判定をスキップ")
+            
+            # 3営業日分の終値で記録
+            for day, prices in ((1, {"7203": 2000.0, "6758": 12000.0}),
+                                (4, {"7203": 2100.0, "6758": 11500.0}),
+                                (5, {"7203": 2200.0, "6758": 11000.0})):
+                db.update_current_prices(prices)
+                if not job.run_if_due(datetime(2024, 3, day, 15, 30)):
+                    print(f"❌ 3/{day} のスナップショットが記録されません")
+                    return False
+            if job.run_if_due(datetime(2024, 3, 5, 18, 0)) is not None:
+                print("❌ 同じ日に2回記録されました")
+                return False
+            
+            curve = job.get_profit_curve()
+            if curve['dates'] != ['2024-03-01', '2024-03-04', '2024-03-05'] or curve['profit_loss'] != [0.0, 15000.0, 30000.0]:
+                print(f"❌ 損益推移異常: {curve}")
+                return False
+            print("✅ 大引け後の1日1回の記録と損益推移")
+            
+            change = job.get_daily_change()
+            if change['day_change'] != 15000.0 or change['previous_market_value'] != 535000.0:
+                print(f"❌ 前日比異常: {change}")
+                return False
+            toyota = db.get_holding_snapshots("7203", start="2024-03-04")
+            if [row['market_value'] for row in toyota] != [420000.0, 440000.0] or toyota[0]['quantity'] != 200:
+                print(f"❌ 銘柄別推移異常: {toyota}")
+                return False
+            print("✅ 前日比・銘柄別の評価額推移")
+            
+            # 同じ日に記録し直すと、売却した銘柄の行は残らない
+            db.delete_holding("6758")
+            db.save_portfolio_snapshot("2024-03-05")
+            latest = db.get_portfolio_snapshots(start="2024-03-05")[0]
+            if latest['total_stocks'] != 2 or db.get_holding_snapshots("6758", start="2024-03-05"):
+                print(f"❌ 再記録異常: {latest}")
+                return False
+            print("✅ 同日の再記録")
+            
+            # 評価額は holdings の最後の価格ではなく、その日の終値で計算する
+            db.write_batch([], [("7203", "2024-03-06", 2300.0, 100)])
+            db.save_portfolio_snapshot("2024-03-06")
+            toyota = db.get_holding_snapshots("7203", start="2024-03-06")[0]
+            if toyota['current_price'] != 2300.0 or toyota['market_value'] != 460000.0:
+                print(f"❌ 終値での評価異常: {toyota}")
+                return False
+            # 履歴より新しい当日の価格更新があればそちらで評価する
+            today = datetime.now().date()
+            db.write_batch([], [("7203", (today - timedelta(days=1)).isoformat(), 9999.0, 100)])
+            db.update_current_prices({"7203": 2500.0})
+            db.save_portfolio_snapshot(today)
+            toyota = db.get_holding_snapshots("7203", start=today.isoformat())[0]
+            if toyota['market_value'] != 500000.0 or toyota['profit_loss'] != 100000.0:
+                print(f"❌ 当日の価格での評価異常: {toyota}")
+                return False
+            print("✅ その日の終値での評価")
+            
+            db.close()
+        
+        print("✅ 日次ポートフォリオスナップショットテスト完了")
+        return True
+        
+    except Exception as e:
+        print(f"❌ 日次ポートフォリオスナップショットテストエラー: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_typed_records():
+    """軽量レコード読み込みテスト"""
+    print("\n🪶 軽量レコード読み込みテスト開始...")
+    
+    try:
+        import tracemalloc
+        from database import DatabaseManager
+        from csv_parser import Holding
+        from records import AlertRecord, HoldingRecord, WatchlistRecord, WishlistRecord
+        
+        with tempfile.TemporaryDirectory() as temp_dir:
+            db = DatabaseManager(os.path.join(temp_dir, "test_records.db"))
+            db.insert_holdings([
+                Holding("7203", "トヨタ自動車", 100, 2000.0, 2100.0, 200000.0, 210000.0, 10000.0, "SBI証券", "特定"),
+                Holding("6758", "ソニーグループ", 10, 12000.0, 13000.0, 120000.0, 130000.0, 10000.0, "SBI証券", "NISA"),
+            ])
+            for i in range(2000):
+                db.add_to_watchlist(f"W{i:04d}", f"監視{i}", "default_strategy", 1000.0 + i)
+            db.add_to_wishlist("9984", "ソフトバンクグループ", 6000.0, "押し目待ち")
+            db.write_batch([("7203", "buy", f"alert {i}", 2000.0, "default_strategy",
+                             f"2024-01-01 09:{i // 60:02d}:{i % 60:02d}") for i in range(120)], [])
+            
+            # 辞書版と同じ値を必要なカラムだけで返す
+            holdings = db.get_all_holdings(as_records=True)
+            if (not isinstance(holdings[0], HoldingRecord) or holdings[0].symbol != "7203"
+                    or holdings[0]._asdict() != {f: db.get_all_holdings()[0][f] for f in HoldingRecord._fields}):
+                print(f"❌ 保有銘柄レコード異常: {holdings}")
+                return False
+            watchlist = db.get_watchlist(as_records=True)
+            first = db.get_watchlist()[0]
+            if (len(watchlist) != 2000 or not isinstance(watchlist[0], WatchlistRecord)
+                    or watchlist[0]._asdict() != {f: first[f] for f in WatchlistRecord._fields}
+                    or db.get_watchlist_count() != 2000):
+                print("❌ 監視銘柄レコード異常")
+                return False
+            wishlist = db.get_wishlist(as_records=True)
+            if wishlist != [WishlistRecord("9984", "ソフトバンクグループ", 6000.0, "押し目待ち", wishlist[0].created_at)]:
+                print(f"❌ 欲しい銘柄レコード異常: {wishlist}")
+                return False
+            print("✅ 保有・監視・欲しい銘柄のレコード読み込み")
+            
+            page = db.get_alerts_page(limit=50, as_records=True)
+            dict_page = db.get_alerts_page(limit=50)
+            second = db.get_alerts_page(limit=50, cursor=page['next_cursor'], as_records=True)
+            if (not isinstance(page['alerts'][0], AlertRecord) or page['next_cursor'] != dict_page['next_cursor']
+                    or [a.id for a in page['alerts']] != [a['id'] for a in dict_page['alerts']]
+                    or len(second['alerts']) != 50):
+                print("❌ アラートレコードのページング異常")
+                return False
+            print("✅ アラート履歴のレコードページング")
+            
+            # 辞書より確保メモリが少ない
+            tracemalloc.start()
+            rows = db.get_watchlist()
+            dict_bytes = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+            del rows
+            tracemalloc.start()
+            records = db.get_watchlist(as_records=True)
+            record_bytes = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+            del records
+            if record_bytes >= dict_bytes:
+                print(f"❌ メモリ削減なし: dict={dict_bytes}, records={record_bytes}")
+                return False
+            print(f"✅ 確保メモリ {dict_bytes:,} → {record_bytes:,} バイト")
+            
+            db.close()
+        
+        print("✅ 軽量レコード読み込みテスト完了")
+        return True
+        
+    except Exception as e:
+        print(f"❌ 軽量レコード読み込みテストエラー: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_async_database():
+    """非同期データベース窓口テスト"""
+    print("\n⚡ 非同期データベース窓口テスト開始...")
+    
+    try:
+        import asyncio
+        import time
+        from async_database import AsyncDatabaseManager
+        from csv_parser import Holding
+        
+        async def scenario(db_path):
+            async with AsyncDatabaseManager(db_path) as adb:
+                await adb.insert_holdings([
+                    Holding("7203", "トヨタ自動車", 100, 2000.0, 2100.0, 200000.0, 210000.0, 10000.0, "SBI証券", "特定"),
+                ])
+                
+                # 同時に積まれた書き込みはまとめてコミットされる
+                results = await asyncio.gather(*(adb.log_alert("7203", "buy", f"alert {i}", 2000.0)
+                                                 for i in range(300)))
+                page = await adb.get_alerts_page(limit=500)
+                if not all(results) or len(page['alerts']) != 300:
+                    print(f"❌ 書き込み結果異常: {len(page['alerts'])}件")
+                    return False
+                if adb.batch_count == 0 or adb.batch_count >= 300:
+                    print(f"❌ 書き込みがまとめられていない: {adb.batch_count}回")
+                    return False
+                print(f"✅ 300件の書き込みを{adb.batch_count}回のコミットで記録")
+                
+                holding = await adb.get_holding("7203")
+                summary = await adb.get_portfolio_summary()
+                if holding['market_value'] != 210000.0 or summary['total_stocks'] != 1:
+                    print("❌ 読み込み結果異常")
+                    return False
+                
+                # データベーススレッドの処理中もイベントループは止まらない
+                ticks = []
+                
+                async def heartbeat():
+                    for _ in range(10):
+                        ticks.append(time.monotonic())
+                        await asyncio.sleep(0.02)
+                
+                await asyncio.gather(adb.run(lambda db: time.sleep(0.2)), heartbeat())
+                if len(ticks) < 5:
+                    print(f"❌ イベントループが停止: {len(ticks)}回")
+                    return False
+                print("✅ 同期処理中もイベントループが動作")
+                
+                chunks = [rows async for rows in adb.iter_table_rows('alerts', chunk_size=100)]
+                if [len(rows) for rows in chunks] != [100, 100, 100]:
+                    print(f"❌ 行の読み進め異常: {[len(rows) for rows in chunks]}")
+                    return False
+                
+                try:
+                    await adb.get_fundamentals()
+                    print("❌ 引数エラーが伝わらない")
+                    return False
+                except TypeError:
+                    pass
+                print("✅ 行の読み進め・例外の伝達")
+            return True
+        
+        with tempfile.TemporaryDirectory() as temp_dir:
+            if not asyncio.run(scenario(os.path.join(temp_dir, "test_async.db"))):
+                return False
+        
+        print("✅ 非同期データベース窓口テスト完了")
+        return True
+        
+    except Exception as e:
+        print(f"❌ 非同期データベース窓口テストエラー: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_unit_of_work():
+    """監視周期の作業単位テスト"""
+    print("\n🧾 監視周期の作業単位テスト開始...")
+    
+    try:
+        import threading
+        from database import DatabaseManager
+        from data_sources import StockInfo
+        
+        with tempfile.TemporaryDirectory() as temp_dir:
+            db = DatabaseManager(os.path.join(temp_dir, "test_uow.db"))
+            statements = []
+            db._pool.connection().set_trace_callback(statements.append)
+            stock_info = StockInfo("7203", "トヨタ自動車", 2100.0, 2000.0, 5.0, 1000000)
+            
+            with db.unit_of_work() as uow:
+                with uow.reads():
+                    # 読み込み中に他のスレッドが書き込んでも同じ時点のデータを読む
+                    writer = threading.Thread(target=lambda: db.log_alert("6758", "buy", "他スレッド"))
+                    writer.start()
+                    writer.join()
+                    if db.get_alerts():
+                        print("❌ スナップショット外の書き込みが見えている")
+                        return False
+                    # スナップショット内の書き込みは（ロールバックで消えないよう）エラー
+                    try:
+                        db.set_sync_state("uow_inside", "lost")
+                        print("❌ スナップショット内で書き込めてしまう")
+                        return False
+                    except RuntimeError:
+                        pass
+                
+                # 読み込み後（通信中など）の書き込みはその場でコミットされる
+                db.set_sync_state("uow_during_cycle", "kept")
+                if db.get_sync_state("uow_during_cycle") != "kept" or db.get_sync_state("uow_inside"):
+                    print("❌ 周期中の書き込み異常")
+                    return False
+                statements.clear()
+                
+                for i in range(20):
+                    uow.save_price_history(f"{7000 + i}", stock_info)
+                    uow.log_alert(f"{7000 + i}", "sell_profit", f"alert {i}", 2100.0, "default_strategy")
+                uow.defer(db.set_sync_state, "uow_test", "done")
+            
+            commits = [sql for sql in statements if sql.split()[0] in ('COMMIT', 'BEGIN', 'BEGIN IMMEDIATE')]
+            if not uow.committed or statements.count('COMMIT') != 1:
+                print(f"❌ コミット回数異常: {commits}")
+                return False
+            alerts = db.get_alerts(limit=100)
+            with db._connect() as conn:
+                prices = conn.execute('SELECT COUNT(*) FROM price_history').fetchone()[0]
+            if (len(alerts) != 21 or prices != 20 or db.get_sync_state("uow_test") != "done"
+                    or db.get_sync_state("uow_during_cycle") != "kept"):
+                print(f"❌ 書き込み結果異常: アラート{len(alerts)}件, 株価履歴{prices}件")
+                return False
+            print("✅ 1周期の書き込みを1回のコミットで記録")
+            
+            # 後回しにした書き込みが失敗（Falseを返す）したら作業単位全体をロールバック
+            uow = db.unit_of_work()
+            uow.save_price_history("9999", stock_info)
+            uow.log_alert("9999", "buy", "ロールバックされる")
+            uow.defer(lambda: False)
+            if uow.commit() or uow.committed or uow.pending_count() != 3:
+                print("❌ 失敗した書き込みがコミット成功として扱われました")
+                return False
+            with db._connect() as conn:
+                partial = conn.execute("SELECT COUNT(*) FROM price_history WHERE symbol = '9999'").fetchone()[0]
+            if partial or len(db.get_alerts(limit=100)) != 21:
+                print("❌ 失敗した作業単位の一部がコミットされました")
+                return False
+            print("✅ 後回しの書き込みの失敗で全体をロールバック")
+            
+            # 例外で中断した周期でも、それまでに積んだ書き込みは失わない
+            try:
+                with db.unit_of_work() as uow:
+                    uow.log_alert("9984", "buy", "中断前のアラート")
+                    raise RuntimeError("株価取得失敗")
+            except RuntimeError:
+                pass
+            if len(db.get_alerts(limit=100)) != 22 or not uow.committed:
+                print("❌ 中断した周期の書き込みが失われました")
+                return False
+            print("✅ 中断した周期の書き込みをコミット")
+            
+            # コミットに失敗したら例外にする（積んだ書き込みは残る）
+            try:
+                with db.unit_of_work() as uow:
+                    uow.log_alert("9984", "buy", "コミット失敗")
+                    uow.defer(lambda: False)
+                print("❌ コミット失敗が呼び出し側に伝わりません")
+                return False
+            except sqlite3.Error:
+                pass
+            if uow.pending_count() != 2:
+                print("❌ コミットに失敗した書き込みが破棄されました")
+                return False
+            print("✅ コミット失敗の通知")
+            
+            # 監視周期で発火したアラートは、周期がその後失敗しても記録される
+            from stock_monitor import StockMonitor, Alert
+            from write_behind import WriteBehindQueue
+            monitor = StockMonitor.__new__(StockMonitor)
+            monitor.db = db
+            monitor.writer = WriteBehindQueue(db, flush_interval_ms=50)
+            monitor.alert_manager = None
+            monitor.alert_callbacks = []
+            monitor.last_alerts = {}
+            alert = Alert("6501", "sell_loss", "通知済みのアラート", 3000.0, "default_strategy", datetime.now())
+            try:
+                with db.unit_of_work(monitor.writer):
+                    monitor._trigger_alert(alert)
+                    raise RuntimeError("株価取得失敗")
+            except RuntimeError:
+                pass
+            monitor.writer.close()
+            if not any(row['message'] == "通知済みのアラート" for row in db.get_alerts(limit=100)):
+                print("❌ 周期が失敗した際に通知済みアラートの記録が失われました")
+                return False
+            print("✅ 通知済みアラートの記録")
+            
+            db.close()
+        
+        print("✅ 監視周期の作業単位テスト完了")
+        return True
+        
+    except Exception as e:
+        print(f"❌ 監視周期の作業単位テストエラー: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_issuer_search():
+    """上場銘柄検索テスト"""
+    print("\n🔎 上場銘柄検索テスト開始...")
+    
+    try:
+        import time
+        from database import DatabaseManager, ISSUER_FTS_AVAILABLE
+        from issuers import IssuerDirectory, extract_issuer
+        
+        class FakeJQuantsSource:
+            def __init__(self, rows):
+                self.rows = rows
+            
+            def iter_listed_info(self):
+                return iter(self.rows)
+        
+        listed = [
+            {'Code': '72030', 'CompanyName': 'トヨタ自動車', 'CompanyNameEnglish': 'TOYOTA MOTOR CORPORATION',
+             'Sector33Code': '3700', 'Sector33CodeName': '輸送用機器', 'MarketCodeName': 'プライム'},
+            {'Code': '67580', 'CompanyName': 'ソニーグループ', 'CompanyNameEnglish': 'Sony Group Corporation',
+             'Sector33Code': '3650', 'Sector33CodeName': '電気機器', 'MarketCodeName': 'プライム'},
+            {'Code': '83060', 'CompanyName': '三菱ＵＦＪフィナンシャル・グループ',
+             'CompanyNameEnglish': 'Mitsubishi UFJ Financial Group,Inc.', 'MarketCodeName': 'プライム'},
+            {'Code': '130A0', 'CompanyName': 'Ｖｅｒｉｔａｓ　Ｉｎ　Ｓｉｌｉｃｏ',
+             'CompanyNameEnglish': 'Veritas In Silico Inc.', 'MarketCodeName': 'グロース'},
+        ]
+        katakana = 'アイウエオカキクケコサシスセソタチツテトナニヌネノハヒフヘホマミムメモ'
+        for i in range(4000):
+            name = ''.join(katakana[(i * 7 + k * 13) % len(katakana)] for k in range(5)) + '工業'
+            listed.append({'Code': f'{2000 + i}0', 'CompanyName': name, 'CompanyNameEnglish': f'Company {i}'})
+        
+        with tempfile.TemporaryDirectory() as temp_dir:
+            db = DatabaseManager(os.path.join(temp_dir, "test_issuers.db"))
+            directory = IssuerDirectory(FakeJQuantsSource(listed), db)
+            if not directory.is_due() or directory.refresh() != 4004 or directory.is_due():
+                print("❌ 上場銘柄一覧の取得異常")
+                return False
+            # 一覧が取得できない（空の）場合、同じ日には再取得しない
+            empty_db = DatabaseManager(os.path.join(temp_dir, "test_issuers_empty.db"))
+            empty = IssuerDirectory(FakeJQuantsSource([]), empty_db)
+            if not empty.is_due() or empty.refresh() != 0 or empty.is_due():
+                print("❌ 空の一覧の再取得が抑止されていません")
+                return False
+            empty_db.close()
+            if extract_issuer({'Code': '72030'}) is not None or db.get_issuer('7203')['sector33_name'] != '輸送用機器':
+                print("❌ 上場銘柄の変換異常")
+                return False
+            print(f"✅ 上場銘柄一覧 {db.get_issuers_count()}銘柄を保存 (全文検索: {ISSUER_FTS_AVAILABLE})")
+            
+            cases = [
+                ('72', '7203'),           # コード前方一致
+                ('130a', '130A'),         # 英字入りコード
+                ('トヨタ', '7203'),        # 銘柄名
+                ('ｿﾆｰ', '6758'),          # 半角カナ
+                ('ufj', '8306'),          # 全角英字の銘柄名
+                ('sony', '6758'),         # 英語名
+                ('三菱', '8306'),          # 2文字
+                ('トヨタ自働車', '7203'),   # 入力ミス
+            ]
+            for query, expected in cases:
+                started = time.perf_counter()
+                results = db.search_issuers(query, limit=10)
+                elapsed = (time.perf_counter() - started) * 1000
+                if not results or results[0]['code'] != expected:
+                    print(f"❌ 検索結果異常: {query} → {[r['code'] for r in results]}")
+                    return False
+                if elapsed > 50:
+                    print(f"❌ 検索が遅い: {query} {elapsed:.1f}ms")
+                    return False
+            if db.search_issuers('') or db.search_issuers('%'):
+                print("❌ 空文字・記号の検索異常")
+                return False
+            print("✅ コード・銘柄名・英語名・入力ミスで検索")
+            
+            # 一覧から消えた銘柄（上場廃止）は検索対象外になる
+            db.replace_issuers([extract_issuer(row) for row in listed[1:]])
+            if db.get_issuer('7203') or db.search_issuers('トヨタ'):
+                print("❌ 上場廃止銘柄が残っている")
+                return False
+            print("✅ 上場廃止銘柄を索引から削除")
+            
+            db.close()
+        
+        print("✅ 上場銘柄検索テスト完了")
+        return True
+        
+    except Exception as e:
+        print(f"❌ 上場銘柄検索テストエラー: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_in_memory_database():
+    """インメモリモードテスト"""
+    print("\n🧠 インメモリモードテスト開始...")
+    
+    try:
+        import threading
+        from database import DatabaseManager
+        from db_connection import disable_in_memory
+        
+        def count_alerts(path):
+            conn = sqlite3.connect(path)
+            try:
+                return conn.execute('SELECT COUNT(*) FROM alerts').fetchone()[0]
+            finally:
+                conn.close()
+        
+        with tempfile.TemporaryDirectory() as temp_dir:
+            db_path = os.path.join(temp_dir, "test_memory.db")
+            disk = DatabaseManager(db_path)
+            disk.add_to_watchlist("7203", "トヨタ自動車", "default_strategy")
+            disk.log_alert("7203", "buy", "起動前のアラート", 2500.0)
+            disk.close()
+            
+            db = DatabaseManager(db_path, in_memory=True, persist_interval=0)
+            try:
+                if not db.in_memory or [w['symbol'] for w in db.get_watchlist()] != ["7203"]:
+                    print("❌ ディスクからの読み込み異常")
+                    return False
+                print("✅ 起動時にディスクの内容をメモリへ読み込み")
+                
+                # 他のスレッド・他のインスタンスも同じインメモリDBを使う
+                def write_alerts(worker):
+                    other = DatabaseManager(db_path)
+                    for i in range(50):
+                        other.log_alert(f"{worker}", "buy", f"アラート{i}", float(i))
+                
+                threads = [threading.Thread(target=write_alerts, args=(w,)) for w in range(4)]
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+                if len(db.get_alerts_page(limit=500)['alerts']) != 201:
+                    print("❌ スレッド間でインメモリDBを共有していない")
+                    return False
+                if count_alerts(db_path) != 1:
+                    print("❌ 書き戻し前にディスクが変更された")
+                    return False
+                print("✅ 書き込みはメモリ上のみ（4スレッド×50件）")
+                
+                if not db.persist() or count_alerts(db_path) != 201:
+                    print("❌ ディスクへの書き戻し異常")
+                    return False
+                conn = sqlite3.connect(db_path)
+                try:
+                    if conn.execute('PRAGMA integrity_check').fetchone()[0] != 'ok':
+                        print("❌ 書き戻したファイルが破損している")
+                        return False
+                finally:
+                    conn.close()
+                print("✅ バックアップAPIでディスクへ書き戻し")
+                
+                db.log_alert("6758", "sell", "終了直前のアラート")
+            finally:
+                disable_in_memory(db_path)
+            
+            if count_alerts(db_path) != 202:
+                print("❌ 終了時の書き戻し異常")
+                return False
+            if DatabaseManager(db_path).in_memory:
+                print("❌ インメモリモードを終了できない")
+                return False
+            print("✅ 終了時に書き戻してディスクのファイルに戻る")
+            
+            # ':memory:' はディスクに保存しないが、スレッド間では共有される
+            memory = DatabaseManager(':memory:')
+            memory.add_to_watchlist("9984", "ソフトバンクグループ", "default_strategy")
+            seen = []
+            thread = threading.Thread(target=lambda: seen.extend(
+                w['symbol'] for w in DatabaseManager(':memory:').get_watchlist()))
+            thread.start()
+            thread.join()
+            if "9984" not in seen:
+                print("❌ ':memory:' がスレッド間で共有されていない")
+                return False
+            print("✅ ':memory:' をスレッド間で共有")
+        
+        print("✅ インメモリモードテスト完了")
+        return True
+        
+    except Exception as e:
+        print(f"❌ インメモリモードテストエラー: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_analytics_service():
+    """横断分析テスト"""
+    print("\n📈 横断分析テスト開始...")
+    
+    try:
+        import numpy as np
+        import pandas as pd
+        from csv_parser import Holding
+        from database import DatabaseManager
+        from analytics import AnalyticsService, DUCKDB_AVAILABLE
+        from data_export import ColumnarExporter, PYARROW_AVAILABLE
+        
+        with tempfile.TemporaryDirectory() as temp_dir:
+            db = DatabaseManager(os.path.join(temp_dir, "test_analytics.db"))
+            start = datetime(2024, 1, 1).date()
+            days = [start + timedelta(days=i) for i in range(400)]
+            closes = {
+                "7203": [1000.0 + i if i < 380 else 1380.0 - 25 * (i - 379) for i in range(400)],  # 最終日に52週安値
+                "6758": [2000.0 + 2 * i for i in range(400)],
+                "9984": [5000.0 + 300 * np.sin(i / 9) for i in range(400)],
+            }
+            prices = [(symbol, day, close, 1000) for symbol, values in closes.items()
+                      for day, close in zip(days, values)]
+            db.write_batch([], prices)
+            db.insert_holdings([
+                Holding(symbol, name, 100, 1000.0, 1000.0, 100000.0, 100000.0, 0.0, "SBI証券")
+                for symbol, name in (("7203", "トヨタ自動車"), ("6758", "ソニーグループ"))
+            ])
+            db.replace_issuers([
+                {'code': "7203", 'name': "トヨタ自動車", 'sector33_code': "3700", 'sector33_name': "輸送用機器"},
+                {'code': "9984", 'name': "ソフトバンクグループ", 'sector33_code': "3700", 'sector33_name': "輸送用機器"},
+                {'code': "6758", 'name': "ソニーグループ", 'sector33_code': "3650", 'sector33_name': "電気機器"},
+            ])
+            
+            analytics = AnalyticsService(db, engine='pandas')
+            lows = analytics.holdings_at_52_week_low()
+            if list(lows['symbol']) != ["7203"] or lows['low_52w'][0] != closes["7203"][-1]:
+                print(f"❌ 52週安値の判定異常: {lows.to_dict('records')}")
+                return False
+            print("✅ 52週安値の保有銘柄")
+            
+            volatility = analytics.rolling_volatility(window=20).set_index('symbol')['volatility']
+            for symbol, values in closes.items():
+                expected = np.std(np.diff(np.log(values[-21:])), ddof=1) * np.sqrt(252)
+                if abs(volatility[symbol] - expected) > 1e-9:
+                    print(f"❌ ボラティリティ異常: {symbol} {volatility[symbol]} != {expected}")
+                    return False
+            series = analytics.rolling_volatility(window=20, latest_only=False)
+            if len(series) != 3 * (400 - 20):
+                print(f"❌ ボラティリティ時系列の件数異常: {len(series)}")
+                return False
+            print("✅ 全銘柄の20日ボラティリティ")
+            
+            month = days[-1].strftime('%Y-%m')
+            month_start = days.index(next(day for day in days if day.strftime('%Y-%m') == month))
+            sectors = analytics.sector_returns().set_index('sector33_name')
+            expected = (closes["6758"][-1] / closes["6758"][month_start - 1] - 1) * 100
+            if sectors.loc["輸送用機器", 'symbols'] != 2 or abs(sectors.loc["電気機器", 'mean_return_pct'] - expected) > 1e-9:
+                print(f"❌ 業種別騰落率異常: {sectors.to_dict('index')}")
+                return False
+            print(f"✅ {month} の業種別騰落率")
+            
+            engines = [('pandas', None)]
+            if DUCKDB_AVAILABLE:
+                engines.append(('duckdb', None))
+            else:
+                print("   ⚠️ duckdbライブラリなし - DuckDBエンジンテストスキップ")
+            if PYARROW_AVAILABLE:
+                export_dir = os.path.join(temp_dir, "export")
+                ColumnarExporter(db).export_table('price_history', export_dir, 'parquet', 'month')
+                engines.append((engines[-1][0], export_dir))
+            for engine, parquet_dir in engines[1:]:
+                other = AnalyticsService(db, parquet_dir=parquet_dir, engine=engine)
+                pd.testing.assert_frame_equal(other.holdings_at_52_week_low(), lows, check_dtype=False)
+                pd.testing.assert_frame_equal(other.rolling_volatility(latest_only=False), series, check_dtype=False)
+                pd.testing.assert_frame_equal(other.sector_returns(month), analytics.sector_returns(month),
+                                              check_dtype=False)
+                other.close()
+                print(f"✅ {engine}{'（Parquet）' if parquet_dir else ''} でも同じ結果")
+            
+            # 読み込み後の変更は refresh() まで反映しない
+            db.write_batch([], [("6758", days[-1] + timedelta(days=1), 1000.0, 1000)])
+            if "6758" in set(analytics.holdings_at_52_week_low()['symbol']):
+                print("❌ 読み込み済みの株価履歴が変わった")
+                return False
+            analytics.refresh()
+            if set(analytics.holdings_at_52_week_low()['symbol']) != {"7203", "6758"}:
+                print("❌ refresh 後の再読み込み異常")
+                return False
+            print("✅ refresh() でSQLiteから読み直し")
+            
+            db.close()
+        
+        print("✅ 横断分析テスト完了")
+        return True
+        
+    except Exception as e:
+        print(f"❌ 横断分析テストエラー: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
 def main():
     """データベース操作完全性テストメイン"""
     print("🗄️ データベース操作完全性テスト開始\n")
@@ -604,6 +2238,25 @@ def main():
     test_results.append(("アラート管理", test_alert_management()))
     test_results.append(("監視銘柄操作", test_watchlist_operations()))
     test_results.append(("並行操作", test_concurrent_operations()))
+    test_results.append(("永続接続", test_connection_pool()))
+    test_results.append(("一括書き込み", test_bulk_writes()))
+    test_results.append(("スキーマ移行", test_schema_migrations()))
+    test_results.append(("書き込み遅延キュー", test_write_behind_queue()))
+    test_results.append(("株価時系列取得", test_price_series()))
+    test_results.append(("データ保持ポリシー", test_retention_policy()))
+    test_results.append(("日中ティックバッファ", test_intraday_ticks()))
+    test_results.append(("保有銘柄メモリキャッシュ", test_holdings_store()))
+    test_results.append(("ポートフォリオ集計の差分更新", test_portfolio_summary_incremental()))
+    test_results.append(("アラート履歴のキーセットページング", test_alerts_pagination()))
+    test_results.append(("複数プロセス同時書き込み", test_concurrent_writers()))
+    test_results.append(("Parquet/Arrow エクスポート", test_columnar_export()))
+    test_results.append(("日次ポートフォリオスナップショット", test_portfolio_snapshots()))
+    test_results.append(("軽量レコード読み込み", test_typed_records()))
+    test_results.append(("非同期データベース窓口", test_async_database()))
+    test_results.append(("監視周期の作業単位", test_unit_of_work()))
+    test_results.append(("上場銘柄検索", test_issuer_search()))
+    test_results.append(("インメモリモード", test_in_memory_database()))
+    test_results.append(("横断分析", test_analytics_service()))
     
     # 結果サマリー
     print("\n" + "="*60)
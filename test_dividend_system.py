@@ -280,6 +280,7 @@ def test_database_operations():
             return False
         
         # テストDBクリーンアップ
+        db.close()
         if os.path.exists(test_db_path):
             os.remove(test_db_path)
             print("✅ テストデータベースクリーンアップ完了")
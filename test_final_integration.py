@@ -285,6 +285,103 @@ def test_system_integration():
         traceback.print_exc()
         return False
 
+def test_http_response_cache():
+    """HTTPレスポンスキャッシュテスト（オフライン）"""
+    print("\n🗃️ HTTPレスポンスキャッシュテスト開始...")
+    
+    try:
+        import json
+        import time
+        from http_cache import HTTPResponseCache
+        from market_indices import MarketIndicesManager
+        
+        class FakeResponse:
+            def __init__(self, status_code, body=b'', headers=None):
+                self.status_code = status_code
+                self.content = body
+                self.headers = headers or {}
+            
+            def raise_for_status(self):
+                if self.status_code >= 400:
+                    raise RuntimeError(f"HTTP {self.status_code}")
+        
+        class FakeSession:
+            """ETag一致なら304を返すダミーサーバー"""
+            def __init__(self, body):
+                self.body = body
+                self.requests = []
+                self.error_status = None
+            
+            def get(self, url, headers=None, timeout=None):
+                self.requests.append(dict(headers or {}))
+                if self.error_status:
+                    return FakeResponse(self.error_status)
+                if (headers or {}).get('If-None-Match') == '"v1"':
+                    return FakeResponse(304)
+                return FakeResponse(200, self.body, {'ETag': '"v1"'})
+        
+        now = time.time()
+        chart = {'chart': {'result': [{'meta': {
+            'regularMarketPrice': 39000.0,
+            'previousClose': 38500.0,
+            'currentTradingPeriod': {'regular': {'start': now - 7200, 'end': now - 3600}},
+        }}]}}
+        
+        with tempfile.TemporaryDirectory() as temp_dir:
+            session = FakeSession(json.dumps(chart).encode('utf-8'))
+            http_cache = HTTPResponseCache(cache_dir=temp_dir, max_age=0, session=session)
+            manager = MarketIndicesManager(http_cache=http_cache)
+            
+            first = manager._fetch_from_yahoo_finance('^N225')
+            second = manager._fetch_from_yahoo_finance('^N225')
+            if first and second and first.value == 39000.0 and len(session.requests) == 1:
+                print("✅ 取引時間外は2回目をディスクから応答")
+            else:
+                print(f"❌ ディスクキャッシュ異常: requests={len(session.requests)}")
+                return False
+            
+            if 'gzip' in session.requests[0].get('Accept-Encoding', ''):
+                print("✅ gzip圧縮を要求")
+            else:
+                print("❌ Accept-Encodingにgzipがありません")
+                return False
+            
+            # 鮮度切れ後は条件付きリクエスト（304）で本文を再利用
+            plain_cache = HTTPResponseCache(cache_dir=temp_dir, max_age=0, session=session)
+            url = "https://example.invalid/chart"
+            plain_cache.get(url)
+            revalidated = plain_cache.get(url)
+            if revalidated.revalidated and session.requests[-1].get('If-None-Match') == '"v1"':
+                print("✅ ETagによる条件付きリクエスト")
+            else:
+                print("❌ 条件付きリクエスト異常")
+                return False
+            
+            # 5xx・429 の場合は期限切れキャッシュを返す（キャッシュがなければ例外）
+            for status in (503, 429):
+                session.error_status = status
+                stale = plain_cache.get(url)
+                if not stale.from_cache or stale.body != session.body:
+                    print(f"❌ HTTP {status} で期限切れキャッシュを返しません")
+                    return False
+            try:
+                plain_cache.get("https://example.invalid/uncached")
+                print("❌ キャッシュなしのHTTPエラーが例外になりません")
+                return False
+            except RuntimeError:
+                pass
+            session.error_status = None
+            print("✅ 5xx・429 では期限切れキャッシュで応答")
+        
+        print("✅ HTTPレスポンスキャッシュテスト完了")
+        return True
+        
+    except Exception as e:
+        print(f"❌ HTTPレスポンスキャッシュテストエラー: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
 def main():
     """最終統合テストメイン"""
     print("🏁 日本株ウォッチドッグ - 最終統合テスト開始\n")
@@ -296,6 +393,7 @@ def main():
     test_results.append(("エラーハンドリング堅牢性", test_error_handling_robustness()))
     test_results.append(("パフォーマンス", test_performance_benchmarks()))
     test_results.append(("システム統合", test_system_integration()))
+    test_results.append(("HTTPレスポンスキャッシュ", test_http_response_cache()))
     
     # 結果サマリー
     print("\n" + "="*60)
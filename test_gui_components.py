@@ -231,6 +231,7 @@ def test_gui_initialization_simulation():
         print("   ✅ GUI初期化に必要なコンポーネント確認完了")
         
         # テストDBクリーンアップ
+        db.close()
         if os.path.exists(test_db_path):
             os.remove(test_db_path)
         
@@ -457,6 +458,78 @@ def test_gui_data_integration():
         traceback.print_exc()
         return False
 
+def test_issuer_search_startup():
+    """銘柄検索の一覧取得・未取得時の案内テスト（画面なし）"""
+    print("\n🔎 銘柄検索の一覧取得テスト開始...")
+    
+    try:
+        from gui.main_window import MainWindow, IssuerSearchBox
+        from database import DatabaseManager
+        
+        class FakeEntry:
+            def __init__(self, text):
+                self.text = text
+            def bind(self, *args, **kwargs):
+                pass
+            def get(self):
+                return self.text
+        
+        class FakeJQuants:
+            def iter_listed_info(self):
+                yield {'Code': '72030', 'CompanyName': 'トヨタ自動車', 'MarketCodeName': 'プライム'}
+        
+        class FakeDataSource:
+            def get_jquants_source(self):
+                return FakeJQuants()
+        
+        with tempfile.TemporaryDirectory() as temp_dir:
+            db = DatabaseManager(os.path.join(temp_dir, "test_gui_issuers.db"))
+            
+            # 一覧が空なら候補の代わりに案内を表示
+            box = IssuerSearchBox(FakeEntry("トヨタ"), db, lambda issuer: None)
+            shown = []
+            box._show = shown.append
+            box.hide = lambda: shown.append(None)
+            box.search()
+            if shown != [[IssuerSearchBox.EMPTY_HINT]]:
+                print(f"❌ 未取得時の案内が表示されません: {shown}")
+                return False
+            print("✅ 一覧が空のときの案内表示")
+            
+            # 起動時にバックグラウンドで一覧を取得
+            window = MainWindow.__new__(MainWindow)
+            window.db = db
+            window.data_source = FakeDataSource()
+            window._issuer_refresh_thread = None
+            window.update_status_thread_safe = lambda message: None
+            if not window.start_issuer_refresh():
+                print("❌ 一覧の取得が開始されません")
+                return False
+            window._issuer_refresh_thread.join(timeout=10)
+            shown.clear()
+            box.search()
+            if db.get_issuers_count() != 1 or shown != [["7203  トヨタ自動車  [プライム]"]]:
+                print(f"❌ 起動時の一覧取得異常: {shown}")
+                return False
+            print("✅ 起動時のバックグラウンド取得")
+            
+            # J Quants 未設定なら取得しない
+            window.data_source = None
+            if window.start_issuer_refresh():
+                print("❌ J Quants 未設定で取得が開始されました")
+                return False
+            
+            db.close()
+        
+        print("✅ 銘柄検索の一覧取得テスト完了")
+        return True
+        
+    except Exception as e:
+        print(f"❌ 銘柄検索の一覧取得テストエラー: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
 def main():
     """GUIコンポーネント検証メイン"""
     print("🖥️  GUI コンポーネント・イベントハンドリング検証開始\n")
@@ -472,6 +545,7 @@ def main():
     test_results.append(("コンテキストメニューシステム", test_context_menu_system()))
     test_results.append(("エラーハンドリングパターン", test_error_handling_patterns()))
     test_results.append(("GUI-データ統合", test_gui_data_integration()))
+    test_results.append(("銘柄検索の一覧取得", test_issuer_search_startup()))
     
     # 結果サマリー
     print("\n" + "="*60)
@@ -373,6 +373,302 @@ def test_data_validation():
         traceback.print_exc()
         return False
 
+def test_fundamentals_incremental_refresh():
+    """財務データ差分更新テスト（オフライン）"""
+    print("\n📑 財務データ差分更新テスト開始...")
+    
+    try:
+        import tempfile
+        from datetime import date, timedelta
+        from database import DatabaseManager
+        from fundamentals import FundamentalsUpdater, calculate_valuation
+        
+        class FakeStatementsSource:
+            """開示日指定の呼び出し回数を記録するダミー"""
+            def __init__(self):
+                self.requested_dates = []
+            
+            def iter_statements_by_date(self, date_yyyymmdd):
+                self.requested_dates.append(date_yyyymmdd)
+                return [{
+                    'LocalCode': '72030',
+                    'DisclosedDate': f"{date_yyyymmdd[:4]}-{date_yyyymmdd[4:6]}-{date_yyyymmdd[6:]}",
+                    'TypeOfDocument': 'FYFinancialStatements_Consolidated_IFRS',
+                    'EarningsPerShare': '200.0',
+                    'ForecastEarningsPerShare': '',
+                    'BookValuePerShare': '2500',
+                    'ResultDividendPerShareAnnual': '60',
+                    'Profit': '1000',
+                    'Equity': '10000',
+                }]
+        
+        with tempfile.TemporaryDirectory() as temp_dir:
+            db = DatabaseManager(os.path.join(temp_dir, "test_fundamentals.db"))
+            source = FakeStatementsSource()
+            updater = FundamentalsUpdater(source, db, initial_lookback_days=7)
+            
+            updated = updater.refresh()
+            if updated == 0 or not source.requested_dates:
+                print("❌ 初回差分取得失敗")
+                return False
+            print(f"✅ 初回差分取得: {len(source.requested_dates)}営業日")
+            
+            # 同日2回目は実行されない
+            source.requested_dates.clear()
+            if updater.refresh_if_due() != 0 or source.requested_dates:
+                print("❌ 同日再実行が抑止されていません")
+                return False
+            print("✅ 同日再実行スキップ")
+            
+            # 2回目の強制実行は前日以降のみ取得
+            updater.refresh()
+            yesterday = date.today() - timedelta(days=1)
+            if any(d < yesterday.strftime('%Y%m%d') for d in source.requested_dates):
+                print(f"❌ 取得済み日付を再取得: {source.requested_dates}")
+                return False
+            print("✅ 取得済み日付の再取得なし")
+            
+            # 初回の遡り取得は1回あたりの日数を抑え、数回に分けて進める
+            source = FakeStatementsSource()
+            backfill = FundamentalsUpdater(source, DatabaseManager(os.path.join(temp_dir, "test_backfill.db")),
+                                           initial_lookback_days=60)
+            backfill.refresh_if_due(max_days=10)
+            if len(source.requested_dates) != 10 or not backfill.is_due():
+                print(f"❌ 遡り取得の分割異常: {len(source.requested_dates)}日")
+                return False
+            runs = 1
+            while backfill.is_due() and runs < 10:
+                backfill.refresh_if_due(max_days=10)
+                runs += 1
+            if backfill.is_due() or len(source.requested_dates) != len(set(source.requested_dates)):
+                print(f"❌ 遡り取得が完了しません: {runs}回")
+                return False
+            print(f"✅ 初回の遡り取得を{runs}回に分割")
+            
+            # 監視ループの定期更新はバックグラウンドで実行し、実行中は重ねて開始しない
+            import threading
+            from stock_monitor import StockMonitor
+            monitor = StockMonitor.__new__(StockMonitor)
+            monitor._background_jobs = {}
+            release = threading.Event()
+            if not monitor._start_background_job("Test", release.wait):
+                print("❌ バックグラウンド処理が開始されません")
+                return False
+            if monitor._start_background_job("Test", release.wait):
+                print("❌ 実行中の処理が重ねて開始されました")
+                return False
+            release.set()
+            monitor._background_jobs["Test"].join(timeout=5)
+            print("✅ 定期更新のバックグラウンド実行")
+            
+            fundamentals = db.get_fundamentals('72030')
+            pe_ratio, pb_ratio, roe, dividend_yield = calculate_valuation(fundamentals, 3000.0)
+            if (round(pe_ratio, 2) == 15.0 and round(pb_ratio, 2) == 1.2 and
+                    round(roe, 2) == 10.0 and round(dividend_yield, 2) == 2.0):
+                print(f"✅ ローカル指標計算: PER={pe_ratio:.1f}, PBR={pb_ratio:.1f}, ROE={roe:.1f}%, 配当={dividend_yield:.1f}%")
+            else:
+                print(f"❌ ローカル指標計算異常: {pe_ratio}, {pb_ratio}, {roe}, {dividend_yield}")
+                return False
+        
+        print("✅ 財務データ差分更新テスト完了")
+        return True
+        
+    except Exception as e:
+        print(f"❌ 財務データ差分更新テストエラー: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_streaming_pagination():
+    """ページング逐次取得テスト（オフライン）"""
+    print("\n📜 ページング逐次取得テスト開始...")
+    
+    try:
+        import json
+        from jquants_stream import JQuantsStream, last_rows
+        
+        class FakePagedClient:
+            """pagination_key付きで5ページ返すダミー"""
+            def __init__(self):
+                self.requests = []
+            
+            def _get_prices_daily_quotes_raw(self, code='', from_yyyymmdd='', to_yyyymmdd='',
+                                             date_yyyymmdd='', pagination_key=''):
+                self.requests.append((from_yyyymmdd, to_yyyymmdd, pagination_key))
+                page = int(pagination_key or 0)
+                body = {'daily_quotes': [
+                    {'Code': code, 'Date': f"2024-01-{page * 2 + i + 1:02d}", 'Close': 100.0 + page * 2 + i}
+                    for i in range(2)
+                ]}
+                if page < 4:
+                    body['pagination_key'] = str(page + 1)
+                return json.dumps(body)
+        
+        client = FakePagedClient()
+        stream = JQuantsStream(client)
+        
+        # 全ページ走査しても保持するのは末尾2行のみ
+        latest = last_rows(stream.iter_daily_quotes('72030', from_date='2024-01-01'), 2)
+        if [q['Close'] for q in latest] == [108.0, 109.0] and len(client.requests) == 5:
+            print("✅ 全5ページ逐次取得・末尾2行保持")
+        else:
+            print(f"❌ 逐次取得異常: {latest}, requests={len(client.requests)}")
+            return False
+        
+        if client.requests[0][0] == '20240101':
+            print("✅ 期間条件のプッシュダウン")
+        else:
+            print(f"❌ 期間条件が渡されていません: {client.requests[0]}")
+            return False
+        
+        # 早期終了時は残りページを取得しない
+        client.requests.clear()
+        first_rows = list(stream.iter_daily_quotes('72030', limit=3))
+        if len(first_rows) == 3 and len(client.requests) == 2:
+            print("✅ 早期終了で残りページ取得なし")
+        else:
+            print(f"❌ 早期終了異常: rows={len(first_rows)}, requests={len(client.requests)}")
+            return False
+        
+        print("✅ ページング逐次取得テスト完了")
+        return True
+        
+    except Exception as e:
+        print(f"❌ ページング逐次取得テストエラー: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_token_cache():
+    """トークンキャッシュテスト（オフライン）"""
+    print("\n🔑 トークンキャッシュテスト開始...")
+    
+    try:
+        import stat
+        import tempfile
+        import pandas as pd
+        from token_cache import JQuantsTokenCache, JQuantsTokenManager
+        
+        class FakeTokenClient:
+            """jquantsapi.Clientのトークン属性だけを模したダミー"""
+            def __init__(self):
+                self._refresh_token = 'refresh-token'
+                self._refresh_token_expire = pd.Timestamp.now(tz='UTC') + pd.Timedelta(6, unit='D')
+                self._id_token = ''
+                self._id_token_expire = pd.Timestamp.now(tz='UTC')
+                self.auth_calls = 0
+            
+            def get_id_token(self):
+                if self._id_token_expire > pd.Timestamp.now(tz='UTC'):
+                    return self._id_token
+                self.auth_calls += 1
+                self._id_token = f"id-token-{self.auth_calls}"
+                self._id_token_expire = pd.Timestamp.now(tz='UTC') + pd.Timedelta(23, unit='hour')
+                return self._id_token
+        
+        with tempfile.TemporaryDirectory() as temp_dir:
+            cache_path = os.path.join(temp_dir, "tokens.json")
+            
+            first_client = FakeTokenClient()
+            manager = JQuantsTokenManager(first_client, JQuantsTokenCache('fingerprint', cache_path))
+            if manager.restore() or not manager.refresh():
+                print("❌ 初回認証・保存失敗")
+                return False
+            print("✅ 初回認証後にキャッシュ保存")
+            
+            if os.name == 'posix' and stat.S_IMODE(os.stat(cache_path).st_mode) != 0o600:
+                print("❌ キャッシュファイル権限が0600ではありません")
+                return False
+            
+            # 2回目の起動はキャッシュから復元し、認証往復なし
+            second_client = FakeTokenClient()
+            manager = JQuantsTokenManager(second_client, JQuantsTokenCache('fingerprint', cache_path))
+            if manager.restore() and second_client.get_id_token() == 'id-token-1' and second_client.auth_calls == 0:
+                print("✅ キャッシュ復元で認証往復なし")
+            else:
+                print("❌ キャッシュ復元失敗")
+                return False
+            
+            # 認証情報が変わった場合はキャッシュを使わない
+            other = JQuantsTokenManager(FakeTokenClient(), JQuantsTokenCache('other', cache_path))
+            if other.restore():
+                print("❌ 異なる認証情報でキャッシュが使われました")
+                return False
+            print("✅ 認証情報変更時はキャッシュ無効")
+        
+        print("✅ トークンキャッシュテスト完了")
+        return True
+        
+    except Exception as e:
+        print(f"❌ トークンキャッシュテストエラー: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_symbol_registry():
+    """銘柄シンボル分類レジストリテスト"""
+    print("\n🏷️ 銘柄シンボル分類テスト開始...")
+    
+    try:
+        from symbols import SymbolRegistry, KIND_TSE, KIND_US, KIND_FUND, KIND_PSEUDO, KIND_OTHER
+        from data_sources import YahooFinanceDataSource, JQuantsDataSource, MultiDataSource
+        
+        registry = SymbolRegistry()
+        cases = [
+            # (入力, 分類, Yahoo形式, J Quants形式)
+            ('7203', KIND_TSE, '7203.T', '72030'),
+            ('7203.T', KIND_TSE, '7203.T', '72030'),
+            ('72030', KIND_TSE, '7203.T', '72030'),
+            ('314A', KIND_TSE, '314A.T', '314A0'),
+            ('12345', KIND_OTHER, '12345.T', '12345'),
+            ('AAPL', KIND_US, 'AAPL', None),
+            ('FUND_00012', KIND_FUND, None, None),
+            ('PORTFOLIO_国内', KIND_PSEUDO, None, None),
+            ('TOTAL_PORTFOLIO', KIND_PSEUDO, None, None),
+        ]
+        for symbol, kind, yahoo, jquants in cases:
+            info = registry.get(symbol)
+            if (info.kind, info.yahoo_symbol, info.jquants_code) != (kind, yahoo, jquants):
+                print(f"❌ 分類異常: {symbol} → {info}")
+                return False
+        print("✅ 分類・形式変換正常")
+        
+        # メモ化: 同じシンボルは同一インスタンス
+        if registry.get('7203') is not registry.get(' 7203 '):
+            print("❌ 分類結果がメモ化されていません")
+            return False
+        # メモは上限件数までで、古いものから捨てる
+        bounded = SymbolRegistry(max_size=3)
+        for symbol in ['7203', '6758', '9984', '8306', ' 7203 ']:
+            bounded.get(symbol)
+        if len(bounded) != 3 or bounded.get('8306').yahoo_symbol != '8306.T':
+            print(f"❌ メモの上限異常: {len(bounded)}件")
+            return False
+        print("✅ 分類結果のメモ化")
+        
+        # データソース間で日本株判定が一致する
+        jquants = JQuantsDataSource()
+        multi = MultiDataSource()
+        yahoo = YahooFinanceDataSource()
+        for symbol in ['7203', '314A', 'AAPL', 'FUND_1', 'ABCDEFGHIJKL']:
+            if jquants._is_japanese_stock(symbol) != multi._is_japanese_stock(symbol):
+                print(f"❌ データソース間で判定不一致: {symbol}")
+                return False
+        if (yahoo._format_japanese_symbol('314A') != '314A.T'
+                or yahoo._format_japanese_symbol('12345') != '12345.T'):
+            print("❌ Yahoo形式変換異常")
+            return False
+        print("✅ データソース間の判定一致")
+        
+        print("✅ 銘柄シンボル分類テスト完了")
+        return True
+        
+    except Exception as e:
+        print(f"❌ 銘柄シンボル分類テストエラー: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
 def main():
     """J Quants API詳細テスト実行"""
     print("🔬 J Quants API統合詳細テスト開始\n")
@@ -386,6 +682,10 @@ def main():
     test_results.append(("レート制限", test_rate_limiting()))
     test_results.append(("配当履歴詳細", test_dividend_history_deep()))
     test_results.append(("データ検証", test_data_validation()))
+    test_results.append(("財務データ差分更新", test_fundamentals_incremental_refresh()))
+    test_results.append(("ページング逐次取得", test_streaming_pagination()))
+    test_results.append(("トークンキャッシュ", test_token_cache()))
+    test_results.append(("銘柄シンボル分類", test_symbol_registry()))
     
     # 結果サマリー
     print("\n" + "="*60)